@@ -1,7 +1,9 @@
 from django.contrib import admin
-from .models import Brand, Product
+from .models import Brand, Product, StockMovement, StockSnapshot
 
 # Register your models here.
 
 admin.site.register(Brand)
-admin.site.register(Product)
\ No newline at end of file
+admin.site.register(Product)
+admin.site.register(StockMovement)
+admin.site.register(StockSnapshot)
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from allinventory.models import Product
+from allinventory.stock import open_stock_journal
+
+
+class Command(BaseCommand):
+    help = "Book opening stock movements for products the journal has not opened yet (run on deploy)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--enterprise', type=int, help='Only open products of this enterprise id')
+        parser.add_argument('--branch',     type=int, help='Only open products of this branch id')
+
+    def handle(self, *args, **options):
+        products = Product.objects.all()
+        if options['enterprise']:
+            products = products.filter(enterprise=options['enterprise'])
+        if options['branch']:
+            products = products.filter(branch=options['branch'])
+
+        with transaction.atomic():
+            opened = open_stock_journal(products)
+
+        self.stdout.write(self.style.SUCCESS(f"Opened the stock journal of {opened} products."))
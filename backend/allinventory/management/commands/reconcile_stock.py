@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from allinventory.models import Product
+from allinventory.stock import repair_counters, repair_journal, stock_drift
+
+
+class Command(BaseCommand):
+    help = "Compare live product counts with the stock journal and optionally repair the drift"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--enterprise', type=int, help='Only check products of this enterprise id')
+        parser.add_argument('--branch',     type=int, help='Only check products of this branch id')
+        parser.add_argument(
+            '--repair', choices=['counters', 'journal'],
+            help="'counters' resets live counts to the journal; 'journal' books adjustments to match the counts",
+        )
+        parser.add_argument('--limit', type=int, default=20, help='Drifted products to list (default: 20)')
+
+    def handle(self, *args, **options):
+        products = Product.objects.all()
+        if options['enterprise']:
+            products = products.filter(enterprise=options['enterprise'])
+        if options['branch']:
+            products = products.filter(branch=options['branch'])
+
+        with transaction.atomic():
+            drifted = list(stock_drift(products).select_for_update().order_by('id'))
+
+            for product in drifted[:options['limit']]:
+                self.stdout.write(
+                    f"{product.id:>8}  {product.name[:30]:<30}  count={product.count}  "
+                    f"journal={product.on_hand}  drift={product.drift:+d}"
+                )
+            self.stdout.write(f"{len(drifted)} products drifted.")
+
+            if drifted and options['repair'] == 'counters':
+                repair_counters(drifted)
+                self.stdout.write(self.style.SUCCESS("Live counters reset to the journal."))
+            elif drifted and options['repair'] == 'journal':
+                repair_journal(drifted)
+                self.stdout.write(self.style.SUCCESS("Adjustments booked to the journal."))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from allinventory.models import Product
+from allinventory.stock import take_stock_snapshots
+
+
+class Command(BaseCommand):
+    help = "Store each product's on-hand quantity from the stock journal (run nightly)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date',       type=str, help='Snapshot date as YYYY-MM-DD (default: yesterday)')
+        parser.add_argument('--enterprise', type=int, help='Only snapshot products of this enterprise id')
+        parser.add_argument('--branch',     type=int, help='Only snapshot products of this branch id')
+
+    def handle(self, *args, **options):
+        date = parse_date(options['date']) if options['date'] else timezone.localdate() - timezone.timedelta(days=1)
+
+        products = Product.objects.all()
+        if options['enterprise']:
+            products = products.filter(enterprise=options['enterprise'])
+        if options['branch']:
+            products = products.filter(branch=options['branch'])
+
+        rows = take_stock_snapshots(date, products)
+
+        self.stdout.write(self.style.SUCCESS(f"Stored {rows} stock snapshots for {date}."))
@@ -82,4 +82,59 @@ class IncentiveProduct(models.Model):
     branch = models.ForeignKey('enterprise.Branch', on_delete=models.CASCADE,related_name='incentive_products', null=True, blank=True)
 
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return self.name
+
+class StockMovement(models.Model):
+    """
+    Append-only journal of every change to a product's on-hand count.
+
+    Written by allinventory.stock alongside the live ``count``/``stock``
+    counters; rows are never edited, corrections are booked as new rows.
+    """
+    KIND_CHOICES = (
+        ('sale','sale'),
+        ('purchase','purchase'),
+        ('sales_return','sales_return'),
+        ('purchase_return','purchase_return'),
+        ('manufacture','manufacture'),
+        ('transfer_in','transfer_in'),
+        ('transfer_out','transfer_out'),
+        ('adjustment','adjustment'),
+        ('opening','opening'),
+        ('recount','recount'),
+    )
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_movements')
+    enterprise = models.ForeignKey('enterprise.Enterprise', on_delete=models.CASCADE, related_name='stock_movements')
+    branch = models.ForeignKey('enterprise.Branch', on_delete=models.CASCADE, related_name='stock_movements', null=True, blank=True)
+    date = models.DateField()
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    source_id = models.IntegerField(null=True, blank=True)
+    quantity = models.IntegerField()
+    value = models.FloatField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['product', 'date']),
+            models.Index(fields=['enterprise', 'branch', 'date']),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.quantity:+d} x {self.product_id} on {self.date}"
+
+
+class StockSnapshot(models.Model):
+    """
+    On-hand quantity of a product at the end of ``date``, derived from the
+    journal. Historical stock is the latest snapshot plus the movements after it.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_snapshots')
+    date = models.DateField()
+    quantity = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('product', 'date')
+
+    def __str__(self):
+        return f"{self.product_id} on {self.date}: {self.quantity}"
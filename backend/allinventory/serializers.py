@@ -3,6 +3,7 @@ from .models import Brand, Product
 from .models import ManufactureItem,Manufacture
 from .models import IncentiveProduct
 from django.db import transaction
+from .stock import apply_stock_movements, lock_products, restate_stock_movements
 
 class BrandSerializer(ModelSerializer):
     class Meta:
@@ -103,79 +104,44 @@ class ManufactureSerializer(ModelSerializer):
     def create(self, validated_data):
         """
         Creates a new Manufacture instance and its related ManufactureItems.
-        Also updates product and brand counts atomically, acquiring locks on
-        Product and Brand instances to prevent race conditions.
+        Product and brand counts move through the stock service, which locks
+        the rows in id order and updates them with F() expressions.
         """
         manufacture_items_data = validated_data.pop('manufacture_items')
         manufacture = Manufacture.objects.create(**validated_data)
 
-        for item_data in manufacture_items_data:
-            # The 'product' in validated_data is the full object.
-            # We fetch it again with a lock to be safe.
-            product = Product.objects.select_for_update().get(id=item_data.get('product').id)
-            quantity = item_data.get('quantity', 0)
-
-            # Update the Product count and stock
-            product.count += quantity
-            product.stock += quantity * product.selling_price
-            product.save()
-
-            # Acquire a lock on the Brand row to prevent race conditions
-            brand = Brand.objects.select_for_update().get(id=product.brand_id)
-            brand.count += quantity
-            brand.stock += quantity * product.selling_price
-            brand.save()
-
-            # Create the ManufactureItem using the validated data
-            ManufactureItem.objects.create(manufacture=manufacture, **item_data)
-        
+        products = lock_products(item_data.get('product').id for item_data in manufacture_items_data)
+        items = [ManufactureItem(manufacture=manufacture, **item_data) for item_data in manufacture_items_data]
+        ManufactureItem.objects.bulk_create(items)
+        apply_stock_movements(
+            ((products[item.product_id], item.quantity or 0) for item in items),
+            'manufacture', manufacture.date, manufacture.id,
+        )
+
         return manufacture
 
     @transaction.atomic
     def update(self, instance, validated_data):
         manufacture_items_data = validated_data.pop('manufacture_items', [])
+        old_date = instance.date
 
         # The super().update() handles the simple fields on the Manufacture model
         instance = super().update(instance, validated_data)
 
-        # First, reverse the counts from the old items
-        for old_item in instance.manufacture_items.all():
-            # Get the product with a lock to prevent race conditions
-            product = Product.objects.select_for_update().get(id=old_item.product.id)
-            quantity = old_item.quantity
-
-            product.count -= quantity
-            product.stock -= quantity * product.selling_price
-            product.save()
-
-            # Acquire a lock on the Brand row to prevent race conditions
-            brand = Brand.objects.select_for_update().get(id=product.brand_id)
-            brand.count -= quantity
-            brand.stock -= quantity * product.selling_price
-            brand.save()
-
+        old_items = list(instance.manufacture_items.all())
+        products = lock_products(
+            [item.product_id for item in old_items]
+            + [item_data.get('product').id for item_data in manufacture_items_data]
+        )
 
-        # Delete the old items
+        # Reverse the old items and apply the new ones in one batch
+        reversals = [(products[item.product_id], -(item.quantity or 0)) for item in old_items]
         instance.manufacture_items.all().delete()
-        
-        # Then, create the new items and update counts
-        for item_data in manufacture_items_data:
-            # Get the product with a lock to prevent race conditions
-            product = Product.objects.select_for_update().get(id=item_data.get('product').id)
-            quantity = item_data.get('quantity', 0)
-
-            product.count += quantity
-            product.stock += quantity * product.selling_price
-            product.save()
 
-            # Acquire a lock on the Brand row to prevent race conditions
-            brand = Brand.objects.select_for_update().get(id=product.brand_id)
-            brand.count += quantity
-            brand.stock += quantity * product.selling_price
-            brand.save()
-
-            # Create the new item
-            ManufactureItem.objects.create(manufacture=instance, **item_data)
+        items = [ManufactureItem(manufacture=instance, **item_data) for item_data in manufacture_items_data]
+        ManufactureItem.objects.bulk_create(items)
+        additions = [(products[item.product_id], item.quantity or 0) for item in items]
+        restate_stock_movements(reversals, additions, 'manufacture', old_date, instance.date, instance.id)
 
         return instance
 
@@ -184,27 +150,13 @@ class ManufactureSerializer(ModelSerializer):
         """
         Deletes a Manufacture instance and reverses the stock changes.
         """
-        with transaction.atomic():
-            for manufacture_item in instance.manufacture_items.all():
-                # Get the product with a lock to prevent race conditions
-                product = Product.objects.select_for_update().get(id=manufacture_item.product.id)
-                quantity = manufacture_item.quantity
-
-                product.count -= quantity
-                product.stock -= quantity * product.selling_price
-                product.save()
-
-                # Lock the brand and reverse the count
-                brand = Brand.objects.select_for_update().get(id=product.brand_id)
-                brand.count -= quantity 
-                brand.stock -= quantity * product.selling_price
-                brand.save()
-
-                # Now delete the item
-                manufacture_item.delete()
-            
-            # Finally, delete the Manufacture instance itself
-            instance.delete()
+        items = list(instance.manufacture_items.select_related('product'))
+        apply_stock_movements(
+            ((item.product, -(item.quantity or 0)) for item in items),
+            'manufacture', instance.date, instance.id,
+        )
+        instance.manufacture_items.all().delete()
+        instance.delete()
 
 class IncentiveProductSerializer(ModelSerializer):
     class Meta:
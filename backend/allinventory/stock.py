@@ -0,0 +1,234 @@
+from __future__ import annotations
+
+import datetime
+from collections import defaultdict
+
+from django.db.models import Case, DateField, F, FloatField, IntegerField, Min, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Brand, Product, StockMovement, StockSnapshot
+
+
+# Products without a snapshot replay the journal from its first row.
+_BEFORE_JOURNAL = Value(datetime.date.min, output_field=DateField())
+
+
+def lock_products(product_ids) -> dict[int, Product]:
+    """
+    Lock the given products in one ``SELECT ... FOR UPDATE``.
+
+    Rows are locked in id order so two checkouts touching the same products
+    always queue up in the same order instead of deadlocking.
+    """
+    products = Product.objects.select_for_update().filter(id__in=set(product_ids)).order_by('id')
+    return {product.id: product for product in products}
+
+
+def _per_row(deltas: dict, index: int, output_field):
+    return Case(
+        *[When(pk=pk, then=Value(delta[index])) for pk, delta in deltas.items()],
+        default=Value(0),
+        output_field=output_field,
+    )
+
+
+def _apply_deltas(model, deltas: dict) -> None:
+    deltas = {pk: delta for pk, delta in deltas.items() if delta[0] or delta[1]}
+    if not deltas:
+        return
+    rows = model.objects.filter(pk__in=list(deltas))
+    # Take the row locks in id order first so concurrent batches over
+    # overlapping rows cannot deadlock inside the UPDATE itself.
+    list(rows.select_for_update().order_by('pk').values_list('pk', flat=True))
+    rows.update(
+        count=Coalesce(F('count'), Value(0)) + _per_row(deltas, 0, IntegerField()),
+        stock=Coalesce(F('stock'), Value(0)) + _per_row(deltas, 1, FloatField()),
+    )
+
+
+def _move_counters(movements) -> dict:
+    product_deltas = defaultdict(lambda: [0, 0])
+    brand_deltas = defaultdict(lambda: [0, 0])
+    products = {}
+    for product, quantity in movements:
+        if not quantity:
+            continue
+        value = quantity * (product.selling_price or 0)
+        products[product.id] = product
+        for deltas, key in ((product_deltas, product.id), (brand_deltas, product.brand_id)):
+            deltas[key][0] += quantity
+            deltas[key][1] += value
+
+    _apply_deltas(Product, product_deltas)
+    _apply_deltas(Brand, brand_deltas)
+    return {pk: (products[pk], delta) for pk, delta in product_deltas.items() if delta[0]}
+
+
+def _record_movements(moved: dict, kind: str, date, source_id=None) -> None:
+    if not moved:
+        return
+    StockMovement.objects.bulk_create([
+        StockMovement(
+            product_id=pk, enterprise_id=product.enterprise_id, branch_id=product.branch_id,
+            date=date, kind=kind, source_id=source_id, quantity=quantity, value=value,
+        )
+        for pk, (product, (quantity, value)) in moved.items()
+    ])
+    # A back-dated movement also shifts every snapshot taken on or after its date.
+    StockSnapshot.objects.filter(product_id__in=list(moved), date__gte=date).update(
+        quantity=F('quantity') + Case(
+            *[When(product_id=pk, then=Value(delta[0])) for pk, (_, delta) in moved.items()],
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+    )
+
+
+def apply_stock_movements(movements, kind: str, date=None, source_id=None) -> None:
+    """
+    Apply signed quantity moves to product and brand counters.
+
+    ``movements`` is an iterable of ``(product, quantity)`` pairs; positive
+    quantities add stock, negative ones take it away. Stock value moves by
+    ``quantity * product.selling_price``. Moves are summed per product and per
+    brand and each table is then written with a single
+    ``UPDATE ... SET count = count + CASE ...`` statement, so concurrent
+    writers never overwrite each other's counts.
+
+    The net move per product is also appended to the ``StockMovement``
+    journal under ``kind`` on ``date`` (today when not given).
+    """
+    moved = _move_counters(movements)
+    _record_movements(moved, kind, date or timezone.localdate(), source_id)
+
+
+def restate_stock_movements(reversals, additions, kind: str, old_date, new_date, source_id=None) -> None:
+    """
+    Apply an edited document: ``reversals`` undo its old lines and
+    ``additions`` book the new ones.
+
+    When the document keeps its date both sides are netted before anything
+    is written, so an unchanged line leaves no trace in the journal.
+    """
+    if old_date == new_date:
+        apply_stock_movements(list(reversals) + list(additions), kind, new_date, source_id)
+    else:
+        apply_stock_movements(reversals, kind, old_date, source_id)
+        apply_stock_movements(additions, kind, new_date, source_id)
+
+
+def revalue_product(product_id) -> None:
+    """
+    Re-price a product's stock at ``count * selling_price`` and carry the
+    difference over to its brand.
+    """
+    product = Product.objects.select_for_update().get(pk=product_id)
+    old_stock = product.stock or 0
+    new_stock = (product.count or 0) * (product.selling_price or 0)
+    Product.objects.filter(pk=product.pk).update(stock=new_stock)
+    Brand.objects.filter(pk=product.brand_id).update(
+        stock=Coalesce(F('stock'), Value(0.0)) + (new_stock - old_stock)
+    )
+
+
+def _journal_total(**filters):
+    movements = StockMovement.objects.filter(product=OuterRef('pk'), **filters)
+    return Coalesce(
+        Subquery(movements.values('product').annotate(total=Sum('quantity')).values('total')[:1]),
+        Value(0),
+    )
+
+
+def stock_on_hand(date, products=None):
+    """
+    Annotate ``products`` with ``on_hand``: the quantity held at the end of
+    ``date`` according to the journal.
+
+    Each product starts from its latest snapshot on or before ``date`` and
+    adds only the movements after it, so the work per product is bounded by
+    the snapshot interval rather than by its whole history.
+    """
+    products = Product.objects.all() if products is None else products
+    snapshots = StockSnapshot.objects.filter(product=OuterRef('pk'), date__lte=date).order_by('-date')
+    products = products.annotate(
+        snapshot_date=Coalesce(Subquery(snapshots.values('date')[:1]), _BEFORE_JOURNAL),
+        snapshot_quantity=Coalesce(Subquery(snapshots.values('quantity')[:1]), Value(0)),
+    )
+    return products.annotate(
+        on_hand=F('snapshot_quantity') + _journal_total(date__gt=OuterRef('snapshot_date'), date__lte=date),
+    )
+
+
+def take_stock_snapshots(date, products=None) -> int:
+    """Store the journal's on-hand quantity at the end of ``date`` for ``products``."""
+    rows = stock_on_hand(date, products).values_list('pk', 'on_hand')
+    snapshots = [StockSnapshot(product_id=pk, date=date, quantity=on_hand) for pk, on_hand in rows.iterator()]
+    StockSnapshot.objects.bulk_create(
+        snapshots, batch_size=1000,
+        update_conflicts=True, unique_fields=['product', 'date'], update_fields=['quantity'],
+    )
+    return len(snapshots)
+
+
+def stock_drift(products=None):
+    """Products whose live ``count`` differs from the journal, annotated with ``drift``."""
+    on_hand = stock_on_hand(datetime.date.max, products)
+    return on_hand.annotate(drift=Coalesce(F('count'), Value(0)) - F('on_hand')).exclude(drift=0)
+
+
+def repair_counters(drifted) -> None:
+    """Move the live counters (and their brands) back to the journal's quantities."""
+    _move_counters((product, -product.drift) for product in drifted)
+
+
+def repair_journal(drifted, date=None) -> None:
+    """Book ``adjustment`` movements so the journal agrees with the live counters."""
+    moved = {
+        product.pk: (product, [product.drift, product.drift * (product.selling_price or 0)])
+        for product in drifted
+    }
+    _record_movements(moved, 'adjustment', date or timezone.localdate())
+
+
+def record_recount(product, old_count, date=None) -> None:
+    """
+    Book a hand edit of ``product.count`` from ``old_count`` as a ``recount``
+    movement. Only the edit itself is journalled; any drift that was already
+    there is left for ``reconcile_stock`` to report.
+    """
+    change = (product.count or 0) - (old_count or 0)
+    if change:
+        _record_movements(
+            {product.pk: (product, [change, change * (product.selling_price or 0)])},
+            'recount', date or timezone.localdate(),
+        )
+
+
+def open_stock_journal(products=None, date=None) -> int:
+    """
+    Book one ``opening`` movement for each product that has none yet, for
+    whatever its live count holds beyond the journal (zero for a product that
+    matches). Run once on deploy for products that predate the journal, and
+    when a product is created.
+
+    The opening is dated the day before the product's first movement, so
+    ``stock_on_hand`` is right from then on, or ``date`` (today) when it
+    has none. Returns the number of products opened.
+    """
+    products = Product.objects.all() if products is None else products
+    unopened = stock_on_hand(datetime.date.max, products.exclude(stock_movements__kind='opening')).annotate(
+        first_movement=Subquery(
+            StockMovement.objects.filter(product=OuterRef('pk')).values('product')
+            .annotate(first=Min('date')).values('first')[:1]
+        ),
+    )
+    date = date or timezone.localdate()
+    by_date = defaultdict(dict)
+    for product in unopened.order_by('id'):
+        drift = (product.count or 0) - product.on_hand
+        opened_on = product.first_movement - datetime.timedelta(days=1) if product.first_movement else date
+        by_date[opened_on][product.pk] = (product, [drift, drift * (product.selling_price or 0)])
+    for opened_on, moved in by_date.items():
+        _record_movements(moved, 'opening', opened_on)
+    return sum(len(moved) for moved in by_date.values())
@@ -18,4 +18,6 @@ urlpatterns = [
     path('incentiveproduct/', views.IncentiveProductView.as_view()),
     path('incentiveproduct/<int:pk>/', views.IncentiveProductView.as_view()),
     path('incentiveproduct/branch/<int:branch>/', views.IncentiveProductView.as_view()),
+    path('stock-on-hand/', views.StockOnHandView.as_view()),
+    path('stock-on-hand/branch/<int:branch>/', views.StockOnHandView.as_view()),
 ]
@@ -1,6 +1,6 @@
 from django.shortcuts import render
 from rest_framework.response import Response
-from rest_framework.pagination import PageNumberPagination
+from alltransactions.pagination import KeysetPagination
 from rest_framework import status
 from rest_framework.views import APIView
 from .models import Product,Brand
@@ -15,6 +15,10 @@ import io
 from django.http import FileResponse
 from rest_framework.permissions import IsAuthenticated
 from .models import ManufactureItem, Manufacture
+from .stock import open_stock_journal, record_recount, revalue_product, stock_on_hand
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date
 
 # Create your views here.
 
@@ -49,7 +53,10 @@ class ProductView(APIView):
         data['enterprise'] = request.user.employee.enterprise.id
         serializer = ProductSerializer(data=data, context={'request': request})
         if serializer.is_valid():
-            serializer.save()
+            with transaction.atomic():
+                product = serializer.save()
+                # Opening stock enters the journal as its opening movement
+                open_stock_journal(Product.objects.filter(pk=product.pk))
             return Response(serializer.data)
         return Response(serializer.errors)
     
@@ -67,13 +74,14 @@ class ProductView(APIView):
 
         serializer = ProductSerializer(product,data=data,partial=True, context={'request': request})
         if serializer.is_valid():
-            serializer.save()
-            old_stock = product.stock if product.stock else 0
-            product.stock = product.count * product.selling_price
-            product.brand.stock = product.brand.stock - old_stock + product.stock
-            product.brand.save()
-            product.save()
-            return Response(serializer.data)
+            old_count = product.count
+            with transaction.atomic():
+                serializer.save()
+                revalue_product(product.id)
+                # A hand-edited count is booked as a recount
+                record_recount(product, old_count)
+            product.refresh_from_db()
+            return Response(ProductSerializer(product, context={'request': request}).data)
         return Response(serializer.errors)
     
     def delete(self,request,pk,format=None):
@@ -199,7 +207,6 @@ class ManufactureView(APIView):
         product = request.GET.get('search')
 
         manufactures = Manufacture.objects.filter(branch=branch, enterprise=request.user.employee.enterprise)
-        manufactures = manufactures.order_by('-id')
         if pk:
             try:
                 manufacture = Manufacture.objects.get(id=pk)
@@ -212,7 +219,8 @@ class ManufactureView(APIView):
         if product:
             manufactures = Manufacture.objects.filter(manufacture_items__product__name__icontains=product,branch = branch, enterprise=request.user.employee.enterprise)
 
-        paginator = PageNumberPagination()
+        paginator = KeysetPagination()
+        paginator.ordering = ('-id',)
         paginator.page_size = 10  # Set the page size here
         paginated_manufactures = paginator.paginate_queryset(manufactures, request)
 
@@ -281,8 +289,8 @@ class IncentiveProductView(APIView):
         if user_branch:
             incentive_products = incentive_products.filter(branch=user_branch)
 
-        incentive_products = incentive_products.order_by('name')
-        paginator = PageNumberPagination()
+        paginator = KeysetPagination()
+        paginator.ordering = ('name', 'id')
         paginator.page_size = 1000 # Fix this later
         paginated = paginator.paginate_queryset(incentive_products, request)
         serializer = IncentiveProductSerializer(paginated, many=True)
@@ -322,4 +330,30 @@ class IncentiveProductView(APIView):
             return Response(status=status.HTTP_404_NOT_FOUND)
         serializer = IncentiveProductSerializer(incentive_product)
         serializer.delete(incentive_product)
-        return Response(status=status.HTTP_204_NO_CONTENT)
\ No newline at end of file
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+class StockOnHandView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, branch=None):
+        date = parse_date(request.GET.get('date') or '') or timezone.localdate()
+
+        products = Product.objects.filter(enterprise=request.user.employee.enterprise)
+        if branch:
+            products = products.filter(branch=branch)
+        search = request.GET.get('search')
+        if search:
+            products = products.filter(name__icontains=search)
+        products = stock_on_hand(date, products)
+
+        paginator = KeysetPagination()
+        paginator.ordering = ('id',)
+        paginator.page_size = 50
+        page = paginator.paginate_queryset(products, request)
+        return paginator.get_paginated_response({
+            'date': date,
+            'products': [
+                {'id': product.id, 'name': product.name, 'uid': product.uid, 'on_hand': product.on_hand}
+                for product in page
+            ],
+        })
@@ -1,6 +1,14 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class AlltransactionsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'alltransactions'
+
+    def ready(self):
+        from .search import install_trigram_indexes
+        from .signals import connect_checkpoint_signals
+
+        post_migrate.connect(install_trigram_indexes, sender=self)
+        connect_checkpoint_signals()
@@ -0,0 +1,217 @@
+from __future__ import annotations
+
+import datetime
+from collections import defaultdict
+from dataclasses import dataclass
+
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models.functions import TruncMonth
+
+from enterprise.models import Employee
+
+from .models import (
+    NCM,
+    BalanceCheckpoint,
+    Debtor,
+    DebtorTransaction,
+    EmployeeTransactions,
+    NCMTransaction,
+    Vendor,
+    VendorTransactions,
+)
+
+
+@dataclass(frozen=True)
+class Party:
+    model: type
+    transactions: type
+    field: str
+    # How the balance moves with a transaction's amount, as on the statement
+    # and on ``due``: vendors and debtors are paid down, employees and NCM accrue.
+    sign: int
+
+    @property
+    def party_field(self) -> str:
+        return f'{self.field}_id'
+
+
+PARTIES = {
+    'vendor': Party(Vendor, VendorTransactions, 'vendor', -1),
+    'debtor': Party(Debtor, DebtorTransaction, 'debtor', -1),
+    'employee': Party(Employee, EmployeeTransactions, 'employee', 1),
+    'ncm': Party(NCM, NCMTransaction, 'ncm', 1),
+}
+PARTY_OF_TRANSACTION = {party.transactions: name for name, party in PARTIES.items()}
+
+
+def month_start(day: datetime.date) -> datetime.date:
+    return day.replace(day=1)
+
+
+def _next_month(month: datetime.date) -> datetime.date:
+    return (month + datetime.timedelta(days=32)).replace(day=1)
+
+
+def _moved(party: Party, party_pk, since, until) -> float:
+    """Signed sum of the party's transactions dated in ``[since, until)``; ``since=None`` is the beginning."""
+    transactions = party.transactions.objects.filter(**{party.party_field: party_pk}, date__lt=until)
+    if since is not None:
+        transactions = transactions.filter(date__gte=since)
+    total = transactions.aggregate(total=Sum('amount'))['total']
+    return party.sign * float(total or 0)
+
+
+def opening_balance(name: str, party_pk, day: datetime.date) -> float:
+    """
+    Balance of a party before ``day``: the latest checkpoint at or before
+    its month plus that month's transactions up to ``day``.
+
+    When the month has no checkpoint yet (none was built, or a change
+    dropped it) the gap from the previous one is summed once and stored.
+    """
+    party = PARTIES[name]
+    month = month_start(day)
+    checkpoint = BalanceCheckpoint.objects.filter(
+        party=name, party_pk=party_pk, month__lte=month,
+    ).order_by('-month').values_list('month', 'balance').first()
+    since, balance = checkpoint or (None, 0.0)
+
+    if since != month:
+        balance += _moved(party, party_pk, since, month)
+        enterprise_id = party.model.objects.filter(pk=party_pk).values_list('enterprise_id', flat=True).first()
+        if enterprise_id is not None:
+            BalanceCheckpoint.objects.bulk_create([
+                BalanceCheckpoint(enterprise_id=enterprise_id, party=name, party_pk=party_pk, month=month,
+                                  balance=balance),
+            ], ignore_conflicts=True)
+    return balance + _moved(party, party_pk, month, day)
+
+
+def _drop_checkpoints(name: str, party_pk, day) -> None:
+    BalanceCheckpoint.objects.filter(party=name, party_pk=party_pk, month__gt=day).delete()
+
+
+def invalidate_checkpoints(name: str, party_pk, day) -> None:
+    """
+    Drop the checkpoints a transaction of the party dated ``day`` is part of.
+
+    Dropped again once the transaction commits, in case a statement read
+    the old rows and stored a checkpoint from them in the meantime.
+    """
+    if party_pk is None or day is None:
+        return
+    _drop_checkpoints(name, party_pk, day)
+    transaction.on_commit(lambda: _drop_checkpoints(name, party_pk, day))
+
+
+def _scoped(queryset, enterprise):
+    return queryset if enterprise is None else queryset.filter(enterprise=enterprise)
+
+
+@transaction.atomic
+def build_balance_checkpoints(names=None, enterprise=None) -> int:
+    """
+    Recompute the checkpoints of every party from its transactions, one
+    GROUP BY per kind of party: a checkpoint at the start of its first month
+    with transactions and after each such month. Returns the number of
+    checkpoints written.
+    """
+    written = 0
+    for name in names or PARTIES:
+        party = PARTIES[name]
+        _scoped(BalanceCheckpoint.objects.filter(party=name), enterprise).delete()
+
+        months = _scoped(party.transactions.objects.filter(**{f'{party.party_field}__isnull': False}), enterprise)
+        months = months.annotate(month=TruncMonth('date')).values(
+            party.party_field, 'enterprise_id', 'month',
+        ).annotate(total=Sum('amount')).values_list(
+            party.party_field, 'enterprise_id', 'month', 'total',
+        ).order_by(party.party_field, 'month')
+
+        balances = defaultdict(float)
+        checkpoints = {}
+        for party_pk, enterprise_id, month, total in months:
+            if party_pk not in balances:
+                checkpoints[(party_pk, month)] = BalanceCheckpoint(
+                    enterprise_id=enterprise_id, party=name, party_pk=party_pk, month=month, balance=0,
+                )
+            balances[party_pk] += party.sign * float(total or 0)
+            key = (party_pk, _next_month(month))
+            checkpoints[key] = BalanceCheckpoint(
+                enterprise_id=enterprise_id, party=name, party_pk=party_pk, month=key[1],
+                balance=balances[party_pk],
+            )
+        BalanceCheckpoint.objects.bulk_create(checkpoints.values(), batch_size=1000)
+        written += len(checkpoints)
+    return written
+
+
+@dataclass
+class DueDrift:
+    party: str
+    party_pk: int
+    name: str
+    stored: float | None
+    expected: float
+
+
+def find_due_drift(names=None, enterprise=None, tolerance=0.005) -> list[DueDrift]:
+    """
+    Parties whose stored ``due`` differs from what their transactions add
+    up to, with one GROUP BY per kind of party.
+    """
+    drift = []
+    for name in names or PARTIES:
+        party = PARTIES[name]
+        if name == 'ncm':
+            totals = _ncm_totals(enterprise)
+        else:
+            totals = dict(
+                _scoped(party.transactions.objects.filter(**{f'{party.party_field}__isnull': False}), enterprise)
+                .values(party.party_field).annotate(total=Sum('amount'))
+                .values_list(party.party_field, 'total').order_by()
+            )
+        for pk, label, due in _scoped(party.model.objects.all(), enterprise).values_list('pk', _label(name), 'due'):
+            expected = party.sign * float(totals.get(pk) or 0)
+            if abs((due or 0) - expected) > tolerance:
+                drift.append(DueDrift(name, pk, label, due, expected))
+    return drift
+
+
+def _ncm_totals(enterprise) -> dict:
+    """
+    NCM transactions summed per account the way NCMTransactionSerializer
+    moves ``due``: onto the first NCM account of the transaction's branch,
+    whatever its ``ncm`` (which may be unset).
+    """
+    accounts = {}
+    for pk, branch_id in NCM.objects.order_by('pk').values_list('pk', 'branch_id'):
+        accounts.setdefault(branch_id, pk)
+    totals = defaultdict(float)
+    rows = _scoped(NCMTransaction.objects.all(), enterprise).values('branch_id').annotate(
+        total=Sum('amount'),
+    ).values_list('branch_id', 'total').order_by()
+    for branch_id, total in rows:
+        if branch_id in accounts:
+            totals[accounts[branch_id]] += total or 0
+    return totals
+
+
+def _label(name: str) -> str:
+    return 'branch__name' if name == 'ncm' else 'name'
+
+
+@transaction.atomic
+def fix_due_drift(drift: list[DueDrift]) -> int:
+    """Set each drifted ``due`` to the value its transactions add up to."""
+    by_party = defaultdict(dict)
+    for entry in drift:
+        by_party[entry.party][entry.party_pk] = entry.expected
+    for name, expected in by_party.items():
+        model = PARTIES[name].model
+        parties = list(model.objects.filter(pk__in=expected))
+        for party in parties:
+            party.due = expected[party.pk]
+        model.objects.bulk_update(parties, ['due'], batch_size=1000)
+    return len(drift)
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Max
+
+from .models import BillNumberCounter, SalesTransaction
+
+# Sales bill numbers come from one counter row per enterprise (or per branch,
+# with ``SALES_BILL_NUMBERS_PER_BRANCH``), moved with a single
+# ``UPDATE ... RETURNING``. The row stays locked until the caller's
+# transaction ends, so two tills never get the same number, and a sale that
+# rolls back gives its number back. A counter is created on first use,
+# starting after the highest bill number already recorded.
+
+
+def _branch_scope(branch_id):
+    return branch_id if getattr(settings, 'SALES_BILL_NUMBERS_PER_BRANCH', False) else None
+
+
+def _counter(enterprise_id, branch_id):
+    return BillNumberCounter.objects.filter(enterprise_id=enterprise_id, branch_id=branch_id)
+
+
+def _ensure_counter(enterprise_id, branch_id) -> None:
+    if _counter(enterprise_id, branch_id).exists():
+        return
+    sales = SalesTransaction.objects.filter(enterprise_id=enterprise_id)
+    if branch_id is not None:
+        sales = sales.filter(branch_id=branch_id)
+    highest = sales.aggregate(highest=Max('bill_no'))['highest'] or 0
+    # Another worker may be creating it too; either row starts in the same place
+    BillNumberCounter.objects.bulk_create([
+        BillNumberCounter(enterprise_id=enterprise_id, branch_id=branch_id, last_bill_no=highest),
+    ], ignore_conflicts=True)
+
+
+def _advance(enterprise_id, branch_id, count: int):
+    """Move the counter by ``count`` and return its new value, or ``None`` when it doesn't exist yet."""
+    table = connection.ops.quote_name(BillNumberCounter._meta.db_table)
+    branch_condition = 'branch_id IS NULL' if branch_id is None else 'branch_id = %s'
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {table} SET last_bill_no = last_bill_no + %s "
+            f"WHERE enterprise_id = %s AND {branch_condition} RETURNING last_bill_no",
+            [count, enterprise_id] + ([] if branch_id is None else [branch_id]),
+        )
+        row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def allocate_bill_numbers(enterprise_id, branch_id=None, count: int = 1) -> range:
+    """
+    Reserve ``count`` consecutive bill numbers and return them. Called inside
+    a transaction the numbers are only taken if it commits.
+    """
+    if count < 1:
+        raise ValueError("count must be at least 1")
+    branch_id = _branch_scope(branch_id)
+    with transaction.atomic():
+        last = _advance(enterprise_id, branch_id, count)
+        if last is None:
+            _ensure_counter(enterprise_id, branch_id)
+            last = _advance(enterprise_id, branch_id, count)
+    return range(last - count + 1, last + 1)
+
+
+def next_bill_number(enterprise_id, branch_id=None) -> int:
+    """The number the next allocation would return, without reserving it."""
+    branch_id = _branch_scope(branch_id)
+    _ensure_counter(enterprise_id, branch_id)
+    return _counter(enterprise_id, branch_id).values_list('last_bill_no', flat=True).get() + 1
+
+
+def claim_bill_number(enterprise_id, branch_id, bill_no: int) -> None:
+    """
+    Record a bill number chosen by hand (or taken from a reserved block), so
+    the counter never hands it out later.
+    """
+    branch_id = _branch_scope(branch_id)
+    _ensure_counter(enterprise_id, branch_id)
+    _counter(enterprise_id, branch_id).filter(last_bill_no__lt=bill_no).update(last_bill_no=bill_no)
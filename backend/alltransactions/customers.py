@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, Max, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, NullIf
+
+from .models import Customer, Sales, SalesTransaction
+
+# Stored customer totals: lifetime spend (net of returns), number of visits
+# (sales) and the date of the last one, over the enterprise's sales to the
+# customer's phone number.
+#
+# Like the daily ledger, each sale's contribution is snapshotted before and
+# after a change and only the difference is written, with F() increments.
+
+_ZERO = Value(0.0, output_field=FloatField())
+
+# A customer key is (enterprise_id, phone_number).
+CustomerKey = tuple
+
+
+def _net_spend(prefix: str = ''):
+    """What a sales line still brings in once its returned quantity is taken out."""
+    total_price = F(f'{prefix}total_price')
+    returned = Coalesce(F(f'{prefix}returned_quantity'), 0) * total_price / NullIf(F(f'{prefix}quantity'), 0)
+    return Coalesce(Sum(total_price - Coalesce(returned, _ZERO), output_field=FloatField()), _ZERO)
+
+
+def snapshot_customer_spend(sales_transaction) -> dict[CustomerKey, dict]:
+    """Current contribution of one sale to its customer's totals."""
+    if not sales_transaction.phone_number:
+        return {}
+    spent = Sales.objects.filter(sales_transaction=sales_transaction).aggregate(spent=_net_spend())['spent']
+    return {
+        (sales_transaction.enterprise_id, sales_transaction.phone_number): {
+            'spent': spent,
+            'date': sales_transaction.date,
+        }
+    }
+
+
+def _latest_visit(enterprise_id, phone_number):
+    return Subquery(
+        SalesTransaction.objects.filter(enterprise_id=enterprise_id, phone_number=phone_number)
+        .order_by('-date').values('date')[:1]
+    )
+
+
+def apply_customer_delta(before: dict[CustomerKey, dict], after: dict[CustomerKey, dict]) -> None:
+    """
+    Move customer totals from a sale's ``before`` snapshot to its ``after``
+    one. Pass an empty ``before`` for a new sale and an empty ``after`` for a
+    deleted one.
+    """
+    for key in set(before) | set(after):
+        old = before.get(key)
+        new = after.get(key)
+        updates = {}
+
+        spent = (new['spent'] if new else 0) - (old['spent'] if old else 0)
+        if spent:
+            updates['total_spent'] = Coalesce(F('total_spent'), _ZERO) + spent
+        visits = (1 if new else 0) - (1 if old else 0)
+        if visits:
+            updates['visit_count'] = F('visit_count') + visits
+
+        enterprise_id, phone_number = key
+        if new and (old is None or new['date'] >= old['date']):
+            updates['last_visit'] = Case(
+                When(Q(last_visit__isnull=True) | Q(last_visit__lt=new['date']), then=Value(new['date'])),
+                default=F('last_visit'),
+            )
+        elif old:
+            # The sale may have been the latest visit
+            updates['last_visit'] = _latest_visit(enterprise_id, phone_number)
+
+        if updates:
+            Customer.objects.filter(enterprise_id=enterprise_id, phone_number=phone_number).update(**updates)
+
+
+def _customer_rows(sales):
+    return sales.exclude(phone_number__isnull=True).exclude(phone_number='').values(
+        'enterprise_id', 'phone_number',
+    ).annotate(
+        spent=_net_spend('sales__'),
+        visits=Count('id', distinct=True),
+        latest=Max('date'),
+    ).order_by()
+
+
+def refresh_customer_totals(customer) -> None:
+    """Compute one customer's totals from its sales, e.g. when the customer is created."""
+    row = _customer_rows(SalesTransaction.objects.filter(
+        enterprise_id=customer.enterprise_id, phone_number=customer.phone_number,
+    )).order_by('phone_number').first()
+    customer.total_spent = row['spent'] if row else 0
+    customer.visit_count = row['visits'] if row else 0
+    customer.last_visit = row['latest'] if row else None
+    customer.save(update_fields=['total_spent', 'visit_count', 'last_visit'])
+
+
+@transaction.atomic
+def rebuild_customer_totals(enterprise=None) -> int:
+    """Recompute every customer's totals with one GROUP BY over the sales. Returns the customers updated."""
+    customers = Customer.objects.all()
+    sales = SalesTransaction.objects.all()
+    if enterprise is not None:
+        customers = customers.filter(enterprise=enterprise)
+        sales = sales.filter(enterprise=enterprise)
+
+    totals = {(row['enterprise_id'], row['phone_number']): row for row in _customer_rows(sales)}
+    customers = list(customers)
+    for customer in customers:
+        row = totals.get((customer.enterprise_id, customer.phone_number))
+        customer.total_spent = row['spent'] if row else 0
+        customer.visit_count = row['visits'] if row else 0
+        customer.last_visit = row['latest'] if row else None
+    Customer.objects.bulk_update(customers, ['total_spent', 'visit_count', 'last_visit'], batch_size=1000)
+    return len(customers)
@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import csv
+import tempfile
+
+from django.http import FileResponse, StreamingHttpResponse
+from openpyxl import Workbook
+
+
+EXPORT_FORMATS = ('csv', 'xlsx')
+
+# Rows are pulled from the database in chunks of this size when iterating reports.
+REPORT_CHUNK_SIZE = 2000
+
+
+class ReportExportMixin:
+    """
+    Lets ``?format=csv`` / ``?format=xlsx`` reach the view.
+
+    DRF treats ``format`` as a renderer override and would 404 before the view
+    runs; for export formats we fall back to the default renderer instead and
+    let the view stream the file itself.
+    """
+
+    def perform_content_negotiation(self, request, force=False):
+        if request.GET.get('format') in EXPORT_FORMATS:
+            force = True
+        return super().perform_content_negotiation(request, force)
+
+
+class SalesReport:
+    """
+    Line-by-line sales report over a ``Sales`` queryset.
+
+    ``rows()`` yields one dict per line and accumulates the totals as it goes,
+    so ``totals()`` is only complete once ``rows()`` has been exhausted.
+    """
+
+    columns = [
+        'id', 'bill_no', 'date', 'brand', 'quantity', 'product', 'unit_price',
+        'line_subtotal', 'discount', 'total_price', 'method', 'transaction_id',
+    ]
+
+    def __init__(self, sales):
+        self.sales = sales.select_related('sales_transaction', 'product__brand')
+        self.count = 0
+        self.subtotal_sales = 0  # sum before discount
+        self.total_discount = 0  # sum of per-line discount amounts
+        self.cash_sales = 0
+        self.card_sales = 0
+        self.online_sales = 0
+        self.write_off = 0
+
+    def rows(self):
+        seen_transactions = set()
+        for sale in self.sales.iterator(chunk_size=REPORT_CHUNK_SIZE):
+            sales_transaction = sale.sales_transaction
+            if sales_transaction.id not in seen_transactions:
+                seen_transactions.add(sales_transaction.id)
+                if sales_transaction.is_ncm == False and sales_transaction.method != "loyalty":
+                    self.write_off += (sales_transaction.total_amount or 0) - (sales_transaction.amount_paid or 0)
+                self.cash_sales += sales_transaction.cash_amount or 0
+                self.card_sales += sales_transaction.card_amount or 0
+                self.online_sales += sales_transaction.online_amount or 0
+            line_subtotal = (sale.unit_price or 0) * (sale.quantity or 0)
+            line_discount = sale.discount or 0
+            self.count += 1
+            self.subtotal_sales += line_subtotal
+            self.total_discount += line_discount
+            yield {
+                "id": sale.id,
+                "bill_no": sales_transaction.bill_no,
+                "date": sales_transaction.date,
+                "brand": sale.product.brand.name,
+                "quantity": sale.quantity,
+                "product": sale.product.name,
+                "unit_price": sale.unit_price,
+                "line_subtotal": line_subtotal,
+                "discount": line_discount,
+                "total_price": line_subtotal - line_discount,
+                "method": sales_transaction.method,
+                "transaction_id": sales_transaction.id
+            }
+
+    def totals(self):
+        net_sales = self.subtotal_sales - self.total_discount
+        return {
+            "count": self.count,
+            "subtotal_sales": self.subtotal_sales,
+            "total_discount": self.total_discount,
+            "total_sales": net_sales,
+            "write_off": self.write_off,
+            "net_sales": net_sales - self.write_off,
+            "cash_sales": self.cash_sales,
+            "card_sales": self.card_sales,
+            "online_sales": self.online_sales,
+        }
+
+
+class PurchaseReport:
+    """Line-by-line purchase report over a ``Purchase`` queryset; see ``SalesReport``."""
+
+    columns = [
+        'date', 'brand', 'quantity', 'product', 'unit_price',
+        'line_subtotal', 'total_price', 'method', 'transaction_id',
+    ]
+
+    def __init__(self, purchases):
+        self.purchases = purchases.select_related('purchase_transaction', 'product__brand')
+        self.count = 0
+        self.subtotal_purchases = 0
+        self.cash_purchases = 0
+
+    def rows(self):
+        for purchase in self.purchases.iterator(chunk_size=REPORT_CHUNK_SIZE):
+            purchase_transaction = purchase.purchase_transaction
+            line_subtotal = (purchase.unit_price or 0) * (purchase.quantity or 0)
+            self.count += 1
+            self.subtotal_purchases += line_subtotal
+            if purchase_transaction.method == 'cash':
+                self.cash_purchases += line_subtotal
+            yield {
+                'date': purchase_transaction.date,
+                'brand': purchase.product.brand.name,
+                'quantity': purchase.quantity,
+                'product': purchase.product.name,
+                'unit_price': purchase.unit_price,
+                'line_subtotal': line_subtotal,
+                'total_price': line_subtotal,
+                'method': purchase_transaction.method,
+                'transaction_id': purchase_transaction.id
+            }
+
+    def totals(self):
+        return {
+            'count': self.count,
+            'subtotal_purchases': self.subtotal_purchases,
+            'total_purchases': self.subtotal_purchases,
+            'cash_purchases': self.cash_purchases,
+        }
+
+
+def _report_lines(report):
+    """Header, one list per row, a blank separator and then ``label, value`` totals."""
+    yield report.columns
+    for row in report.rows():
+        yield [row[column] for column in report.columns]
+    yield []
+    for label, value in report.totals().items():
+        yield [label, value]
+
+
+class _Echo:
+    """File-like object whose ``write`` hands the value back, for csv.writer streaming."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(report, filename: str) -> StreamingHttpResponse:
+    writer = csv.writer(_Echo())
+    response = StreamingHttpResponse(
+        (writer.writerow(line) for line in _report_lines(report)),
+        content_type='text/csv',
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+    return response
+
+
+def export_xlsx(report, filename: str) -> FileResponse:
+    # Write-only workbooks flush rows to disk as they are appended, so memory
+    # stays flat; the finished file is then streamed back from disk.
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Report')
+    for line in _report_lines(report):
+        sheet.append(line)
+
+    output = tempfile.TemporaryFile()
+    workbook.save(output)
+    output.seek(0)
+    return FileResponse(
+        output,
+        as_attachment=True,
+        filename=f'{filename}.xlsx',
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    )
+
+
+def export_report(report, export_format: str, filename: str):
+    if export_format == 'xlsx':
+        return export_xlsx(report, filename)
+    return stream_csv(report, filename)
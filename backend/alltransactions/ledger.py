@@ -0,0 +1,243 @@
+from __future__ import annotations
+
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, FloatField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, NullIf
+
+from allinventory.models import Product
+
+from .models import DailyBranchLedger, Purchase, Sales
+
+
+LEDGER_FIELDS = ('amount', 'count', 'discount', 'cogs', 'write_off')
+
+_ZERO = Value(0.0, output_field=FloatField())
+
+# A ledger key is (enterprise_id, branch_id, kind, date, method).
+LedgerKey = tuple
+
+
+def _float_sum(expression):
+    return Coalesce(Sum(expression, output_field=FloatField()), _ZERO)
+
+
+def _cost_of(quantity):
+    # The unit cost kept on the line when it was sold; only lines that predate
+    # it fall back to what the product costs now
+    return quantity * Coalesce(F('cost_price'), F('product__cost_price'), _ZERO)
+
+
+def _empty_entry() -> dict:
+    return dict.fromkeys(LEDGER_FIELDS, 0)
+
+
+def sales_entries(sales) -> dict[LedgerKey, dict]:
+    """
+    Group a ``Sales`` queryset into ledger entries.
+
+    Lines count towards the day and method of their transaction. Returned
+    quantities are booked as a write-off on the return date, and their cost is
+    taken back out of COGS since the goods go back into stock.
+    """
+    entries: dict[LedgerKey, dict] = defaultdict(_empty_entry)
+
+    lines = sales.values(
+        'sales_transaction__enterprise',
+        'sales_transaction__branch',
+        'sales_transaction__date',
+        'sales_transaction__method',
+    ).annotate(
+        line_amount=_float_sum('total_price'),
+        line_count=Count('id'),
+        line_discount=_float_sum('discount'),
+        line_cogs=_float_sum(_cost_of(F('quantity'))),
+    ).order_by()
+    for row in lines:
+        entry = entries[(
+            row['sales_transaction__enterprise'],
+            row['sales_transaction__branch'],
+            'sales',
+            row['sales_transaction__date'],
+            row['sales_transaction__method'],
+        )]
+        entry['amount'] += row['line_amount']
+        entry['count'] += row['line_count']
+        entry['discount'] += row['line_discount']
+        entry['cogs'] += row['line_cogs']
+
+    returned_quantity = Coalesce(F('returned_quantity'), 0)
+    returns = sales.filter(returned=True, sales_return__isnull=False).values(
+        'sales_transaction__enterprise',
+        'sales_transaction__branch',
+        'sales_return__date',
+        'sales_transaction__method',
+    ).annotate(
+        returned_amount=_float_sum(returned_quantity * F('total_price') / NullIf(F('quantity'), 0)),
+        returned_cogs=_float_sum(_cost_of(returned_quantity)),
+    ).order_by()
+    for row in returns:
+        entry = entries[(
+            row['sales_transaction__enterprise'],
+            row['sales_transaction__branch'],
+            'sales',
+            row['sales_return__date'],
+            row['sales_transaction__method'],
+        )]
+        entry['write_off'] += row['returned_amount']
+        entry['cogs'] -= row['returned_cogs']
+
+    return dict(entries)
+
+
+def purchase_entries(purchases) -> dict[LedgerKey, dict]:
+    """
+    Group a ``Purchase`` queryset into ledger entries.
+
+    Purchases have no discount or COGS of their own; ``amount`` is what was
+    bought and returned goods are booked as a write-off on the return date.
+    """
+    entries: dict[LedgerKey, dict] = defaultdict(_empty_entry)
+
+    lines = purchases.values(
+        'purchase_transaction__enterprise',
+        'purchase_transaction__branch',
+        'purchase_transaction__date',
+        'purchase_transaction__method',
+    ).annotate(
+        line_amount=_float_sum('total_price'),
+        line_count=Count('id'),
+    ).order_by()
+    for row in lines:
+        entry = entries[(
+            row['purchase_transaction__enterprise'],
+            row['purchase_transaction__branch'],
+            'purchase',
+            row['purchase_transaction__date'],
+            row['purchase_transaction__method'],
+        )]
+        entry['amount'] += row['line_amount']
+        entry['count'] += row['line_count']
+
+    returns = purchases.filter(returned=True, purchase_return__isnull=False).values(
+        'purchase_transaction__enterprise',
+        'purchase_transaction__branch',
+        'purchase_return__date',
+        'purchase_transaction__method',
+    ).annotate(
+        returned_amount=_float_sum(Coalesce(F('returned_quantity'), 0) * F('unit_price')),
+    ).order_by()
+    for row in returns:
+        entry = entries[(
+            row['purchase_transaction__enterprise'],
+            row['purchase_transaction__branch'],
+            'purchase',
+            row['purchase_return__date'],
+            row['purchase_transaction__method'],
+        )]
+        entry['write_off'] += row['returned_amount']
+
+    return dict(entries)
+
+
+def snapshot_sales_transaction(sales_transaction) -> dict[LedgerKey, dict]:
+    """Current ledger contribution of one sales transaction, returns included."""
+    return sales_entries(Sales.objects.filter(sales_transaction=sales_transaction))
+
+
+def snapshot_purchase_transaction(purchase_transaction) -> dict[LedgerKey, dict]:
+    """Current ledger contribution of one purchase transaction, returns included."""
+    return purchase_entries(Purchase.objects.filter(purchase_transaction=purchase_transaction))
+
+
+def apply_ledger_delta(before: dict[LedgerKey, dict], after: dict[LedgerKey, dict]) -> None:
+    """
+    Move the ledger from a transaction's ``before`` snapshot to its ``after`` one.
+
+    Only the difference is written, with F() increments, so concurrent
+    writers touching the same day/method row do not overwrite each other.
+    Pass an empty ``before`` for a new transaction and an empty ``after`` for
+    a deleted one.
+    """
+    for key in set(before) | set(after):
+        old = before.get(key, {})
+        new = after.get(key, {})
+        delta = {field: new.get(field, 0) - old.get(field, 0) for field in LEDGER_FIELDS}
+        if not any(delta.values()):
+            continue
+
+        enterprise_id, branch_id, kind, date, method = key
+        row, _ = DailyBranchLedger.objects.get_or_create(
+            enterprise_id=enterprise_id,
+            branch_id=branch_id,
+            kind=kind,
+            date=date,
+            method=method,
+        )
+        DailyBranchLedger.objects.filter(pk=row.pk).update(
+            **{field: F(field) + value for field, value in delta.items() if value}
+        )
+
+
+@transaction.atomic
+def rebuild_daily_ledger(enterprise=None, branch=None) -> int:
+    """Recompute ledger rows from the raw line items. Returns the number of rows written."""
+    ledger = DailyBranchLedger.objects.all()
+    sales = Sales.objects.all()
+    purchases = Purchase.objects.all()
+    if enterprise is not None:
+        ledger = ledger.filter(enterprise=enterprise)
+        sales = sales.filter(sales_transaction__enterprise=enterprise)
+        purchases = purchases.filter(purchase_transaction__enterprise=enterprise)
+    if branch is not None:
+        ledger = ledger.filter(branch=branch)
+        sales = sales.filter(sales_transaction__branch=branch)
+        purchases = purchases.filter(purchase_transaction__branch=branch)
+
+    ledger.delete()
+    # Lines sold before their cost was kept get today's cost, once, so the
+    # incremental snapshots agree with this rebuild from now on
+    sales.filter(cost_price__isnull=True).update(
+        cost_price=Subquery(Product.objects.filter(pk=OuterRef('product')).values('cost_price')[:1])
+    )
+
+    entries = {**sales_entries(sales), **purchase_entries(purchases)}
+    rows = [
+        DailyBranchLedger(
+            enterprise_id=enterprise_id,
+            branch_id=branch_id,
+            kind=kind,
+            date=date,
+            method=method,
+            **values,
+        )
+        for (enterprise_id, branch_id, kind, date, method), values in entries.items()
+    ]
+    DailyBranchLedger.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def ledger_totals_by_kind(enterprise, branch, start_date, end_date, kinds=None) -> dict[str, dict[str, dict]]:
+    """Per-kind, per-method totals for a date range in one query, read from the rollup instead of line items."""
+    rows = DailyBranchLedger.objects.filter(
+        enterprise=enterprise, branch=branch, date__range=(start_date, end_date)
+    )
+    if kinds is not None:
+        rows = rows.filter(kind__in=kinds)
+    rows = rows.values('kind', 'method').annotate(
+        total_amount=Sum('amount'),
+        total_count=Sum('count'),
+        total_discount=Sum('discount'),
+        total_cogs=Sum('cogs'),
+        total_write_off=Sum('write_off'),
+    ).order_by('kind', 'method')
+    totals: dict[str, dict[str, dict]] = defaultdict(dict)
+    for row in rows:
+        totals[row['kind']][row['method']] = {field: row[f'total_{field}'] for field in LEDGER_FIELDS}
+    return dict(totals)
+
+
+def ledger_totals(enterprise, branch, kind: str, start_date, end_date) -> dict[str, dict]:
+    """Per-method totals of one kind for a date range, read from the rollup instead of line items."""
+    return ledger_totals_by_kind(enterprise, branch, start_date, end_date, kinds=[kind]).get(kind, {})
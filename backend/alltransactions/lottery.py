@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import heapq
+import random
+from bisect import bisect_right
+from itertools import accumulate
+
+from .models import Customer, SalesTransaction
+
+# Customer lottery draws.
+#
+# A customer's chance is proportional to its weight: its loyalty points (at
+# least one entry each) or 1 for a fair spin. Nothing is expanded into one
+# slot per point, so memory is one number per eligible customer whatever the
+# points add up to, and fractional points count as they are.
+
+
+def eligible_customers(enterprise, start_date=None, end_date=None):
+    """
+    ``(phone_number, loyalty_points)`` of the customers who can win: every
+    customer of the enterprise, or with a date range only those with a sale
+    in it. Ordered by phone number so a seeded draw can be repeated.
+    """
+    customers = Customer.objects.filter(enterprise=enterprise)
+    if start_date and end_date:
+        phones = SalesTransaction.objects.filter(
+            enterprise=enterprise, date__gte=start_date, date__lte=end_date,
+        ).exclude(phone_number__isnull=True).exclude(phone_number='').values('phone_number').distinct()
+        customers = customers.filter(phone_number__in=phones)
+    return customers.order_by('phone_number').values_list('phone_number', 'loyalty_points')
+
+
+def lottery_weight(loyalty_points, use_loyalty_points: bool = True) -> float:
+    if not use_loyalty_points:
+        return 1.0
+    return max(1.0, float(loyalty_points or 0))
+
+
+class WeightedSampler:
+    """Draws indexes of ``weights`` by binary search over their running totals."""
+
+    def __init__(self, weights):
+        self.cumulative = list(accumulate(weights))
+        self.total = self.cumulative[-1] if self.cumulative else 0
+
+    def draw(self, rng: random.Random) -> int:
+        # Clamped for the rare float sum that rounds up to exactly ``total``
+        return min(bisect_right(self.cumulative, rng.random() * self.total), len(self.cumulative) - 1)
+
+
+def draw_winners(weights, count: int, rng: random.Random, with_replacement: bool = True) -> list[int]:
+    """
+    Indexes of ``count`` winners among ``weights``.
+
+    With replacement a customer can win more than once. Without it the draw
+    is the same as drawing one winner at a time and taking it out of the
+    pool, done in one pass by keeping the ``count`` largest ``u ** (1 / w)``
+    keys (Efraimidis-Spirakis), so at most ``len(weights)`` winners come out.
+    """
+    weights = list(weights)
+    if not weights or count < 1:
+        return []
+    if with_replacement:
+        sampler = WeightedSampler(weights)
+        return [sampler.draw(rng) for _ in range(count)]
+    keys = ((rng.random() ** (1.0 / weight), index) for index, weight in enumerate(weights))
+    return [index for _, index in heapq.nlargest(count, keys)]
@@ -0,0 +1,92 @@
+import datetime
+import random
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from alltransactions.lottery import draw_winners, eligible_customers, lottery_weight
+from alltransactions.models import Customer, SalesTransaction
+from enterprise.models import Enterprise
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Seed synthetic customers and time the weighted lottery draw (rolled back afterwards)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--customers', type=int, default=100000, help='Number of customers to seed (default: 100000)')
+        parser.add_argument('--winners',   type=int, default=100,    help='Winners drawn per run')
+        parser.add_argument('--seed',      type=int, default=42,     help='Seed of the synthetic data and of the draws')
+        parser.add_argument('--keep',      action='store_true',      help='Commit the synthetic data instead of rolling back')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+
+        try:
+            with transaction.atomic():
+                enterprise = self._seed(rng, options)
+
+                ranges = [
+                    ('all customers', None, None),
+                    ('sales in range', datetime.date(2024, 1, 1), datetime.date(2024, 3, 31)),
+                ]
+                for label, start_date, end_date in ranges:
+                    started = time.perf_counter()
+                    eligible = list(eligible_customers(enterprise, start_date, end_date))
+                    elapsed = time.perf_counter() - started
+                    entries = sum(lottery_weight(points) for _, points in eligible)
+                    self.stdout.write(
+                        f"{label:<15} {len(eligible):>8} eligible in {elapsed * 1000:8.1f} ms "
+                        f"({entries:,.0f} loyalty entries)"
+                    )
+
+                    for with_replacement in (True, False):
+                        tracemalloc.start()
+                        started = time.perf_counter()
+                        winners = draw_winners(
+                            (lottery_weight(points) for _, points in eligible),
+                            options['winners'], random.Random(options['seed']), with_replacement,
+                        )
+                        elapsed = time.perf_counter() - started
+                        peak = tracemalloc.get_traced_memory()[1]
+                        tracemalloc.stop()
+                        mode = 'with replacement' if with_replacement else 'without replacement'
+                        self.stdout.write(
+                            f"  {mode:<20} {len(winners):>5} winners in {elapsed * 1000:8.1f} ms, "
+                            f"peak {peak / 2 ** 20:6.1f} MiB"
+                        )
+
+                if not options['keep']:
+                    raise _Rollback
+        except _Rollback:
+            self.stdout.write("Synthetic data rolled back.")
+
+    def _seed(self, rng, options):
+        enterprise = Enterprise.objects.create(name="Benchmark Enterprise")
+
+        started = time.perf_counter()
+        start = datetime.date(2023, 1, 1)
+        batch = 5000
+        for offset in range(0, options['customers'], batch):
+            customers = Customer.objects.bulk_create([
+                # Most customers hold a few points, a handful tens of thousands
+                Customer(phone_number=f"98{i:08d}", enterprise=enterprise,
+                         loyalty_points=round(rng.paretovariate(1.2) * 10, 2))
+                for i in range(offset, min(offset + batch, options['customers']))
+            ])
+            SalesTransaction.objects.bulk_create([
+                SalesTransaction(
+                    enterprise=enterprise, bill_no=offset + i, phone_number=customer.phone_number,
+                    date=start + datetime.timedelta(days=rng.randrange(730)),
+                    total_amount=100, amount_paid=100, cash_amount=100,
+                )
+                for i, customer in enumerate(customers)
+                for _ in range(rng.randrange(3))
+            ])
+        self.stdout.write(f"Seeded {options['customers']} customers in {time.perf_counter() - started:.1f} s")
+        return enterprise
@@ -0,0 +1,74 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from allinventory.models import Brand, Product
+from alltransactions.models import Vendor
+from alltransactions.serializers import PurchaseTransactionSerializer
+from enterprise.models import Branch, Enterprise
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Replay a large synthetic purchase invoice and report time and statement count (rolled back afterwards)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lines',  type=int, default=300, help='Number of SKUs on the invoice (default: 300)')
+        parser.add_argument('--brands', type=int, default=10,  help='Number of brands the SKUs are spread over')
+        parser.add_argument('--method', default='cash', choices=['cash', 'credit', 'cheque'])
+        parser.add_argument('--keep',   action='store_true', help='Commit the synthetic data instead of rolling back')
+
+    def handle(self, *args, **options):
+        lines  = options['lines']
+        brands = options['brands']
+        keep   = options['keep']
+
+        try:
+            with transaction.atomic():
+                enterprise = Enterprise.objects.create(name="Benchmark Enterprise")
+                branch = Branch.objects.create(name="Benchmark Branch", enterprise=enterprise)
+                vendor = Vendor.objects.create(name="Benchmark Vendor", enterprise=enterprise, branch=branch, due=0)
+                brand_rows = Brand.objects.bulk_create([
+                    Brand(name=f"Brand {i}", enterprise=enterprise, branch=branch) for i in range(brands)
+                ])
+                products = Product.objects.bulk_create([
+                    Product(
+                        name=f"SKU {i}", uid=f"9{i:011d}", cost_price=100, selling_price=150,
+                        brand=brand_rows[i % brands], enterprise=enterprise, branch=branch,
+                    )
+                    for i in range(lines)
+                ])
+
+                serializer = PurchaseTransactionSerializer(data={
+                    'enterprise': enterprise.id,
+                    'branch': branch.id,
+                    'vendor': vendor.id,
+                    'bill_no': 'BENCH-1',
+                    'date': timezone.localdate().isoformat(),
+                    'method': options['method'],
+                    'purchase': [
+                        {'product': product.id, 'quantity': 12, 'unit_price': 100} for product in products
+                    ],
+                })
+
+                started = time.perf_counter()
+                with CaptureQueriesContext(connection) as queries:
+                    serializer.is_valid(raise_exception=True)
+                    purchase_transaction = serializer.save()
+                elapsed = time.perf_counter() - started
+
+                self.stdout.write(f"Lines:      {lines}")
+                self.stdout.write(f"Total:      {purchase_transaction.total_amount}")
+                self.stdout.write(f"Statements: {len(queries)}")
+                self.stdout.write(self.style.SUCCESS(f"Elapsed:    {elapsed * 1000:.1f} ms"))
+
+                if not keep:
+                    raise _Rollback
+        except _Rollback:
+            self.stdout.write("Synthetic data rolled back.")
@@ -0,0 +1,97 @@
+import datetime
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from allinventory.models import Brand, Product
+from alltransactions.models import Sales, SalesTransaction
+from alltransactions.search import search_sales_transactions
+from enterprise.models import Branch, Enterprise
+
+
+class _Rollback(Exception):
+    pass
+
+
+NAMES = ['Ram', 'Sita', 'Hari', 'Gita', 'Krishna', 'Maya', 'Bikash', 'Anita', 'Suman', 'Rita']
+
+
+class Command(BaseCommand):
+    help = "Seed synthetic sales bills and time the sales list search (rolled back afterwards)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bills',    type=int, default=200000, help='Number of bills to seed (default: 200000)')
+        parser.add_argument('--branches', type=int, default=4,      help='Number of branches the bills are spread over')
+        parser.add_argument('--products', type=int, default=2000,   help='Size of the product catalogue')
+        parser.add_argument('--explain',  action='store_true',      help='Print the query plan of each search')
+        parser.add_argument('--keep',     action='store_true',      help='Commit the synthetic data instead of rolling back')
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+
+        try:
+            with transaction.atomic():
+                enterprise, branches = self._seed(rng, options)
+
+                searches = [
+                    ('no search', None),
+                    ('customer name', 'sita'),
+                    ('phone digits', '98412'),
+                    ('product prefix', 'SKU 12'),
+                    ('bill number', '1234'),
+                ]
+                for label, search in searches:
+                    transactions = search_sales_transactions(
+                        enterprise, branches[0], search,
+                        datetime.date(2024, 1, 1), datetime.date(2024, 12, 31),
+                    )
+                    started = time.perf_counter()
+                    total = transactions.count()
+                    page = list(transactions[:5])
+                    elapsed = time.perf_counter() - started
+                    self.stdout.write(f"{label:<15} {total:>8} matches, first page {len(page)} rows in {elapsed * 1000:8.1f} ms")
+                    if options['explain']:
+                        self.stdout.write(transactions[:5].explain())
+
+                if not options['keep']:
+                    raise _Rollback
+        except _Rollback:
+            self.stdout.write("Synthetic data rolled back.")
+
+    def _seed(self, rng, options):
+        enterprise = Enterprise.objects.create(name="Benchmark Enterprise")
+        branches = Branch.objects.bulk_create([
+            Branch(name=f"Branch {i}", enterprise=enterprise) for i in range(options['branches'])
+        ])
+        brand = Brand.objects.create(name="Benchmark Brand", enterprise=enterprise, branch=branches[0])
+        products = Product.objects.bulk_create([
+            Product(name=f"SKU {i}", uid=f"8{i:011d}", selling_price=100, brand=brand,
+                    enterprise=enterprise, branch=branches[0])
+            for i in range(options['products'])
+        ])
+
+        started = time.perf_counter()
+        start = datetime.date(2023, 1, 1)
+        batch = 5000
+        for offset in range(0, options['bills'], batch):
+            bills = SalesTransaction.objects.bulk_create([
+                SalesTransaction(
+                    enterprise=enterprise, branch=branches[i % len(branches)], bill_no=i,
+                    date=start + datetime.timedelta(days=rng.randrange(730)),
+                    name=f"{rng.choice(NAMES)} {rng.choice(NAMES)}",
+                    phone_number=f"98{rng.randrange(10 ** 8):08d}",
+                    total_amount=100, amount_paid=100, cash_amount=100,
+                )
+                for i in range(offset, min(offset + batch, options['bills']))
+            ])
+            Sales.objects.bulk_create([
+                Sales(sales_transaction=bill, product=rng.choice(products), quantity=1, unit_price=100, total_price=100)
+                for bill in bills
+            ])
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(f"ANALYZE {SalesTransaction._meta.db_table}, {Sales._meta.db_table}, {Product._meta.db_table}")
+        self.stdout.write(f"Seeded {options['bills']} bills in {time.perf_counter() - started:.1f} s")
+        return enterprise, branches
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from alltransactions.balances import PARTIES, build_balance_checkpoints
+
+
+class Command(BaseCommand):
+    help = "Rebuild the monthly balance checkpoints of vendors, debtors, employees and NCM accounts"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--party',      choices=list(PARTIES), action='append', help='Only this kind of party (repeatable)')
+        parser.add_argument('--enterprise', type=int,                               help='Only rebuild checkpoints for this enterprise id')
+
+    def handle(self, *args, **options):
+        rows = build_balance_checkpoints(names=options['party'], enterprise=options['enterprise'])
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} balance checkpoints."))
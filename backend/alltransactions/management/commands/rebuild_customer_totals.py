@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from alltransactions.customers import rebuild_customer_totals
+
+
+class Command(BaseCommand):
+    help = "Rebuild each customer's total spent, visit count and last visit from raw sales"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--enterprise', type=int, help='Only rebuild customers of this enterprise id')
+
+    def handle(self, *args, **options):
+        customers = rebuild_customer_totals(enterprise=options['enterprise'])
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt totals of {customers} customers."))
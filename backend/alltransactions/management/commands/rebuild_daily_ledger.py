@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from alltransactions.ledger import rebuild_daily_ledger
+
+
+class Command(BaseCommand):
+    help = "Rebuild the DailyBranchLedger rollup from raw sales and purchase lines"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--enterprise', type=int, help='Only rebuild rows for this enterprise id')
+        parser.add_argument('--branch',     type=int, help='Only rebuild rows for this branch id')
+
+    def handle(self, *args, **options):
+        enterprise = options['enterprise']
+        branch     = options['branch']
+
+        rows = rebuild_daily_ledger(enterprise=enterprise, branch=branch)
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} ledger rows."))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from alltransactions.balances import PARTIES, find_due_drift, fix_due_drift
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the stored due of every vendor, debtor, employee and NCM account with what its "
+        "transactions add up to, and optionally fix the ones that drifted"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--party',      choices=list(PARTIES), action='append', help='Only this kind of party (repeatable)')
+        parser.add_argument('--enterprise', type=int,                               help='Only check parties of this enterprise id')
+        parser.add_argument('--fix',        action='store_true',                    help='Overwrite drifted dues with the recomputed value')
+
+    def handle(self, *args, **options):
+        drift = find_due_drift(names=options['party'], enterprise=options['enterprise'])
+
+        for entry in drift:
+            self.stdout.write(
+                f"{entry.party} {entry.party_pk} ({entry.name}): stored {entry.stored}, "
+                f"transactions add up to {entry.expected:.2f}"
+            )
+        if not drift:
+            self.stdout.write(self.style.SUCCESS("Every due matches its transactions."))
+        elif options['fix']:
+            self.stdout.write(self.style.SUCCESS(f"Fixed {fix_due_drift(drift)} dues."))
+        else:
+            self.stdout.write(self.style.WARNING(f"{len(drift)} dues drifted; rerun with --fix to correct them."))
@@ -25,6 +25,12 @@ class PurchaseTransaction(models.Model):
     cheque_number = models.CharField(max_length=10,null=True,blank=True)
     cashout_date = models.DateField(null=True)
     employee = models.ForeignKey('enterprise.Employee', on_delete=models.SET_NULL, null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['enterprise', 'branch', 'date', 'id']),
+        ]
+
     def __str__(self):
         return self.vendor.name if self.vendor else f"Purchase Transaction {self.pk}"
     
@@ -108,6 +114,12 @@ class SalesTransaction(models.Model):
     exchange_previous_balance = models.FloatField(null=True, blank=True, default=0)
     exchange_exceeded_amount = models.FloatField(null=True, blank=True, default=0)
     hidden = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['enterprise', 'branch', 'date', 'id']),
+            models.Index(fields=['enterprise', 'phone_number', 'date']),
+        ]
     
     def __str__(self):
         return f"Sales Transaction {self.pk} of {self.enterprise.name}"
@@ -136,6 +148,8 @@ class Sales(models.Model):
     unit_price = models.FloatField()
     total_price = models.FloatField(null=True,blank=True)
     discount = models.FloatField(default=0)
+    # What one unit cost when it was sold, so a later re-price does not move COGS
+    cost_price = models.FloatField(null=True,blank=True)
     sales_transaction = models.ForeignKey(SalesTransaction, on_delete=models.CASCADE,related_name='sales')
     returned = models.BooleanField(default=False)
     sales_return = models.ForeignKey(
@@ -236,6 +250,10 @@ class Customer(models.Model):
     total_spent = models.FloatField(null=True,blank=True,default=0)
     enterprise = models.ForeignKey(Enterprise, on_delete=models.CASCADE,related_name='customers')
     loyalty_points = models.FloatField(null=True, blank=True, default=0)
+    # Kept current by the sales serializers and views (see customers.py) and
+    # rebuilt with ``manage.py rebuild_customer_totals``.
+    visit_count = models.IntegerField(default=0)
+    last_visit = models.DateField(null=True, blank=True)
 
     def __str__(self):
         return self.name or self.phone_number
@@ -343,3 +361,86 @@ class NCMTransaction(models.Model):
             self.ncm.due = self.ncm.due - self.amount if self.ncm.due is not None else -self.amount
             self.ncm.save() 
         super().delete(*args, **kwargs)
+
+
+class DailyBranchLedger(models.Model):
+    """
+    Per-day rollup of sales and purchases for a branch, split by payment method.
+
+    Kept current by the transaction and return serializers (see ledger.py) and
+    rebuilt from scratch with ``manage.py rebuild_daily_ledger``.
+    """
+    KIND_CHOICES = (('sales','sales'),('purchase','purchase'))
+
+    enterprise = models.ForeignKey(Enterprise, on_delete=models.CASCADE,related_name='daily_ledger')
+    branch = models.ForeignKey(Branch, on_delete=models.CASCADE, null=True, blank=True, related_name='daily_ledger')
+    date = models.DateField()
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    method = models.CharField(max_length=20)
+    amount = models.FloatField(default=0)
+    count = models.IntegerField(default=0)
+    discount = models.FloatField(default=0)
+    cogs = models.FloatField(default=0)
+    write_off = models.FloatField(default=0)
+
+    class Meta:
+        # Two constraints because NULLs never collide in a plain unique index
+        constraints = [
+            models.UniqueConstraint(fields=['enterprise', 'branch', 'date', 'kind', 'method'],
+                                    condition=models.Q(branch__isnull=False), name='unique_branch_daily_ledger'),
+            models.UniqueConstraint(fields=['enterprise', 'date', 'kind', 'method'],
+                                    condition=models.Q(branch__isnull=True), name='unique_enterprise_daily_ledger'),
+        ]
+        indexes = [
+            models.Index(fields=['enterprise', 'branch', 'kind', 'date']),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} ledger {self.date} ({self.method}) of {self.enterprise.name}"
+
+
+class BalanceCheckpoint(models.Model):
+    """
+    Balance of a vendor, debtor, employee or NCM account at the start of
+    ``month``: what its transactions dated before then add up to, signed as
+    on its statement.
+
+    Statements start from the latest checkpoint and only add the rest of the
+    month (see balances.py). A checkpoint is dropped whenever a transaction
+    dated before it changes, and ``manage.py build_balance_checkpoints``
+    rebuilds them from scratch.
+    """
+    PARTY_CHOICES = (('vendor','vendor'),('debtor','debtor'),('employee','employee'),('ncm','ncm'))
+
+    enterprise = models.ForeignKey(Enterprise, on_delete=models.CASCADE,related_name='balance_checkpoints')
+    party = models.CharField(max_length=10, choices=PARTY_CHOICES)
+    party_pk = models.PositiveBigIntegerField()
+    month = models.DateField()
+    balance = models.FloatField(default=0)
+
+    class Meta:
+        unique_together = ('party', 'party_pk', 'month')
+
+    def __str__(self):
+        return f"{self.party} {self.party_pk} balance on {self.month}"
+
+
+class BillNumberCounter(models.Model):
+    """
+    Last sales bill number handed out for an enterprise (``branch`` unset)
+    or one of its branches; see bill_numbers.py.
+    """
+    enterprise = models.ForeignKey(Enterprise, on_delete=models.CASCADE,related_name='bill_number_counters')
+    branch = models.ForeignKey(Branch, on_delete=models.CASCADE, null=True, blank=True, related_name='bill_number_counters')
+    last_bill_no = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['enterprise', 'branch'], condition=models.Q(branch__isnull=False),
+                                    name='unique_branch_bill_number_counter'),
+            models.UniqueConstraint(fields=['enterprise'], condition=models.Q(branch__isnull=True),
+                                    name='unique_enterprise_bill_number_counter'),
+        ]
+
+    def __str__(self):
+        return f"Bill numbers of {self.enterprise.name} up to {self.last_bill_no}"
@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import base64
+import functools
+import heapq
+import itertools
+import json
+import math
+import operator
+from collections import OrderedDict
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset ("seek") pagination over a fixed ordering, ``(date, id)`` newest
+    first by default.
+
+    Instead of ``OFFSET`` each page filters on the last row of the previous
+    one, so page N reads the same handful of index entries as page 1. The
+    cursor is opaque to clients and also carries the page number and the
+    total, which is only counted when the first page is requested; the
+    response keeps the ``count``/``next``/``previous``/``results`` shape of
+    ``PageNumberPagination``.
+
+    ``ordering`` must end in a unique column and its columns must not be
+    NULL. ``paginate_merged`` walks several querysets with the same ordering
+    as one list, fetching at most a page from each.
+    """
+    page_size = 5
+    ordering = ('-date', '-id')
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.paginate_merged([(queryset, None)], request)
+
+    def paginate_merged(self, sources, request):
+        """
+        Paginate ``sources``, a list of ``(queryset, to_item)`` pairs, as one
+        ordered stream. ``to_item`` turns a row into the result item (``None``
+        keeps the row). Rows that tie on every ordering column are listed in
+        source order.
+        """
+        self.request = request
+        cursor = self._decode_cursor(request)
+        if cursor is None:
+            reverse, self.page, self.count = False, 1, sum(queryset.count() for queryset, _ in sources)
+        else:
+            reverse, self.page, self.count = cursor['r'], cursor['n'], cursor['c']
+
+        streams = []
+        for rank, (queryset, _) in enumerate(sources):
+            queryset = self._ordered(queryset, cursor, reverse)
+            if cursor is not None:
+                queryset = queryset.filter(self._seek(cursor['p'], cursor['s'], rank, reverse))
+            streams.append(self._stream(queryset[:self.page_size + 1], rank))
+
+        key = functools.cmp_to_key(functools.partial(self._compare, reverse=reverse))
+        rows = list(itertools.islice(
+            heapq.merge(*streams, key=lambda entry: key(entry[:2])), self.page_size + 1,
+        ))
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        self.first = rows[0][:2] if rows else None
+        self.last = rows[-1][:2] if rows else None
+        self.has_next = bool(rows) and (reverse or has_more)
+        self.has_previous = bool(rows) and (has_more if reverse else cursor is not None)
+        return [row if sources[rank][1] is None else sources[rank][1](row) for _, rank, row in rows]
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('count', self.count),
+            ('total_pages', math.ceil(self.count / self.page_size)),
+            ('page', self.page),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self._link(self.last, reverse=False, page=self.page + 1)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        return self._link(self.first, reverse=True, page=self.page - 1)
+
+    def _fields(self):
+        return [(field.lstrip('-'), field.startswith('-')) for field in self.ordering]
+
+    def _order_by(self, reverse):
+        return [f"{'-' if descending != reverse else ''}{name}" for name, descending in self._fields()]
+
+    def _ordered(self, queryset, cursor, reverse):
+        """``queryset`` in page order; subclasses may annotate the rows of the page here."""
+        return queryset.order_by(*self._order_by(reverse))
+
+    def _position(self, row):
+        return tuple(getattr(row, name) for name, _ in self._fields())
+
+    def _stream(self, rows, rank):
+        for row in rows:
+            yield self._position(row), rank, row
+
+    def _seek(self, position, position_rank, rank, reverse):
+        """Rows strictly after ``position`` when walking forwards (or before it when ``reverse``)."""
+        fields = self._fields()
+        conditions = []
+        for index, (name, descending) in enumerate(fields):
+            condition = Q(**{f"{name}__{'lt' if descending != reverse else 'gt'}": position[index]})
+            for earlier_index, (earlier, _) in enumerate(fields[:index]):
+                condition &= Q(**{earlier: position[earlier_index]})
+            conditions.append(condition)
+        if (rank > position_rank) if not reverse else (rank < position_rank):
+            conditions.append(Q(**{name: position[index] for index, (name, _) in enumerate(fields)}))
+        return functools.reduce(operator.or_, conditions)
+
+    def _compare(self, left, right, reverse=False):
+        (left_values, left_rank), (right_values, right_rank) = left, right
+        for (_, descending), a, b in zip(self._fields(), left_values, right_values):
+            if a != b:
+                before = (a > b) if descending else (a < b)
+                return -1 if before != reverse else 1
+        if left_rank == right_rank:
+            return 0
+        return -1 if (left_rank < right_rank) != reverse else 1
+
+    def _link(self, boundary, reverse, page):
+        payload = self._cursor_payload(boundary, reverse, page)
+        encoded = base64.urlsafe_b64encode(json.dumps(payload, cls=DjangoJSONEncoder).encode()).decode()
+        # ``page`` is informational only; clients that read it off the link keep working
+        url = replace_query_param(self.request.build_absolute_uri(), 'page', page)
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+    def _cursor_payload(self, boundary, reverse, page):
+        position, rank = boundary
+        return {'p': list(position), 's': rank, 'r': reverse, 'n': page, 'c': self.count}
+
+    def _decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            if len(cursor['p']) != len(self.ordering):
+                raise ValueError
+            cursor['s'], cursor['n'], cursor['c'], cursor['r'] = (
+                int(cursor['s']), int(cursor['n']), int(cursor['c']), bool(cursor['r'])
+            )
+        except (TypeError, ValueError, KeyError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+        return cursor
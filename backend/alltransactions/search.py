@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import re
+
+from django.db.models import Exists, OuterRef, Q
+
+from allinventory.models import Product
+
+from .models import Purchase, PurchaseTransaction, Sales, SalesTransaction, Vendor
+
+
+RETURN_PATTERN = re.compile(r'\breturn(ed)?\b', re.IGNORECASE)
+
+# (model, column) pairs that get a pg_trgm GIN index on UPPER(column), the
+# form Django emits for icontains/istartswith on PostgreSQL.
+TRIGRAM_INDEXES = (
+    (SalesTransaction, 'name'),
+    (SalesTransaction, 'phone_number'),
+    (Product, 'name'),
+    (Vendor, 'name'),
+)
+
+
+def split_return_keyword(search: str | None) -> tuple[str | None, bool]:
+    """Strip a "return"/"returned" keyword from a search, reporting whether it was there."""
+    if not search:
+        return search, False
+    is_return = bool(RETURN_PATTERN.search(search))
+    return RETURN_PATTERN.sub('', search).strip(), is_return
+
+
+def sales_search_q(search: str) -> Q:
+    # Line matches go through EXISTS so a bill with several matching lines
+    # is still returned once, without DISTINCT.
+    q = Q(Exists(Sales.objects.filter(sales_transaction=OuterRef('pk'), product__name__istartswith=search)))
+    q |= Q(name__icontains=search) | Q(phone_number__icontains=search)
+    if search.isdigit():
+        q |= Q(bill_no=int(search))
+    return q
+
+
+def purchase_search_q(search: str) -> Q:
+    q = Q(Exists(Purchase.objects.filter(purchase_transaction=OuterRef('pk'), product__name__istartswith=search)))
+    return q | Q(vendor__name__icontains=search) | Q(bill_no__iexact=search)
+
+
+def _scoped(queryset, enterprise, branch, start_date, end_date):
+    queryset = queryset.filter(enterprise=enterprise)
+    if branch:
+        queryset = queryset.filter(branch=branch)
+    if start_date and end_date:
+        queryset = queryset.filter(date__range=(start_date, end_date))
+    return queryset
+
+
+def search_sales_transactions(enterprise, branch=None, search=None, start_date=None, end_date=None,
+                              include_hidden=False):
+    """
+    Sales bills of an enterprise (and branch) matching ``search`` within the
+    date range, newest first, as a single query.
+    """
+    transactions = _scoped(SalesTransaction.objects.all(), enterprise, branch, start_date, end_date)
+    if not include_hidden:
+        transactions = transactions.filter(hidden=False)
+    if search:
+        transactions = transactions.filter(sales_search_q(search))
+    return transactions.order_by('-date', '-id')
+
+
+def search_purchase_transactions(enterprise, branch=None, search=None, start_date=None, end_date=None):
+    """Purchase bills of an enterprise (and branch) matching ``search``, newest first."""
+    transactions = _scoped(PurchaseTransaction.objects.all(), enterprise, branch, start_date, end_date)
+    if search:
+        transactions = transactions.filter(purchase_search_q(search))
+    return transactions.order_by('-date', '-id')
+
+
+def install_trigram_indexes(using='default', **kwargs) -> None:
+    """
+    Create the pg_trgm extension and the trigram search indexes.
+
+    Run after every ``migrate`` (see apps.py); the statements are idempotent
+    and do nothing on databases other than PostgreSQL.
+    """
+    from django.db import connections
+
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        for model, column in TRIGRAM_INDEXES:
+            table = model._meta.db_table
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {quote(f'{table}_{column}_trgm')} "
+                f"ON {quote(table)} USING gin (UPPER({quote(column)}) gin_trgm_ops)"
+            )
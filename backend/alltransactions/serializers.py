@@ -1,11 +1,26 @@
 from rest_framework import serializers
 from .models import ClosingCash, Vendor, Purchase, PurchaseTransaction,PurchaseReturn, Sales, SalesTransaction, VendorTransactions, SalesReturn, Expenses, Customer
 from django.db import transaction
-from allinventory.models import Product,Brand
+from django.db.models import F, Sum, Value
+from django.db.models.functions import Coalesce
 from alltransactions.models import EmployeeTransactions, Debtor, DebtorTransaction, EmployeeTransactionDetail, Withdrawal, ClosingCash, NCM, NCMTransaction
 from enterprise.models import Employee
+from allinventory.stock import apply_stock_movements, lock_products, restate_stock_movements
+from .balances import invalidate_checkpoints
+from .bill_numbers import allocate_bill_numbers, claim_bill_number
+from .customers import apply_customer_delta, snapshot_customer_spend
+from .ledger import apply_ledger_delta, snapshot_purchase_transaction, snapshot_sales_transaction
 
 
+def sales_stock_kind(sales_transaction):
+    # Branch transfers are booked as a sale out of the sending branch.
+    return 'transfer_out' if sales_transaction.method == 'transfer' else 'sale'
+
+
+def purchase_stock_kind(purchase_transaction):
+    # ... and as a purchase into the receiving one.
+    return 'transfer_in' if purchase_transaction.method == 'transfer' else 'purchase'
+
 
 class VendorSerializer(serializers.ModelSerializer):
     # brand_name = serializers.SerializerMethodField(read_only=True)
@@ -19,7 +34,8 @@ class CustomerSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Customer
-        fields = ['phone_number', 'name', 'loyalty_points']
+        fields = ['phone_number', 'name', 'loyalty_points', 'total_spent', 'visit_count', 'last_visit']
+        read_only_fields = ['total_spent', 'visit_count', 'last_visit']
 
     
 class PurchaseSerializer(serializers.ModelSerializer):
@@ -44,98 +60,109 @@ class PurchaseTransactionSerializer(serializers.ModelSerializer):
         model = PurchaseTransaction
         fields = '__all__'
 
-    def _get_locked_product(self, product_id, cache):
+    def validate(self, attrs):
+        """
+        Check the whole invoice before anything is written: every line must
+        be for a product of this enterprise and move a positive quantity.
+        An edited line may leave out any field to keep the stored one.
         """
-        Fetch a Product with select_for_update, caching to avoid redundant queries.
+        enterprise = attrs.get('enterprise') or getattr(self.instance, 'enterprise', None)
+        errors = {}
+        for index, line in enumerate(attrs.get('purchase', [])):
+            product = line.get('product')
+            missing = [] if line.get('id') else [
+                field for field in ('product', 'quantity', 'unit_price') if line.get(field) is None
+            ]
+            if missing:
+                errors[index] = f"A new line needs {' and '.join(missing)}."
+            elif product is not None and enterprise and product.enterprise_id != enterprise.id:
+                errors[index] = f"{product} does not belong to this enterprise."
+            elif line.get('quantity') is not None and line['quantity'] <= 0:
+                errors[index] = "Quantity must be greater than zero."
+        if errors:
+            raise serializers.ValidationError({'purchase': errors})
+        return attrs
+
+    def _write_vendor_entries(self, purchase_transaction, desc, total):
         """
-        if product_id not in cache:
-            cache[product_id] = Product.objects.select_for_update().get(id=product_id)
-        return cache[product_id]
+        Record the base entry (and the payment entry for cash/cheque) for a
+        purchase in one insert, and move the vendor's due once by their net.
+        """
+        vendor = purchase_transaction.vendor
+        common = {
+            'vendor': vendor,
+            'date': purchase_transaction.date,
+            'purchase_transaction': purchase_transaction,
+            'enterprise': purchase_transaction.enterprise,
+            'branch': purchase_transaction.branch,
+            'bill_no': purchase_transaction.bill_no,
+        }
+        entries = [VendorTransactions(
+            amount=-total, desc=desc, method=purchase_transaction.method, type='base', **common
+        )]
+        if purchase_transaction.method in ('cash', 'cheque'):
+            payment = VendorTransactions(
+                amount=total, desc='Paid for purchase', method=purchase_transaction.method, type='payment', **common
+            )
+            if purchase_transaction.method == 'cheque':
+                payment.cheque_number = purchase_transaction.cheque_number
+                payment.cashout_date = purchase_transaction.cashout_date
+            entries.append(payment)
+        VendorTransactions.objects.bulk_create(entries)
+        # bulk_create skips the signals that keep balance checkpoints current
+        invalidate_checkpoints('vendor', vendor.pk, purchase_transaction.date)
+
+        net = sum(entry.amount for entry in entries)
+        if net:
+            Vendor.objects.filter(pk=vendor.pk).update(due=Coalesce(F('due'), Value(0.0)) - net)
+
+    def _clear_vendor_entries(self, purchase_transaction):
+        """Delete a purchase's vendor entries, giving each vendor its amounts back."""
+        entries = VendorTransactions.objects.filter(purchase_transaction=purchase_transaction)
+        for row in entries.values('vendor').annotate(total=Sum('amount')).order_by():
+            Vendor.objects.filter(pk=row['vendor']).update(due=Coalesce(F('due'), Value(0.0)) + (row['total'] or 0))
+        entries.delete()
+
+    def _set_total_amount(self, purchase_transaction):
+        # PurchaseTransaction.save() re-aggregates its lines on every call, so
+        # the total is written with a single UPDATE instead.
+        total = Purchase.objects.filter(purchase_transaction=purchase_transaction).aggregate(
+            total=Sum('total_price')
+        )['total'] or 0
+        PurchaseTransaction.objects.filter(pk=purchase_transaction.pk).update(total_amount=total)
+        purchase_transaction.total_amount = total
+        return total
 
     @transaction.atomic
     def create(self, validated_data):
         purchases = validated_data.pop('purchase')
         purchase_transaction = PurchaseTransaction.objects.create(**validated_data)
-        products_cache = {}
-        brands_cache = {}
         desc = f'Purchase made for :\n'
 
-        # Create each Purchase and update Product/Brand counts/stocks
+        products = lock_products(purchase['product'].id for purchase in purchases)
+        lines = []
         for purchase in purchases:
             desc += f"{purchase.get('product', {})} - {purchase.get('quantity', 0)} pcs, \n"
-            if not purchase.get('total_price'):
-                purchase['total_price'] = purchase['quantity'] * purchase['unit_price']
-            purchaseobj = Purchase.objects.create(purchase_transaction=purchase_transaction, **purchase)
-
-            # lock and cache product
-            product = self._get_locked_product(purchaseobj.product.id, products_cache)
-            product.count = (product.count + purchaseobj.quantity) if product.count is not None else purchaseobj.quantity
-            product.stock = (product.stock + purchaseobj.quantity * product.selling_price) if product.stock is not None else purchaseobj.quantity * product.selling_price
-
-            # lock and cache brand
-            brand_obj = product.brand
-            if brand_obj.id not in brands_cache:
-                brands_cache[brand_obj.id] = brand_obj
-            brand = brands_cache[brand_obj.id]
-            brand.count = (brand.count + purchaseobj.quantity) if brand.count is not None else purchaseobj.quantity
-            brand.stock = (brand.stock + purchaseobj.quantity * product.selling_price) if brand.stock is not None else purchaseobj.quantity * product.selling_price
-
-            product.save()
-            brand.save()
-
-        # Calculate total amount and record base transaction
-        amount = purchase_transaction.calculate_total_amount()
-        vendor = purchase_transaction.vendor
-        if vendor:
-            VendorTransactionSerializer().create({
-                'vendor': vendor,
-                'date': purchase_transaction.date,
-                'amount': -amount,
-                'desc': desc,
-                'method': purchase_transaction.method,
-                'purchase_transaction': purchase_transaction,
-                'enterprise': purchase_transaction.enterprise,
-                'branch': purchase_transaction.branch,
-                'type': 'base',
-                'bill_no': purchase_transaction.bill_no
-            })
-
-            # Handle payment method -> create VendorTransactions if needed
-            method = purchase_transaction.method
-            if method == 'cash':
-                VendorTransactionSerializer().create({
-                    'vendor': vendor,
-                    'branch': purchase_transaction.branch,
-                    'date': purchase_transaction.date,
-                    'amount': purchase_transaction.total_amount,
-                    'desc': 'Paid for purchase',
-                    'method': 'cash',
-                    'purchase_transaction': purchase_transaction,
-                    'enterprise': purchase_transaction.enterprise,
-                    'type': 'payment',
-                    'bill_no': purchase_transaction.bill_no
-                })
-            elif method == 'cheque':
-                VendorTransactionSerializer().create({
-                    'vendor': vendor,
-                    'branch': purchase_transaction.branch,
-                    'date': purchase_transaction.date,
-                    'amount': purchase_transaction.total_amount,
-                    'desc': 'Paid for purchase',
-                    'method': 'cheque',
-                    'cheque_number': purchase_transaction.cheque_number,
-                    'cashout_date': purchase_transaction.cashout_date,
-                    'purchase_transaction': purchase_transaction,
-                    'enterprise': purchase_transaction.enterprise,
-                    'type': 'payment',
-                    'bill_no': purchase_transaction.bill_no
-                })
+            line = Purchase(purchase_transaction=purchase_transaction, **purchase)
+            line.total_price = line.quantity * line.unit_price
+            lines.append(line)
+        Purchase.objects.bulk_create(lines)
+        apply_stock_movements(
+            ((products[line.product_id], line.quantity) for line in lines),
+            purchase_stock_kind(purchase_transaction), purchase_transaction.date, purchase_transaction.id,
+        )
+
+        self._set_total_amount(purchase_transaction)
+        apply_ledger_delta({}, snapshot_purchase_transaction(purchase_transaction))
+        if purchase_transaction.vendor:
+            self._write_vendor_entries(purchase_transaction, desc, purchase_transaction.total_amount)
 
         return purchase_transaction
 
     @transaction.atomic
     def update(self, instance, validated_data):
         # Store old values
+        ledger_before = snapshot_purchase_transaction(instance)
         old_vendor = instance.vendor
         old_method = instance.method
         old_total = instance.total_amount or 0
@@ -149,178 +176,70 @@ class PurchaseTransactionSerializer(serializers.ModelSerializer):
         instance.cashout_date = validated_data.get('cashout_date', instance.cashout_date)
         instance.save()
 
-        products_cache = {}
-        brands_cache = {}
         desc = f'Purchase made for :\n'
-
-        def get_product_obj(product):
-            return self._get_locked_product(product.id, products_cache)
-
         purchases_data = validated_data.pop('purchase', [])
 
         # Keep track of existing purchases
         existing_purchases = {purchase.id: purchase for purchase in instance.purchase.all()}
-        new_purchase_ids = []
-
+        products = lock_products(
+            [purchase.product_id for purchase in existing_purchases.values()]
+            + [purchase_data['product'].id for purchase_data in purchases_data if 'product' in purchase_data]
+        )
+
+        reversals = []
+        additions = []
+        changed_lines = []
+        changed_fields = {'total_price'}
+        new_lines = []
         for purchase_data in purchases_data:
             desc += f"{purchase_data.get('product', {})} - {purchase_data.get('quantity', 0)} pcs, \n"
             purchase_id = purchase_data.get('id', None)
             if purchase_id and purchase_id in existing_purchases:
-                # Update existing purchase
-                purchase_instance = existing_purchases[purchase_id]
-
-                # Lock old
-                old_product = get_product_obj(purchase_instance.product)
-                old_quantity = purchase_instance.quantity
-
-                # New product lock
-                new_product = purchase_data.get('product', old_product)
-                new_product = get_product_obj(new_product)
-                new_quantity = purchase_data.get('quantity', old_quantity)
-
-                # Adjust stock for old/new product if changed
-                if old_product != new_product:
-                    # Decrease from old
-                    old_product.count -= old_quantity
-                    old_product.stock -= old_quantity * old_product.selling_price
-                    old_product.save()
-                    # Brand old
-                    old_brand = old_product.brand
-                    if old_brand.id not in brands_cache:
-                        brands_cache[old_brand.id] = old_brand
-                    old_brand = brands_cache[old_brand.id]
-                    old_brand.count -= old_quantity
-                    old_brand.stock -= old_quantity * old_product.selling_price
-                    old_brand.save()
-
-                    # Increase in new
-                    new_product.count = (new_product.count or 0) + new_quantity
-                    new_product.stock = (new_product.stock or 0) + new_quantity * new_product.selling_price
-                    new_product.save()
-                    new_brand = new_product.brand
-                    if new_brand.id not in brands_cache:
-                        brands_cache[new_brand.id] = new_brand
-                    new_brand = brands_cache[new_brand.id]
-                    new_brand.count += new_quantity
-                    new_brand.stock += new_quantity * new_product.selling_price
-                    new_brand.save()
-                else:
-                    # Same product -> adjust quantity
-                    quantity_diff = new_quantity - old_quantity
-                    stock_diff = quantity_diff * old_product.selling_price
-
-                    old_product.count = (old_product.count or 0) + quantity_diff
-                    old_product.stock = (old_product.stock or 0) + stock_diff
-                    old_product.save()
-
-                    old_brand = old_product.brand
-                    if old_brand.id not in brands_cache:
-                        brands_cache[old_brand.id] = old_brand
-                    old_brand = brands_cache[old_brand.id]
-                    old_brand.count += quantity_diff
-                    old_brand.stock += stock_diff
-                    old_brand.save()
-
+                # Take the old line out of stock and put the edited one back in
+                purchase_instance = existing_purchases.pop(purchase_id)
+                reversals.append((products[purchase_instance.product_id], -purchase_instance.quantity))
                 for attr, value in purchase_data.items():
-                    if attr == 'returned':
-                        print("Handling returned attribute pid:", attr)
+                    if attr in ('id', 'returned'):
                         continue
-                    print("YAHA aaunu hunna ,", attr)
                     setattr(purchase_instance, attr, value)
-                print(f"--- Finished purchase data processing. purchase_instance.returned is now: {purchase_instance.returned} ---")
-                if not purchase_data.get('total_price'):
-                    purchase_instance.total_price = purchase_instance.quantity * purchase_instance.unit_price
-                purchase_instance.save()
-                new_purchase_ids.append(purchase_instance.id)
-                del existing_purchases[purchase_id]
+                    changed_fields.add(attr)
+                purchase_instance.total_price = purchase_instance.quantity * purchase_instance.unit_price
+                additions.append((products[purchase_instance.product_id], purchase_instance.quantity))
+                changed_lines.append(purchase_instance)
             else:
-                # Create new purchase
-                purchase_data['purchase_transaction'] = instance
-                if not purchase_data.get('total_price'):
-                    purchase_data['total_price'] = purchase_data['quantity'] * purchase_data['unit_price']
-                new_purchase = Purchase.objects.create(**purchase_data)
-
-                # Lock and update new product
-                new_product = self._get_locked_product(new_purchase.product.id, products_cache)
-                new_product.count = (new_product.count or 0) + new_purchase.quantity
-                new_product.stock = (new_product.stock or 0) + new_purchase.quantity * new_product.selling_price
-                new_product.save()
-
-                new_brand = new_product.brand
-                if new_brand.id not in brands_cache:
-                    brands_cache[new_brand.id] = new_brand
-                new_brand = brands_cache[new_brand.id]
-                new_brand.count += new_purchase.quantity
-                new_brand.stock += new_purchase.quantity * new_product.selling_price
-                new_brand.save()
-
-                new_purchase_ids.append(new_purchase.id)
+                purchase_data.pop('id', None)
+                line = Purchase(purchase_transaction=instance, **purchase_data)
+                line.total_price = line.quantity * line.unit_price
+                additions.append((products[line.product_id], line.quantity))
+                new_lines.append(line)
 
         # Remove deleted purchases
         for removed in existing_purchases.values():
-            old_product = self._get_locked_product(removed.product.id, products_cache)
-            old_quantity = removed.quantity
-            old_product.count -= old_quantity
-            old_product.stock -= old_quantity * old_product.selling_price
-            old_product.save()
-
-            old_brand = old_product.brand
-            if old_brand.id not in brands_cache:
-                brands_cache[old_brand.id] = old_brand
-            old_brand = brands_cache[old_brand.id]
-            old_brand.count -= old_quantity
-            old_brand.stock -= old_quantity * old_product.selling_price
-            old_brand.save()
-
-            removed.delete()
-
-        # Recalculate total and handle vendor transactions
-        instance.calculate_total_amount()
-        instance.refresh_from_db()
-        new_total_amount = instance.total_amount
-        instance.save()
+            reversals.append((products[removed.product_id], -removed.quantity))
 
-        # Refresh and adjust vendor txns as before...
-        new_vendor = instance.vendor
-        amount_diff = new_total_amount - old_total
+        if changed_lines:
+            Purchase.objects.bulk_update(changed_lines, sorted(changed_fields))
+        if new_lines:
+            Purchase.objects.bulk_create(new_lines)
+        if existing_purchases:
+            Purchase.objects.filter(id__in=list(existing_purchases)).delete()
+        restate_stock_movements(
+            reversals, additions, purchase_stock_kind(instance), old_date, instance.date, instance.id,
+        )
+
+        new_total_amount = self._set_total_amount(instance)
+        apply_ledger_delta(ledger_before, snapshot_purchase_transaction(instance))
 
-        if old_vendor and new_vendor:
+        if old_vendor and instance.vendor:
 
             if old_date != instance.date:
-                vts = VendorTransactions.objects.filter(purchase_transaction=instance)
-                for vt in vts:
-                    vt.date = instance.date
-                    vt.save()
+                VendorTransactions.objects.filter(purchase_transaction=instance).update(date=instance.date)
+                invalidate_checkpoints('vendor', old_vendor.pk, min(old_date, instance.date))
 
             # Handle full vendor transaction rebuild if method/vendor/total changed
             if old_method != instance.method or old_total != new_total_amount or old_vendor != instance.vendor:
-                vts_all = VendorTransactions.objects.filter(purchase_transaction=instance)
-                for vt in vts_all:
-                    vt.delete()
-                instance.vendor.refresh_from_db()
-                base = {
-                    'vendor': instance.vendor,
-                    'date': instance.date,
-                    'branch': instance.branch,
-                    'enterprise': instance.enterprise,
-                    'amount': -new_total_amount,
-                    'desc': desc,
-                    'method': instance.method,
-                    'purchase_transaction': instance,
-                    'type': 'base',
-                    'bill_no': instance.bill_no,
-                }
-                VendorTransactionSerializer().create(base)
-                if instance.method in ('cash', 'cheque'):
-                    pay = base.copy()
-                    pay['amount'] = new_total_amount
-                    pay['desc'] = 'Paid for purchase'
-                    pay['type'] = 'payment'
-                    pay['branch'] = instance.branch
-                    pay['enterprise'] = instance.enterprise
-                    if instance.method == 'cheque':
-                        pay.update({'cheque_number': instance.cheque_number, 'cashout_date': instance.cashout_date})
-                    VendorTransactionSerializer().create(pay)
+                self._clear_vendor_entries(instance)
+                self._write_vendor_entries(instance, desc, new_total_amount)
 
         return instance
 
@@ -355,21 +274,21 @@ class SalesTransactionSerializer(serializers.ModelSerializer):
     exchange_previous_balance = serializers.FloatField(write_only=True, required=False, default=0)
     exchange_exceeded_amount = serializers.FloatField(write_only=True, required=False, default=0)
     exchange_desc = serializers.CharField(write_only=True, required=False, allow_blank=True)
+    # Left out, the next number is allocated when the sale is saved
+    bill_no = serializers.IntegerField(required=False)
 
     class Meta:
         model = SalesTransaction
         fields = '__all__'
 
-    def _get_locked_product(self, product_id, cache):
-        """
-        Fetch a Product with select_for_update, caching to avoid redundant queries.
-        """
-        if product_id not in cache:
-            cache[product_id] = Product.objects.select_for_update().get(id=product_id)
-        return cache[product_id]
-
     @transaction.atomic
     def create(self, validated_data):
+        enterprise_id = validated_data['enterprise'].id
+        branch_id = validated_data['branch'].id if validated_data.get('branch') else None
+        if validated_data.get('bill_no') is None:
+            validated_data['bill_no'] = allocate_bill_numbers(enterprise_id, branch_id)[0]
+        else:
+            claim_bill_number(enterprise_id, branch_id, validated_data['bill_no'])
         is_sale_exchange = validated_data.get('is_sale_exchange', False)
         exchange_previous_balance = float(validated_data.get('exchange_previous_balance', 0) or 0)
         exchange_exceeded_amount = float(validated_data.get('exchange_exceeded_amount', 0) or 0)
@@ -377,33 +296,27 @@ class SalesTransactionSerializer(serializers.ModelSerializer):
         sales = validated_data.pop('sales')
         transaction = SalesTransaction.objects.create(**validated_data)
 
-        products_cache = {}
-        brands_cache = {}
         desc = f'Sales credited for :\n'
 
-        # Create each Sale and update Product/Brand counts/stocks
+        # Lock every product on the bill at once, then write all lines in one
+        # insert and move stock with one UPDATE per product and per brand.
+        products = lock_products(sale['product'].id for sale in sales)
+        lines = []
         for sale in sales:
             desc += f"{sale.get('product', {})} - {sale.get('quantity', 0)} pcs, \n"
-            saleobj = Sales.objects.create(sales_transaction=transaction, **sale)
-
-            # lock product
-            product = self._get_locked_product(saleobj.product.id, products_cache)
-            qty = saleobj.quantity or 0
-            price = product.selling_price or 0
-            product.count = (product.count or 0) - qty
-            product.stock = (product.stock or 0) - qty * price
-            product.save()
-
-            # lock brand
-            brand_obj = product.brand
-            if brand_obj.id not in brands_cache:
-                brands_cache[brand_obj.id] = brand_obj
-            brand = brands_cache[brand_obj.id]
-            brand.count = (brand.count or 0) - qty
-            brand.stock = (brand.stock or 0) - qty * price
-            brand.save()
+            line = Sales(sales_transaction=transaction, **sale)
+            line.total_price = line.quantity * line.unit_price - line.discount
+            line.cost_price = products[line.product_id].cost_price
+            lines.append(line)
+        Sales.objects.bulk_create(lines)
+        apply_stock_movements(
+            ((products[line.product_id], -(line.quantity or 0)) for line in lines),
+            sales_stock_kind(transaction), transaction.date, transaction.id,
+        )
 
         transaction.calculate_total_amount()
+        apply_ledger_delta({}, snapshot_sales_transaction(transaction))
+        apply_customer_delta({}, snapshot_customer_spend(transaction))
 
         exchange_note = ""
         if is_sale_exchange and exchange_exceeded_amount > 0:
@@ -446,6 +359,8 @@ class SalesTransactionSerializer(serializers.ModelSerializer):
 
     @transaction.atomic
     def update(self, instance, validated_data):
+        ledger_before = snapshot_sales_transaction(instance)
+        customer_before = snapshot_customer_spend(instance)
         old_date = instance.date
         old_method = instance.method
         old_total = instance.total_amount or 0
@@ -463,116 +378,66 @@ class SalesTransactionSerializer(serializers.ModelSerializer):
             setattr(instance, attr, value)
         instance.save()
 
-        products_cache = {}
-        brands_cache = {}
         desc = f'Sales credited for :\n'
 
-        def get_product_obj(prod):
-            return self._get_locked_product(prod.id, products_cache)
-
         # Keep track of existing sales
         existing_sales = {sale.id: sale for sale in instance.sales.all()}
-        new_sales_ids = []
-
+        products = lock_products(
+            [sale.product_id for sale in existing_sales.values()]
+            + [sale_data['product'].id for sale_data in sales_data if 'product' in sale_data]
+        )
+
+        reversals = []
+        additions = []
+        changed_lines = []
+        changed_fields = {'total_price'}
+        new_lines = []
         for sale_data in sales_data:
             desc += f"{sale_data.get('product', {})} - {sale_data.get('quantity', 0)} pcs, \n"
             sale_id = sale_data.get('id')
             if sale_id and sale_id in existing_sales:
+                # put the old line back into stock and take the edited one out
                 sale_inst = existing_sales.pop(sale_id)
-
-                # lock old & new products
-                old_prod = get_product_obj(sale_inst.product)
-                old_qty = sale_inst.quantity or 0
-                new_prod = sale_data.get('product', old_prod)
-                new_prod = get_product_obj(new_prod)
-                new_qty = sale_data.get('quantity', old_qty) or 0
-                price_old = old_prod.selling_price or 0
-                price_new = new_prod.selling_price or 0
-
-                # If product changed
-                if old_prod != new_prod:
-                    # restore old product/brand
-                    old_prod.count = (old_prod.count or 0) + old_qty
-                    old_prod.stock = (old_prod.stock or 0) + old_qty * price_old
-                    old_prod.save()
-                    br_old = old_prod.brand
-                    if br_old.id not in brands_cache:
-                        brands_cache[br_old.id] = br_old
-                    br_old = brands_cache[br_old.id]
-                    br_old.count = (br_old.count or 0) + old_qty
-                    br_old.stock = (br_old.stock or 0) + old_qty * price_old
-                    br_old.save()
-
-                    # deduct from new product/brand
-                    new_prod.count = (new_prod.count or 0) - new_qty
-                    new_prod.stock = (new_prod.stock or 0) - new_qty * price_new
-                    new_prod.save()
-                    br_new = new_prod.brand
-                    if br_new.id not in brands_cache:
-                        brands_cache[br_new.id] = br_new
-                    br_new = brands_cache[br_new.id]
-                    br_new.count = (br_new.count or 0) - new_qty
-                    br_new.stock = (br_new.stock or 0) - new_qty * price_new
-                    br_new.save()
-                else:
-                    # adjust same product
-                    qty_diff = new_qty - old_qty
-                    stock_diff = qty_diff * price_old
-                    old_prod.count = (old_prod.count or 0) - qty_diff
-                    old_prod.stock = (old_prod.stock or 0) - stock_diff
-                    old_prod.save()
-                    br = old_prod.brand
-                    if br.id not in brands_cache:
-                        brands_cache[br.id] = br
-                    br = brands_cache[br.id]
-                    br.count = (br.count or 0) - qty_diff
-                    br.stock = (br.stock or 0) - stock_diff
-                    br.save()
-
-                # update sale fields
+                reversals.append((products[sale_inst.product_id], sale_inst.quantity or 0))
+                old_product_id = sale_inst.product_id
                 for attr, val in sale_data.items():
+                    if attr == 'id':
+                        continue
                     setattr(sale_inst, attr, val)
-                sale_inst.save()
-                new_sales_ids.append(sale_inst.id)
-
+                    changed_fields.add(attr)
+                if sale_inst.product_id != old_product_id:
+                    sale_inst.cost_price = products[sale_inst.product_id].cost_price
+                    changed_fields.add('cost_price')
+                sale_inst.total_price = sale_inst.quantity * sale_inst.unit_price - sale_inst.discount
+                additions.append((products[sale_inst.product_id], -(sale_inst.quantity or 0)))
+                changed_lines.append(sale_inst)
             else:
                 # new sale
-                sale_data['sales_transaction'] = instance
-                new_sale = Sales.objects.create(**sale_data)
-                prod = self._get_locked_product(new_sale.product.id, products_cache)
-                qty = new_sale.quantity or 0
-                price = prod.selling_price or 0
-                prod.count = (prod.count or 0) - qty
-                prod.stock = (prod.stock or 0) - qty * price
-                prod.save()
-                br = prod.brand
-                if br.id not in brands_cache:
-                    brands_cache[br.id] = br
-                br = brands_cache[br.id]
-                br.count = (br.count or 0) - qty
-                br.stock = (br.stock or 0) - qty * price
-                br.save()
-                new_sales_ids.append(new_sale.id)
+                sale_data.pop('id', None)
+                line = Sales(sales_transaction=instance, **sale_data)
+                line.total_price = line.quantity * line.unit_price - line.discount
+                line.cost_price = products[line.product_id].cost_price
+                additions.append((products[line.product_id], -(line.quantity or 0)))
+                new_lines.append(line)
 
         # remove deleted sales
         for removed in existing_sales.values():
-            prod = self._get_locked_product(removed.product.id, products_cache)
-            old_qty = removed.quantity or 0
-            price = prod.selling_price or 0
-            prod.count = (prod.count or 0) + old_qty
-            prod.stock = (prod.stock or 0) + old_qty * price
-            prod.save()
-            br = prod.brand
-            if br.id not in brands_cache:
-                brands_cache[br.id] = br
-            br = brands_cache[br.id]
-            br.count = (br.count or 0) + old_qty
-            br.stock = (br.stock or 0) + old_qty * price
-            br.save()
-            removed.delete()
+            reversals.append((products[removed.product_id], removed.quantity or 0))
+
+        if changed_lines:
+            Sales.objects.bulk_update(changed_lines, sorted(changed_fields))
+        if new_lines:
+            Sales.objects.bulk_create(new_lines)
+        if existing_sales:
+            Sales.objects.filter(id__in=list(existing_sales)).delete()
+        restate_stock_movements(
+            reversals, additions, sales_stock_kind(instance), old_date, instance.date, instance.id,
+        )
 
         instance.calculate_total_amount()
         instance.save()
+        apply_ledger_delta(ledger_before, snapshot_sales_transaction(instance))
+        apply_customer_delta(customer_before, snapshot_customer_spend(instance))
         new_method = instance.method
         new_date = instance.date
         new_total = instance.total_amount or 0
@@ -742,64 +607,27 @@ class PurchaseReturnSerializer(serializers.ModelSerializer):
         # purchase_ids = validated_data.pop('purchase_ids', [])
         returns = validated_data.pop('returns', [])
         purchase_transaction = validated_data.get('purchase_transaction')
+        ledger_before = snapshot_purchase_transaction(purchase_transaction)
         purchase_return = PurchaseReturn.objects.create(**validated_data)
         vendor = purchase_return.purchase_transaction.vendor
         # total_unit_price = 0
 
         amount_diff = 0
         desc = "Purchase return:"
-        # Memory cache
-        products_cache = {}
-        brands_cache = {}
+        purchases = Purchase.objects.select_related('product').in_bulk([int(data['id']) for data in returns])
+        movements = []
 
-        # for purchase in purchase_ids:
         for data in returns:
-            purchase = Purchase.objects.get(id=data['id'])
+            purchase = purchases[int(data['id'])]
             purchase.purchase_return = purchase_return
             purchase.returned = True
             purchase.returned_quantity = data['quantity']
-            purchase.save()
-            # total_unit_price += purchase.unit_price * purchase.quantity
-
-            # # Cache product
-            # product_id = purchase.product.id
-            # if product_id not in products_cache:
-            #     products_cache[product_id] = purchase.product
-            # product = products_cache[product_id]
-            # product.count = (product.count or 0) - purchase.quantity
-            # product.stock = (product.stock or 0) - purchase.quantity * product.selling_price
-
-            # # Cache brand
-            # brand_id = product.brand.id
-            # if brand_id not in brands_cache:
-            #     brands_cache[brand_id] = product.brand
-            # brand = brands_cache[brand_id]
-            # brand.count = (brand.count or 0) - purchase.quantity
-            # brand.stock = (brand.stock or 0) - purchase.quantity * product.selling_price
             desc += f"{data['quantity']} x {purchase.product.name}, \n"
-
-
-            pid = purchase.product.id
-            if pid not in products_cache:
-                products_cache[pid] = purchase.product
-            product = products_cache[pid]
-            product.count = (product.count or 0) - data['quantity']
-            product.stock = (product.stock or 0) - data['quantity'] * product.selling_price
-
-            bid = product.brand.id
-            if bid not in brands_cache:
-                brands_cache[bid] = product.brand
-            brand = brands_cache[bid]
-            brand.count = (brand.count or 0) - data['quantity']
-            brand.stock = (brand.stock or 0) - data['quantity'] * product.selling_price
-
-            returned_quantity = data['quantity']
-            amount_diff += returned_quantity * purchase.unit_price
-        # Save all cached products and brands
-        for product in products_cache.values():
-            product.save()
-        for brand in brands_cache.values():
-            brand.save()
+            movements.append((purchase.product, -data['quantity']))
+            amount_diff += data['quantity'] * purchase.unit_price
+        Purchase.objects.bulk_update(purchases.values(), ['purchase_return', 'returned', 'returned_quantity'])
+        apply_stock_movements(movements, 'purchase_return', purchase_return.date, purchase_return.id)
+        apply_ledger_delta(ledger_before, snapshot_purchase_transaction(purchase_transaction))
 
         if purchase_transaction.vendor:
             vendor = purchase_transaction.vendor
@@ -823,38 +651,13 @@ class PurchaseReturnSerializer(serializers.ModelSerializer):
     
     @transaction.atomic
     def delete(self, instance):
-        purchases = instance.purchases.all()
-        # Memory cache
-        products_cache = {}
-        brands_cache = {}
-
-        for purchase in purchases:
-            purchase.returned = False
-            returned_quantity = purchase.returned_quantity
-            purchase.returned_quantity = 0
-            purchase.purchase_return = None
-            purchase.save()
-
+        ledger_before = snapshot_purchase_transaction(instance.purchase_transaction)
+        purchases = list(instance.purchases.select_related('product'))
+        movements = [(purchase.product, purchase.returned_quantity or 0) for purchase in purchases]
+        instance.purchases.update(returned=False, returned_quantity=0, purchase_return=None)
+        apply_stock_movements(movements, 'purchase_return', instance.date, instance.id)
 
-            pid = purchase.product.id
-            if pid not in products_cache:
-                products_cache[pid] = purchase.product
-            product = products_cache[pid]
-            product.count = (product.count or 0) + returned_quantity
-            product.stock = (product.stock or 0) + returned_quantity * product.selling_price
-
-            bid = product.brand.id
-            if bid not in brands_cache:
-                brands_cache[bid] = product.brand
-            brand = brands_cache[bid]
-            brand.count = (brand.count or 0) + returned_quantity
-            brand.stock = (brand.stock or 0) + returned_quantity * product.selling_price
-
-
-        for product in products_cache.values():
-            product.save()
-        for brand in brands_cache.values():
-            brand.save()
+        apply_ledger_delta(ledger_before, snapshot_purchase_transaction(instance.purchase_transaction))
 
         vt = VendorTransactions.objects.filter(purchase_transaction=instance.purchase_transaction, type="return")
         if vt:
@@ -916,46 +719,29 @@ class SalesReturnSerializer(serializers.ModelSerializer):
         # sales_ids = validated_data.pop('sales_ids', [])
         returns = validated_data.pop('returns', [])
         sales_transaction = validated_data.get('sales_transaction')
+        ledger_before = snapshot_sales_transaction(sales_transaction)
+        customer_before = snapshot_customer_spend(sales_transaction)
         sales_return = SalesReturn.objects.create(**validated_data)
         debtor = sales_return.sales_transaction.debtor
         # total_unit_price = 0
 
         amount_diff = 0
         desc = "Sales return:"
-        # Memory cache
-        products_cache = {}
-        brands_cache = {}
+        sales = Sales.objects.select_related('product').in_bulk([int(data['id']) for data in returns])
+        movements = []
 
-        # for sale in sales_ids:
         for data in returns:
-            sale = Sales.objects.get(id=data['id'])
+            sale = sales[int(data['id'])]
             sale.sales_return = sales_return
             sale.returned = True
             sale.returned_quantity = data['quantity']
-            sale.save()
             desc += f"{data['quantity']} x {sale.product.name}, \n"
-
-            sid = sale.product.id
-            if sid not in products_cache:
-                products_cache[sid] = sale.product
-            product = products_cache[sid]
-            product.count = (product.count or 0) + data['quantity']
-            product.stock = (product.stock or 0) + data['quantity'] * product.selling_price
-
-            bid = product.brand.id
-            if bid not in brands_cache:
-                brands_cache[bid] = product.brand
-            brand = brands_cache[bid]
-            brand.count = (brand.count or 0) + data['quantity']
-            brand.stock = (brand.stock or 0) + data['quantity'] * product.selling_price
-
-            returned_quantity = data['quantity']
-            amount_diff += returned_quantity * (sale.total_price / sale.quantity)
-        # Save all cached products and brands
-        for product in products_cache.values():
-            product.save()
-        for brand in brands_cache.values():
-            brand.save()
+            movements.append((sale.product, data['quantity']))
+            amount_diff += data['quantity'] * (sale.total_price / sale.quantity)
+        Sales.objects.bulk_update(sales.values(), ['sales_return', 'returned', 'returned_quantity'])
+        apply_stock_movements(movements, 'sales_return', sales_return.date, sales_return.id)
+        apply_ledger_delta(ledger_before, snapshot_sales_transaction(sales_transaction))
+        apply_customer_delta(customer_before, snapshot_customer_spend(sales_transaction))
 
         if sales_return.sales_transaction.debtor and sales_return.sales_transaction.method == 'credit':
             debtor = sales_return.sales_transaction.debtor
@@ -991,38 +777,15 @@ class SalesReturnSerializer(serializers.ModelSerializer):
 
     @transaction.atomic
     def delete(self, instance):
-        sales = instance.sales.all()
-        # Memory cache
-        products_cache = {}
-        brands_cache = {}
-
-        for sale in sales:
-            sale.returned = False
-            returned_quantity = sale.returned_quantity
-            sale.returned_quantity = 0
-            sale.sales_return = None
-            sale.save()
-
-
-            sid = sale.product.id
-            if sid not in products_cache:
-                products_cache[sid] = sale.product
-            product = products_cache[sid]
-            product.count = (product.count or 0) - returned_quantity
-            product.stock = (product.stock or 0) - returned_quantity * product.selling_price
-
-            bid = product.brand.id
-            if bid not in brands_cache:
-                brands_cache[bid] = product.brand
-            brand = brands_cache[bid]
-            brand.count = (brand.count or 0) - returned_quantity
-            brand.stock = (brand.stock or 0) - returned_quantity * product.selling_price
-
-
-        for product in products_cache.values():
-            product.save()
-        for brand in brands_cache.values():
-            brand.save()
+        ledger_before = snapshot_sales_transaction(instance.sales_transaction)
+        customer_before = snapshot_customer_spend(instance.sales_transaction)
+        sales = list(instance.sales.select_related('product'))
+        movements = [(sale.product, -(sale.returned_quantity or 0)) for sale in sales]
+        instance.sales.update(returned=False, returned_quantity=0, sales_return=None)
+        apply_stock_movements(movements, 'sales_return', instance.date, instance.id)
+
+        apply_ledger_delta(ledger_before, snapshot_sales_transaction(instance.sales_transaction))
+        apply_customer_delta(customer_before, snapshot_customer_spend(instance.sales_transaction))
 
         dt = DebtorTransaction.objects.filter(all_sales_transaction=instance.sales_transaction, type="return")
         if dt:
@@ -0,0 +1,34 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+
+from .balances import PARTIES, PARTY_OF_TRANSACTION, invalidate_checkpoints
+
+# Balance checkpoints sum up a party's transactions before each month, so
+# saving or deleting a transaction drops the ones after its date, for the
+# party and date it had before the save as well as after.
+
+
+def _party_and_date(sender, instance):
+    return getattr(instance, PARTIES[PARTY_OF_TRANSACTION[sender]].party_field), instance.date
+
+
+def remember_party_and_date(sender, instance, **kwargs):
+    instance._previous_party_and_date = None
+    if instance.pk is not None:
+        party = PARTIES[PARTY_OF_TRANSACTION[sender]]
+        instance._previous_party_and_date = sender.objects.filter(pk=instance.pk).values_list(
+            party.party_field, 'date',
+        ).first()
+
+
+def drop_stale_checkpoints(sender, instance, **kwargs):
+    name = PARTY_OF_TRANSACTION[sender]
+    touched = {_party_and_date(sender, instance), getattr(instance, '_previous_party_and_date', None)}
+    for party_pk, day in touched - {None}:
+        invalidate_checkpoints(name, party_pk, day)
+
+
+def connect_checkpoint_signals():
+    for model in PARTY_OF_TRANSACTION:
+        pre_save.connect(remember_party_and_date, sender=model)
+        post_save.connect(drop_stale_checkpoints, sender=model)
+        post_delete.connect(drop_stale_checkpoints, sender=model)
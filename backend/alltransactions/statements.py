@@ -0,0 +1,197 @@
+from __future__ import annotations
+
+from django.db.models import F, FloatField, RowRange, Sum, Value, Window
+from django.db.models.functions import Coalesce
+from django.utils.dateparse import parse_date
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+
+from .balances import PARTIES, opening_balance
+from .exports import EXPORT_FORMATS, REPORT_CHUNK_SIZE, export_report
+from .pagination import KeysetPagination
+
+# Party statements (vendor, debtor, employee, NCM).
+#
+# A statement is the party's transactions in ``(date, id)`` order, each with
+# the balance after it. The balance moves by ``sign * amount`` (see
+# ``balances.PARTIES``). The running balance is a window sum computed by the database, so
+# a page or an export never needs the rows before it, only the balance they
+# add up to: the opening balance for the first row, the cursor afterwards.
+
+STATEMENT_ORDERING = ('date', 'id')
+
+
+def parse_statement_dates(request):
+    """``start_date`` and ``end_date`` query parameters, either of which may be missing."""
+    start_date = request.GET.get('start_date')
+    end_date = request.GET.get('end_date')
+    return (parse_date(start_date) if start_date else None, parse_date(end_date) if end_date else None)
+
+
+def running_balance(sign: int, opening: float, descending: bool = False):
+    """
+    Balance after each row, ``opening`` being the balance before the first
+    row in ``(date, id)`` order. ``descending`` is for rows listed newest
+    first, where ``opening`` is the balance after the newest one.
+    """
+    if descending:
+        # Everything listed before the row happened after it
+        moved = Window(
+            Sum(F('amount') * sign), order_by=[F('date').desc(), F('id').desc()],
+            frame=RowRange(start=None, end=-1),
+        )
+        return Value(float(opening)) - Coalesce(moved, Value(0.0), output_field=FloatField())
+    moved = Window(
+        Sum(F('amount') * sign), order_by=[F('date').asc(), F('id').asc()],
+        frame=RowRange(start=None, end=0),
+    )
+    return Value(float(opening)) + Coalesce(moved, Value(0.0), output_field=FloatField())
+
+
+class Statement:
+    """
+    The transactions of one party between ``start_date`` and ``end_date``
+    (both optional and inclusive). ``history`` is every transaction of the
+    ``party`` (a key of ``balances.PARTIES``) with primary key ``party_pk``;
+    the opening balance is what the ones before ``start_date`` add up to.
+    """
+
+    def __init__(self, history, party: str, party_pk, start_date=None, end_date=None):
+        self.history = history
+        self.party = party
+        self.party_pk = party_pk
+        self.sign = PARTIES[party].sign
+        self.start_date = start_date
+        self.end_date = end_date
+        self._opening_balance = None
+
+    @property
+    def transactions(self):
+        transactions = self.history
+        if self.start_date:
+            transactions = transactions.filter(date__gte=self.start_date)
+        if self.end_date:
+            transactions = transactions.filter(date__lte=self.end_date)
+        return transactions
+
+    @property
+    def opening_balance(self) -> float:
+        if self._opening_balance is None:
+            if self.start_date:
+                self._opening_balance = opening_balance(self.party, self.party_pk, self.start_date)
+            else:
+                self._opening_balance = 0.0
+        return self._opening_balance
+
+    def entries(self):
+        """Every transaction of the statement, oldest first, annotated with ``running_balance``."""
+        return self.transactions.annotate(
+            running_balance=running_balance(self.sign, self.opening_balance),
+        ).order_by(*STATEMENT_ORDERING)
+
+
+class StatementPagination(KeysetPagination):
+    """
+    Keyset pages through a statement, oldest first. The cursor also carries
+    the balance at its boundary, so each page's running balances are summed
+    over that page alone.
+    """
+    page_size = 100
+    max_page_size = 1000
+    page_size_query_param = 'page_size'
+    ordering = STATEMENT_ORDERING
+
+    def __init__(self, statement: Statement):
+        self.statement = statement
+
+    def paginate_queryset(self, queryset, request, view=None):
+        size = request.query_params.get(self.page_size_query_param)
+        if size:
+            try:
+                self.page_size = min(max(int(size), 1), self.max_page_size)
+            except ValueError:
+                raise NotFound('Invalid page size')
+        rows = super().paginate_queryset(queryset, request, view)
+        if rows:
+            self.closing_balance = rows[-1].running_balance
+            self.balance_before = rows[0].running_balance - self.statement.sign * (rows[0].amount or 0)
+        return rows
+
+    def _ordered(self, queryset, cursor, reverse):
+        opening = self.statement.opening_balance if cursor is None else cursor['b']
+        return super()._ordered(queryset, cursor, reverse).annotate(
+            running_balance=running_balance(self.statement.sign, opening, descending=reverse),
+        )
+
+    def _cursor_payload(self, boundary, reverse, page):
+        payload = super()._cursor_payload(boundary, reverse, page)
+        payload['b'] = self.balance_before if reverse else self.closing_balance
+        return payload
+
+    def _decode_cursor(self, request):
+        cursor = super()._decode_cursor(request)
+        if cursor is not None:
+            try:
+                cursor['b'] = float(cursor['b'])
+            except (TypeError, ValueError, KeyError):
+                raise NotFound(self.invalid_cursor_message)
+        return cursor
+
+
+class StatementReport:
+    """Export of a statement: its rows with their running balance, then the opening and closing balances."""
+
+    def __init__(self, statement: Statement, columns):
+        self.statement = statement
+        self.columns = [*columns, 'amount', 'running_balance']
+        self.count = 0
+        self.closing_balance = None
+
+    def rows(self):
+        for entry in self.statement.entries().iterator(chunk_size=REPORT_CHUNK_SIZE):
+            self.count += 1
+            self.closing_balance = entry.running_balance
+            yield {column: getattr(entry, column) for column in self.columns}
+
+    def totals(self):
+        opening = self.statement.opening_balance
+        return {
+            'count': self.count,
+            'opening_balance': opening,
+            'closing_balance': opening if self.closing_balance is None else self.closing_balance,
+        }
+
+
+def statement_response(request, statement: Statement, party_key: str, party_data: dict, serializer_class,
+                       export_columns, filename: str):
+    """
+    The statement as ``{<party>_data, <party>_transactions}``, every row
+    carrying its ``running_balance``; ``previous_due`` is the opening balance
+    when the statement starts at a date.
+
+    ``?page_size=`` (or a ``cursor``) pages through it instead, adding the
+    keyset pagination fields, and ``?format=csv|xlsx`` streams it as a file.
+    """
+    export_format = request.GET.get('format')
+    if export_format in EXPORT_FORMATS:
+        return export_report(StatementReport(statement, export_columns), export_format, filename)
+
+    if statement.start_date:
+        party_data['previous_due'] = statement.opening_balance
+
+    paginator = None
+    if request.query_params.get('page_size') or request.query_params.get('cursor'):
+        paginator = StatementPagination(statement)
+        rows = paginator.paginate_queryset(statement.transactions, request)
+    else:
+        rows = list(statement.entries())
+
+    transactions = serializer_class(rows, many=True).data
+    for row, data in zip(rows, transactions):
+        data['running_balance'] = row.running_balance
+
+    payload = {f'{party_key}_data': party_data, f'{party_key}_transactions': transactions}
+    if paginator is not None:
+        payload.update(paginator.get_paginated_response(transactions).data)
+        del payload['results']
+    return Response(payload)
@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+from datetime import date
+
+from allinventory.models import Brand, Product
+
+from .ledger import LEDGER_FIELDS, ledger_totals_by_kind
+
+
+def _kind_totals(totals: dict, kind: str) -> dict:
+    """Totals of one kind summed over its payment methods."""
+    summed = dict.fromkeys(LEDGER_FIELDS, 0)
+    for method_totals in totals.get(kind, {}).values():
+        for field in LEDGER_FIELDS:
+            summed[field] += method_totals[field] or 0
+    return summed
+
+
+def _sales_profit(sales: dict) -> float:
+    # What was sold, less what came back and the cost of the goods kept
+    return sales['amount'] - sales['write_off'] - sales['cogs']
+
+
+def build_dashboard_stats(enterprise, branch, start_date: date, end_date: date, today: date) -> dict:
+    """
+    Home dashboard figures for one branch.
+
+    Read from the daily ledger (see ledger.py), so the number of queries
+    does not depend on how many purchase or sales lines fall in the range.
+    """
+    monthly = ledger_totals_by_kind(enterprise, branch, start_date, end_date)
+    daily = ledger_totals_by_kind(enterprise, branch, today, today)
+    monthly_sales, daily_sales = _kind_totals(monthly, 'sales'), _kind_totals(daily, 'sales')
+    monthly_purchases, daily_purchases = _kind_totals(monthly, 'purchase'), _kind_totals(daily, 'purchase')
+
+    return {
+        "enterprise": enterprise.name,
+        "daily": {
+            "purchases": daily_purchases['count'],
+            "dailyptamt": daily_purchases['amount'],
+            "sales": daily_sales['count'],
+            "dailystamt": daily_sales['amount'],
+            "profit": round(_sales_profit(daily_sales), 2),
+        },
+        "monthly": {
+            "purchases": monthly_purchases['count'],
+            "ptamt": monthly_purchases['amount'],
+            "stamt": monthly_sales['amount'],
+            "sales": monthly_sales['count'],
+            "profit": round(_sales_profit(monthly_sales), 2),
+        },
+        "stock": Product.objects.filter(enterprise=enterprise, branch=branch).count(),
+        "brands": Brand.objects.filter(enterprise=enterprise, branch=branch).count(),
+    }
@@ -0,0 +1,116 @@
+import datetime
+import io
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from alltransactions.balances import build_balance_checkpoints, find_due_drift, opening_balance
+from alltransactions.models import (
+    NCM,
+    BalanceCheckpoint,
+    Debtor,
+    DebtorTransaction,
+    NCMTransaction,
+    Vendor,
+    VendorTransactions,
+)
+from alltransactions.serializers import NCMTransactionSerializer
+from enterprise.models import Branch, Enterprise
+
+
+class BalanceCheckpointTestCase(TestCase):
+    def setUp(self):
+        self.enterprise = Enterprise.objects.create(name="Test Enterprise")
+        self.branch = Branch.objects.create(name="Main", enterprise=self.enterprise)
+        self.vendor = Vendor.objects.create(name="Supplier", enterprise=self.enterprise, branch=self.branch, due=0)
+        # 100 on credit on the 5th and 20th of every month of 2024
+        self.transactions = []
+        for month in range(1, 13):
+            for day in (5, 20):
+                self.transactions.append(VendorTransactions.objects.create(
+                    vendor=self.vendor, enterprise=self.enterprise, branch=self.branch,
+                    date=datetime.date(2024, month, day), amount=-100,
+                ))
+
+    def _expected(self, day):
+        return sum(-transaction.amount for transaction in VendorTransactions.objects.filter(date__lt=day))
+
+    def test_builds_a_checkpoint_after_each_month(self):
+        self.assertEqual(build_balance_checkpoints(), 13)
+        checkpoint = BalanceCheckpoint.objects.get(party='vendor', party_pk=self.vendor.pk, month=datetime.date(2024, 7, 1))
+        self.assertEqual(checkpoint.balance, 1200)
+
+    def test_opening_balance_reads_a_checkpoint_and_its_month(self):
+        build_balance_checkpoints()
+        day = datetime.date(2024, 9, 10)
+        expected = self._expected(day)
+        with self.assertNumQueries(2) as captured:
+            self.assertEqual(opening_balance('vendor', self.vendor.pk, day), expected)
+        self.assertIn(str(datetime.date(2024, 9, 1)), captured.captured_queries[1]['sql'])
+
+    def test_missing_checkpoint_is_stored_on_first_use(self):
+        day = datetime.date(2024, 9, 10)
+        self.assertEqual(opening_balance('vendor', self.vendor.pk, day), self._expected(day))
+        self.assertTrue(BalanceCheckpoint.objects.filter(month=datetime.date(2024, 9, 1)).exists())
+        expected = self._expected(day)
+        with self.assertNumQueries(2):
+            self.assertEqual(opening_balance('vendor', self.vendor.pk, day), expected)
+
+    def test_changes_drop_later_checkpoints(self):
+        build_balance_checkpoints()
+        day = datetime.date(2024, 9, 10)
+
+        VendorTransactions.objects.create(
+            vendor=self.vendor, enterprise=self.enterprise, date=datetime.date(2024, 3, 1), amount=-50,
+        )
+        self.assertEqual(opening_balance('vendor', self.vendor.pk, day), self._expected(day))
+
+        # Moving a transaction from before ``day`` to after it
+        moved = self.transactions[0]
+        moved.date = datetime.date(2024, 10, 1)
+        moved.save()
+        self.assertEqual(opening_balance('vendor', self.vendor.pk, day), self._expected(day))
+
+        self.transactions[1].delete()
+        self.assertEqual(opening_balance('vendor', self.vendor.pk, day), self._expected(day))
+        self.assertFalse(BalanceCheckpoint.objects.filter(month__gt=datetime.date(2024, 9, 1)).exists())
+
+    def test_reports_and_fixes_due_drift(self):
+        Vendor.objects.filter(pk=self.vendor.pk).update(due=2400)
+        debtor = Debtor.objects.create(name="Ram", enterprise=self.enterprise, due=70)
+        DebtorTransaction.objects.create(
+            debtor=debtor, enterprise=self.enterprise, date=datetime.date(2024, 1, 1), amount=-100,
+        )
+        DebtorTransaction.objects.create(
+            debtor=debtor, enterprise=self.enterprise, date=datetime.date(2024, 1, 2), amount=40,
+        )
+
+        drift = find_due_drift()
+        self.assertEqual([(entry.party, entry.party_pk, entry.expected) for entry in drift], [('debtor', debtor.pk, 60)])
+
+        out = io.StringIO()
+        call_command('verify_party_dues', '--fix', stdout=out)
+        self.assertIn('Fixed 1 dues', out.getvalue())
+        debtor.refresh_from_db()
+        self.assertEqual(debtor.due, 60)
+        self.assertEqual(find_due_drift(), [])
+
+    def test_ncm_dues_follow_the_branch_account(self):
+        ncm = NCM.objects.create(enterprise=self.enterprise, branch=self.branch, due=0)
+        # Booked onto the branch's account even though it names none, or another one
+        other = NCM.objects.create(enterprise=self.enterprise, branch=None, due=0)
+        for amount, account in [(300, None), (200, other), (-50, ncm)]:
+            NCMTransactionSerializer().create({
+                'amount': amount, 'ncm': account, 'date': datetime.date(2024, 1, 1),
+                'enterprise': self.enterprise, 'branch': self.branch,
+            })
+        ncm.refresh_from_db()
+        self.assertEqual(ncm.due, 450)
+        self.assertEqual(NCMTransaction.objects.filter(ncm=None).count(), 1)
+        self.assertEqual(find_due_drift(['ncm']), [])
+
+        NCM.objects.filter(pk=ncm.pk).update(due=0)
+        call_command('verify_party_dues', '--party', 'ncm', '--fix', stdout=io.StringIO())
+        ncm.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual((ncm.due, other.due), (450, 0))
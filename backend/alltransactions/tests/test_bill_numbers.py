@@ -0,0 +1,122 @@
+import datetime
+import threading
+import unittest
+
+from django.contrib.auth import get_user_model
+from django.db import close_old_connections, connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from allinventory.models import Brand, Product
+from alltransactions.bill_numbers import allocate_bill_numbers, next_bill_number
+from alltransactions.models import SalesTransaction
+from alltransactions.serializers import SalesTransactionSerializer
+from enterprise.models import Branch, Employee, Enterprise
+
+
+class BillNumberTestCase(TestCase):
+    def setUp(self):
+        self.enterprise = Enterprise.objects.create(name="Test Enterprise")
+        self.branch = Branch.objects.create(name="Main", enterprise=self.enterprise)
+        brand = Brand.objects.create(name="Brand", enterprise=self.enterprise, branch=self.branch, count=100, stock=10000)
+        self.product = Product.objects.create(
+            name="Item", selling_price=100, count=100, stock=10000,
+            brand=brand, enterprise=self.enterprise, branch=self.branch,
+        )
+        SalesTransaction.objects.create(
+            enterprise=self.enterprise, branch=self.branch, bill_no=41, date=datetime.date(2025, 1, 1),
+        )
+
+    def _sell(self, **extra):
+        serializer = SalesTransactionSerializer(data={
+            'enterprise': self.enterprise.id,
+            'branch': self.branch.id,
+            'date': datetime.date(2025, 1, 15).isoformat(),
+            'method': 'cash',
+            'sales': [{'product': self.product.id, 'quantity': 1, 'unit_price': 100}],
+            **extra,
+        })
+        serializer.is_valid(raise_exception=True)
+        return serializer.save()
+
+    def test_counter_starts_after_recorded_bills(self):
+        self.assertEqual(next_bill_number(self.enterprise.id), 42)
+        self.assertEqual([self._sell().bill_no for _ in range(3)], [42, 43, 44])
+        self.assertEqual(next_bill_number(self.enterprise.id), 45)
+
+    def test_allocation_is_one_update(self):
+        allocate_bill_numbers(self.enterprise.id)
+        with CaptureQueriesContext(connection) as queries:
+            numbers = allocate_bill_numbers(self.enterprise.id, count=10)
+        self.assertEqual(list(numbers), list(range(43, 53)))
+        statements = [query['sql'] for query in queries if not query['sql'].startswith(('SAVEPOINT', 'RELEASE'))]
+        self.assertEqual(len(statements), 1)
+        self.assertIn('RETURNING', statements[0].upper())
+
+    def test_hand_picked_numbers_are_not_handed_out_again(self):
+        self.assertEqual(self._sell(bill_no=100).bill_no, 100)
+        self.assertEqual(self._sell().bill_no, 101)
+        # Reusing an old number leaves the counter alone
+        self.assertEqual(self._sell(bill_no=7).bill_no, 7)
+        self.assertEqual(self._sell().bill_no, 102)
+
+    @override_settings(SALES_BILL_NUMBERS_PER_BRANCH=True)
+    def test_branches_can_number_separately(self):
+        other = Branch.objects.create(name="Other", enterprise=self.enterprise)
+        self.assertEqual(list(allocate_bill_numbers(self.enterprise.id, self.branch.id, 2)), [42, 43])
+        self.assertEqual(list(allocate_bill_numbers(self.enterprise.id, other.id, 2)), [1, 2])
+
+    def test_till_reserves_a_block(self):
+        user = get_user_model().objects.create_user(email="till@example.com", name="Till", password="pass12345")
+        Employee.objects.create(name="Till", user=user, enterprise=self.enterprise, branch=self.branch)
+        client = APIClient()
+        client.force_authenticate(user=user)
+
+        response = client.post('/alltransaction/next-bill-no/', {'count': 20}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data, {'first': 42, 'last': 61})
+        self.assertEqual(client.get('/alltransaction/next-bill-no/').data, {'bill_no': 62})
+        self.assertEqual(self._sell(bill_no=42).bill_no, 42)
+        self.assertEqual(self._sell().bill_no, 62)
+        self.assertEqual(client.post('/alltransaction/next-bill-no/', {'count': 0}, format='json').status_code, 400)
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', "row locking needs PostgreSQL")
+class ConcurrentBillNumberTestCase(TransactionTestCase):
+    workers = 16
+    allocations = 25
+
+    def setUp(self):
+        self.enterprise = Enterprise.objects.create(name="Test Enterprise")
+
+    def _allocate(self, results, errors, count):
+        try:
+            for _ in range(self.allocations):
+                results.extend(allocate_bill_numbers(self.enterprise.id, count=count))
+        except Exception as exc:
+            errors.append(exc)
+        finally:
+            close_old_connections()
+
+    def _run(self, count):
+        results, errors = [], []
+        threads = [
+            threading.Thread(target=self._allocate, args=(results, errors, count)) for _ in range(self.workers)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        return results
+
+    def test_parallel_allocations_never_repeat(self):
+        results = self._run(count=1)
+        total = self.workers * self.allocations
+        self.assertEqual(sorted(results), list(range(1, total + 1)))
+
+    def test_parallel_blocks_never_overlap(self):
+        results = self._run(count=5)
+        total = self.workers * self.allocations * 5
+        self.assertEqual(sorted(results), list(range(1, total + 1)))
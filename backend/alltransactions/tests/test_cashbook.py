@@ -0,0 +1,91 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from allinventory.models import Brand, Product
+from alltransactions.cashbook import build_cash_book
+from alltransactions.models import (
+    Debtor,
+    DebtorTransaction,
+    Expenses,
+    Sales,
+    SalesTransaction,
+    Withdrawal,
+)
+from enterprise.models import Branch, Employee, Enterprise
+from order.models import Order, OrderItem
+
+
+class CashBookTestCase(TestCase):
+    def setUp(self):
+        self.enterprise = Enterprise.objects.create(name="Test Enterprise")
+        self.branch = Branch.objects.create(name="Main", enterprise=self.enterprise)
+        brand = Brand.objects.create(name="Brand", enterprise=self.enterprise, branch=self.branch)
+        self.product = Product.objects.create(
+            name="Shirt", selling_price=100, brand=brand, enterprise=self.enterprise, branch=self.branch,
+        )
+        user = get_user_model().objects.create_user(email="cashier@example.com", name="Cashier", password="pass12345")
+        self.employee = Employee.objects.create(name="Cashier", user=user, enterprise=self.enterprise)
+        self.debtor = Debtor.objects.create(name="Ram", enterprise=self.enterprise, branch=self.branch)
+        self.today = timezone.localdate()
+        self.bill_no = 0
+
+    def _add_day(self, count):
+        for _ in range(count):
+            self.bill_no += 1
+            sale = SalesTransaction.objects.create(
+                enterprise=self.enterprise, branch=self.branch, bill_no=self.bill_no, date=self.today,
+                method='online', online_amount=200, amount_paid=200,
+            )
+            Sales.objects.create(product=self.product, quantity=2, unit_price=100, sales_transaction=sale)
+            order = Order.objects.create(
+                customer_name="Sita", customer_phone="98", enterprise=self.enterprise, branch=self.branch,
+                advance_received=50, advance_method='cash',
+                remaining_received=150, remaining_received_method='mixed',
+                cash_remaining=100, card_remaining=50, remaining_received_date=self.today,
+            )
+            OrderItem.objects.create(order=order, item="Cake")
+            DebtorTransaction.objects.create(
+                debtor=self.debtor, amount=30, method='card', date=self.today,
+                enterprise=self.enterprise, branch=self.branch,
+            )
+            Expenses.objects.create(
+                enterprise=self.enterprise, branch=self.branch, amount=20, method='cash', date=self.today,
+            )
+            Withdrawal.objects.create(
+                enterprise=self.enterprise, branch=self.branch, amount=10, date=self.today, employee=self.employee,
+            )
+
+    def _build(self):
+        return build_cash_book(self.enterprise, self.branch, self.today, self.today)
+
+    def test_entries_are_merged_by_date_and_method(self):
+        self._add_day(1)
+        entries, totals = self._build()
+
+        self.assertEqual(
+            [(entry['type'], entry['method']) for entry in entries],
+            [('Order', 'cash'), ('Expense', 'cash'), ('Debtor Transaction', 'card'),
+             ('Sale', 'online'), ('Order', 'mixed'), ('Withdrawal', 'N/A')],
+        )
+        self.assertTrue(entries[3]['description'].startswith("Shirt (x2)"))
+        self.assertEqual(totals['total_cash_income'], 150)
+        self.assertEqual(totals['total_card_income'], 80)
+        self.assertEqual(totals['total_online_income'], 200)
+        self.assertEqual(totals['total_income'], 430)
+        self.assertEqual(totals['total_cash_expense'], 20)
+        self.assertEqual(totals['total_withdrawal'], 10)
+
+    def test_query_count_does_not_grow_with_transactions(self):
+        self._add_day(2)
+        with CaptureQueriesContext(connection) as small:
+            self._build()
+
+        self._add_day(25)
+        with CaptureQueriesContext(connection) as large:
+            entries, _ = self._build()
+
+        self.assertEqual(len(entries), 27 * 6)
+        self.assertEqual(len(small), len(large))
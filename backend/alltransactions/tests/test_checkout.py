@@ -0,0 +1,65 @@
+import datetime
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from allinventory.models import Brand, Product
+from alltransactions.models import Sales
+from alltransactions.serializers import SalesTransactionSerializer
+from enterprise.models import Branch, Enterprise
+
+
+class BulkCheckoutTestCase(TestCase):
+    def setUp(self):
+        self.enterprise = Enterprise.objects.create(name="Test Enterprise")
+        self.branch = Branch.objects.create(name="Main", enterprise=self.enterprise)
+        self.brand = Brand.objects.create(
+            name="Brand", enterprise=self.enterprise, branch=self.branch, count=100, stock=10000,
+        )
+        self.products = [
+            Product.objects.create(
+                name=f"Item {i}", cost_price=60, selling_price=100, count=50, stock=5000,
+                brand=self.brand, enterprise=self.enterprise, branch=self.branch,
+            )
+            for i in range(2)
+        ]
+        self.bill_no = 0
+
+    def _checkout(self, lines):
+        self.bill_no += 1
+        serializer = SalesTransactionSerializer(data={
+            'enterprise': self.enterprise.id,
+            'branch': self.branch.id,
+            'date': datetime.date(2025, 1, 15).isoformat(),
+            'bill_no': self.bill_no,
+            'method': 'cash',
+            'sales': [
+                {'product': self.products[i % 2].id, 'quantity': 1, 'unit_price': 100, 'discount': 5}
+                for i in range(lines)
+            ],
+        })
+        serializer.is_valid(raise_exception=True)
+        with CaptureQueriesContext(connection) as queries:
+            sale = serializer.save()
+        return sale, len(queries)
+
+    def test_lines_and_stock_are_written(self):
+        sale, _ = self._checkout(3)
+
+        self.assertEqual(sale.total_amount, 285)
+        self.assertEqual(list(Sales.objects.filter(sales_transaction=sale).values_list('total_price', flat=True)),
+                         [95.0, 95.0, 95.0])
+        for product, sold in zip(self.products, (2, 1)):
+            product.refresh_from_db()
+            self.assertEqual(product.count, 50 - sold)
+            self.assertEqual(product.stock, 5000 - sold * 100)
+        self.brand.refresh_from_db()
+        self.assertEqual(self.brand.count, 97)
+        self.assertEqual(self.brand.stock, 9700)
+
+    def test_statement_count_does_not_grow_with_lines(self):
+        self._checkout(1)  # creates the day's ledger row
+        _, small = self._checkout(2)
+        _, large = self._checkout(40)
+        self.assertEqual(small, large)
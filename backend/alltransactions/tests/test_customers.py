@@ -0,0 +1,111 @@
+import datetime
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from allinventory.models import Brand, Product
+from alltransactions.models import Customer
+from alltransactions.serializers import SalesReturnSerializer, SalesTransactionSerializer
+from enterprise.models import Branch, Employee, Enterprise
+
+
+class CustomerTotalsTestCase(TestCase):
+    def setUp(self):
+        self.enterprise = Enterprise.objects.create(name="Test Enterprise")
+        self.branch = Branch.objects.create(name="Main", enterprise=self.enterprise)
+        brand = Brand.objects.create(name="Brand", enterprise=self.enterprise, branch=self.branch)
+        self.shirt = Product.objects.create(
+            name="Shirt", cost_price=60, selling_price=100,
+            brand=brand, enterprise=self.enterprise, branch=self.branch,
+        )
+        self.customer = Customer.objects.create(name="Ram", phone_number="9800000000", enterprise=self.enterprise)
+        self.date = datetime.date(2025, 1, 15)
+
+    def _sell(self, quantity, date=None, bill_no=1, discount=0):
+        serializer = SalesTransactionSerializer(data={
+            'enterprise': self.enterprise.id,
+            'branch': self.branch.id,
+            'date': (date or self.date).isoformat(),
+            'bill_no': bill_no,
+            'method': 'cash',
+            'phone_number': self.customer.phone_number,
+            'sales': [{'product': self.shirt.id, 'quantity': quantity, 'unit_price': 100, 'discount': discount}],
+        })
+        serializer.is_valid(raise_exception=True)
+        return serializer.save()
+
+    def _totals(self):
+        customer = Customer.objects.get(pk=self.customer.pk)
+        return customer.total_spent, customer.visit_count, customer.last_visit
+
+    def _assert_matches_rebuild(self):
+        incremental = self._totals()
+        call_command('rebuild_customer_totals', stdout=StringIO())
+        self.assertEqual(incremental, self._totals())
+
+    def test_sales_add_to_the_customer(self):
+        self._sell(2, discount=20)
+        later = self.date + datetime.timedelta(days=3)
+        self._sell(1, date=later, bill_no=2)
+        self.assertEqual(self._totals(), (280.0, 2, later))
+        self._assert_matches_rebuild()
+
+    def test_update_moves_spend_and_last_visit(self):
+        first = self._sell(2)
+        second = self._sell(1, date=self.date + datetime.timedelta(days=3), bill_no=2)
+
+        line = second.sales.get()
+        serializer = SalesTransactionSerializer(second, data={
+            'date': (self.date - datetime.timedelta(days=1)).isoformat(),
+            'sales': [{'id': line.id, 'product': self.shirt.id, 'quantity': 3, 'unit_price': 100, 'discount': 0}],
+        }, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        self.assertEqual(self._totals(), (500.0, 2, first.date))
+        self._assert_matches_rebuild()
+
+    def test_returns_are_taken_out_of_spend(self):
+        sale = self._sell(2)
+        serializer = SalesReturnSerializer(data={
+            'enterprise': self.enterprise.id,
+            'branch': self.branch.id,
+            'sales_transaction_id': sale.id,
+            'returns': [{'id': sale.sales.get().id, 'quantity': 1}],
+        })
+        serializer.is_valid(raise_exception=True)
+        sales_return = serializer.save()
+        self.assertEqual(self._totals(), (100.0, 1, self.date))
+        self._assert_matches_rebuild()
+
+        SalesReturnSerializer().delete(sales_return)
+        self.assertEqual(self._totals(), (200.0, 1, self.date))
+
+    def _client(self):
+        user = get_user_model().objects.create_user(email="admin@example.com", name="Admin", password="pass12345")
+        Employee.objects.create(name="Admin", user=user, enterprise=self.enterprise, role="Admin")
+        client = APIClient()
+        client.force_authenticate(user=user)
+        return client
+
+    def test_deleting_the_latest_sale_steps_last_visit_back(self):
+        client = self._client()
+        self._sell(1)
+        latest = self._sell(2, date=self.date + datetime.timedelta(days=3), bill_no=2)
+        response = client.delete(f"/alltransaction/salestransaction/{latest.id}/?flag=false")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._totals(), (100.0, 1, self.date))
+
+        response = client.get(f"/alltransaction/customer/{self.customer.phone_number}/")
+        self.assertEqual(response.data['total_spent'], 100.0)
+        self.assertEqual(response.data['visit_count'], 1)
+
+    def test_new_customer_picks_up_earlier_sales(self):
+        Customer.objects.filter(pk=self.customer.pk).delete()
+        self._sell(2)
+        response = self._client().post("/alltransaction/customer/", {"phone_number": "9800000000"})
+        self.assertEqual(response.data['total_spent'], 200.0)
+        self.assertEqual(self._totals(), (200.0, 1, self.date))
+        self._assert_matches_rebuild()
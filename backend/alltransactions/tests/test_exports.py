@@ -0,0 +1,87 @@
+import csv
+import datetime
+import io
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from openpyxl import load_workbook
+from rest_framework.test import APIClient
+
+from allinventory.models import Brand, Product
+from alltransactions.models import Purchase, PurchaseTransaction, Sales, SalesTransaction
+from enterprise.models import Branch, Employee, Enterprise
+
+
+class ReportExportTestCase(TestCase):
+    def setUp(self):
+        self.enterprise = Enterprise.objects.create(name="Test Enterprise")
+        self.branch = Branch.objects.create(name="Main", enterprise=self.enterprise)
+        brand = Brand.objects.create(name="Brand", enterprise=self.enterprise, branch=self.branch)
+        self.product = Product.objects.create(
+            name="Shirt", cost_price=60, selling_price=100,
+            brand=brand, enterprise=self.enterprise, branch=self.branch,
+        )
+        user = get_user_model().objects.create_user(
+            email="admin@example.com", name="Admin", password="pass12345"
+        )
+        Employee.objects.create(name="Admin", user=user, enterprise=self.enterprise, role="Admin")
+        self.client = APIClient()
+        self.client.force_authenticate(user=user)
+
+        self.date = datetime.date(2025, 1, 15)
+        for bill_no in range(1, 4):
+            sales_transaction = SalesTransaction.objects.create(
+                enterprise=self.enterprise, branch=self.branch, bill_no=bill_no, date=self.date,
+                method='cash', cash_amount=190, amount_paid=190,
+            )
+            Sales.objects.create(
+                product=self.product, quantity=2, unit_price=100, discount=10,
+                sales_transaction=sales_transaction,
+            )
+            sales_transaction.calculate_total_amount()
+            purchase_transaction = PurchaseTransaction.objects.create(
+                enterprise=self.enterprise, branch=self.branch, bill_no=str(bill_no),
+                date=self.date, method='cash',
+            )
+            Purchase.objects.create(
+                product=self.product, quantity=5, unit_price=60,
+                purchase_transaction=purchase_transaction,
+            )
+        self.params = {'start_date': '2025-01-01', 'end_date': '2025-01-31'}
+
+    def _get(self, url, **params):
+        return self.client.get(f"/alltransaction/{url}/branch/{self.branch.id}/", {**self.params, **params})
+
+    def test_json_report_is_unchanged(self):
+        response = self._get('sales-report')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 4)
+        self.assertEqual(response.data[0]['brand'], 'Brand')
+        self.assertEqual(response.data[-1]['count'], 3)
+        self.assertEqual(response.data[-1]['total_sales'], 570)
+        self.assertEqual(response.data[-1]['cash_sales'], 570)
+
+    def test_json_report_does_not_query_per_line(self):
+        with self.assertNumQueries(1):
+            self._get('sales-report')
+
+    def test_sales_csv_streams_rows_and_totals(self):
+        response = self._get('sales-report', format='csv')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+
+        lines = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(lines[0][:3], ['id', 'bill_no', 'date'])
+        self.assertEqual(len(lines), 1 + 3 + 1 + 9)
+        self.assertEqual(lines[1][2], '2025-01-15')
+        self.assertIn(['total_sales', '570.0'], lines)
+
+    def test_purchase_xlsx_export(self):
+        response = self._get('purchase-report', format='xlsx')
+        self.assertEqual(response.status_code, 200)
+
+        workbook = load_workbook(io.BytesIO(b''.join(response.streaming_content)))
+        rows = list(workbook.active.iter_rows(values_only=True))
+        self.assertEqual(rows[0][0], 'date')
+        self.assertEqual(rows[-1][:2], ('cash_purchases', 900))
@@ -0,0 +1,166 @@
+import datetime
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from allinventory.models import Brand, Product
+from alltransactions.ledger import apply_ledger_delta, ledger_totals, snapshot_sales_transaction
+from alltransactions.models import DailyBranchLedger
+from alltransactions.stats import build_dashboard_stats
+from alltransactions.serializers import (
+    PurchaseTransactionSerializer,
+    SalesReturnSerializer,
+    SalesTransactionSerializer,
+)
+from enterprise.models import Branch, Enterprise
+
+
+class DailyBranchLedgerTestCase(TestCase):
+    def setUp(self):
+        self.enterprise = Enterprise.objects.create(name="Test Enterprise")
+        self.branch = Branch.objects.create(name="Main", enterprise=self.enterprise)
+        brand = Brand.objects.create(name="Brand", enterprise=self.enterprise, branch=self.branch)
+        self.shirt = Product.objects.create(
+            name="Shirt", cost_price=60, selling_price=100,
+            brand=brand, enterprise=self.enterprise, branch=self.branch,
+        )
+        self.pants = Product.objects.create(
+            name="Pants", cost_price=150, selling_price=250,
+            brand=brand, enterprise=self.enterprise, branch=self.branch,
+        )
+        self.date = datetime.date(2025, 1, 15)
+
+    def _sell(self, lines, method='cash', bill_no=1):
+        serializer = SalesTransactionSerializer(data={
+            'enterprise': self.enterprise.id,
+            'branch': self.branch.id,
+            'date': self.date.isoformat(),
+            'bill_no': bill_no,
+            'method': method,
+            'sales': lines,
+        })
+        serializer.is_valid(raise_exception=True)
+        return serializer.save()
+
+    def _ledger(self):
+        return {
+            (row.kind, row.date, row.method): (row.amount, row.count, row.discount, row.cogs, row.write_off)
+            for row in DailyBranchLedger.objects.filter(enterprise=self.enterprise)
+            if row.count or row.amount or row.write_off
+        }
+
+    def _assert_matches_rebuild(self):
+        incremental = self._ledger()
+        call_command('rebuild_daily_ledger', stdout=StringIO())
+        self.assertEqual(incremental, self._ledger())
+
+    def test_sale_is_booked_by_day_and_method(self):
+        self._sell([
+            {'product': self.shirt.id, 'quantity': 2, 'unit_price': 100, 'discount': 20},
+            {'product': self.pants.id, 'quantity': 1, 'unit_price': 250, 'discount': 0},
+        ])
+        self._sell([{'product': self.shirt.id, 'quantity': 1, 'unit_price': 100, 'discount': 0}],
+                   method='online', bill_no=2)
+
+        self.assertEqual(self._ledger(), {
+            ('sales', self.date, 'cash'): (430.0, 2, 20.0, 270.0, 0),
+            ('sales', self.date, 'online'): (100.0, 1, 0.0, 60.0, 0),
+        })
+        totals = ledger_totals(self.enterprise, self.branch, 'sales', self.date, self.date)
+        self.assertEqual(totals['cash']['amount'], 430.0)
+        self._assert_matches_rebuild()
+
+    def test_update_moves_the_transaction_between_days(self):
+        sale = self._sell([{'product': self.shirt.id, 'quantity': 2, 'unit_price': 100, 'discount': 0}])
+        line = sale.sales.get()
+
+        new_date = self.date + datetime.timedelta(days=1)
+        serializer = SalesTransactionSerializer(sale, data={
+            'date': new_date.isoformat(),
+            'sales': [{'id': line.id, 'product': self.shirt.id, 'quantity': 3, 'unit_price': 100, 'discount': 0}],
+        }, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+        self.assertEqual(self._ledger(), {
+            ('sales', new_date, 'cash'): (300.0, 1, 0.0, 180.0, 0),
+        })
+        self._assert_matches_rebuild()
+
+    def test_return_books_write_off_and_delete_reverses_it(self):
+        sale = self._sell([{'product': self.shirt.id, 'quantity': 2, 'unit_price': 100, 'discount': 0}])
+        line = sale.sales.get()
+
+        serializer = SalesReturnSerializer(data={
+            'enterprise': self.enterprise.id,
+            'branch': self.branch.id,
+            'sales_transaction_id': sale.id,
+            'returns': [{'id': line.id, 'quantity': 1}],
+        })
+        serializer.is_valid(raise_exception=True)
+        sales_return = serializer.save()
+        return_date = sales_return.date
+
+        ledger = self._ledger()
+        self.assertEqual(ledger[('sales', return_date, 'cash')][4], 100.0)
+        self._assert_matches_rebuild()
+
+        SalesReturnSerializer().delete(sales_return)
+        self.assertEqual(self._ledger(), {('sales', self.date, 'cash'): (200.0, 1, 0.0, 120.0, 0)})
+
+    def test_repriced_product_leaves_no_cogs_behind(self):
+        sale = self._sell([{'product': self.shirt.id, 'quantity': 2, 'unit_price': 100, 'discount': 0}])
+        Product.objects.filter(pk=self.shirt.pk).update(cost_price=80)
+
+        # The line keeps the cost it was sold at, for the dashboard and a rebuild alike
+        self.assertEqual(self._ledger(), {('sales', self.date, 'cash'): (200.0, 1, 0.0, 120.0, 0)})
+        self._assert_matches_rebuild()
+
+        ledger_before = snapshot_sales_transaction(sale)
+        sale.delete()
+        apply_ledger_delta(ledger_before, {})
+        row = DailyBranchLedger.objects.get(enterprise=self.enterprise, date=self.date)
+        self.assertEqual((row.amount, row.count, row.cogs), (0, 0, 0))
+
+    def test_purchase_is_booked(self):
+        serializer = PurchaseTransactionSerializer(data={
+            'enterprise': self.enterprise.id,
+            'branch': self.branch.id,
+            'date': self.date.isoformat(),
+            'bill_no': 'P-1',
+            'method': 'cash',
+            'purchase': [{'product': self.shirt.id, 'quantity': 10, 'unit_price': 60}],
+        })
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+        self.assertEqual(self._ledger(), {('purchase', self.date, 'cash'): (600.0, 1, 0, 0, 0)})
+        self._assert_matches_rebuild()
+
+    def test_branchless_rows_are_not_duplicated(self):
+        key = (self.enterprise.id, None, 'sales', self.date, 'cash')
+        entry = {'amount': 100.0, 'count': 1, 'discount': 0, 'cogs': 60.0, 'write_off': 0}
+        apply_ledger_delta({}, {key: entry})
+        apply_ledger_delta({}, {key: entry})
+
+        row = DailyBranchLedger.objects.get(enterprise=self.enterprise, branch=None)
+        self.assertEqual((row.amount, row.count), (200.0, 2))
+        totals = ledger_totals(self.enterprise, None, 'sales', self.date, self.date)
+        self.assertEqual(totals['cash']['cogs'], 120.0)
+
+    def test_dashboard_nets_returns_out_of_profit(self):
+        sale = self._sell([{'product': self.shirt.id, 'quantity': 2, 'unit_price': 100, 'discount': 0}])
+        serializer = SalesReturnSerializer(data={
+            'enterprise': self.enterprise.id,
+            'branch': self.branch.id,
+            'sales_transaction_id': sale.id,
+            'returns': [{'id': sale.sales.get().id, 'quantity': 1}],
+        })
+        serializer.is_valid(raise_exception=True)
+        return_date = serializer.save().date
+
+        stats = build_dashboard_stats(self.enterprise, self.branch, self.date, return_date, return_date)
+        # 200 sold, 100 back, one shirt kept at a cost of 60
+        self.assertEqual(stats['monthly']['stamt'], 200.0)
+        self.assertEqual(stats['monthly']['profit'], 40.0)
@@ -0,0 +1,80 @@
+import datetime
+import random
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+
+from alltransactions.lottery import draw_winners
+from alltransactions.models import Customer, SalesTransaction
+from enterprise.models import Employee, Enterprise
+
+
+class DrawWinnersTestCase(SimpleTestCase):
+    def test_wins_follow_the_weights(self):
+        wins = Counter(draw_winners([1, 3, 0.5, 5.5], 20000, random.Random(1)))
+        for index, share in enumerate([0.1, 0.3, 0.05, 0.55]):
+            self.assertAlmostEqual(wins[index] / 20000, share, delta=0.02)
+
+    def test_without_replacement_each_wins_once(self):
+        winners = draw_winners([1, 1000, 1, 1], 10, random.Random(1), with_replacement=False)
+        self.assertEqual(sorted(winners), [0, 1, 2, 3])
+        self.assertEqual(winners[0], 1)
+
+    def test_seed_repeats_the_draw(self):
+        weights = [random.Random(i).uniform(1, 100) for i in range(500)]
+        for with_replacement in (True, False):
+            self.assertEqual(
+                draw_winners(weights, 20, random.Random(7), with_replacement),
+                draw_winners(weights, 20, random.Random(7), with_replacement),
+            )
+
+
+class CustomerLotteryViewTestCase(TestCase):
+    def setUp(self):
+        self.enterprise = Enterprise.objects.create(name="Test Enterprise")
+        user = get_user_model().objects.create_user(email="admin@example.com", name="Admin", password="pass12345")
+        Employee.objects.create(name="Admin", user=user, enterprise=self.enterprise, role="Admin")
+        self.client = APIClient()
+        self.client.force_authenticate(user=user)
+
+        for i, points in enumerate([50000.5, 0, 12]):
+            Customer.objects.create(phone_number=f"980000000{i}", enterprise=self.enterprise, loyalty_points=points)
+        other = Enterprise.objects.create(name="Other Enterprise")
+        Customer.objects.create(phone_number="9811111111", enterprise=other, loyalty_points=10)
+
+    def _draw(self, **data):
+        return self.client.post("/alltransaction/customers/lottery/", data, format='json')
+
+    def test_seeded_draw_is_repeatable(self):
+        response = self._draw(num_winners=5, seed=3)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['eligible_customers_count'], 3)
+        self.assertEqual(response.data['num_winners_drawn'], 5)
+        self.assertEqual(response.data['seed'], 3)
+        self.assertEqual(response.data['winners'], self._draw(num_winners=5, seed=3).data['winners'])
+
+    def test_without_replacement_stops_at_the_eligible_customers(self):
+        response = self._draw(num_winners=5, with_replacement=False)
+        phones = [winner['phone_number'] for winner in response.data['winners']]
+        self.assertEqual(sorted(phones), ["9800000000", "9800000001", "9800000002"])
+
+    def test_fair_spin_draws_distinct_customers(self):
+        response = self._draw(num_winners=5, use_loyalty_points=False, seed=3)
+        self.assertFalse(response.data['with_replacement'])
+        self.assertEqual(response.data['num_winners_drawn'], 3)
+        phones = [winner['phone_number'] for winner in response.data['winners']]
+        self.assertEqual(sorted(phones), ["9800000000", "9800000001", "9800000002"])
+
+    def test_date_range_limits_eligibility(self):
+        for _ in range(2):
+            SalesTransaction.objects.create(
+                enterprise=self.enterprise, bill_no=1, phone_number="9800000001", date=datetime.date(2025, 1, 5),
+            )
+        response = self._draw(num_winners=3, start_date='2025-01-01', end_date='2025-01-31')
+        self.assertEqual(response.data['eligible_customers_count'], 1)
+        self.assertEqual({winner['phone_number'] for winner in response.data['winners']}, {"9800000001"})
+
+        response = self._draw(num_winners=1, start_date='2025-02-01', end_date='2025-02-28')
+        self.assertEqual(response.status_code, 400)
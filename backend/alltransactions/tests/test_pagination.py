@@ -0,0 +1,102 @@
+import datetime
+from urllib.parse import parse_qs, urlparse
+
+from django.test import TestCase
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from alltransactions.models import Expenses, SalesTransaction, Withdrawal
+from alltransactions.pagination import KeysetPagination
+from enterprise.models import Branch, Enterprise
+
+
+class KeysetPaginationTestCase(TestCase):
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.enterprise = Enterprise.objects.create(name="Test Enterprise")
+        self.branch = Branch.objects.create(name="Main", enterprise=self.enterprise)
+        self.day = datetime.date(2025, 1, 1)
+
+    def _request(self, link=None):
+        params = {}
+        if link:
+            params = {key: values[0] for key, values in parse_qs(urlparse(link).query).items()}
+        return Request(self.factory.get('/list/', params))
+
+    def _page(self, queryset, link=None, sources=None):
+        paginator = KeysetPagination()
+        paginator.page_size = 3
+        if sources is None:
+            rows = paginator.paginate_queryset(queryset, self._request(link))
+        else:
+            rows = paginator.paginate_merged(sources, self._request(link))
+        return rows, paginator.get_paginated_response(rows).data
+
+    def test_walks_forward_and_back_over_tied_dates(self):
+        for i in range(8):
+            SalesTransaction.objects.create(
+                enterprise=self.enterprise, branch=self.branch, bill_no=i,
+                date=self.day + datetime.timedelta(days=i // 3),
+            )
+        queryset = SalesTransaction.objects.filter(enterprise=self.enterprise)
+        expected = list(queryset.order_by('-date', '-id').values_list('id', flat=True))
+
+        seen, pages, link = [], [], None
+        while True:
+            rows, data = self._page(queryset, link)
+            seen += [row.id for row in rows]
+            pages.append(data['page'])
+            self.assertEqual(data['count'], 8)
+            self.assertEqual(data['total_pages'], 3)
+            if not data['next']:
+                break
+            link = data['next']
+        self.assertEqual(seen, expected)
+        self.assertEqual(pages, [1, 2, 3])
+
+        rows, data = self._page(queryset, data['previous'])
+        self.assertEqual([row.id for row in rows], expected[3:6])
+        self.assertEqual(data['page'], 2)
+        rows, data = self._page(queryset, data['previous'])
+        self.assertEqual([row.id for row in rows], expected[:3])
+        self.assertIsNone(data['previous'])
+
+    def test_later_pages_do_not_count_or_offset(self):
+        for i in range(10):
+            SalesTransaction.objects.create(enterprise=self.enterprise, branch=self.branch, bill_no=i, date=self.day)
+        queryset = SalesTransaction.objects.filter(enterprise=self.enterprise)
+
+        with self.assertNumQueries(2):
+            _, data = self._page(queryset)
+        with self.assertNumQueries(1) as captured:
+            self._page(queryset, data['next'])
+        self.assertNotIn('OFFSET', captured.captured_queries[0]['sql'].upper())
+
+    def test_merges_two_sources(self):
+        for i in range(4):
+            date = self.day + datetime.timedelta(days=i)
+            Expenses.objects.create(enterprise=self.enterprise, branch=self.branch, amount=10, date=date)
+            Withdrawal.objects.create(enterprise=self.enterprise, branch=self.branch, amount=5, date=date)
+        sources = [
+            (Expenses.objects.all(), lambda exp: ('Expense', exp.date)),
+            (Withdrawal.objects.all(), lambda wit: ('Withdrawal', wit.date)),
+        ]
+
+        seen, link = [], None
+        while True:
+            rows, data = self._page(None, link, sources)
+            seen += rows
+            if not data['next']:
+                break
+            link = data['next']
+
+        self.assertEqual(data['count'], 8)
+        self.assertEqual(len(seen), 8)
+        self.assertEqual([date for _, date in seen], sorted((date for _, date in seen), reverse=True))
+        # Rows tying on (date, id) keep source order
+        self.assertEqual([kind for kind, _ in seen[:2]], ['Expense', 'Withdrawal'])
+
+    def test_rejects_garbled_cursor(self):
+        with self.assertRaises(NotFound):
+            self._page(SalesTransaction.objects.all(), '/list/?cursor=bm90LWpzb24')
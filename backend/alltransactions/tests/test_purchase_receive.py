@@ -0,0 +1,136 @@
+import datetime
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from allinventory.models import Brand, Product
+from alltransactions.models import Purchase, PurchaseTransaction, Vendor, VendorTransactions
+from alltransactions.serializers import PurchaseTransactionSerializer
+from enterprise.models import Branch, Enterprise
+
+
+class PurchaseReceiveTestCase(TestCase):
+    def setUp(self):
+        self.enterprise = Enterprise.objects.create(name="Test Enterprise")
+        self.branch = Branch.objects.create(name="Main", enterprise=self.enterprise)
+        self.vendor = Vendor.objects.create(name="Vendor", enterprise=self.enterprise, due=0)
+        self.brand = Brand.objects.create(name="Brand", enterprise=self.enterprise, branch=self.branch)
+        self.shirt = Product.objects.create(
+            name="Shirt", selling_price=100, brand=self.brand, enterprise=self.enterprise, branch=self.branch,
+        )
+        self.pants = Product.objects.create(
+            name="Pants", selling_price=200, brand=self.brand, enterprise=self.enterprise, branch=self.branch,
+        )
+
+    def _receive(self, lines, method='credit'):
+        serializer = PurchaseTransactionSerializer(data={
+            'enterprise': self.enterprise.id,
+            'branch': self.branch.id,
+            'vendor': self.vendor.id,
+            'bill_no': 'P-1',
+            'date': datetime.date(2025, 1, 15).isoformat(),
+            'method': method,
+            'purchase': lines,
+        })
+        serializer.is_valid(raise_exception=True)
+        return serializer.save()
+
+    def test_receive_writes_lines_stock_and_vendor_ledger(self):
+        purchase_transaction = self._receive([
+            {'product': self.shirt.id, 'quantity': 10, 'unit_price': 60},
+            {'product': self.pants.id, 'quantity': 5, 'unit_price': 120},
+        ])
+
+        self.assertEqual(PurchaseTransaction.objects.get(pk=purchase_transaction.pk).total_amount, 1200)
+        self.shirt.refresh_from_db()
+        self.assertEqual((self.shirt.count, self.shirt.stock), (10, 1000))
+        self.brand.refresh_from_db()
+        self.assertEqual((self.brand.count, self.brand.stock), (15, 2000))
+        self.vendor.refresh_from_db()
+        self.assertEqual(self.vendor.due, 1200)
+        self.assertEqual(list(VendorTransactions.objects.values_list('type', 'amount')), [('base', -1200)])
+
+    def test_cash_receive_records_payment_and_leaves_due(self):
+        self._receive([{'product': self.shirt.id, 'quantity': 10, 'unit_price': 60}], method='cash')
+        self.vendor.refresh_from_db()
+        self.assertEqual(self.vendor.due, 0)
+        self.assertEqual(VendorTransactions.objects.filter(type='payment').count(), 1)
+
+    def test_update_moves_stock_and_rebuilds_vendor_entries(self):
+        purchase_transaction = self._receive([
+            {'product': self.shirt.id, 'quantity': 10, 'unit_price': 60},
+            {'product': self.pants.id, 'quantity': 5, 'unit_price': 120},
+        ])
+        shirt_line = purchase_transaction.purchase.get(product=self.shirt)
+
+        serializer = PurchaseTransactionSerializer(purchase_transaction, data={
+            'purchase': [
+                {'id': shirt_line.id, 'product': self.pants.id, 'quantity': 4, 'unit_price': 120},
+                {'product': self.shirt.id, 'quantity': 1, 'unit_price': 60},
+            ],
+        }, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+        self.shirt.refresh_from_db()
+        self.pants.refresh_from_db()
+        self.assertEqual(self.shirt.count, 1)
+        self.assertEqual(self.pants.count, 4)
+        self.assertEqual(Purchase.objects.filter(purchase_transaction=purchase_transaction).count(), 2)
+        self.vendor.refresh_from_db()
+        self.assertEqual(self.vendor.due, 540)
+        self.assertEqual(list(VendorTransactions.objects.values_list('type', 'amount')), [('base', -540)])
+
+    def test_partial_line_keeps_its_product(self):
+        purchase_transaction = self._receive([{'product': self.shirt.id, 'quantity': 10, 'unit_price': 60}])
+        line = purchase_transaction.purchase.get()
+
+        serializer = PurchaseTransactionSerializer(purchase_transaction, data={
+            'purchase': [{'id': line.id, 'quantity': 4}],
+        }, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+        line.refresh_from_db()
+        self.assertEqual((line.product_id, line.quantity, line.total_price), (self.shirt.id, 4, 240))
+        self.shirt.refresh_from_db()
+        self.assertEqual(self.shirt.count, 4)
+
+    def test_invoice_is_rejected_as_a_whole(self):
+        other = Enterprise.objects.create(name="Other")
+        foreign = Product.objects.create(name="Foreign", brand=self.brand, enterprise=other)
+        serializer = PurchaseTransactionSerializer(data={
+            'enterprise': self.enterprise.id,
+            'bill_no': 'P-2',
+            'date': '2025-01-15',
+            'purchase': [
+                {'product': self.shirt.id, 'quantity': 1, 'unit_price': 60},
+                {'product': foreign.id, 'quantity': 1, 'unit_price': 60},
+                {'product': self.pants.id, 'quantity': 0, 'unit_price': 60},
+            ],
+        })
+        self.assertFalse(serializer.is_valid())
+        self.assertEqual(set(serializer.errors['purchase']), {1, 2})
+
+    def test_new_line_needs_quantity_and_price(self):
+        purchase_transaction = self._receive([{'product': self.shirt.id, 'quantity': 10, 'unit_price': 60}])
+        line = purchase_transaction.purchase.get()
+
+        serializer = PurchaseTransactionSerializer(purchase_transaction, data={
+            'purchase': [
+                {'id': line.id, 'quantity': 4},
+                {'product': self.pants.id, 'unit_price': 120},
+                {'product': self.pants.id, 'quantity': 2},
+            ],
+        }, partial=True)
+        self.assertFalse(serializer.is_valid())
+        self.assertEqual(set(serializer.errors['purchase']), {1, 2})
+        self.assertIn('quantity', str(serializer.errors['purchase'][1]))
+        self.assertIn('unit_price', str(serializer.errors['purchase'][2]))
+
+    def test_benchmark_command_rolls_back(self):
+        out = StringIO()
+        call_command('benchmark_purchase_receive', lines=50, stdout=out)
+        self.assertIn('Statements:', out.getvalue())
+        self.assertFalse(Enterprise.objects.filter(name="Benchmark Enterprise").exists())
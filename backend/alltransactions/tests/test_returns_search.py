@@ -0,0 +1,96 @@
+import datetime
+from urllib.parse import parse_qs, urlparse
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from allinventory.models import Brand, Product
+from alltransactions.models import (
+    Purchase,
+    PurchaseReturn,
+    PurchaseTransaction,
+    Sales,
+    SalesReturn,
+    SalesTransaction,
+    Vendor,
+    VendorTransactions,
+)
+from enterprise.models import Branch, Employee, Enterprise
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class ReturnSearchTestCase(TestCase):
+    def setUp(self):
+        self.enterprise = Enterprise.objects.create(name="Test Enterprise")
+        self.branch = Branch.objects.create(name="Main", enterprise=self.enterprise)
+        user = get_user_model().objects.create_user(email="admin@example.com", name="Admin", password="pass12345")
+        Employee.objects.create(name="Admin", user=user, enterprise=self.enterprise, role="Admin")
+        self.client = APIClient()
+        self.client.force_authenticate(user=user)
+
+        brand = Brand.objects.create(name="Brand", enterprise=self.enterprise, branch=self.branch)
+        self.shirt = Product.objects.create(name="Shirt", brand=brand, enterprise=self.enterprise, branch=self.branch)
+        self.vendor = Vendor.objects.create(name="Supplier", enterprise=self.enterprise, branch=self.branch)
+        self.day = datetime.date(2025, 1, 1)
+
+    def _walk(self, url, **params):
+        """Ids of every page of ``url``, following the next links."""
+        seen = []
+        while True:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            seen += [row['id'] for row in response.data['results']]
+            if not response.data['next']:
+                return seen
+            params = {key: values[0] for key, values in parse_qs(urlparse(response.data['next']).query).items()}
+
+    def test_purchase_return_search_pages_through(self):
+        purchase = PurchaseTransaction.objects.create(
+            vendor=self.vendor, enterprise=self.enterprise, branch=self.branch, date=self.day,
+        )
+        returns = []
+        for _ in range(7):
+            purchase_return = PurchaseReturn.objects.create(
+                enterprise=self.enterprise, branch=self.branch, purchase_transaction=purchase,
+            )
+            # Two matching lines must not list the return twice
+            for _ in range(2):
+                Purchase.objects.create(
+                    purchase_transaction=purchase, product=self.shirt, quantity=1, unit_price=10,
+                    purchase_return=purchase_return,
+                )
+            returns.append(purchase_return.id)
+
+        seen = self._walk("/alltransaction/purchase-return/", search="shirt", start_date='2000-01-01', end_date='2100-01-01')
+        self.assertEqual(seen, sorted(returns, reverse=True))
+
+    def test_sales_return_search_pages_through(self):
+        sale = SalesTransaction.objects.create(
+            enterprise=self.enterprise, branch=self.branch, bill_no=1, date=self.day, name="Sita",
+        )
+        returns = []
+        for _ in range(7):
+            sales_return = SalesReturn.objects.create(
+                enterprise=self.enterprise, branch=self.branch, sales_transaction=sale,
+            )
+            Sales.objects.create(
+                sales_transaction=sale, product=self.shirt, quantity=1, unit_price=10, sales_return=sales_return,
+            )
+            returns.append(sales_return.id)
+
+        self.assertEqual(self._walk("/alltransaction/sales-return/", search="Sita"), sorted(returns, reverse=True))
+
+    def test_vendor_transaction_search_pages_through(self):
+        other = Vendor.objects.create(name="Other", enterprise=self.enterprise, branch=self.branch)
+        for i in range(7):
+            VendorTransactions.objects.create(
+                vendor=self.vendor, enterprise=self.enterprise, branch=self.branch, date=self.day, amount=10,
+            )
+            VendorTransactions.objects.create(
+                vendor=other, enterprise=self.enterprise, branch=self.branch, date=self.day, amount=10,
+            )
+
+        seen = self._walk("/alltransaction/vendortransaction/", search="supp")
+        expected = VendorTransactions.objects.filter(vendor=self.vendor).order_by('-date', '-id').values_list('id', flat=True)
+        self.assertEqual(seen, list(expected))
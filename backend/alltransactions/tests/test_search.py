@@ -0,0 +1,79 @@
+import datetime
+
+from django.test import TestCase
+
+from allinventory.models import Brand, Product
+from alltransactions.models import Purchase, PurchaseTransaction, Sales, SalesTransaction, Vendor
+from alltransactions.search import (
+    search_purchase_transactions,
+    search_sales_transactions,
+    split_return_keyword,
+)
+from enterprise.models import Branch, Enterprise
+
+
+class TransactionSearchTestCase(TestCase):
+    def setUp(self):
+        self.enterprise = Enterprise.objects.create(name="Test Enterprise")
+        self.other_enterprise = Enterprise.objects.create(name="Other Enterprise")
+        self.branch = Branch.objects.create(name="Main", enterprise=self.enterprise)
+        self.other_branch = Branch.objects.create(name="Second", enterprise=self.enterprise)
+        brand = Brand.objects.create(name="Brand", enterprise=self.enterprise, branch=self.branch)
+        self.shirt = Product.objects.create(name="Shirt", brand=brand, enterprise=self.enterprise, branch=self.branch)
+        self.day = datetime.date(2025, 2, 10)
+
+    def _sale(self, bill_no, branch=None, enterprise=None, name="", phone="", lines=(), date=None, hidden=False):
+        sale = SalesTransaction.objects.create(
+            enterprise=enterprise or self.enterprise, branch=branch or self.branch, bill_no=bill_no,
+            date=date or self.day, name=name, phone_number=phone, hidden=hidden,
+        )
+        for product in lines:
+            Sales.objects.create(sales_transaction=sale, product=product, quantity=1, unit_price=10)
+        return sale
+
+    def _ids(self, transactions):
+        return [transaction.bill_no for transaction in transactions]
+
+    def test_sales_search_matches_each_field_once(self):
+        self._sale(1, name="Sita Sharma")
+        self._sale(2, phone="9841000001")
+        self._sale(3, lines=[self.shirt, self.shirt])
+        self._sale(4, name="Ram")
+
+        self.assertEqual(self._ids(search_sales_transactions(self.enterprise, self.branch, "sita")), [1])
+        self.assertEqual(self._ids(search_sales_transactions(self.enterprise, self.branch, "41000")), [2])
+        self.assertEqual(self._ids(search_sales_transactions(self.enterprise, self.branch, "shi")), [3])
+        self.assertEqual(self._ids(search_sales_transactions(self.enterprise, self.branch, "4")), [4, 2])
+
+    def test_date_range_stays_within_enterprise_and_branch(self):
+        self._sale(1)
+        self._sale(2, branch=self.other_branch)
+        other_branch = Branch.objects.create(name="Elsewhere", enterprise=self.other_enterprise)
+        self._sale(3, branch=other_branch, enterprise=self.other_enterprise)
+        self._sale(4, date=self.day - datetime.timedelta(days=30))
+        self._sale(5, hidden=True)
+
+        transactions = search_sales_transactions(self.enterprise, self.branch, None, self.day, self.day)
+        self.assertEqual(self._ids(transactions), [1])
+        transactions = search_sales_transactions(self.enterprise, self.branch, None, self.day, self.day,
+                                                 include_hidden=True)
+        self.assertEqual(self._ids(transactions), [5, 1])
+
+    def test_purchase_search(self):
+        vendor = Vendor.objects.create(name="Kathmandu Traders", enterprise=self.enterprise)
+        by_vendor = PurchaseTransaction.objects.create(
+            enterprise=self.enterprise, branch=self.branch, vendor=vendor, bill_no="A-1", date=self.day,
+        )
+        by_product = PurchaseTransaction.objects.create(
+            enterprise=self.enterprise, branch=self.branch, bill_no="A-2", date=self.day,
+        )
+        Purchase.objects.create(purchase_transaction=by_product, product=self.shirt, quantity=1, unit_price=5)
+
+        self.assertEqual(list(search_purchase_transactions(self.enterprise, self.branch, "traders")), [by_vendor])
+        self.assertEqual(list(search_purchase_transactions(self.enterprise, self.branch, "Shirt")), [by_product])
+        self.assertEqual(list(search_purchase_transactions(self.enterprise, self.branch, "shi")), [by_product])
+        self.assertEqual(list(search_purchase_transactions(self.enterprise, self.branch, "a-2")), [by_product])
+
+    def test_return_keyword_is_stripped(self):
+        self.assertEqual(split_return_keyword("returned sita"), ("sita", True))
+        self.assertEqual(split_return_keyword("sita"), ("sita", False))
@@ -0,0 +1,124 @@
+import csv
+import datetime
+import io
+from urllib.parse import parse_qs, urlparse
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from alltransactions.balances import build_balance_checkpoints
+from alltransactions.models import EmployeeTransactions, NCM, NCMTransaction, Vendor, VendorTransactions
+from enterprise.models import Branch, Employee, Enterprise
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class StatementTestCase(TestCase):
+    def setUp(self):
+        self.enterprise = Enterprise.objects.create(name="Test Enterprise")
+        self.branch = Branch.objects.create(name="Main", enterprise=self.enterprise)
+        user = get_user_model().objects.create_user(email="admin@example.com", name="Admin", password="pass12345")
+        self.employee = Employee.objects.create(name="Admin", user=user, enterprise=self.enterprise, role="Admin")
+        self.client = APIClient()
+        self.client.force_authenticate(user=user)
+
+        self.vendor = Vendor.objects.create(name="Supplier", enterprise=self.enterprise, branch=self.branch)
+        self.day = datetime.date(2025, 1, 1)
+        # Two purchases on credit a day, then a payment: 100, 50, -120, 100, 50, -120, ...
+        self.amounts = []
+        for i in range(12):
+            amount = [100, 50, -120][i % 3]
+            self.amounts.append(amount)
+            VendorTransactions.objects.create(
+                vendor=self.vendor, enterprise=self.enterprise, branch=self.branch,
+                date=self.day + datetime.timedelta(days=i // 3), amount=amount,
+            )
+
+    def _vendor(self, **params):
+        return self.client.get(f"/alltransaction/vendor/statement/{self.vendor.id}/", params)
+
+    def _balances(self, amounts, opening=0, sign=-1):
+        balances = []
+        for amount in amounts:
+            opening += sign * amount
+            balances.append(opening)
+        return balances
+
+    def test_rows_carry_their_running_balance(self):
+        response = self._vendor()
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('previous_due', response.data['vendor_data'])
+        rows = response.data['vendor_transactions']
+        self.assertEqual([row['amount'] for row in rows], self.amounts)
+        self.assertEqual([row['running_balance'] for row in rows], self._balances(self.amounts))
+
+    def test_opening_balance_starts_the_window(self):
+        build_balance_checkpoints()
+        with self.assertNumQueries(4):  # vendor, checkpoint, rest of its month, rows
+            response = self._vendor(start_date='2025-01-02', end_date='2025-01-03')
+        opening = -sum(self.amounts[:3])
+        self.assertEqual(response.data['vendor_data']['previous_due'], opening)
+        rows = response.data['vendor_transactions']
+        self.assertEqual([row['amount'] for row in rows], self.amounts[3:9])
+        self.assertEqual([row['running_balance'] for row in rows], self._balances(self.amounts[3:9], opening))
+
+    def _follow(self, link):
+        params = {key: values[0] for key, values in parse_qs(urlparse(link).query).items()}
+        return self._vendor(**params)
+
+    def test_keyset_pages_continue_the_balance(self):
+        expected = self._balances(self.amounts[3:], -sum(self.amounts[:3]))
+        response = self._vendor(start_date='2025-01-02', page_size=4)
+        self.assertEqual(response.data['count'], 9)
+        seen = []
+        while True:
+            seen += [row['running_balance'] for row in response.data['vendor_transactions']]
+            if not response.data['next']:
+                break
+            response = self._follow(response.data['next'])
+        self.assertEqual(seen, expected)
+
+        response = self._follow(response.data['previous'])
+        self.assertEqual([row['running_balance'] for row in response.data['vendor_transactions']], expected[4:8])
+        response = self._follow(response.data['previous'])
+        self.assertEqual([row['running_balance'] for row in response.data['vendor_transactions']], expected[:4])
+        self.assertIsNone(response.data['previous'])
+
+    def test_later_pages_only_read_their_rows(self):
+        response = self._vendor(page_size=5)
+        with self.assertNumQueries(2) as captured:  # vendor, page
+            self._follow(response.data['next'])
+        self.assertIn('OVER', captured.captured_queries[-1]['sql'].upper())
+        self.assertNotIn('OFFSET', captured.captured_queries[-1]['sql'].upper())
+
+    def test_csv_export_streams_balances(self):
+        response = self._vendor(start_date='2025-01-04', format='csv')
+        self.assertEqual(response.status_code, 200)
+        lines = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(lines[0][-2:], ['amount', 'running_balance'])
+        opening = -sum(self.amounts[:9])
+        self.assertEqual([float(line[-1]) for line in lines[1:4]], self._balances(self.amounts[9:], opening))
+        totals = dict(line for line in lines[5:])
+        self.assertEqual(float(totals['opening_balance']), opening)
+        self.assertEqual(float(totals['closing_balance']), -sum(self.amounts))
+
+    def test_employee_and_ncm_accrue(self):
+        for i, amount in enumerate([500, -200, -100]):
+            EmployeeTransactions.objects.create(
+                employee=self.employee, enterprise=self.enterprise, amount=amount,
+                date=self.day + datetime.timedelta(days=i),
+            )
+        response = self.client.get(
+            f"/alltransaction/employee/statement/{self.employee.id}/", {'start_date': '2025-01-02'},
+        )
+        self.assertEqual(response.data['employee_data']['previous_due'], 500)
+        self.assertEqual([row['running_balance'] for row in response.data['employee_transactions']], [300, 200])
+
+        ncm = NCM.objects.create(enterprise=self.enterprise, branch=self.branch, due=0)
+        for amount in [40, 60]:
+            NCMTransaction.objects.create(
+                ncm=ncm, enterprise=self.enterprise, branch=self.branch, amount=amount, date=self.day,
+            )
+        response = self.client.get(f"/alltransaction/ncm/statement/branch/{self.branch.id}/")
+        self.assertEqual(response.data['ncm_data']['branch_name'], "Main")
+        self.assertEqual([row['running_balance'] for row in response.data['ncm_transactions']], [40, 100])
@@ -0,0 +1,105 @@
+import datetime
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from allinventory.models import Brand, Product
+from alltransactions.ledger import rebuild_daily_ledger
+from alltransactions.models import Purchase, PurchaseTransaction, Sales, SalesTransaction
+from alltransactions.stats import build_dashboard_stats
+from enterprise.models import Branch, Employee, Enterprise
+
+
+class DashboardStatsTestCase(TestCase):
+    def setUp(self):
+        self.enterprise = Enterprise.objects.create(name="Test Enterprise")
+        self.branch = Branch.objects.create(name="Main", enterprise=self.enterprise)
+        self.brand = Brand.objects.create(name="Brand", enterprise=self.enterprise, branch=self.branch)
+        self.product = Product.objects.create(
+            name="Shirt", cost_price=60, selling_price=100,
+            brand=self.brand, enterprise=self.enterprise, branch=self.branch,
+        )
+        self.today = timezone.localdate()
+        self.month_start = self.today.replace(day=1)
+        self.bill_no = 0
+
+    def _add_lines(self, lines, date):
+        self.bill_no += 1
+        purchase_transaction = PurchaseTransaction.objects.create(
+            enterprise=self.enterprise, branch=self.branch, bill_no=str(self.bill_no), date=date,
+        )
+        sales_transaction = SalesTransaction.objects.create(
+            enterprise=self.enterprise, branch=self.branch, bill_no=self.bill_no, date=date,
+        )
+        for _ in range(lines):
+            Purchase.objects.create(
+                product=self.product, quantity=2, unit_price=60,
+                purchase_transaction=purchase_transaction,
+            )
+            Sales.objects.create(
+                product=self.product, quantity=1, unit_price=100, discount=10,
+                sales_transaction=sales_transaction,
+            )
+        # Lines created straight through the ORM skip the serializers that book them
+        rebuild_daily_ledger(enterprise=self.enterprise)
+
+    def _stats(self):
+        return build_dashboard_stats(
+            self.enterprise, self.branch, self.month_start, self.today, self.today
+        )
+
+    def test_daily_and_monthly_totals(self):
+        self._add_lines(3, self.today)
+        # A line from before the range must not leak into either bucket.
+        self._add_lines(1, self.month_start - datetime.timedelta(days=1))
+
+        stats = self._stats()
+
+        self.assertEqual(stats["daily"], {
+            "purchases": 3, "dailyptamt": 360.0, "sales": 3, "dailystamt": 270.0, "profit": 90.0,
+        })
+        self.assertEqual(stats["monthly"], {
+            "purchases": 3, "ptamt": 360.0, "stamt": 270.0, "sales": 3, "profit": 90.0,
+        })
+        self.assertEqual(stats["stock"], 1)
+        self.assertEqual(stats["brands"], 1)
+
+    def test_empty_branch_returns_zeroes(self):
+        stats = self._stats()
+        self.assertEqual(stats["daily"]["dailystamt"], 0)
+        self.assertEqual(stats["monthly"]["profit"], 0)
+
+    def test_query_count_is_constant_as_lines_grow(self):
+        self._add_lines(5, self.today)
+        with CaptureQueriesContext(connection) as small:
+            self._stats()
+
+        self._add_lines(200, self.today)
+        with CaptureQueriesContext(connection) as large:
+            stats = self._stats()
+
+        self.assertEqual(stats["monthly"]["sales"], 205)
+        self.assertEqual(len(small), len(large))
+        self.assertLessEqual(len(large), 4)
+
+    def test_view_uses_today_when_range_is_given(self):
+        user = get_user_model().objects.create_user(
+            email="admin@example.com", name="Admin", password="pass12345"
+        )
+        Employee.objects.create(name="Admin", user=user, enterprise=self.enterprise, role="Admin")
+        self._add_lines(2, self.today)
+
+        client = APIClient()
+        client.force_authenticate(user=user)
+        response = client.get(
+            f"/alltransaction/stats/branch/{self.branch.id}/",
+            {"start_date": self.month_start.isoformat(), "end_date": self.today.isoformat()},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["daily"]["sales"], 2)
+        self.assertEqual(response.data["monthly"]["stamt"], 180.0)
@@ -0,0 +1,102 @@
+import datetime
+import threading
+import unittest
+
+from django.db import close_old_connections, connection
+from django.test import TestCase, TransactionTestCase
+
+from allinventory.models import Brand, Product
+from allinventory.stock import apply_stock_movements, revalue_product
+from alltransactions.serializers import SalesTransactionSerializer
+from enterprise.models import Branch, Enterprise
+
+
+class StockServiceTestCase(TestCase):
+    def setUp(self):
+        self.enterprise = Enterprise.objects.create(name="Test Enterprise")
+        self.branch = Branch.objects.create(name="Main", enterprise=self.enterprise)
+        self.brand = Brand.objects.create(
+            name="Brand", enterprise=self.enterprise, branch=self.branch, count=20, stock=2000,
+        )
+        self.products = [
+            Product.objects.create(
+                name=f"Item {i}", selling_price=100, count=10, stock=1000,
+                brand=self.brand, enterprise=self.enterprise, branch=self.branch,
+            )
+            for i in range(2)
+        ]
+
+    def test_movements_are_summed_per_row(self):
+        first, second = self.products
+        with self.assertNumQueries(6):
+            apply_stock_movements([(first, -3), (second, 5), (first, -1)], 'adjustment')
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.brand.refresh_from_db()
+        self.assertEqual((first.count, first.stock), (6, 600))
+        self.assertEqual((second.count, second.stock), (15, 1500))
+        self.assertEqual((self.brand.count, self.brand.stock), (21, 2100))
+
+    def test_revalue_product_moves_brand_by_difference(self):
+        product = self.products[0]
+        Product.objects.filter(pk=product.pk).update(selling_price=150)
+        revalue_product(product.pk)
+
+        product.refresh_from_db()
+        self.brand.refresh_from_db()
+        self.assertEqual(product.stock, 1500)
+        self.assertEqual(self.brand.stock, 2500)
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', "row locking needs PostgreSQL")
+class ConcurrentCheckoutTestCase(TransactionTestCase):
+    checkouts = 8
+
+    def setUp(self):
+        self.enterprise = Enterprise.objects.create(name="Test Enterprise")
+        self.branch = Branch.objects.create(name="Main", enterprise=self.enterprise)
+        self.brand = Brand.objects.create(
+            name="Brand", enterprise=self.enterprise, branch=self.branch, count=200, stock=20000,
+        )
+        self.products = [
+            Product.objects.create(
+                name=f"Item {i}", selling_price=100, count=100, stock=10000,
+                brand=self.brand, enterprise=self.enterprise, branch=self.branch,
+            )
+            for i in range(2)
+        ]
+
+    def _checkout(self, bill_no, errors):
+        try:
+            # Alternate the line order so naive locking would deadlock.
+            products = self.products if bill_no % 2 else self.products[::-1]
+            serializer = SalesTransactionSerializer(data={
+                'enterprise': self.enterprise.id,
+                'branch': self.branch.id,
+                'date': datetime.date(2025, 1, 15).isoformat(),
+                'bill_no': bill_no,
+                'method': 'cash',
+                'sales': [{'product': product.id, 'quantity': 1, 'unit_price': 100} for product in products],
+            })
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+        except Exception as exc:
+            errors.append(exc)
+        finally:
+            close_old_connections()
+
+    def test_parallel_checkouts_do_not_lose_updates(self):
+        errors = []
+        threads = [threading.Thread(target=self._checkout, args=(i + 1, errors)) for i in range(self.checkouts)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        for product in self.products:
+            product.refresh_from_db()
+            self.assertEqual(product.count, 100 - self.checkouts)
+        self.brand.refresh_from_db()
+        self.assertEqual(self.brand.count, 200 - 2 * self.checkouts)
@@ -0,0 +1,125 @@
+import datetime
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from allinventory.models import Brand, Product, StockMovement
+from allinventory.stock import stock_drift, stock_on_hand, take_stock_snapshots
+from alltransactions.serializers import PurchaseTransactionSerializer, SalesTransactionSerializer
+from enterprise.models import Branch, Employee, Enterprise
+
+
+class StockJournalTestCase(TestCase):
+    def setUp(self):
+        self.enterprise = Enterprise.objects.create(name="Test Enterprise")
+        self.branch = Branch.objects.create(name="Main", enterprise=self.enterprise)
+        self.brand = Brand.objects.create(name="Brand", enterprise=self.enterprise, branch=self.branch)
+        self.product = Product.objects.create(
+            name="Shirt", selling_price=100, brand=self.brand, enterprise=self.enterprise, branch=self.branch,
+        )
+        self.bill_no = 0
+
+    def _post(self, serializer_class, lines_key, date, quantity):
+        self.bill_no += 1
+        serializer = serializer_class(data={
+            'enterprise': self.enterprise.id,
+            'branch': self.branch.id,
+            'date': date.isoformat(),
+            'bill_no': self.bill_no,
+            'method': 'cash',
+            lines_key: [{'product': self.product.id, 'quantity': quantity, 'unit_price': 100}],
+        })
+        serializer.is_valid(raise_exception=True)
+        return serializer.save()
+
+    def _on_hand(self, date):
+        return stock_on_hand(date, Product.objects.filter(pk=self.product.pk)).get().on_hand
+
+    def test_on_hand_is_snapshot_plus_later_movements(self):
+        day = datetime.date(2025, 3, 1)
+        self._post(PurchaseTransactionSerializer, 'purchase', day, 10)
+        self._post(SalesTransactionSerializer, 'sales', day + datetime.timedelta(days=1), 3)
+        take_stock_snapshots(day + datetime.timedelta(days=1))
+        self._post(SalesTransactionSerializer, 'sales', day + datetime.timedelta(days=3), 2)
+
+        self.assertEqual(self._on_hand(day - datetime.timedelta(days=1)), 0)
+        self.assertEqual(self._on_hand(day), 10)
+        self.assertEqual(self._on_hand(day + datetime.timedelta(days=2)), 7)
+        self.assertEqual(self._on_hand(day + datetime.timedelta(days=3)), 5)
+
+        # A sale back-dated before the snapshot still shows up after it
+        self._post(SalesTransactionSerializer, 'sales', day, 1)
+        self.assertEqual(self._on_hand(day + datetime.timedelta(days=2)), 6)
+        self.assertEqual(
+            set(StockMovement.objects.values_list('kind', flat=True)), {'purchase', 'sale'},
+        )
+
+    def test_editing_a_sale_journals_only_the_difference(self):
+        sale = self._post(SalesTransactionSerializer, 'sales', datetime.date(2025, 3, 1), 3)
+        line = sale.sales.get()
+        serializer = SalesTransactionSerializer(sale, data={
+            'sales': [{'id': line.id, 'product': self.product.id, 'quantity': 5, 'unit_price': 100}],
+        }, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+        self.assertEqual(list(StockMovement.objects.order_by('id').values_list('quantity', flat=True)), [-3, -2])
+
+    def test_reconcile_repairs_counters_and_journal(self):
+        self._post(PurchaseTransactionSerializer, 'purchase', datetime.date(2025, 3, 1), 10)
+        Product.objects.filter(pk=self.product.pk).update(count=7)
+        self.assertEqual([(p.pk, p.drift) for p in stock_drift()], [(self.product.pk, -3)])
+
+        out = StringIO()
+        call_command('reconcile_stock', '--repair', 'counters', stdout=out)
+        self.assertIn("1 products drifted.", out.getvalue())
+        self.product.refresh_from_db()
+        self.brand.refresh_from_db()
+        self.assertEqual((self.product.count, self.brand.count), (10, 13))
+
+        Product.objects.filter(pk=self.product.pk).update(count=12)
+        call_command('reconcile_stock', '--repair', 'journal', stdout=StringIO())
+        self.assertFalse(stock_drift().exists())
+        self.assertEqual(StockMovement.objects.get(kind='adjustment').quantity, 2)
+
+    def test_editing_a_count_journals_only_the_edit(self):
+        self._post(PurchaseTransactionSerializer, 'purchase', datetime.date(2025, 3, 1), 10)
+        # Drift from elsewhere that the edit must not swallow
+        Product.objects.filter(pk=self.product.pk).update(count=8)
+        user = get_user_model().objects.create_user(email="admin@example.com", name="Admin", password="pass12345")
+        Employee.objects.create(name="Admin", user=user, enterprise=self.enterprise, role="Admin")
+        client = APIClient()
+        client.force_authenticate(user=user)
+
+        response = client.patch(f"/allinventory/product/{self.product.id}/", {'count': 5}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(StockMovement.objects.get(kind='recount').quantity, -3)
+        self.assertFalse(StockMovement.objects.filter(kind='adjustment').exists())
+        self.assertEqual([(p.pk, p.drift) for p in stock_drift()], [(self.product.pk, -2)])
+
+    def test_opening_movements_start_from_the_live_count(self):
+        # Stock held before the journal existed, then one sale journaled after it
+        Product.objects.filter(pk=self.product.pk).update(count=20)
+        day = datetime.date(2025, 3, 1)
+        self._post(SalesTransactionSerializer, 'sales', day, 3)
+        take_stock_snapshots(day)
+        untouched = Product.objects.create(
+            name="Pants", selling_price=200, count=4, brand=self.brand, enterprise=self.enterprise,
+        )
+        self.assertEqual(stock_drift().count(), 2)
+
+        out = StringIO()
+        call_command('open_stock_journal', stdout=out)
+        self.assertIn("2 products", out.getvalue())
+        self.assertFalse(stock_drift().exists())
+        self.assertEqual(self._on_hand(day - datetime.timedelta(days=1)), 20)
+        self.assertEqual(self._on_hand(day), 17)
+        self.assertEqual(StockMovement.objects.get(product=untouched, kind='opening').quantity, 4)
+
+        # Opened products are left alone, so later drift is still reported
+        Product.objects.filter(pk=self.product.pk).update(count=16)
+        call_command('open_stock_journal', stdout=out)
+        self.assertEqual([(p.pk, p.drift) for p in stock_drift()], [(self.product.pk, -1)])
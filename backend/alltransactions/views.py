@@ -1,4 +1,5 @@
 from django.shortcuts import render
+from django.conf import settings
 from datetime import timedelta
 from rest_framework.response import Response
 import random
@@ -9,14 +10,14 @@ from rest_framework.views import APIView
 from rest_framework import status
 from .models import PurchaseTransaction,SalesTransaction,Vendor,VendorTransactions,SalesReturn,Purchase,Sales,PurchaseReturn,EmployeeTransactions, Expenses
 from rest_framework.permissions import IsAuthenticated
-from allinventory.models import Product,Brand
+from allinventory.models import Product
 from django.utils.dateparse import parse_date
 from django.utils import timezone
 from datetime import date, datetime,time
 from django.utils.dateparse import parse_date
 from rest_framework.pagination import PageNumberPagination
 from django.utils.timezone import make_aware,localtime
-from django.db.models import Max, Q, Sum
+from django.db.models import Q
 from .models import Customer
 from django.db import transaction
 from .models import Debtor, DebtorTransaction
@@ -26,8 +27,20 @@ from alltransactions.models import EmployeeTransactionDetail,Withdrawal, Closing
 from order.models import Order
 from .models import NCM, NCMTransaction
 from .serializers import NCMSerializer, NCMTransactionSerializer
+from .serializers import purchase_stock_kind, sales_stock_kind
+from .search import search_purchase_transactions, search_sales_transactions, split_return_keyword
+from .pagination import KeysetPagination
 from enterprise.models import Employee
 from enterprise.serializers import EmployeeSerializer
+from .stats import build_dashboard_stats
+from allinventory.stock import apply_stock_movements
+from .ledger import apply_ledger_delta, snapshot_purchase_transaction, snapshot_sales_transaction
+from .cashbook import build_cash_book
+from .exports import EXPORT_FORMATS, PurchaseReport, ReportExportMixin, SalesReport, export_report
+from .statements import Statement, parse_statement_dates, statement_response
+from .bill_numbers import allocate_bill_numbers, next_bill_number
+from .customers import apply_customer_delta, refresh_customer_totals, snapshot_customer_spend
+from .lottery import draw_winners, eligible_customers, lottery_weight
 
 
 # Create your views here.
@@ -46,41 +59,23 @@ class PurchaseTransactionView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
     def get(self, request,pk=None,branch=None, format=None):
-        print("HERE")
         user = request.user
         enterprise = user.employee.enterprise
         search = request.GET.get('search')
         start_date = request.GET.get('start_date')
         end_date = request.GET.get('end_date')
-        transactions = PurchaseTransaction.objects.filter(enterprise=enterprise)
-
         if pk:
             purchase_transaction = PurchaseTransaction.objects.get(id=pk)
             serializer = PurchaseTransactionSerializer(purchase_transaction)
             return Response(serializer.data)
-        
-        if branch:
-            transactions = PurchaseTransaction.objects.filter(enterprise=enterprise,branch=branch)
-        
-        if search:
-            phone_transactions = transactions.filter(purchase__product__name__startswith = search)
-            vendor_trasactions = transactions.filter(vendor__name__icontains = search)
-            bill_transactions = transactions.filter(bill_no__iexact = search)
-            transactions = phone_transactions.union(vendor_trasactions,bill_transactions)
-        
+
         if start_date and end_date:
             start_date = parse_date(start_date)
             end_date = parse_date(end_date)
 
-        if start_date and end_date:
-            transactions = PurchaseTransaction.objects.filter(
-                date__range=(start_date, end_date)
-            )
-
-        transactions = transactions.order_by('-date','-id')
-
+        transactions = search_purchase_transactions(enterprise, branch, search, start_date, end_date)
 
-        paginator = PageNumberPagination()
+        paginator = KeysetPagination()
         paginator.page_size = 5  # Set the page size here
         paginated_transactions = paginator.paginate_queryset(transactions, request)
 
@@ -112,38 +107,12 @@ class PurchaseTransactionView(APIView):
                 return Response("Unauthorized")
 
             purchase_transaction = PurchaseTransaction.objects.get(id=pk)
-            purchases = purchase_transaction.purchase.all()
-            returned_amount = 0
-
-            # In‐memory caches
-            products_cache = {}
-            brands_cache = {}
-
-            for purchase in purchases:
-                if not purchase.returned:
-                    # Cache and update product
-                    pid = purchase.product.id
-                    if pid not in products_cache:
-                        products_cache[pid] = purchase.product
-                    product = products_cache[pid]
-                    product.count -= purchase.quantity
-                    product.stock -= purchase.quantity * product.selling_price
-
-                    # Cache and update brand
-                    bid = product.brand.id
-                    if bid not in brands_cache:
-                        brands_cache[bid] = product.brand
-                    brand = brands_cache[bid]
-                    brand.count -= purchase.quantity
-                    brand.stock -= purchase.quantity * product.selling_price
-                else:
-                    returned_amount += purchase.total_price
-
-            # Save each unique product and brand once
-            for product in products_cache.values():
-                product.save()
-            for brand in brands_cache.values():
-                brand.save()
+            ledger_before = snapshot_purchase_transaction(purchase_transaction)
+            purchases = purchase_transaction.purchase.select_related('product')
+            apply_stock_movements(
+                ((purchase.product, -purchase.quantity) for purchase in purchases if not purchase.returned),
+                purchase_stock_kind(purchase_transaction), purchase_transaction.date, purchase_transaction.id,
+            )
             
             # Remove any related vendor transactions
             vts = VendorTransactions.objects.filter(purchase_transaction=purchase_transaction)
@@ -151,6 +120,7 @@ class PurchaseTransactionView(APIView):
                 vt.delete()
 
             purchase_transaction.delete()
+            apply_ledger_delta(ledger_before, {})
             return Response("Deleted")
 
 
@@ -233,51 +203,23 @@ class SalesTransactionView(APIView):
         search = request.GET.get('search')
         start_date = request.GET.get('start_date')
         end_date = request.GET.get('end_date')
-        is_return = False
-        import re
-        if search:
-            pattern = r'\breturn(ed)?\b'
-
-            is_return = bool(re.search(pattern, search, re.IGNORECASE))
-            search = re.sub(pattern, '', search, flags=re.IGNORECASE).strip()
-        
-        transactions = SalesTransaction.objects.filter(enterprise=enterprise, hidden=False)
+        search, is_return = split_return_keyword(search)
 
         if pk:
             sales_transaction = SalesTransaction.objects.get(id=pk)
             serializer = SalesTransactionSerializer(sales_transaction)
             return Response(serializer.data)
-        
-        if branch and not is_return:
-            transactions = SalesTransaction.objects.filter(enterprise=enterprise,branch=branch, hidden=False)
-        elif branch and is_return:
-            transactions = SalesTransaction.objects.filter(enterprise=enterprise,branch=branch)
-            print("Return")
 
-        
-        if search:
-            product_transactions = transactions.filter(sales__product__name__istartswith = search)
-            customer_transactions = transactions.filter(name__icontains = search)
-            phone_transactions = transactions.filter(phone_number__icontains = search)
-            print(phone_transactions)
-            bill_transactions = transactions.filter(bill_no__iexact = search)
-            transactions = product_transactions.union(customer_transactions,phone_transactions,bill_transactions)
-        
         if start_date and end_date:
             start_date = parse_date(start_date)
             end_date = parse_date(end_date)
 
-        if start_date and end_date:
-            
-            transactions = SalesTransaction.objects.filter(
-                date__range=(start_date, end_date),
-                hidden=False
-            )
-
-        transactions = transactions.order_by('-date','-id')
-
+        # Searching for returns also lists bills hidden from the branch view
+        transactions = search_sales_transactions(
+            enterprise, branch, search, start_date, end_date, include_hidden=bool(branch and is_return),
+        )
 
-        paginator = PageNumberPagination()
+        paginator = KeysetPagination()
         paginator.page_size = 5  # Set the page size here
         paginated_transactions = paginator.paginate_queryset(transactions, request)
 
@@ -400,41 +342,19 @@ class SalesTransactionView(APIView):
                 return Response("Cannot delete transaction with returned sales")
         if role != "Admin":
             return Response("Unauthorized")
+        ledger_before = snapshot_sales_transaction(sales_transaction)
+        customer_before = snapshot_customer_spend(sales_transaction)
         if modify_stock == 'false':
             sales_transaction.delete()
+            apply_ledger_delta(ledger_before, {})
+            apply_customer_delta(customer_before, {})
             return Response("Deleted")
 
-        sales = sales_transaction.sales.all()
-
-        # Memory caches for products and brands
-        products_cache = {}
-        brands_cache = {}
-
-        for sale in sales:
-            # preserve your original check
-            if not sale.returned:
-                # cache and update product
-                pid = sale.product.id
-                if pid not in products_cache:
-                    products_cache[pid] = sale.product
-                product = products_cache[pid]
-                product.count += sale.quantity
-                product.stock += sale.product.selling_price * sale.quantity
-
-                # cache and update brand
-                bid = product.brand.id
-                if bid not in brands_cache:
-                    brands_cache[bid] = product.brand
-                brand = brands_cache[bid]
-                brand.count += sale.quantity
-                brand.stock += sale.product.selling_price * sale.quantity
-
-        # save each unique product and brand once
-        print(products_cache)
-        for product in products_cache.values():
-            product.save()
-        for brand in brands_cache.values():
-            brand.save()
+        sales = sales_transaction.sales.select_related('product')
+        apply_stock_movements(
+            ((sale.product, sale.quantity) for sale in sales if not sale.returned),
+            sales_stock_kind(sales_transaction), sales_transaction.date, sales_transaction.id,
+        )
 
         dt = DebtorTransaction.objects.filter(all_sales_transaction=sales_transaction).first()
         if dt:
@@ -449,6 +369,8 @@ class SalesTransactionView(APIView):
             ncmt.delete()
 
         sales_transaction.delete()
+        apply_ledger_delta(ledger_before, {})
+        apply_customer_delta(customer_before, {})
 
         if customer:
             if not use_loyalty_points:
@@ -564,9 +486,8 @@ class VendorTransactionView(APIView):
         if branch:
             vendor_transactions = vendor_transactions.filter(branch = branch)
         if query:
-            vendor_transactions_name = vendor_transactions.filter(vendor__name__icontains=query,enterprise = request.user.employee.enterprise)
-            vendor_transactions_brand = vendor_transactions.filter(vendor__brand__name__icontains=query,enterprise = request.user.employee.enterprise)
-            vendor_transactions = vendor_transactions_name.union(vendor_transactions_brand)
+            # Vendors no longer carry a brand, so the name is all there is to match
+            vendor_transactions = vendor_transactions.filter(vendor__name__icontains=query)
 
         if start_date and end_date:
             start_date = parse_date(start_date)
@@ -578,9 +499,7 @@ class VendorTransactionView(APIView):
                 date__range=(start_date, end_date)
             )
 
-        vendor_transactions = vendor_transactions.order_by('-date','-id')
-
-        paginator = PageNumberPagination()
+        paginator = KeysetPagination()
         paginator.page_size = 5  # Set the page size here
         paginated_transactions = paginator.paginate_queryset(vendor_transactions, request)
 
@@ -627,78 +546,21 @@ class StatsView(APIView):
     # permission_classes = [IsAuthenticated]
 
     def get(self,request, branch=None):
-        
-        print("HERE")
 
         start_date = request.GET.get('start_date')
         end_date = request.GET.get('end_date')
+        today = timezone.localdate()
 
         if not start_date or not end_date:
-            today = timezone.now().date()
             start_date = today.replace(day=1)  # First day of the current month
             end_date = today
         
         start_date = parse_date(start_date) if isinstance(start_date, str) else start_date
         end_date = parse_date(end_date) if isinstance(end_date, str) else end_date
 
-
         enterprise = request.user.employee.enterprise
-    
-        allstock = Product.objects.filter(enterprise = enterprise, branch=branch).count()
-        allbrands = Brand.objects.filter(enterprise = enterprise, branch=branch).count()
-
-        monthlypurchases = Purchase.objects.filter(purchase_transaction__enterprise = enterprise,purchase_transaction__branch=branch,purchase_transaction__date__range=(start_date, end_date))
-        monthlysales = Sales.objects.filter(sales_transaction__enterprise = enterprise,sales_transaction__branch=branch,sales_transaction__date__range=(start_date, end_date))
-
-        dailypurchases = Purchase.objects.filter(purchase_transaction__enterprise = enterprise,purchase_transaction__branch=branch,purchase_transaction__date = today)
-        dailysales = Sales.objects.filter(sales_transaction__enterprise = enterprise,sales_transaction__branch=branch,sales_transaction__date = today)
-
-
-
-
-        ptamt = 0
-        dailyptamt = 0
-        daily_profit = 0
-        monthly_profit = 0
-
-        for p in monthlypurchases:
-            ptamt += p.total_price if p.total_price else 0
-
-        for p in dailypurchases:
-            dailyptamt += p.total_price if p.total_price else 0
-
-        stamt = 0
-        dailystamt = 0
-        for sale in monthlysales:
-           stamt += sale.total_price if sale.total_price else 0
-           product = sale.product
-           monthly_profit += sale.total_price - product.cost_price * sale.quantity
-
-        for sale in dailysales:
-            dailystamt += sale.total_price if sale.total_price else 0
-            product = sale.product
-            daily_profit += sale.total_price - product.cost_price * sale.quantity
-
-
-        stat = { 
-            "enterprise" : enterprise.name,
-            "daily":{
-                "purchases" : dailypurchases.count(),
-                "dailyptamt":dailyptamt,
-                "sales": dailysales.count(),
-                "dailystamt":dailystamt,
-                "profit": round(daily_profit,2)
-            },
-            "monthly":{
-                "purchases" : monthlypurchases.count(),
-                "ptamt":ptamt,
-                "stamt":stamt,
-                "sales": monthlysales.count(),
-                "profit": round(monthly_profit,2)
-            },
-            "stock": allstock,
-            "brands" : allbrands
-        }
+
+        stat = build_dashboard_stats(enterprise, branch, start_date, end_date, today)
         return Response(stat)
     
 
@@ -723,15 +585,12 @@ class PurchaseReturnView(APIView):
         # 1) Search Filter
         # -----------------
         if search:
-            name_filter = purchase_returns.filter(purchase_transaction__vendor__name__icontains=search)
-            # amount_filter = purchase_returns.filter(amount__icontains=search)
-            product_name = purchase_returns.filter(purchases__product__name__icontains=search)
-            
-            # union() will merge the two QuerySets without duplicates.
-            purchase_returns = name_filter.union(product_name)
+            # One filter rather than a union, so the date range and the
+            # pagination cursor can still be applied to the result
+            matches = Q(purchase_transaction__vendor__name__icontains=search) | Q(purchases__product__name__icontains=search)
             if search.isdigit():
-                id = purchase_returns.filter(id__icontains=search)
-                purchase_returns = purchase_returns.union(id)
+                matches |= Q(id__icontains=search)
+            purchase_returns = purchase_returns.filter(matches).distinct()
 
         # ---------------------
         # 2) Date Range Filter
@@ -750,9 +609,8 @@ class PurchaseReturnView(APIView):
         # ---------------------------------
         # 3) Sort and Paginate the Results
         # ---------------------------------
-        purchase_returns = purchase_returns.order_by('-id')  # Sorting
-
-        paginator = PageNumberPagination()
+        paginator = KeysetPagination()
+        paginator.ordering = ('-id',)
         paginator.page_size = 5  # Set your desired page size
         paginated_data = paginator.paginate_queryset(purchase_returns, request)
 
@@ -786,7 +644,7 @@ class PurchaseReturnView(APIView):
         serializer.delete(purchase_return)
         return Response(status=status.HTTP_204_NO_CONTENT)
     
-class SalesReportView(APIView):
+class SalesReportView(ReportExportMixin, APIView):
 
     permission_classes = [IsAuthenticated]
 
@@ -825,58 +683,16 @@ class SalesReportView(APIView):
         if not search and not start_date and not end_date:
             sales = sales.filter(sales_transaction__date = timezone.now().date())
 
-        count = sales.count()
+        report = SalesReport(sales)
+        export_format = request.GET.get('format')
+        if export_format in EXPORT_FORMATS:
+            return export_report(report, export_format, 'sales-report')
 
-        subtotal_sales = 0  # sum before discount
-        total_discount = 0  # sum of per-line discount amounts
-        cash_sales = 0
-        card_sales = 0
-        online_sales = 0
-        st = []
-        write_off = 0
-        rows = []
-        for sale in sales:
-            if sale.sales_transaction.id not in st:
-                if sale.sales_transaction.is_ncm == False and sale.sales_transaction.method != "loyalty":
-                    write_off += sale.sales_transaction.total_amount - sale.sales_transaction.amount_paid
-                st.append(sale.sales_transaction.id)
-                cash_sales += sale.sales_transaction.cash_amount
-                card_sales += sale.sales_transaction.card_amount
-                online_sales += sale.sales_transaction.online_amount
-            line_subtotal = (sale.unit_price or 0) * (sale.quantity or 0)
-            line_discount = sale.discount or 0
-            line_net = line_subtotal - line_discount
-            subtotal_sales += line_subtotal
-            total_discount += line_discount
-            rows.append({
-                "id": sale.id,
-                "bill_no": sale.sales_transaction.bill_no,
-                "date": sale.sales_transaction.date,
-                "brand": sale.product.brand.name,
-                "quantity": sale.quantity,
-                "product": sale.product.name,
-                "unit_price": sale.unit_price,
-                "line_subtotal": line_subtotal,
-                "discount": line_discount,
-                "total_price": line_net,
-                "method": sale.sales_transaction.method,
-                "transaction_id": sale.sales_transaction.id
-            })
-        net_sales = subtotal_sales - total_discount
-        rows.append({
-            "count": count,
-            "subtotal_sales": subtotal_sales,
-            "total_discount": total_discount,
-            "total_sales": net_sales,
-            "write_off": write_off,
-            "net_sales": net_sales - write_off,
-            "cash_sales": cash_sales,
-            "card_sales": card_sales,
-            "online_sales": online_sales,
-        })
+        rows = list(report.rows())
+        rows.append(report.totals())
         return Response(rows)
 
-class PurchaseReportView(APIView):
+class PurchaseReportView(ReportExportMixin, APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request, branch=None):
@@ -904,46 +720,38 @@ class PurchaseReportView(APIView):
         
         purchases = purchases.order_by('purchase_transaction__date', 'id')
 
-        count = purchases.count()
-        subtotal_purchases = 0
-        rows = []
-        cash_purchases = 0
-        for purchase in purchases:
-            line_subtotal = (purchase.unit_price or 0) * (purchase.quantity or 0)
-            subtotal_purchases += line_subtotal
-            rows.append({
-                'date': purchase.purchase_transaction.date,
-                'brand': purchase.product.brand.name,
-                'quantity': purchase.quantity,
-                'product': purchase.product.name,
-                'unit_price': purchase.unit_price,
-                'line_subtotal': line_subtotal,
-                'total_price': line_subtotal,
-                'method': purchase.purchase_transaction.method,
-                'transaction_id': purchase.purchase_transaction.id
-            })
-            if purchase.purchase_transaction.method == 'cash':
-                cash_purchases += line_subtotal
-        rows.append({
-            'count': count,
-            'subtotal_purchases': subtotal_purchases,
-            'total_purchases': subtotal_purchases,
-            'cash_purchases': cash_purchases,
-        })
+        report = PurchaseReport(purchases)
+        export_format = request.GET.get('format')
+        if export_format in EXPORT_FORMATS:
+            return export_report(report, export_format, 'purchase-report')
+
+        rows = list(report.rows())
+        rows.append(report.totals())
         return Response(rows)
      
 class NextBillNo(APIView):
+    permission_classes = [IsAuthenticated]
+
     def get(self,request):
-        max_bill_no = SalesTransaction.objects.filter(
-            enterprise=request.user.employee.enterprise,
-        ).aggregate(max_bill_no=Max('bill_no'))['max_bill_no']
-        
-        if max_bill_no is None:
-            next_bill_no = 1
-        else:
-            next_bill_no = max_bill_no + 1
-        
-        return Response({'bill_no':next_bill_no})
+        """The number the next sale will get, without reserving it."""
+        employee = request.user.employee
+        return Response({'bill_no': next_bill_number(employee.enterprise_id, employee.branch_id)})
+
+    def post(self, request):
+        """
+        Reserve a block of ``count`` bill numbers for this till, which then
+        sends them as ``bill_no`` on its sales without asking again.
+        """
+        employee = request.user.employee
+        max_block = getattr(settings, 'SALES_BILL_NUMBER_MAX_BLOCK', 500)
+        try:
+            count = int(request.data.get('count', 1))
+        except (TypeError, ValueError):
+            count = 0
+        if not 1 <= count <= max_block:
+            return Response({'error': f'count must be between 1 and {max_block}'}, status=status.HTTP_400_BAD_REQUEST)
+        numbers = allocate_bill_numbers(employee.enterprise_id, employee.branch_id, count)
+        return Response({'first': numbers[0], 'last': numbers[-1]}, status=status.HTTP_201_CREATED)
     
 class EmployeeTransactionView(APIView):
     permission_classes = [IsAuthenticated]
@@ -979,9 +787,8 @@ class EmployeeTransactionView(APIView):
                 date__range=(start_date, end_date)
             )
 
-        employee_transactions = employee_transactions.order_by('-id')
-
-        paginator = PageNumberPagination()
+        paginator = KeysetPagination()
+        paginator.ordering = ('-id',)
         paginator.page_size = 5  # Set the page size here
         paginated_transactions = paginator.paginate_queryset(employee_transactions, request)
 
@@ -1035,13 +842,9 @@ class CustomerView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self,request,pk):
-        customer = Customer.objects.filter(phone_number=pk).first()
+        customer = Customer.objects.filter(phone_number=pk, enterprise=request.user.employee.enterprise).first()
         if customer:
-            sales = SalesTransaction.objects.filter(phone_number=customer.phone_number,enterprise=request.user.employee.enterprise)
-            total_amount = 0
-            for sale in sales:
-                total_amount += sale.total_amount
-            return Response({"name": customer.name, "phone_number": customer.phone_number, "total_spent": total_amount, "loyalty_points": customer.loyalty_points})
+            return Response(self._data(customer))
         else:
             return Response("Customer not found", status=status.HTTP_404_NOT_FOUND)
 
@@ -1052,11 +855,19 @@ class CustomerView(APIView):
         phone_number = data["phone_number"]
         customer = Customer.objects.create(name=customer_name, phone_number=phone_number, enterprise=enterprise)
         if customer:
-            total_spent = 0
-            sales = SalesTransaction.objects.filter(phone_number=customer.phone_number, enterprise=enterprise)
-            for sale in sales:
-                total_spent += sale.total_amount
-            return Response({"name": customer.name, "phone_number": customer.phone_number, "total_spent": total_spent})
+            # Sales may have been made to the number before it was registered
+            refresh_customer_totals(customer)
+            return Response(self._data(customer))
+
+    def _data(self, customer):
+        return {
+            "name": customer.name,
+            "phone_number": customer.phone_number,
+            "total_spent": customer.total_spent or 0,
+            "visit_count": customer.visit_count,
+            "last_visit": customer.last_visit,
+            "loyalty_points": customer.loyalty_points,
+        }
 
 
 class ListCustomerView(APIView):
@@ -1100,22 +911,36 @@ class CustomerLotteryView(APIView):
         {
             "num_winners": int,
             "use_loyalty_points": bool (default=True),
+            "with_replacement": bool (default=use_loyalty_points),
+            "seed": int (optional),
             "start_date": "YYYY-MM-DD" (optional),
             "end_date": "YYYY-MM-DD" (optional)
         }
         
         If date range provided: only customers with sales in that range are eligible.
-        If use_loyalty_points=True: weighted by loyalty_points.
+        If use_loyalty_points=True: weighted by loyalty points (at least one entry each).
         If use_loyalty_points=False: all eligible customers have equal probability.
+        If with_replacement=False: each customer wins at most once, so no more
+        winners are drawn than there are eligible customers. A fair spin draws
+        distinct winners unless with_replacement=True is sent.
+        The seed used is returned, and drawing again with it gives the same winners.
         """
         from datetime import datetime
-        from alltransactions.models import SalesTransaction
         
         enterprise = request.user.employee.enterprise
-        num_winners = int(request.data.get('num_winners', 1))
         use_loyalty_points = request.data.get('use_loyalty_points', True)
+        with_replacement = request.data.get('with_replacement', use_loyalty_points)
         start_date_str = request.data.get('start_date')
         end_date_str = request.data.get('end_date')
+        try:
+            num_winners = int(request.data.get('num_winners', 1))
+            seed = request.data.get('seed')
+            seed = int(seed) if seed not in (None, '') else random.SystemRandom().randrange(2 ** 32)
+        except (TypeError, ValueError):
+            return Response(
+                {'error': 'num_winners and seed must be integers'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
         if num_winners < 1:
             return Response(
@@ -1123,11 +948,9 @@ class CustomerLotteryView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Determine eligible customers
-        eligible_customers = set()
-        
+        start_date = end_date = None
         if start_date_str and end_date_str:
-            # Filter by sales within date range
+            # Only customers with sales within the date range
             try:
                 start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
                 end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
@@ -1136,67 +959,35 @@ class CustomerLotteryView(APIView):
                     {'error': 'Invalid date format. Use YYYY-MM-DD'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
-            
-            sales_in_range = SalesTransaction.objects.filter(
-                enterprise=enterprise,
-                date__gte=start_date,
-                date__lte=end_date
-            )
-            
-            for sale in sales_in_range:
-                if sale.phone_number:
-                    eligible_customers.add(sale.phone_number)
-        else:
-            # No date range: all customers are eligible
-            all_customers = Customer.objects.filter(enterprise=enterprise)
-            eligible_customers = {c.phone_number for c in all_customers}
         
-        if not eligible_customers:
+        eligible = list(eligible_customers(enterprise, start_date, end_date))
+        if not eligible:
             return Response(
                 {'error': 'No eligible customers found for the specified criteria'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Get customer objects for eligible customers
-        customers = Customer.objects.filter(
-            enterprise=enterprise,
-            phone_number__in=eligible_customers
+        winner_indexes = draw_winners(
+            (lottery_weight(points, use_loyalty_points) for _, points in eligible),
+            num_winners, random.Random(seed), with_replacement,
         )
-        
-        # Build lottery pool
-        lottery_pool = []
-        
-        if use_loyalty_points:
-            # Weighted by loyalty points
-            for customer in customers:
-                points = max(0, customer.loyalty_points or 0)
-                entries = max(1, points)  # minimum 1 entry per customer
-                lottery_pool.extend([customer] * entries)
-        else:
-            # Fair spin: each customer has exactly 1 entry
-            lottery_pool = list(customers)
-        
-        if not lottery_pool:
-            return Response(
-                {'error': 'No customers available for lottery'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        # Draw winners (with replacement possible - same customer can win multiple times)
-        available_winners = min(num_winners, len(lottery_pool))
-        winners_list = random.sample(lottery_pool, available_winners)
+        winner_phones = [eligible[index][0] for index in winner_indexes]
+        customers = Customer.objects.in_bulk(set(winner_phones))
         
         # Keep all winners including duplicates - each entry is a separate win
+        winners_list = [customers[phone] for phone in winner_phones]
         serializer = CustomerSerializer(winners_list, many=True)
         return Response({
             'num_winners_requested': num_winners,
             'num_winners_drawn': len(winners_list),
             'use_loyalty_points': use_loyalty_points,
+            'with_replacement': with_replacement,
+            'seed': seed,
             'date_range': {
                 'start_date': start_date_str,
                 'end_date': end_date_str
             } if start_date_str and end_date_str else None,
-            'eligible_customers_count': len(eligible_customers),
+            'eligible_customers_count': len(eligible),
             'winners': serializer.data
         }, status=status.HTTP_200_OK)
 
@@ -1222,15 +1013,12 @@ class SalesReturnView(APIView):
         # 1) Search Filter
         # -----------------
         if search:
-            name_filter = sales_returns.filter(sales_transaction__name=search)
-            # amount_filter = purchase_returns.filter(amount__icontains=search)
-            product_name = sales_returns.filter(sales__product__name__icontains=search)
-            
-            # union() will merge the two QuerySets without duplicates.
-            sales_returns = name_filter.union(product_name)
+            # One filter rather than a union, so the date range and the
+            # pagination cursor can still be applied to the result
+            matches = Q(sales_transaction__name=search) | Q(sales__product__name__icontains=search)
             if search.isdigit():
-                id = sales_returns.filter(id__icontains=search)
-                sales_returns = sales_returns.union(id)
+                matches |= Q(id__icontains=search)
+            sales_returns = sales_returns.filter(matches).distinct()
 
         # ---------------------
         # 2) Date Range Filter
@@ -1249,9 +1037,8 @@ class SalesReturnView(APIView):
         # ---------------------------------
         # 3) Sort and Paginate the Results
         # ---------------------------------
-        sales_returns = sales_returns.order_by('-id')  # Sorting
-
-        paginator = PageNumberPagination()
+        paginator = KeysetPagination()
+        paginator.ordering = ('-id',)
         paginator.page_size = 5  # Set your desired page size
         paginated_data = paginator.paginate_queryset(sales_returns, request)
 
@@ -1352,10 +1139,7 @@ class DebtorTransactionView(APIView):
                 date__range=(start_date, end_date)
             )
 
-        debtor_transactions = debtor_transactions.order_by('-date','-id')
-
-
-        paginator = PageNumberPagination()
+        paginator = KeysetPagination()
         paginator.page_size = 5  # Set your desired page size
         paginated_data = paginator.paginate_queryset(debtor_transactions, request)
 
@@ -1438,9 +1222,7 @@ class NCMTransactionView(APIView):
                 date__range=(start_date, end_date)
             )
 
-        ncm_transactions = ncm_transactions.order_by('-date','-id')
-
-        paginator = PageNumberPagination()
+        paginator = KeysetPagination()
         paginator.page_size = 5
         paginated_data = paginator.paginate_queryset(ncm_transactions, request)
 
@@ -1482,170 +1264,73 @@ class NCMTransactionView(APIView):
         if role != "Admin":
             return Response("Unauthorized")
         ncm_transaction = NCMTransaction.objects.filter(id=pk).first()
-        ncm = ncm_transaction.ncm if ncm_transaction else None
-        if ncm: 
-            ncm.due -= ncm_transaction.amount
-            ncm.save()
         if not ncm_transaction:
             return Response("NCM Transaction not found", status=status.HTTP_404_NOT_FOUND)
         ncm_transaction.delete()
         return Response("Deleted", status=status.HTTP_204_NO_CONTENT)
     
 
-class VendorStatementView(APIView):
+class VendorStatementView(ReportExportMixin, APIView):
     permission_classes = [IsAuthenticated]
+    export_columns = ['date', 'id', 'bill_no', 'type', 'method', 'desc']
 
     def get(self, request, vendorId=None, branch=None):
-        print("HERE START")
         enterprise = request.user.employee.enterprise
         vendor = Vendor.objects.filter(id=vendorId, enterprise=enterprise).first()
-        vendor_transactions = VendorTransactions.objects.filter(enterprise=enterprise,vendor=vendor)
-
         if not vendor:
             return Response("Vendor not found", status=status.HTTP_404_NOT_FOUND)
 
-        start_date = request.GET.get('start_date')
-        end_date = request.GET.get('end_date')
-
-        if start_date:
-            start_date = parse_date(start_date)
-        
-        if end_date:
-            end_date = parse_date(end_date)
-
-    
-        if start_date and end_date:
-            vendor_transactions = vendor_transactions.filter(
-                date__range=(start_date, end_date)
-            )
-        elif start_date and not end_date:
-            vendor_transactions = vendor_transactions.filter(
-                date__gte=start_date
-            )
-        elif not start_date and end_date:
-            vendor_transactions = vendor_transactions.filter(
-                date__lte=end_date
-            )
-
-        vendor_transactions = vendor_transactions.order_by('date','id')
-        vendor = VendorSerializer(vendor).data 
-        # Calculate previous due when a start_date is provided
-        previous_due = 0
-        if start_date:
-            print("HERE IN")
-            prev_sum = VendorTransactions.objects.filter(
-                enterprise=enterprise,
-                vendor_id=vendorId,
-                date__lt=start_date
-            ).aggregate(total=Sum('amount'))['total'] or 0
-            # Running formula is running -= amount, so opening due = -sum(amount before start)
-            previous_due = -float(prev_sum)
-            print("HERE", previous_due)
-            vendor['previous_due'] = previous_due
-            print("VENDOR", vendor)
-        vts = VendorTransactionSerializer(vendor_transactions, many=True).data
-        return Response({'vendor_data': vendor, 'vendor_transactions': vts})
+        start_date, end_date = parse_statement_dates(request)
+        statement = Statement(
+            VendorTransactions.objects.filter(enterprise=enterprise, vendor=vendor).select_related('vendor'),
+            'vendor', vendor.pk, start_date=start_date, end_date=end_date,
+        )
+        return statement_response(
+            request, statement, 'vendor', VendorSerializer(vendor).data, VendorTransactionSerializer,
+            self.export_columns, f'vendor_statement_{vendor.id}',
+        )
     
-class DebtorStatementView(APIView):
+class DebtorStatementView(ReportExportMixin, APIView):
     permission_classes = [IsAuthenticated]
+    export_columns = ['date', 'id', 'type', 'method', 'desc']
 
     def get(self, request, debtorId=None, branch=None):
         enterprise = request.user.employee.enterprise
         debtor = Debtor.objects.filter(id=debtorId, enterprise=enterprise).first()
-        debtor_transactions = DebtorTransaction.objects.filter(enterprise=enterprise, debtor=debtor)
-
         if not debtor:
             return Response("Debtor not found", status=status.HTTP_404_NOT_FOUND)
 
-        start_date = request.GET.get('start_date')
-        end_date = request.GET.get('end_date')
-
-        if start_date and end_date:
-            start_date = parse_date(start_date)
-            end_date = parse_date(end_date)
-
-    
-        if start_date and end_date:
-            debtor_transactions = debtor_transactions.filter(
-                date__range=(start_date, end_date)
-            )
-        elif start_date and not end_date:
-            debtor_transactions = debtor_transactions.filter(
-                date__gte=start_date
-            )
-        elif not start_date and end_date:
-            debtor_transactions = debtor_transactions.filter(
-                date__lte=end_date
-            )
-
-        debtor_transactions = debtor_transactions.order_by('date','id')
-        debtor = DebtorSerializer(debtor).data
-        # Calculate previous due when a start_date is provided
-        previous_due = 0
-        if start_date:
-            prev_sum = DebtorTransaction.objects.filter(
-                enterprise=enterprise,
-                debtor_id=debtorId,
-                date__lt=start_date
-            ).aggregate(total=Sum('amount'))['total'] or 0
-            # Running formula is running -= amount, so opening due = -sum(amount before start)
-            previous_due = -float(prev_sum)
-            debtor['previous_due'] = previous_due
-        dts = DebtorTransactionSerializer(debtor_transactions, many=True).data
-        return Response({'debtor_data': debtor, 'debtor_transactions': dts})
+        start_date, end_date = parse_statement_dates(request)
+        statement = Statement(
+            DebtorTransaction.objects.filter(enterprise=enterprise, debtor=debtor).select_related('debtor'),
+            'debtor', debtor.pk, start_date=start_date, end_date=end_date,
+        )
+        return statement_response(
+            request, statement, 'debtor', DebtorSerializer(debtor).data, DebtorTransactionSerializer,
+            self.export_columns, f'debtor_statement_{debtor.id}',
+        )
     
 
-class EmployeeStatementView(APIView):
+class EmployeeStatementView(ReportExportMixin, APIView):
     permission_classes = [IsAuthenticated]
+    export_columns = ['date', 'id', 'transaction_type', 'desc']
 
     def get(self, request, employeeId=None, branch=None):
         enterprise = request.user.employee.enterprise
         employee = Employee.objects.filter(id=employeeId, enterprise=enterprise).first()
-        employee_transactions = EmployeeTransactions.objects.filter(enterprise=enterprise, employee=employee)
-        due = 0
         if not employee:
             return Response("Employee not found", status=status.HTTP_404_NOT_FOUND)
 
-        start_date = request.GET.get('start_date')
-        end_date = request.GET.get('end_date')
-
-        if start_date and end_date:
-            start_date = parse_date(start_date)
-            end_date = parse_date(end_date)
-
-        if start_date and end_date:
-            due = 0
-            employee_transactions = employee_transactions.filter(
-                date__range=(start_date, end_date)
-            )
-            for st in EmployeeTransactions.objects.filter(employee=employee, enterprise=enterprise, date__lt=start_date).order_by('date','id'):
-                due += st.amount
-        elif start_date and not end_date:
-            employee_transactions = employee_transactions.filter(
-                date__gte=start_date
-            )
-            due = 0
-            for st in EmployeeTransactions.objects.filter(employee=employee, enterprise=enterprise, date__lt=start_date).order_by('date','id'):
-                due += st.amount
-        elif not start_date and end_date:
-            employee_transactions = employee_transactions.filter(
-                date__lte=end_date
-            )
-
-        employee_transactions = employee_transactions.order_by('date','id')
-        employee_data = EmployeeSerializer(employee).data
-        # previous_due for employee when start_date provided
-        previous_due = 0
-        if start_date:
-            prev_sum = EmployeeTransactions.objects.filter(
-                enterprise=enterprise,
-                employee_id=employeeId,
-                date__lt=start_date
-            ).aggregate(total=Sum('amount'))['total'] or 0
-            previous_due = float(prev_sum)
-            employee_data['previous_due'] = previous_due
-        sts = EmployeeTransactionSerializer(employee_transactions, many=True).data
-        return Response({'employee_data': employee_data, 'employee_transactions': sts})
+        start_date, end_date = parse_statement_dates(request)
+        statement = Statement(
+            EmployeeTransactions.objects.filter(enterprise=enterprise, employee=employee)
+            .select_related('employee').prefetch_related('employee_transaction_details'),
+            'employee', employee.pk, start_date=start_date, end_date=end_date,
+        )
+        return statement_response(
+            request, statement, 'employee', EmployeeSerializer(employee).data, EmployeeTransactionSerializer,
+            self.export_columns, f'employee_statement_{employee.id}',
+        )
 
 
 class ProductTransferView(APIView):
@@ -1784,10 +1469,11 @@ class ExpensesView(APIView):
             expenses = expenses.filter(date__lte=end_date)
             withdrawals = withdrawals.filter(date__lte=end_date)
 
-        # Combine expenses and withdrawals into a single list
-        expenses_data = []
-        for exp in expenses:
-            expenses_data.append({
+        # Walk expenses and withdrawals as one list, newest first
+        paginator = KeysetPagination()
+        paginator.page_size = 5
+        page_data = paginator.paginate_merged([
+            (expenses.select_related('employee__user'), lambda exp: {
                 'id': exp.id,
                 'date': exp.date,
                 'amount': exp.amount,
@@ -1795,10 +1481,8 @@ class ExpensesView(APIView):
                 'desc': exp.desc,
                 'employee_name': exp.employee.user.name if exp.employee else None,
                 'type': 'Expense'
-            })
-        
-        for wit in withdrawals:
-            expenses_data.append({
+            }),
+            (withdrawals.select_related('employee__user'), lambda wit: {
                 'id': wit.id,
                 'date': wit.date,
                 'amount': wit.amount,
@@ -1806,36 +1490,9 @@ class ExpensesView(APIView):
                 'desc': 'Withdrawal',
                 'employee_name': wit.employee.user.name if wit.employee else None,
                 'type': 'Withdrawal'
-            })
-        
-        # Sort combined list by date (descending) and id
-        expenses_data.sort(key=lambda x: (x['date'], x['id']), reverse=True)
-
-        # Paginate combined results
-        paginator = PageNumberPagination()
-        paginator.page_size = 5
-        # Manual pagination for combined list
-        page_number = request.GET.get('page', 1)
-        try:
-            page_number = int(page_number)
-        except ValueError:
-            page_number = 1
-        
-        start_idx = (page_number - 1) * paginator.page_size
-        end_idx = start_idx + paginator.page_size
-        page_data = expenses_data[start_idx:end_idx]
-        
-        total_count = len(expenses_data)
-        total_pages = (total_count + paginator.page_size - 1) // paginator.page_size
-        
-        return Response({
-            'count': total_count,
-            'next': f"?page={page_number + 1}" if page_number < total_pages else None,
-            'previous': f"?page={page_number - 1}" if page_number > 1 else None,
-            'results': page_data,
-            'total_pages': total_pages,
-            'page': page_number
-        })
+            }),
+        ], request)
+        return paginator.get_paginated_response(page_data)
     
 
     def post(self,request):
@@ -1991,9 +1648,7 @@ class WithdrawalView(APIView):
             if ed:
                 withdrawals = withdrawals.filter(date__lte=ed)
 
-        withdrawals = withdrawals.order_by('-date', '-id')
-
-        paginator = PageNumberPagination()
+        paginator = KeysetPagination()
         paginator.page_size = 5
         page = paginator.paginate_queryset(withdrawals, request)
         serializer = WithdrawalSerializer(page, many=True)
@@ -2092,15 +1747,6 @@ class IncomeExpenseReportView(APIView):
         enterprise = request.user.employee.enterprise
         start_date = request.GET.get('start_date')
         end_date = request.GET.get('end_date')
-        total_cash_income = 0
-        total_online_income = 0
-        total_card_income = 0
-        total_cash_expense = 0
-        total_online_expense = 0
-        total_card_expense = 0
-        total_income = 0
-        total_expense = 0
-        total_withdrawal = 0
         if start_date:
             report_start_date = parse_date(start_date)
         else:
@@ -2124,193 +1770,23 @@ class IncomeExpenseReportView(APIView):
                 report_start_date = required_date
         else:
             closing_cash = closing_cash.first()
-        sales = SalesTransaction.objects.filter(enterprise=enterprise,branch=branch, date__range=(report_start_date, report_end_date))
-        sales = sales.exclude(method='transfer')
-        if branch:
-            sales = sales.filter(branch=branch)
-        list1=[]
-        for sale in sales:
-            desc = ""
-            if sale.is_sale_exchange:
-                desc += "Sale Exchange for balance amounting to " + str(sale.exchange_previous_balance) + ". \nTotal: " + str(sale.total_amount) + ". \t Prev: " + str(sale.exchange_previous_balance) + ". \t Exceeding: " + str(sale.exchange_exceeded_amount) + ". \nProducts: "
-            for s in sale.sales.all():
-                desc += f"{s.product.name} (x{s.quantity}), \n "
-            sale.description = desc.rstrip(", ")
-            list1.append({
-                'id': sale.id,
-                'bill_no': sale.bill_no,
-                'net_amount': sale.amount_paid,
-                'description': sale.description,
-                'method': sale.method,
-                'cash_amount': sale.cash_amount,
-                'card_amount': sale.card_amount,
-                'online_amount': sale.online_amount,
-                'type': 'Sale',
-                'date': sale.date
-            })
-            total_cash_income += sale.cash_amount or 0
-            total_card_income += sale.card_amount or 0
-            total_online_income += sale.online_amount or 0
-            total_income += sale.amount_paid or 0
-
-        orders = Order.objects.filter(enterprise=enterprise, received_date__range=(report_start_date, report_end_date))
-        if branch:
-            orders = orders.filter(branch=branch)
-        for order in orders:
-            desc = "Order's Advanced Payment for: "
-            for o in order.items.all():
-                desc += f"{o.item}), \n "
-            order.description = desc.rstrip(", ")
-            list1.append({
-                'id': order.id,
-                'bill_no': order.bill_no,
-                'net_amount': order.advance_received,
-                'description': order.description,
-                'method': order.advance_method,
-                'type': 'Order',
-                'date': order.received_date
-            })
-            if order.advance_method == 'cash':
-                total_cash_income += order.advance_received or 0
-            elif order.advance_method == 'card':
-                total_card_income += order.advance_received or 0
-            elif order.advance_method == 'online':
-                total_online_income += order.advance_received or 0
-            elif order.advance_method == 'mixed':
-                total_cash_income += order.cash_advance or 0
-                total_card_income += order.card_advance or 0
-                total_online_income += order.online_advance or 0
-            total_income += order.advance_received or 0
-
-        remaining_payment_orders = Order.objects.filter(enterprise=enterprise, remaining_received_date__range=(report_start_date, report_end_date))
-        if branch:
-            remaining_payment_orders = remaining_payment_orders.filter(branch=branch)
-
-        for order in remaining_payment_orders:
-            desc = "Order's Remaining Payment for: "
-            for o in order.items.all():
-                desc += f"{o.item}), \n "
-            order.description = desc.rstrip(", ")
-            list1.append({
-                'id': order.id,
-                'bill_no': order.bill_no,
-                'net_amount': order.remaining_received,
-                'description': order.description,
-                'method': order.remaining_received_method,
-                'type': 'Order',
-                'date': order.remaining_received_date
-            })
-            if order.remaining_received_method == 'cash':
-                total_cash_income += order.remaining_received or 0
-            elif order.remaining_received_method == 'card':
-                total_card_income += order.remaining_received or 0
-            elif order.remaining_received_method == 'online':
-                total_online_income += order.remaining_received or 0
-            elif order.remaining_received_method == 'mixed':
-                total_cash_income += order.cash_remaining or 0
-                total_card_income += order.card_remaining or 0
-                total_online_income += order.online_remaining or 0
-            total_income += order.remaining_received or 0
-
-        dts = DebtorTransaction.objects.filter(enterprise=enterprise, date__range=(report_start_date, report_end_date))
-        if branch:
-            dts = dts.filter(branch=branch)
-
-        for dt in dts:
-            if dt.method == 'credit':
-                continue
-            list1.append({
-                'id': dt.id,
-                'bill_no': 'Debtor Transaction',
-                'net_amount': dt.amount,
-                'description': f"Debtor Transaction for {dt.debtor.name}: {dt.desc}",
-                'method': dt.method,
-                'date': dt.date,
-                'type': 'Debtor Transaction',
-            })
-            if dt.method == 'cash':
-                if dt.amount > 0:
-                    total_cash_income += dt.amount or 0
-                else:
-                    total_cash_expense += -dt.amount or 0
-            elif dt.method == 'card':
-                if dt.amount > 0:
-                    total_card_income += dt.amount or 0
-                else:
-                    total_card_expense += -dt.amount or 0
-            elif dt.method == 'online':
-                if dt.amount > 0:
-                    total_online_income += dt.amount or 0
-                else:
-                    total_online_expense += -dt.amount or 0
-            if dt.amount > 0:
-                total_income += dt.amount or 0
-            else:
-                total_expense += -dt.amount or 0
-
-        expenses = Expenses.objects.filter(enterprise=enterprise, date__range=(report_start_date, report_end_date))
-        if branch:
-            expenses = expenses.filter(branch=branch)
-        for exp in expenses:
-            list1.append({
-                'id': exp.id,
-                'bill_no': 'Expense',
-                'net_amount': -exp.amount,
-                'description': f"{exp.desc}",
-                'method': exp.method,
-                'type': 'Expense',
-                'date': exp.date
-            })
-            if exp.method == 'cash':
-                total_cash_expense += exp.amount or 0
-            elif exp.method == 'card':
-                total_card_expense += exp.amount or 0
-            elif exp.method == 'online':
-                total_online_expense += exp.amount or 0
-            total_expense += exp.amount or 0
-
-        withdrawals = Withdrawal.objects.filter(enterprise=enterprise, date__range=(report_start_date, report_end_date))
-        if branch:
-            withdrawals = withdrawals.filter(branch=branch)
-        for wd in withdrawals:
-            list1.append({
-                'id': wd.id,
-                'bill_no': 'Withdrawal',
-                'net_amount': -wd.amount,
-                'description': f"Withdrawal by {wd.employee.user.name if wd.employee else 'Unknown'}",
-                'method': 'N/A',
-                'type': 'Withdrawal',
-                'date': wd.date
-            })
-            total_withdrawal += wd.amount or 0
-        
-        sort_order = {
-            "cash" : 1,
-            "card" : 2,
-            "online" : 3,
-            "mixed" : 4,
-            "credit" : 5,
-            "N/A" : 6,
-        }
-        net_cash_in_hand = (closing_cash.amount if closing_cash else 0) + total_cash_income - total_cash_expense - total_withdrawal
-        list1.sort(key=lambda x: (
-            x["date"],              # 1st: date (ascending)
-            sort_order[x["method"]]        # 2nd: type priority
-        ))
+        transactions, totals = build_cash_book(enterprise, branch, report_start_date, report_end_date)
+        previous_closing_cash = closing_cash.amount if closing_cash else 0
+        net_cash_in_hand = previous_closing_cash + totals['total_cash_income'] - totals['total_cash_expense'] - totals['total_withdrawal']
 
         report = {
-            'transactions' : list1,
-            'total_cash_income': total_cash_income,
-            'total_cash_expense': total_cash_expense,
-            'total_online_income': total_online_income,
-            'total_online_expense': total_online_expense,
-            'total_card_income': total_card_income,
-            'total_card_expense': total_card_expense,
-            'previous_closing_cash': closing_cash.amount if closing_cash else 0,
+            'transactions' : transactions,
+            'total_cash_income': totals['total_cash_income'],
+            'total_cash_expense': totals['total_cash_expense'],
+            'total_online_income': totals['total_online_income'],
+            'total_online_expense': totals['total_online_expense'],
+            'total_card_income': totals['total_card_income'],
+            'total_card_expense': totals['total_card_expense'],
+            'previous_closing_cash': previous_closing_cash,
             'net_cash_in_hand': net_cash_in_hand,
-            'total_income': total_income,
-            'total_expense': total_expense,
-            'total_withdrawal': total_withdrawal,
+            'total_income': totals['total_income'],
+            'total_expense': totals['total_expense'],
+            'total_withdrawal': totals['total_withdrawal'],
         }
         if message:
             report['message'] = message
@@ -2438,82 +1914,37 @@ class ClosingCashView(APIView):
         return Response(serializer.data)
 
 
-class NCMReport(APIView):
+class NCMReport(ReportExportMixin, APIView):
     permission_classes = [IsAuthenticated]
+    export_columns = ['date', 'id', 'branch_id', 'desc']
 
     def get(self, request, branch=None):
         """Return a statement for the enterprise's NCM account.
 
-        The logic is essentially a copy of :class:`DebtorStatementView` but
-        operates on the ``NCM`` / ``NCMTransaction`` models.  We allow an
-        optional ``branch`` path parameter so the frontend can view statements
-        branch‑wise (the user asked for a branch column on the page).
+        An optional ``branch`` path parameter lets the frontend view
+        statements branch‑wise (the user asked for a branch column on the
+        page).
         """
 
         enterprise = request.user.employee.enterprise
-        ncm = NCM.objects.filter(enterprise=enterprise, branch=branch).first()
+        ncm = NCM.objects.filter(enterprise=enterprise, branch=branch).select_related('branch').first()
         # if there is no NCM record for the enterprise we cannot proceed
         if not ncm:
             return Response("NCM not found", status=status.HTTP_404_NOT_FOUND)
 
-        # transactions should be filtered by the base NCM object (there should
-        # only be one per enterprise) but also optionally by branch
-        ncm_transactions = NCMTransaction.objects.filter(enterprise=enterprise, ncm=ncm)
-        print("Initial NCM transactions count: ", ncm_transactions.count())
-        # if branch:
-        #     ncm_transactions = ncm_transactions.filter(branch=branch)
-
-        if not ncm:
-            return Response("NCM not found", status=status.HTTP_404_NOT_FOUND)
-
-        start_date = request.GET.get('start_date')
-        end_date = request.GET.get('end_date')
-
-        if start_date and end_date:
-            start_date = parse_date(start_date)
-            end_date = parse_date(end_date)
-
-    
-        if start_date and end_date:
-            ncm_transactions = ncm_transactions.filter(
-                date__range=(start_date, end_date)
-            )
-        elif start_date and not end_date:
-            ncm_transactions = ncm_transactions.filter(
-                date__gte=start_date
-            )
-        elif not start_date and end_date:
-            ncm_transactions = ncm_transactions.filter(
-                date__lte=end_date
-            )
-
-        ncm_transactions = ncm_transactions.order_by('date','id')
         ncm_data = NCMSerializer(ncm).data
         # include human readable branch name for frontend convenience
-        branch_name = None
-        if branch:
-            try:
-                branch_obj = Branch.objects.get(id=branch)
-                branch_name = branch_obj.name
-            except Branch.DoesNotExist:
-                branch_name = None
-        else:
-            # if the NCM object itself has a branch set use that
-            branch_name = ncm.branch.name if ncm.branch else None
+        branch_name = ncm.branch.name if ncm.branch else None
         if branch_name:
             ncm_data['branch_name'] = branch_name
-        # Calculate previous due when a start_date is provided
-        previous_due = 0
-        if start_date:
-            prev_sum = NCMTransaction.objects.filter(
-                enterprise=enterprise,
-                ncm=ncm,
-                date__lt=start_date
-            ).aggregate(total=Sum('amount'))['total'] or 0
-            # running business logic: due decreases by amount so opening due
-            # is negative of the sum of prior amounts
-            previous_due = -float(prev_sum)
-            ncm_data['previous_due'] = previous_due
-        ncmts = NCMTransactionSerializer(ncm_transactions, many=True).data
-        return Response({'ncm_data': ncm_data, 'ncm_transactions': ncmts})
+
+        start_date, end_date = parse_statement_dates(request)
+        statement = Statement(
+            NCMTransaction.objects.filter(enterprise=enterprise, ncm=ncm).select_related('branch'),
+            'ncm', ncm.pk, start_date=start_date, end_date=end_date,
+        )
+        return statement_response(
+            request, statement, 'ncm', ncm_data, NCMTransactionSerializer,
+            self.export_columns, f'ncm_statement_{ncm.id}',
+        )
     
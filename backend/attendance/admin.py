@@ -1,6 +1,8 @@
 from django.contrib import admin
+from django.utils import timezone
 
 from .models import AttendanceEvent, DailyAttendance
+from .services import rebuild_daily_attendance_summaries
 
 
 @admin.register(AttendanceEvent)
@@ -10,6 +12,26 @@ class AttendanceEventAdmin(admin.ModelAdmin):
     search_fields = ('employee__name', 'employee__employee_code', 'device_serial')
     date_hierarchy = 'event_time'
 
+    # Summaries only fold in new punches, so edits and deletions here rebuild the days they touch.
+
+    def save_model(self, request, obj, form, change):
+        days = set()
+        if change:
+            previous = AttendanceEvent.objects.select_related('employee').get(pk=obj.pk)
+            days.add((previous.employee, timezone.localdate(previous.event_time)))
+        super().save_model(request, obj, form, change)
+        days.add((obj.employee, timezone.localdate(obj.event_time)))
+        rebuild_daily_attendance_summaries(days)
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        rebuild_daily_attendance_summaries({(obj.employee, timezone.localdate(obj.event_time))})
+
+    def delete_queryset(self, request, queryset):
+        days = {(event.employee, timezone.localdate(event.event_time)) for event in queryset.select_related('employee')}
+        super().delete_queryset(request, queryset)
+        rebuild_daily_attendance_summaries(days)
+
 
 @admin.register(DailyAttendance)
 class DailyAttendanceAdmin(admin.ModelAdmin):
@@ -1,6 +1,19 @@
 from django.apps import AppConfig
+from django.core.management import call_command
+from django.db.models.signals import post_migrate
+
+
+def create_cache_table(sender, using='default', **kwargs):
+    # The dashboard cache lives in the database (see ``CACHES``)
+    call_command('createcachetable', database=using, verbosity=0)
 
 
 class AttendanceConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'attendance'
+
+    def ready(self):
+        from .signals import connect_schedule_signals
+
+        post_migrate.connect(create_cache_table, sender=self)
+        connect_schedule_signals()
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import hashlib
+import time
+from typing import Callable
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+# Cached dashboard payloads, shared by every worker through the configured
+# cache backend.
+#
+# Payload keys carry a generation number per (enterprise, date, branch,
+# department) scope. A punch bumps the generations of the four scopes its
+# employee falls in (the whole enterprise, its branch, its department, and
+# both), so every cached page, filter and view of those scopes is
+# invalidated in one step and the others stay warm.
+
+KEY_PREFIX = 'attendance-dashboard'
+GENERATION_TIMEOUT = 2 * 24 * 60 * 60
+LOCK_POLL_INTERVAL = 0.05
+
+
+def _timeout() -> int:
+    return getattr(settings, 'ATTENDANCE_DASHBOARD_CACHE_TIMEOUT', 30)
+
+
+def _lock_timeout() -> int:
+    return getattr(settings, 'ATTENDANCE_DASHBOARD_LOCK_TIMEOUT', 10)
+
+
+def _generation_key(enterprise_id, attendance_date, branch_id=None, department_id=None) -> str:
+    return f'{KEY_PREFIX}:gen:{enterprise_id}:{attendance_date}:{branch_id or "*"}:{department_id or "*"}'
+
+
+def dashboard_cache_key(view: str, enterprise_id, attendance_date, branch_id=None, department_id=None,
+                        variant: str = '') -> str:
+    generation = cache.get(_generation_key(enterprise_id, attendance_date, branch_id, department_id), 0)
+    variant_hash = hashlib.md5(variant.encode('utf-8')).hexdigest()
+    return (
+        f'{KEY_PREFIX}:{view}:{enterprise_id}:{attendance_date}:{branch_id or "*"}:{department_id or "*"}'
+        f':{generation}:{variant_hash}'
+    )
+
+
+def get_or_compute(key: str, compute: Callable[[], object], timeout: int | None = None):
+    """
+    Cached value of ``key``, computing and storing it on a miss. Only one
+    caller at a time computes a given key, across workers: the others wait
+    for its result (up to the lock timeout, then compute it themselves).
+    """
+    value = cache.get(key)
+    if value is not None:
+        return value
+
+    lock_key = f'{key}:lock'
+    lock_timeout = _lock_timeout()
+    if cache.add(lock_key, 1, timeout=lock_timeout):
+        try:
+            value = compute()
+            cache.set(key, value, timeout=timeout or _timeout())
+            return value
+        finally:
+            cache.delete(lock_key)
+
+    deadline = time.monotonic() + lock_timeout
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL_INTERVAL)
+        value = cache.get(key)
+        if value is not None:
+            return value
+        if cache.get(lock_key) is None:
+            break
+    return compute()
+
+
+def cached_dashboard(view: str, enterprise_id, attendance_date, compute: Callable[[], object],
+                     branch_id=None, department_id=None, variant: str = ''):
+    """Dashboard payload ``view`` of one scope and day, cached until a punch in that scope or the timeout."""
+    key = dashboard_cache_key(view, enterprise_id, attendance_date, branch_id, department_id, variant)
+    return get_or_compute(key, compute)
+
+
+def _bump(key: str) -> None:
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=GENERATION_TIMEOUT):
+            cache.incr(key)
+
+
+def invalidate_dashboards(days) -> None:
+    """Invalidate the cached dashboards touched by ``(employee, attendance_date)`` pairs."""
+    scopes = set()
+    for employee, attendance_date in days:
+        if employee.enterprise_id is None:
+            continue
+        for branch_id in {None, employee.branch_id}:
+            for department_id in {None, employee.department_id}:
+                scopes.add(_generation_key(employee.enterprise_id, attendance_date, branch_id, department_id))
+    for key in sorted(scopes):
+        _bump(key)
+
+
+def invalidate_dashboards_on_commit(days) -> None:
+    """
+    ``invalidate_dashboards`` once the current transaction commits, so no
+    worker can refill the cache from data that is about to change.
+    """
+    days = list(days)
+    transaction.on_commit(lambda: invalidate_dashboards(days))
@@ -4,7 +4,7 @@ Nepali Date (Bikram Sambat) and English Date (Gregorian) conversion utilities.
 This module provides functions to convert between Nepali (BS) and English (AD) calendar systems.
 """
 
-from datetime import date, datetime, timedelta
+from datetime import date, datetime
 
 # Nepali date range mapping (year, month, day) to Gregorian date
 # This data is derived from official nepali calendar conversion tables
@@ -111,25 +111,21 @@ NEPALI_EPOCH_BS_MONTH = 1
 NEPALI_EPOCH_BS_DAY = 1
 
 
-from typing import Union, Tuple
+from bisect import bisect_right
+from typing import Iterable, Union, Tuple
 
 
-# Prefer the external `nepali_date_utils` package for conversion if available.
-try:
-    from nepali_date_utils import converter as _ndu_converter
-    _HAS_NEPALI_CONVERTER = True
-except Exception:
-    _ndu_converter = None
-    _HAS_NEPALI_CONVERTER = False
-
-# Use the package's own month table as the fallback source for years that are
-# not explicitly listed below. The installed package currently covers BS 1978
-# through 2092.
+# The `nepali_date_utils` package ships the more up-to-date month table
+# (BS 1978 through 2092), anchored at AD 2017-02-11 = BS 2073-10-29; when it
+# is installed its table is used first, and the one above covers the rest.
 try:
     from nepali_date_utils.data import calendar_data as _PACKAGE_CALENDAR_DATA
 except Exception:
     _PACKAGE_CALENDAR_DATA = {}
 
+PACKAGE_REFERENCE_AD = date(2017, 2, 11)
+PACKAGE_REFERENCE_BS = (2073, 10, 29)
+
 
 def get_nepali_month_days(nepali_year: int, nepali_month: int) -> int:
     """Get number of days in a Nepali month."""
@@ -140,6 +136,66 @@ def get_nepali_month_days(nepali_year: int, nepali_month: int) -> int:
     return NEPALI_MONTH_DAYS[nepali_year][nepali_month - 1]
 
 
+class _MonthIndex:
+    """
+    A BS month table flattened into the AD day ordinal each month starts on,
+    so BS -> AD is one lookup and AD -> BS one binary search.
+    """
+
+    def __init__(self, month_days: dict, reference_ad: date, reference_bs: Tuple[int, int, int]):
+        self.first_year = min(month_days)
+        self.last_year = max(month_days)
+        self.month_starts: list[int] = []
+        ordinal = 0
+        for year in range(self.first_year, self.last_year + 1):
+            for length in month_days[year][:12]:
+                self.month_starts.append(ordinal)
+                ordinal += length
+        self.month_starts.append(ordinal)  # end of the table
+
+        year, month, day = reference_bs
+        offset = reference_ad.toordinal() - (self.month_starts[self._month(year, month)] + day - 1)
+        self.month_starts = [start + offset for start in self.month_starts]
+
+    def _month(self, year: int, month: int) -> int:
+        if not (self.first_year <= year <= self.last_year and 1 <= month <= 12):
+            raise ValueError(f"Nepali date out of supported range: {year}-{month}")
+        return (year - self.first_year) * 12 + month - 1
+
+    def to_ad(self, year: int, month: int, day: int) -> date:
+        index = self._month(year, month)
+        start = self.month_starts[index]
+        if not 1 <= day <= self.month_starts[index + 1] - start:
+            raise ValueError(f"Invalid Nepali date: {year}-{month}-{day}")
+        return date.fromordinal(start + day - 1)
+
+    def find(self, ordinal: int, hint: int = -1) -> int:
+        """Index of the month holding ``ordinal``; ``hint`` (a previous answer) is tried first."""
+        if 0 <= hint < len(self.month_starts) - 1 and self.month_starts[hint] <= ordinal < self.month_starts[hint + 1]:
+            return hint
+        index = bisect_right(self.month_starts, ordinal) - 1
+        if index < 0 or index >= len(self.month_starts) - 1:
+            raise ValueError(f"Date out of supported range: {date.fromordinal(ordinal)}")
+        return index
+
+    def to_bs(self, ordinal: int, index: int) -> Tuple[int, int, int]:
+        year, month = divmod(index, 12)
+        return self.first_year + year, month + 1, ordinal - self.month_starts[index] + 1
+
+
+def _build_indexes() -> list:
+    indexes = []
+    if _PACKAGE_CALENDAR_DATA:
+        indexes.append(_MonthIndex(_PACKAGE_CALENDAR_DATA, PACKAGE_REFERENCE_AD, PACKAGE_REFERENCE_BS))
+    indexes.append(_MonthIndex(
+        NEPALI_MONTH_DAYS, NEPALI_EPOCH_AD, (NEPALI_EPOCH_BS_YEAR, NEPALI_EPOCH_BS_MONTH, NEPALI_EPOCH_BS_DAY),
+    ))
+    return indexes
+
+
+_INDEXES = _build_indexes()
+
+
 def ad_to_bs(gregorian_date: Union[date, datetime]) -> Tuple[int, int, int]:
     """
     Convert Gregorian (AD) date to Nepali (BS) date.
@@ -154,55 +210,32 @@ def ad_to_bs(gregorian_date: Union[date, datetime]) -> Tuple[int, int, int]:
         >>> ad_to_bs(date(2023, 5, 15))
         (2080, 2, 1)
     """
-    # Try external converter first (more up-to-date/accurate)
-    if _HAS_NEPALI_CONVERTER:
-        try:
-            if isinstance(gregorian_date, datetime):
-                gregorian_date = gregorian_date.date()
-            s = gregorian_date.strftime('%Y/%m/%d')
-            res = _ndu_converter.ad_to_bs(s)
-            # Normalise separators and parse
-            res = str(res).replace('-', '/')
-            y, m, d = res.split('/')
-            return int(y), int(m), int(d)
-        except Exception:
-            # Fall back to internal implementation on any error
-            pass
-
-    if isinstance(gregorian_date, datetime):
-        gregorian_date = gregorian_date.date()
-
-    # Calculate days from epoch (internal fallback)
-    delta_days = (gregorian_date - NEPALI_EPOCH_AD).days
+    return ad_to_bs_many([gregorian_date])[0]
 
-    # Start from epoch
-    nepali_year = NEPALI_EPOCH_BS_YEAR
-    nepali_month = NEPALI_EPOCH_BS_MONTH
-    nepali_day = NEPALI_EPOCH_BS_DAY
 
-    # Add the days
-    days_to_add = delta_days
-
-    while days_to_add > 0:
-        # Get days in current month
-        days_in_month = get_nepali_month_days(nepali_year, nepali_month)
-        days_left_in_month = days_in_month - nepali_day + 1
-
-        if days_to_add >= days_left_in_month:
-            # Move to next month
-            days_to_add -= days_left_in_month
-            nepali_day = 1
-            nepali_month += 1
+def ad_to_bs_many(gregorian_dates: Iterable[Union[date, datetime]]) -> list[Tuple[int, int, int]]:
+    """
+    Convert many Gregorian dates at once, e.g. every day of a month matrix.
 
-            if nepali_month > 12:
-                nepali_month = 1
-                nepali_year += 1
+    Consecutive dates that fall in the same BS month are converted without a
+    search, so a sorted run of N days costs O(N) plus one search per month.
+    """
+    results = []
+    hints = [-1] * len(_INDEXES)
+    for gregorian_date in gregorian_dates:
+        if isinstance(gregorian_date, datetime):
+            gregorian_date = gregorian_date.date()
+        ordinal = gregorian_date.toordinal()
+        for position, index in enumerate(_INDEXES):
+            try:
+                hints[position] = index.find(ordinal, hints[position])
+            except ValueError:
+                continue
+            results.append(index.to_bs(ordinal, hints[position]))
+            break
         else:
-            # Add days to current month
-            nepali_day += days_to_add
-            days_to_add = 0
-
-    return nepali_year, nepali_month, nepali_day
+            raise ValueError(f"Date out of supported range: {gregorian_date}")
+    return results
 
 
 def bs_to_ad(nepali_year: int, nepali_month: int, nepali_day: int) -> date:
@@ -221,36 +254,17 @@ def bs_to_ad(nepali_year: int, nepali_month: int, nepali_day: int) -> date:
         >>> bs_to_ad(2080, 2, 1)
         datetime.date(2023, 5, 15)
     """
-    # Try external converter first
-    if _HAS_NEPALI_CONVERTER:
+    for index in _INDEXES:
         try:
-            s = f"{int(nepali_year)}/{int(nepali_month)}/{int(nepali_day)}"
-            res = _ndu_converter.bs_to_ad(s)
-            res = str(res).replace('-', '/')
-            # Expect YYYY/MM/DD
-            return datetime.strptime(res, '%Y/%m/%d').date()
-        except Exception:
-            # Fall back to internal implementation on any error
-            pass
-
-    # Internal fallback calculation
-    days = 0
-
-    # Add days for complete years
-    for year in range(NEPALI_EPOCH_BS_YEAR, nepali_year):
-        for month in range(1, 13):
-            days += get_nepali_month_days(year, month)
-
-    # Add days for complete months in current year
-    for month in range(1, nepali_month):
-        days += get_nepali_month_days(nepali_year, month)
-
-    # Add days in current month
-    days += nepali_day - 1
-
-    # Calculate Gregorian date
-    gregorian_date = NEPALI_EPOCH_AD + timedelta(days=days)
-    return gregorian_date
+            return index.to_ad(int(nepali_year), int(nepali_month), int(nepali_day))
+        except ValueError:
+            continue
+    raise ValueError(f"Invalid or unsupported Nepali date: {nepali_year}-{nepali_month}-{nepali_day}")
+
+
+def bs_to_ad_many(nepali_dates: Iterable[Tuple[int, int, int]]) -> list[date]:
+    """``bs_to_ad`` of many ``(year, month, day)`` tuples."""
+    return [bs_to_ad(*nepali_date) for nepali_date in nepali_dates]
 
 
 def format_ad_date(gregorian_date: Union[date, datetime], format_str: str = "%Y-%m-%d") -> str:
@@ -0,0 +1,309 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from device.models import BiometricDevice, EmployeeBiometricMapping
+from enterprise.models import Employee
+
+from .models import AttendanceEvent
+from .services import (
+    NEXT_EVENT_CODE,
+    event_fingerprint,
+    parse_device_timestamp,
+    parse_event_code,
+    publish_attendance_update,
+    rebuild_daily_attendance_summaries,
+    update_daily_attendance_summaries,
+)
+from .time_window import within_local_days
+
+
+SERIAL_KEYS = ['SN', 'sn', 'device_sn', 'DeviceSN']
+IDENTIFIER_KEYS = ['PIN', 'pin', 'UserID', 'userid', 'USERID', 'EMPID', 'empid', 'employee_id', 'device_id', 'CardNo', 'cardno', 'ID', 'id']
+EVENT_CODE_KEYS = ['event_code', 'event', 'type', 'eventtype', 'eventType', 'attendance_type', 'status']
+TIMESTAMP_KEYS = ['timestamp', 'time', 'datetime', 'date_time', 'punch_time', 'punchTime']
+LOOKUP_CHUNK = 1000
+
+
+def _pick_value(payload: dict, keys: list[str], default=None):
+    for key in keys:
+        if key not in payload:
+            continue
+        value = payload[key]
+        if isinstance(value, (list, tuple)):
+            value = value[0] if value else None
+        if value not in ('', None):
+            return value
+    return default
+
+
+def _normalize(value: object | None) -> str:
+    return '' if value is None else str(value).strip()
+
+
+def payload_fingerprint(serial: object, payload: dict, event_time: datetime) -> str:
+    """Fingerprint of a punch from its device serial and the row the device sent."""
+    return event_fingerprint(
+        _normalize(serial),
+        _normalize(_pick_value(payload, IDENTIFIER_KEYS)),
+        event_time,
+        parse_event_code(_pick_value(payload, EVENT_CODE_KEYS)),
+    )
+
+
+@dataclass
+class Punch:
+    payload: dict
+    serial: str
+    identifier: str
+    event_code: int | None
+    event_time: datetime
+    fingerprint: str
+    employee: Employee | None = None
+
+    @classmethod
+    def from_payload(cls, payload: dict) -> 'Punch':
+        serial = _normalize(_pick_value(payload, SERIAL_KEYS, 'unknown'))
+        event_time = parse_device_timestamp(_pick_value(payload, TIMESTAMP_KEYS))
+        return cls(
+            payload=payload,
+            serial=serial,
+            identifier=_normalize(_pick_value(payload, IDENTIFIER_KEYS)),
+            event_code=parse_event_code(_pick_value(payload, EVENT_CODE_KEYS)),
+            event_time=event_time,
+            # Taken before inference, so a retry matches whatever code we guessed
+            fingerprint=payload_fingerprint(serial, payload, event_time),
+        )
+
+    @property
+    def attendance_date(self):
+        return timezone.localdate(self.event_time)
+
+
+@dataclass
+class IngestResult:
+    received: int = 0
+    recorded: int = 0
+    unknown_employee: int = 0
+    duplicates: int = 0
+    # (employee_id, attendance_date) -> updated summary
+    summaries: dict = field(default_factory=dict)
+    # (employee_id, attendance_date) pairs that got a check-out in this batch
+    check_outs: set = field(default_factory=set)
+    employees: dict = field(default_factory=dict)
+
+    def as_dict(self) -> dict:
+        return {
+            'received': self.received,
+            'recorded': self.recorded,
+            'unknown_employee': self.unknown_employee,
+            'duplicates': self.duplicates,
+            'days_updated': len(self.summaries),
+        }
+
+
+def ingest_punches(records: list[dict], source: str = 'device') -> IngestResult:
+    """
+    Record a batch of ATTLOG punches (one dict per row, as parsed from an
+    iClock push) with a fixed number of queries, whatever the batch size.
+
+    Punches whose fingerprint is already stored (a retried push, a log
+    re-uploaded after a reboot) are dropped first and cost nothing further.
+    For the rest, devices and employees are resolved up front, missing event
+    codes are inferred from the last event of the day and the rows before
+    them in the batch, the events are inserted in bulk (conflicting
+    fingerprints are skipped) and every affected ``DailyAttendance`` is
+    updated once, folding the new punches in when they follow the day's
+    stored ones. One SSE message is published per updated summary.
+    """
+    punches = [Punch.from_payload(payload) for payload in records if isinstance(payload, dict)]
+    result = IngestResult(received=len(punches))
+    if not punches:
+        return result
+
+    with transaction.atomic():
+        fresh = _skip_duplicates(punches)
+        result.duplicates = len(punches) - len(fresh)
+        _resolve_employees(fresh)
+        _touch_devices(punches)
+        resolved = [punch for punch in fresh if punch.employee is not None]
+        result.unknown_employee = len(fresh) - len(resolved)
+        _infer_event_codes(resolved)
+
+        days = {(punch.employee, punch.attendance_date) for punch in resolved}
+        if not days:
+            return result
+        # Rows skipped by ``ignore_conflicts`` are not reported back, so the
+        # recorded count comes from the affected days before and after.
+        stored = _stored_events(days)
+        before = stored.count()
+        AttendanceEvent.objects.bulk_create(
+            [
+                AttendanceEvent(
+                    employee=punch.employee,
+                    event_type=punch.event_code,
+                    event_time=punch.event_time,
+                    device_serial=punch.serial,
+                    raw_payload=punch.payload,
+                    source=source,
+                    fingerprint=punch.fingerprint,
+                )
+                for punch in resolved
+            ],
+            batch_size=1000,
+            ignore_conflicts=True,
+        )
+        result.recorded = stored.count() - before
+        # Rows another connection stored between the probe and the insert
+        result.duplicates += len(resolved) - result.recorded
+
+        if result.recorded == len(resolved):
+            new_events = {}
+            for punch in sorted(resolved, key=lambda punch: punch.event_time):
+                new_events.setdefault((punch.employee, punch.attendance_date), []).append(
+                    (punch.event_code, punch.event_time)
+                )
+            result.summaries = update_daily_attendance_summaries(new_events)
+        else:
+            # Some rows were skipped and we can't tell which: fold nothing
+            result.summaries = rebuild_daily_attendance_summaries(days)
+        result.employees = {punch.employee.id: punch.employee for punch in resolved}
+        result.check_outs = {
+            (punch.employee.id, punch.attendance_date)
+            for punch in resolved if punch.event_code == AttendanceEvent.CHECK_OUT
+        }
+
+    last_punch = {}
+    for punch in resolved:
+        last_punch[(punch.employee.id, punch.attendance_date)] = punch
+    for key, summary in result.summaries.items():
+        punch = last_punch[key]
+        publish_attendance_update(summary, punch.employee, punch.event_code, punch.event_time)
+    return result
+
+
+def _skip_duplicates(punches: list[Punch]) -> list[Punch]:
+    """Drop punches already stored, or repeated earlier in the batch, with one fingerprint lookup."""
+    fingerprints = list({punch.fingerprint for punch in punches})
+    seen = set()
+    for offset in range(0, len(fingerprints), LOOKUP_CHUNK):
+        seen.update(AttendanceEvent.objects.filter(
+            fingerprint__in=fingerprints[offset:offset + LOOKUP_CHUNK],
+        ).values_list('fingerprint', flat=True))
+    fresh = []
+    for punch in punches:
+        if punch.fingerprint in seen:
+            continue
+        seen.add(punch.fingerprint)
+        fresh.append(punch)
+    return fresh
+
+
+def _stored_events(days):
+    dates = [attendance_date for _, attendance_date in days]
+    return AttendanceEvent.objects.filter(
+        within_local_days(min(dates), max(dates)), employee_id__in={employee.id for employee, _ in days},
+    )
+
+
+def _resolve_employees(punches: list[Punch]) -> None:
+    """Attach the employee of every punch: device mapping first, then employee code."""
+    identifiers = {punch.identifier for punch in punches if punch.identifier}
+    if not identifiers:
+        return
+    serials = {punch.serial for punch in punches if punch.identifier and punch.serial}
+
+    mapped = {
+        (serial, device_user_id): employee_id
+        for serial, device_user_id, employee_id in EmployeeBiometricMapping.objects.filter(
+            device__serial_number__in=serials, device_user_id__in=identifiers,
+        ).values_list('device__serial_number', 'device_user_id', 'employee_id')
+    }
+    employees = Employee.objects.filter(
+        Q(id__in=set(mapped.values())) | Q(employee_code__in=identifiers)
+    ).select_related('enterprise', 'branch').order_by(*(Employee._meta.ordering or ['pk']), 'pk')
+
+    by_id, by_code = {}, {}
+    for employee in employees:
+        by_id[employee.id] = employee
+        by_code.setdefault(employee.employee_code, employee)
+
+    for punch in punches:
+        if not punch.identifier:
+            continue
+        employee = by_id.get(mapped.get((punch.serial, punch.identifier)))
+        punch.employee = employee or by_code.get(punch.identifier)
+
+
+def _touch_devices(punches: list[Punch]) -> None:
+    """
+    Register unseen serials and move each device's ``last_seen_at`` to its
+    latest punch, adopting the enterprise/branch of the last employee it
+    recognised.
+    """
+    latest: dict[str, Punch] = {}
+    last_known: dict[str, Employee] = {}
+    for punch in punches:
+        if not punch.serial or punch.serial.lower() == 'unknown':
+            continue
+        latest[punch.serial] = punch
+        if punch.employee is not None:
+            last_known[punch.serial] = punch.employee
+    if not latest:
+        return
+
+    devices = BiometricDevice.objects.in_bulk(list(latest), field_name='serial_number')
+    missing = [BiometricDevice(serial_number=serial) for serial in latest if serial not in devices]
+    if missing:
+        BiometricDevice.objects.bulk_create(missing, ignore_conflicts=True)
+        devices = BiometricDevice.objects.in_bulk(list(latest), field_name='serial_number')
+
+    for serial, device in devices.items():
+        device.last_seen_at = latest[serial].event_time
+        employee = last_known.get(serial)
+        if employee is not None:
+            if employee.enterprise_id is not None:
+                device.enterprise_id = employee.enterprise_id
+            if employee.branch_id is not None:
+                device.branch_id = employee.branch_id
+    BiometricDevice.objects.bulk_update(list(devices.values()), ['last_seen_at', 'enterprise', 'branch'])
+
+
+def _infer_event_codes(punches: list[Punch]) -> None:
+    """
+    Fill in missing event codes the way ``infer_next_event_code`` would had
+    the rows been recorded one by one: from the day's last event, counting
+    the earlier rows of the batch.
+    """
+    days = {(punch.employee.id, punch.attendance_date) for punch in punches if punch.event_code is None}
+    if not days:
+        return
+
+    last_event: dict[tuple[int, object], tuple[datetime, int]] = {}
+    stored = AttendanceEvent.objects.filter(
+        within_local_days(min(day for _, day in days), max(day for _, day in days)),
+        employee_id__in={employee_id for employee_id, _ in days},
+    ).order_by('event_time', 'id').values_list('employee_id', 'event_time', 'event_type')
+    for employee_id, event_time, event_type in stored:
+        key = (employee_id, timezone.localdate(event_time))
+        if key in days:
+            last_event[key] = (event_time, event_type)
+
+    for punch in punches:
+        key = (punch.employee.id, punch.attendance_date)
+        if key not in days:
+            continue
+        if punch.event_code is None:
+            previous = last_event.get(key)
+            punch.event_code = (
+                AttendanceEvent.CHECK_IN if previous is None
+                else NEXT_EVENT_CODE.get(previous[1], AttendanceEvent.CHECK_IN)
+            )
+        previous = last_event.get(key)
+        if previous is None or punch.event_time >= previous[0]:
+            last_event[key] = (punch.event_time, punch.event_code)
@@ -0,0 +1,99 @@
+import random
+import time
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from attendance.models import AttendanceEvent, DailyAttendance
+from device.models import BiometricDevice, EmployeeBiometricMapping
+from device.views import adms_cdata
+from enterprise.models import Branch, Employee, Enterprise
+
+
+class _Rollback(Exception):
+    pass
+
+
+SERIAL = 'BENCH0001'
+
+
+class Command(BaseCommand):
+    help = "Replay an ATTLOG dump through the iClock cdata endpoint and time it (rolled back afterwards)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows',      type=int, default=10000, help='Number of synthetic punches (default: 10000)')
+        parser.add_argument('--employees', type=int, default=200,   help='Number of enrolled employees')
+        parser.add_argument('--file',      type=str, default=None,  help='Replay this ATTLOG dump instead of a synthetic one')
+        parser.add_argument('--keep',      action='store_true',     help='Commit the data instead of rolling back')
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+
+        try:
+            with transaction.atomic():
+                pins = self._seed(options)
+                if options['file']:
+                    with open(options['file'], encoding='utf-8', errors='ignore') as dump:
+                        body = dump.read()
+                else:
+                    body = self._dump(rng, pins, options['rows'])
+                rows = sum(1 for line in body.splitlines() if line.strip())
+
+                # The second push is the terminal retrying: every row is a duplicate
+                for label in ('first push', 'retried push'):
+                    request = RequestFactory().post(
+                        f'/iclock/cdata?SN={SERIAL}&table=ATTLOG', data=body, content_type='text/plain',
+                    )
+                    with CaptureQueriesContext(connection) as queries:
+                        started = time.perf_counter()
+                        response = adms_cdata(request)
+                        elapsed = time.perf_counter() - started
+
+                    self.stdout.write(
+                        f"{label:<13} {rows} rows -> {response.content.decode()!r} in {elapsed:.2f} s, "
+                        f"{len(queries.captured_queries)} queries"
+                    )
+                self.stdout.write(
+                    f"{AttendanceEvent.objects.filter(device_serial=SERIAL).count()} events, "
+                    f"{DailyAttendance.objects.filter(employee__enterprise__name='Benchmark Enterprise').count()} daily summaries"
+                )
+
+                if not options['keep']:
+                    raise _Rollback
+        except _Rollback:
+            self.stdout.write("Synthetic data rolled back.")
+
+    def _seed(self, options):
+        enterprise = Enterprise.objects.create(name="Benchmark Enterprise")
+        branch = Branch.objects.create(name="Benchmark Branch", enterprise=enterprise)
+        device = BiometricDevice.objects.create(serial_number=SERIAL, enterprise=enterprise, branch=branch)
+        # Hourly wages are off so the timing covers ingestion, not the wage ledger.
+        employees = Employee.objects.bulk_create([
+            Employee(name=f"Employee {i}", employee_code=f"E{i}", enterprise=enterprise, branch=branch,
+                     is_hourly_wage=False)
+            for i in range(options['employees'])
+        ])
+        EmployeeBiometricMapping.objects.bulk_create([
+            EmployeeBiometricMapping(employee=employee, device=device, device_user_id=str(i + 1))
+            for i, employee in enumerate(employees)
+        ])
+        return [str(i + 1) for i in range(len(employees))]
+
+    def _dump(self, rng, pins, rows):
+        # An outage backlog: each employee punches in and out on consecutive
+        # days, without event codes, so every code is inferred.
+        start = datetime(2025, 1, 1)
+        lines = []
+        day = 0
+        while len(lines) < rows:
+            for pin in pins:
+                arrival = start + timedelta(days=day, hours=9, minutes=rng.randrange(60))
+                for punch in (arrival, arrival + timedelta(hours=8, minutes=rng.randrange(60))):
+                    lines.append(f"{pin}\t{punch:%Y-%m-%d %H:%M:%S}")
+            day += 1
+        lines = lines[:rows]
+        lines.sort(key=lambda line: line.split('\t')[1])
+        return '\n'.join(lines)
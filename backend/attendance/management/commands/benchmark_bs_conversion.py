@@ -0,0 +1,85 @@
+import random
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+
+from attendance import date_utils
+from attendance.date_utils import ad_to_bs, ad_to_bs_many, bs_to_ad, get_nepali_month_days
+
+
+def _walk_ad_to_bs(gregorian_date):
+    """The month-by-month walk from the epoch that ``ad_to_bs`` used to fall back on."""
+    days_to_add = (gregorian_date - date_utils.NEPALI_EPOCH_AD).days
+    year, month, day = date_utils.NEPALI_EPOCH_BS_YEAR, date_utils.NEPALI_EPOCH_BS_MONTH, date_utils.NEPALI_EPOCH_BS_DAY
+    while days_to_add > 0:
+        days_left_in_month = get_nepali_month_days(year, month) - day + 1
+        if days_to_add >= days_left_in_month:
+            days_to_add -= days_left_in_month
+            day = 1
+            month += 1
+            if month > 12:
+                month = 1
+                year += 1
+        else:
+            day += days_to_add
+            days_to_add = 0
+    return year, month, day
+
+
+def _walk_bs_to_ad(year, month, day):
+    """The year-by-year sum from the epoch that ``bs_to_ad`` used to fall back on."""
+    days = 0
+    for walked_year in range(date_utils.NEPALI_EPOCH_BS_YEAR, year):
+        for walked_month in range(1, 13):
+            days += get_nepali_month_days(walked_year, walked_month)
+    for walked_month in range(1, month):
+        days += get_nepali_month_days(year, walked_month)
+    return date_utils.NEPALI_EPOCH_AD + timedelta(days=days + day - 1)
+
+
+class Command(BaseCommand):
+    help = "Time AD <-> BS conversion: the previous implementations against the month index and its batch API"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dates',     type=int, default=20000, help='Random dates converted per run (default: 20000)')
+        parser.add_argument('--employees', type=int, default=30,    help='Rows of the month matrix')
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        first, last = date(2000, 1, 1).toordinal(), date(2030, 12, 31).toordinal()
+        dates = [date.fromordinal(rng.randint(first, last)) for _ in range(options['dates'])]
+        bs_dates = ad_to_bs_many(dates)
+        # Every day of a month, once per employee row
+        month = [date(2025, 4, 14) + timedelta(days=offset) for offset in range(31)]
+        matrix = month * options['employees']
+
+        try:
+            from nepali_date_utils import converter
+        except Exception:
+            converter = None
+
+        cases = [
+            ('AD->BS month walk', lambda: [_walk_ad_to_bs(value) for value in dates]),
+            ('AD->BS index', lambda: [ad_to_bs(value) for value in dates]),
+            ('AD->BS index, batch', lambda: ad_to_bs_many(dates)),
+            ('BS->AD year walk', lambda: [_walk_bs_to_ad(*value) for value in bs_dates]),
+            ('BS->AD index', lambda: [bs_to_ad(*value) for value in bs_dates]),
+            (f'matrix {len(matrix)} days, walk', lambda: [_walk_ad_to_bs(value) for value in matrix]),
+            (f'matrix {len(matrix)} days, index', lambda: [ad_to_bs(value) for value in matrix]),
+            (f'matrix {len(matrix)} days, batch', lambda: ad_to_bs_many(matrix)),
+        ]
+        if converter is not None:
+            cases[:0] = [
+                ('AD->BS nepali-date-utils', lambda: [converter.ad_to_bs(value.strftime('%Y/%m/%d')) for value in dates]),
+                ('BS->AD nepali-date-utils', lambda: [converter.bs_to_ad('%d/%d/%d' % value) for value in bs_dates]),
+            ]
+
+        for label, run in cases:
+            started = time.perf_counter()
+            results = run()
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"{label:<34} {len(results):>7} conversions in {elapsed * 1000:8.1f} ms "
+                f"({elapsed / len(results) * 1e6:7.2f} us each)"
+            )
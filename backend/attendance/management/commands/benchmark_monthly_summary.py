@@ -0,0 +1,89 @@
+import random
+import time
+from datetime import date, datetime, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from attendance.models import DailyAttendance
+from attendance.views import MonthlySummaryAPIView
+from enterprise.models import Enterprise, Employee
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Time the monthly summary report over a synthetic month of attendance (rolled back afterwards)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employees', type=int, default=1000, help='Number of employees (default: 1000)')
+        parser.add_argument('--year',      type=int, default=2025,  help='Year of the synthetic month')
+        parser.add_argument('--month',     type=int, default=1,     help='Month of the synthetic month')
+        parser.add_argument('--pages',     type=int, default=3,     help='Pages to request, from the first')
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+
+        # The pagination links are absolute URLs on the factory's host
+        try:
+            with transaction.atomic(), override_settings(ALLOWED_HOSTS=['testserver']):
+                user = self._seed(rng, options)
+                view = MonthlySummaryAPIView.as_view()
+                for page in range(1, options['pages'] + 1):
+                    request = APIRequestFactory().get('/attendance/api/reports/monthly-summary/', {
+                        'year': options['year'], 'month': options['month'], 'page': page,
+                    })
+                    force_authenticate(request, user=user)
+                    with CaptureQueriesContext(connection) as queries:
+                        started = time.perf_counter()
+                        response = view(request)
+                        elapsed = time.perf_counter() - started
+
+                    self.stdout.write(
+                        f"page {page:<3} {len(response.data['summary'])} rows of {response.data['count']} "
+                        f"in {elapsed * 1000:.1f} ms, {len(queries.captured_queries)} queries"
+                    )
+                raise _Rollback
+        except _Rollback:
+            self.stdout.write("Synthetic data rolled back.")
+
+    def _seed(self, rng, options):
+        enterprise = Enterprise.objects.create(name="Benchmark Enterprise")
+        user = get_user_model().objects.create_user(
+            email='benchmark-admin@example.com', name='Benchmark Admin', password=None,
+        )
+        Employee.objects.create(name='Benchmark Admin', employee_code='ADMIN', user=user, enterprise=enterprise,
+                                role='Admin', is_hourly_wage=False)
+        employees = Employee.objects.bulk_create([
+            Employee(name=f"Employee {i:05d}", employee_code=f"E{i}", enterprise=enterprise, is_hourly_wage=False)
+            for i in range(options['employees'])
+        ])
+
+        first = date(options['year'], options['month'], 1)
+        days = [first + timedelta(days=offset) for offset in range(31)]
+        days = [day for day in days if day.month == first.month]
+        summaries = []
+        for employee in employees:
+            for day in days:
+                if rng.random() < 0.1:
+                    continue
+                arrival = timezone.make_aware(datetime.combine(day, datetime.min.time()) + timedelta(
+                    hours=8, minutes=30 + rng.randrange(60),
+                ))
+                departure = arrival + timedelta(hours=8, minutes=rng.randrange(90))
+                scheduled_arrival = timezone.make_aware(datetime.combine(day, datetime.min.time()) + timedelta(hours=9))
+                summaries.append(DailyAttendance(
+                    employee=employee, attendance_date=day, first_check_in=arrival, last_check_out=departure,
+                    present=True, worked_minutes=int((departure - arrival).total_seconds() // 60),
+                    scheduled_arrival=scheduled_arrival,
+                    late_seconds=max(int((arrival - scheduled_arrival).total_seconds()), 0),
+                ))
+        DailyAttendance.objects.bulk_create(summaries, batch_size=2000)
+        self.stdout.write(f"Seeded {len(employees)} employees, {len(summaries)} daily summaries.")
+        return user
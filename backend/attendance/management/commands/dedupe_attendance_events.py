@@ -0,0 +1,90 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from attendance.ingest import payload_fingerprint
+from attendance.models import AttendanceEvent
+from attendance.services import rebuild_daily_attendance_summaries
+from enterprise.models import Employee
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Fingerprint device punches recorded before fingerprints existed, delete the duplicates "
+        "(keeping the earliest row of each) and rebuild the affected daily summaries"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help='Events read per batch (default: 5000)')
+        parser.add_argument('--dry-run',    action='store_true',    help='Report what would change and roll back')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        try:
+            with transaction.atomic():
+                fingerprinted, deleted, days = self._dedupe(batch_size)
+                rebuilt = self._rebuild(days, batch_size)
+                self.stdout.write(
+                    f"Fingerprinted {fingerprinted} events, deleted {deleted} duplicates, "
+                    f"rebuilt {rebuilt} daily summaries."
+                )
+                if options['dry_run']:
+                    raise _Rollback
+        except _Rollback:
+            self.stdout.write("Dry run, changes rolled back.")
+
+    def _dedupe(self, batch_size):
+        # Rows are walked in id order and each batch's keepers are written
+        # before the next batch is read, so the earliest row of every
+        # fingerprint wins and later batches see it in the unique index.
+        pending = AttendanceEvent.objects.filter(fingerprint__isnull=True).exclude(device_serial='')
+        fingerprinted = deleted = 0
+        days = set()
+        last_id = 0
+        while True:
+            rows = list(
+                pending.filter(id__gt=last_id).order_by('id')
+                .values_list('id', 'employee_id', 'device_serial', 'raw_payload', 'event_time')[:batch_size]
+            )
+            if not rows:
+                break
+            last_id = rows[-1][0]
+
+            fingerprints = {
+                event_id: payload_fingerprint(serial, payload if isinstance(payload, dict) else {}, event_time)
+                for event_id, _, serial, payload, event_time in rows
+            }
+            seen = set(
+                AttendanceEvent.objects.filter(fingerprint__in=set(fingerprints.values()))
+                .values_list('fingerprint', flat=True)
+            )
+            keep, duplicates = [], []
+            for event_id, employee_id, _, _, event_time in rows:
+                fingerprint = fingerprints[event_id]
+                if fingerprint in seen:
+                    duplicates.append(event_id)
+                    days.add((employee_id, timezone.localdate(event_time)))
+                else:
+                    seen.add(fingerprint)
+                    keep.append(AttendanceEvent(id=event_id, fingerprint=fingerprint))
+
+            if duplicates:
+                AttendanceEvent.objects.filter(id__in=duplicates).delete()
+            AttendanceEvent.objects.bulk_update(keep, ['fingerprint'], batch_size=1000)
+            fingerprinted += len(keep)
+            deleted += len(duplicates)
+        return fingerprinted, deleted, days
+
+    def _rebuild(self, days, batch_size):
+        employees = Employee.objects.in_bulk({employee_id for employee_id, _ in days})
+        days = sorted(days, key=lambda day: (day[1], day[0]))
+        for offset in range(0, len(days), batch_size):
+            rebuild_daily_attendance_summaries([
+                (employees[employee_id], attendance_date)
+                for employee_id, attendance_date in days[offset:offset + batch_size]
+            ])
+        return len(days)
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from attendance.services import refresh_attendance_schedules
+from enterprise.models import Employee
+
+
+class Command(BaseCommand):
+    help = (
+        "Store the scheduled arrival/departure and late/early seconds on existing daily summaries "
+        "(run once after adding the columns, or after changing schedules outside the ORM)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--enterprise', type=int, default=None, help='Only this enterprise id')
+        parser.add_argument('--employee',   type=int, default=None, help='Only this employee id')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Summaries updated per query (default: 1000)')
+
+    def handle(self, *args, **options):
+        employees = Employee.objects.all()
+        if options['enterprise']:
+            employees = employees.filter(enterprise_id=options['enterprise'])
+        if options['employee']:
+            employees = employees.filter(id=options['employee'])
+
+        with transaction.atomic():
+            updated = refresh_attendance_schedules(
+                list(employees.values_list('id', flat=True)), batch_size=options['batch_size'],
+            )
+        self.stdout.write(f"Updated {updated} daily summaries.")
@@ -5,6 +5,7 @@ from django.contrib.auth.hashers import make_password
 from django.utils import timezone
 from enterprise.models import Enterprise, Branch, Department, Employee
 from attendance.models import AttendanceEvent, DailyAttendance
+from attendance.services import refresh_attendance_schedules
 
 
 # Nepali names for realistic data
@@ -319,6 +320,8 @@ class Command(BaseCommand):
             if (day_offset + 1) % 30 == 0 or day_offset == num_days - 1:
                 self.stdout.write(f'    ... day {day_offset + 1}/{num_days} ({current_date})')
 
+        # Summaries are bulk-created without their schedule; fill it in one pass
+        refresh_attendance_schedules([emp.id for emp in employees])
         return stats
 
     def _build_day_events(self, employee, attendance_date, profile, is_today=False, is_saturday=False):
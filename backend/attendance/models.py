@@ -32,6 +32,9 @@ class AttendanceEvent(models.Model):
     device_serial = models.CharField(max_length=64, blank=True)
     raw_payload = models.JSONField(default=dict, blank=True)
     source = models.CharField(max_length=32, default='device')
+    # Hash of (device serial, device user id, timestamp, status) for punches
+    # pushed by a terminal, so re-uploaded logs are skipped rather than stored twice.
+    fingerprint = models.CharField(max_length=64, unique=True, blank=True, null=True, editable=False)
 
     class Meta:
         ordering = ['event_time', 'id']
@@ -56,6 +59,16 @@ class DailyAttendance(models.Model):
     present = models.BooleanField(default=False)
     last_event_type = models.PositiveSmallIntegerField(choices=AttendanceEvent.EVENT_CHOICES, blank=True, null=True)
     last_event_time = models.DateTimeField(blank=True, null=True)
+    # Break state kept so an in-order punch can be folded in without
+    # re-reading the day; NULL break_duration means "rebuild before folding".
+    break_duration = models.DurationField(blank=True, null=True)
+    open_break_start = models.DateTimeField(blank=True, null=True)
+    # The employee's schedule for the day and how far the day strayed from
+    # it, kept in step with the schedule by ``refresh_attendance_schedules``.
+    scheduled_arrival = models.DateTimeField(blank=True, null=True)
+    scheduled_departure = models.DateTimeField(blank=True, null=True)
+    late_seconds = models.PositiveIntegerField(default=0)
+    early_seconds = models.PositiveIntegerField(default=0)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
@@ -64,6 +77,8 @@ class DailyAttendance(models.Model):
         indexes = [
             models.Index(fields=['attendance_date', 'employee']),
             models.Index(fields=['attendance_date_bs', 'employee']),
+            models.Index(fields=['attendance_date', 'late_seconds']),
+            models.Index(fields=['attendance_date', 'early_seconds']),
         ]
 
     def __str__(self) -> str:
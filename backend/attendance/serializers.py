@@ -64,46 +64,11 @@ class DailyAttendanceSerializer(serializers.ModelSerializer):
         except Exception:
             return None
 
-    def _get_schedule_datetimes(self, obj):
-        from datetime import datetime as _dt, time as _time
-        from django.utils import timezone as _tz
-
-        employee = getattr(obj, 'employee', None)
-        arrival_time = getattr(employee, 'arrival_time', None) if employee else None
-        departure_time = getattr(employee, 'departure_time', None) if employee else None
-        department = getattr(employee, 'department', None) if employee else None
-        if arrival_time is None and department:
-            arrival_time = getattr(department, 'arrival_time', None)
-        if departure_time is None and department:
-            departure_time = getattr(department, 'departure_time', None)
-        if arrival_time is None:
-            arrival_time = _time(hour=9, minute=0)
-        if departure_time is None:
-            departure_time = _time(hour=18, minute=0)
-
-        arrival_dt = _dt.combine(obj.attendance_date, arrival_time)
-        departure_dt = _dt.combine(obj.attendance_date, departure_time)
-        if _tz.is_naive(arrival_dt):
-            arrival_dt = _tz.make_aware(arrival_dt, _tz.get_current_timezone())
-        if _tz.is_naive(departure_dt):
-            departure_dt = _tz.make_aware(departure_dt, _tz.get_current_timezone())
-        return arrival_dt, departure_dt
-
     def get_late_seconds(self, obj):
-        if not obj or not obj.first_check_in:
-            return 0
-        arrival_dt, _ = self._get_schedule_datetimes(obj)
-        if obj.first_check_in <= arrival_dt:
-            return 0
-        return int((obj.first_check_in - arrival_dt).total_seconds())
+        return obj.late_seconds if obj else 0
 
     def get_early_seconds(self, obj):
-        if not obj or not obj.last_check_out:
-            return 0
-        _, departure_dt = self._get_schedule_datetimes(obj)
-        if obj.last_check_out >= departure_dt:
-            return 0
-        return int((departure_dt - obj.last_check_out).total_seconds())
+        return obj.early_seconds if obj else 0
 
     def get_late_duration(self, obj):
         secs = self.get_late_seconds(obj)
@@ -120,15 +85,7 @@ class DailyAttendanceSerializer(serializers.ModelSerializer):
         return str(_td(seconds=secs))
 
     def get_scheduled_arrival(self, obj):
-        arrival_dt, _ = self._get_schedule_datetimes(obj)
-        try:
-            return arrival_dt.isoformat()
-        except Exception:
-            return None
+        return obj.scheduled_arrival.isoformat() if obj.scheduled_arrival else None
 
     def get_scheduled_departure(self, obj):
-        _, departure_dt = self._get_schedule_datetimes(obj)
-        try:
-            return departure_dt.isoformat()
-        except Exception:
-            return None
+        return obj.scheduled_departure.isoformat() if obj.scheduled_departure else None
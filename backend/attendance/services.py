@@ -1,6 +1,8 @@
 from __future__ import annotations
 
+import hashlib
 from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
 
 from django.db import transaction
 from django.db.models import Q, Sum
@@ -9,7 +11,9 @@ from django.utils import timezone
 from enterprise.models import Employee
 from device.models import BiometricDevice, EmployeeBiometricMapping
 
+from .dashboard_cache import invalidate_dashboards_on_commit
 from .models import AttendanceEvent, DailyAttendance
+from .time_window import within_local_days
 from .ssm import publish_event
 
 
@@ -35,6 +39,17 @@ EVENT_CODE_ALIASES = {
 }
 
 
+# Event a punch without an explicit code is taken to be, given the last event of the day.
+NEXT_EVENT_CODE = {
+    AttendanceEvent.CHECK_IN: AttendanceEvent.CHECK_OUT,
+    AttendanceEvent.CHECK_OUT: AttendanceEvent.CHECK_IN,
+    AttendanceEvent.BREAK_OUT: AttendanceEvent.BREAK_IN,
+    AttendanceEvent.BREAK_IN: AttendanceEvent.BREAK_OUT,
+    AttendanceEvent.OT_IN: AttendanceEvent.OT_OUT,
+    AttendanceEvent.OT_OUT: AttendanceEvent.OT_IN,
+}
+
+
 def _normalize_key(value: object) -> str:
     return str(value).strip().lower().replace(' ', '').replace('_', '-')
 
@@ -85,6 +100,22 @@ def parse_device_timestamp(value: object | None) -> datetime:
     return parsed
 
 
+def event_fingerprint(device_serial: object, device_user_id: object, event_time: datetime, status: object) -> str:
+    """
+    Deterministic identity of a device punch. A terminal that re-sends a row
+    sends the same serial, user id, timestamp and status, so the retry hashes
+    to the same value whatever code we would infer for it. ``status`` is the
+    raw code from the device, ``None`` when it sent none.
+    """
+    parts = [
+        str(device_serial or '').strip(),
+        str(device_user_id or '').strip(),
+        event_time.astimezone(dt_timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f'),
+        '' if status is None else str(status),
+    ]
+    return hashlib.sha256('|'.join(parts).encode('utf-8')).hexdigest()
+
+
 def register_biometric_device(
     serial_number: object | None,
     *,
@@ -129,7 +160,6 @@ def resolve_employee(identifier: object | None, device_serial: object | None = N
         return None
     if device_serial not in (None, ''):
         device_serial_normalized = str(device_serial).strip()
-        print(normalized,device_serial_normalized)
         if device_serial_normalized:
             mapped_employee = (
                 EmployeeBiometricMapping.objects.select_related('employee')
@@ -137,7 +167,6 @@ def resolve_employee(identifier: object | None, device_serial: object | None = N
                 .values_list('employee', flat=True)
                 .first()
             )
-            print(mapped_employee)
             if mapped_employee:
                 employee = Employee.objects.filter(id=mapped_employee).first()
                 if employee:
@@ -159,23 +188,14 @@ def infer_next_event_code(employee: Employee, event_time: datetime | None = None
     attendance_date = timezone.localdate(event_time)
 
     last_event = (
-        AttendanceEvent.objects.filter(employee=employee, event_time__date=attendance_date)
+        AttendanceEvent.objects.filter(within_local_days(attendance_date), employee=employee)
         .order_by('event_time', 'id')
         .last()
     )
 
     if last_event is None:
         return AttendanceEvent.CHECK_IN
-
-    next_event_map = {
-        AttendanceEvent.CHECK_IN: AttendanceEvent.CHECK_OUT,
-        AttendanceEvent.CHECK_OUT: AttendanceEvent.CHECK_IN,
-        AttendanceEvent.BREAK_OUT: AttendanceEvent.BREAK_IN,
-        AttendanceEvent.BREAK_IN: AttendanceEvent.BREAK_OUT,
-        AttendanceEvent.OT_IN: AttendanceEvent.OT_OUT,
-        AttendanceEvent.OT_OUT: AttendanceEvent.OT_IN,
-    }
-    return next_event_map.get(last_event.event_type, AttendanceEvent.CHECK_IN)
+    return NEXT_EVENT_CODE.get(last_event.event_type, AttendanceEvent.CHECK_IN)
 
 
 def _event_field_values(events, event_type: int) -> list[datetime]:
@@ -217,12 +237,30 @@ def _get_employee_schedule(employee: Employee):
     return arrival_time or _time(hour=9, minute=0), departure_time or _time(hour=18, minute=0)
 
 
+def _employee_schedules(employee_ids) -> dict[int, tuple]:
+    """``_get_employee_schedule`` of many employees with one query, keyed by id."""
+    from datetime import time as _time
+
+    schedules = {}
+    for employee_id, arrival, departure, department_arrival, department_departure in Employee.objects.filter(
+        id__in=employee_ids,
+    ).values_list('id', 'arrival_time', 'departure_time', 'department__arrival_time', 'department__departure_time'):
+        schedules[employee_id] = (
+            arrival or department_arrival or _time(hour=9, minute=0),
+            departure or department_departure or _time(hour=18, minute=0),
+        )
+    return schedules
+
+
 def _schedule_datetimes(employee: Employee, attendance_date):
+    return _combine_schedule(attendance_date, *_get_employee_schedule(employee))
+
+
+def _combine_schedule(attendance_date, arrival_time, departure_time):
     from datetime import datetime as _dt
 
     from django.utils import timezone as _tz
 
-    arrival_time, departure_time = _get_employee_schedule(employee)
     arrival_dt = _dt.combine(attendance_date, arrival_time)
     departure_dt = _dt.combine(attendance_date, departure_time)
     if _tz.is_naive(arrival_dt):
@@ -232,51 +270,70 @@ def _schedule_datetimes(employee: Employee, attendance_date):
     return arrival_dt, departure_dt
 
 
-def _worked_minutes_from_events(events) -> int:
-    check_in_times = _event_field_values(events, AttendanceEvent.CHECK_IN)
-    if not check_in_times:
-        return 0
+def _set_schedule(summary: DailyAttendance, arrival_time, departure_time) -> None:
+    """Store the day's scheduled arrival/departure on ``summary`` and recompute its lateness."""
+    summary.scheduled_arrival, summary.scheduled_departure = _combine_schedule(
+        summary.attendance_date, arrival_time, departure_time,
+    )
+    _fill_lateness(summary)
 
-    first_check_in = min(check_in_times)
-    checkout_times = _event_field_values(events, AttendanceEvent.CHECK_OUT)
-    ot_out_times = _event_field_values(events, AttendanceEvent.OT_OUT)
-    end_time = max([*checkout_times, *ot_out_times], default=None)
-    if end_time is None:
-        end_time = timezone.now()
 
-    worked = end_time - first_check_in
-    if worked.total_seconds() < 0:
-        return 0
-    print("BEFORE BREAK CALCULATION: Worked time:", worked)
+def _fill_lateness(summary: DailyAttendance) -> None:
+    """Seconds ``summary`` started after its scheduled arrival and finished before its scheduled departure."""
+    late_seconds = early_seconds = 0
+    if summary.first_check_in is not None and summary.scheduled_arrival is not None:
+        late_seconds = max(int((summary.first_check_in - summary.scheduled_arrival).total_seconds()), 0)
+    if summary.last_check_out is not None and summary.scheduled_departure is not None:
+        early_seconds = max(int((summary.scheduled_departure - summary.last_check_out).total_seconds()), 0)
+    summary.late_seconds, summary.early_seconds = late_seconds, early_seconds
+
+
+def _break_state(events) -> tuple[timedelta, datetime | None]:
+    """Total of the closed breaks in ``events`` and the start of a break still open."""
     break_total = timedelta()
     active_break_start: datetime | None = None
     for event in events:
         if event.event_type == AttendanceEvent.BREAK_OUT:
-            print("BREAK OUT EVENT:", event.event_time)
             if active_break_start is None:
                 active_break_start = event.event_time
         elif event.event_type == AttendanceEvent.BREAK_IN and active_break_start is not None:
-            print("BREAK IN EVENT:", event.event_time)
             if event.event_time > active_break_start:
                 break_total += event.event_time - active_break_start
             active_break_start = None
+    return break_total, active_break_start
+
 
-    if active_break_start is not None and end_time > active_break_start:
-        break_total += end_time - active_break_start
-        print("ACTIVE BREAK NOT CLOSED. Adding break time until end_time:", end_time)
+def _worked_minutes(first_check_in, end_time, break_total: timedelta, open_break_start) -> int:
+    if first_check_in is None:
+        return 0
+    if end_time is None:
+        end_time = timezone.now()
+
+    worked = end_time - first_check_in
+    if worked.total_seconds() < 0:
+        return 0
+    if open_break_start is not None and end_time > open_break_start:
+        break_total += end_time - open_break_start
 
     total_minutes = int((worked - break_total).total_seconds() // 60)
-    print("AFTER BREAK CALCULATION: Worked time:", worked, "Break total:", break_total, "Total minutes:", total_minutes)
     return max(total_minutes, 0)
 
 
-def rebuild_daily_attendance_summary(employee: Employee, attendance_date) -> DailyAttendance:
-    events = list(
-        AttendanceEvent.objects.filter(employee=employee, event_time__date=attendance_date).order_by('event_time', 'id')
+def _summary_end_time(summary: DailyAttendance):
+    return max([value for value in (summary.last_check_out, summary.last_ot_out) if value is not None], default=None)
+
+
+def _worked_minutes_from_events(events) -> int:
+    check_in_times = _event_field_values(events, AttendanceEvent.CHECK_IN)
+    end_time = max(
+        [*_event_field_values(events, AttendanceEvent.CHECK_OUT), *_event_field_values(events, AttendanceEvent.OT_OUT)],
+        default=None,
     )
+    return _worked_minutes(min(check_in_times, default=None), end_time, *_break_state(events))
 
-    summary, _ = DailyAttendance.objects.get_or_create(employee=employee, attendance_date=attendance_date)
 
+def _fill_daily_attendance(summary: DailyAttendance, events) -> None:
+    """Set the summary columns of ``summary`` from the day's ``events`` (ordered by time)."""
     first_check_ins = _event_field_values(events, AttendanceEvent.CHECK_IN)
     check_outs = _event_field_values(events, AttendanceEvent.CHECK_OUT)
     ot_ins = _event_field_values(events, AttendanceEvent.OT_IN)
@@ -287,10 +344,17 @@ def rebuild_daily_attendance_summary(employee: Employee, attendance_date) -> Dai
     summary.first_ot_in = min(ot_ins) if ot_ins else None
     summary.last_ot_out = max(ot_outs) if ot_outs else None
     summary.present = bool(events)
-    summary.worked_minutes = _worked_minutes_from_events(events)
-    if events:
-        summary.last_event_type = events[-1].event_type
-        summary.last_event_time = events[-1].event_time
+    summary.break_duration, summary.open_break_start = _break_state(events)
+    summary.worked_minutes = _worked_minutes(
+        summary.first_check_in, _summary_end_time(summary), summary.break_duration, summary.open_break_start,
+    )
+    summary.last_event_type = events[-1].event_type if events else None
+    summary.last_event_time = events[-1].event_time if events else None
+    _fill_lateness(summary)
+    _fill_bs_date(summary)
+
+
+def _fill_bs_date(summary: DailyAttendance) -> None:
     # Ensure BS fields are populated based on the attendance_date
     try:
         from .date_utils import ad_to_bs
@@ -303,10 +367,235 @@ def rebuild_daily_attendance_summary(employee: Employee, attendance_date) -> Dai
         # ignore conversion errors; leave defaults
         pass
 
+
+def can_fold_event(summary: DailyAttendance | None, event_time: datetime) -> bool:
+    """
+    Whether a new event at ``event_time`` can be folded into ``summary``
+    without re-reading the day: the summary carries break state and its
+    schedule, and the event sorts after every event it has seen.
+    """
+    return (
+        summary is not None
+        and summary.pk is not None
+        and summary.break_duration is not None
+        and summary.scheduled_arrival is not None
+        and (summary.last_event_time is None or event_time >= summary.last_event_time)
+    )
+
+
+def fold_event(summary: DailyAttendance, event_type: int, event_time: datetime) -> None:
+    """
+    Apply one in-order event to ``summary`` in constant time. The result is
+    what a full rebuild over the day's events would produce; callers check
+    ``can_fold_event`` first.
+    """
+    if event_type == AttendanceEvent.CHECK_IN:
+        if summary.first_check_in is None or event_time < summary.first_check_in:
+            summary.first_check_in = event_time
+    elif event_type == AttendanceEvent.CHECK_OUT:
+        summary.last_check_out = event_time
+    elif event_type == AttendanceEvent.OT_IN:
+        if summary.first_ot_in is None or event_time < summary.first_ot_in:
+            summary.first_ot_in = event_time
+    elif event_type == AttendanceEvent.OT_OUT:
+        summary.last_ot_out = event_time
+    elif event_type == AttendanceEvent.BREAK_OUT:
+        if summary.open_break_start is None:
+            summary.open_break_start = event_time
+    elif event_type == AttendanceEvent.BREAK_IN and summary.open_break_start is not None:
+        if event_time > summary.open_break_start:
+            summary.break_duration += event_time - summary.open_break_start
+        summary.open_break_start = None
+
+    summary.present = True
+    summary.last_event_type = event_type
+    summary.last_event_time = event_time
+    summary.worked_minutes = _worked_minutes(
+        summary.first_check_in, _summary_end_time(summary), summary.break_duration, summary.open_break_start,
+    )
+    _fill_lateness(summary)
+    if summary.attendance_date_bs is None:
+        _fill_bs_date(summary)
+
+
+def update_daily_attendance_summary(employee: Employee, event: AttendanceEvent) -> DailyAttendance:
+    """
+    Bring the day's summary up to date after ``event`` was stored: folded in
+    place for the usual in-order punch, rebuilt from the day's events when
+    it arrived out of order or the summary has no break state yet. Cached
+    dashboards of the day are invalidated once the transaction commits.
+    """
+    attendance_date = timezone.localdate(event.event_time)
+    summary = (
+        DailyAttendance.objects.select_for_update()
+        .filter(employee=employee, attendance_date=attendance_date)
+        .first()
+    )
+    if not can_fold_event(summary, event.event_time):
+        return rebuild_daily_attendance_summary(employee, attendance_date)
+    fold_event(summary, event.event_type, event.event_time)
+    summary.save(update_fields=SUMMARY_FIELDS)
+    invalidate_dashboards_on_commit([(employee, attendance_date)])
+    return summary
+
+
+def rebuild_daily_attendance_summary(employee: Employee, attendance_date) -> DailyAttendance:
+    events = list(
+        AttendanceEvent.objects.filter(within_local_days(attendance_date), employee=employee).order_by('event_time', 'id')
+    )
+
+    summary, _ = DailyAttendance.objects.get_or_create(employee=employee, attendance_date=attendance_date)
+    summary.scheduled_arrival, summary.scheduled_departure = _schedule_datetimes(employee, attendance_date)
+    _fill_daily_attendance(summary, events)
     summary.save()
+    invalidate_dashboards_on_commit([(employee, attendance_date)])
     return summary
 
 
+SUMMARY_FIELDS = [
+    'attendance_date_bs', 'first_check_in', 'last_check_out', 'first_ot_in', 'last_ot_out',
+    'worked_minutes', 'present', 'last_event_type', 'last_event_time', 'break_duration', 'open_break_start',
+    'scheduled_arrival', 'scheduled_departure', 'late_seconds', 'early_seconds', 'updated_at',
+]
+LATENESS_FIELDS = ['scheduled_arrival', 'scheduled_departure', 'late_seconds', 'early_seconds']
+
+
+def rebuild_daily_attendance_summaries(days) -> dict[tuple[int, object], DailyAttendance]:
+    """
+    Rebuild the ``DailyAttendance`` rows of many ``(employee, attendance_date)``
+    pairs at once: one query for their events, one for the existing rows, then
+    a bulk insert and a bulk update. Returns the summaries keyed by
+    ``(employee_id, attendance_date)``.
+    """
+    employees = {(employee.id, attendance_date): employee for employee, attendance_date in days}
+    if not employees:
+        return {}
+    employee_ids = {employee_id for employee_id, _ in employees}
+    dates = {attendance_date for _, attendance_date in employees}
+
+    events_by_day: dict[tuple[int, object], list[AttendanceEvent]] = {}
+    for event in AttendanceEvent.objects.filter(
+        within_local_days(min(dates), max(dates)), employee_id__in=employee_ids,
+    ).order_by('event_time', 'id'):
+        key = (event.employee_id, timezone.localdate(event.event_time))
+        if key in employees:
+            events_by_day.setdefault(key, []).append(event)
+
+    existing = {
+        (summary.employee_id, summary.attendance_date): summary
+        for summary in DailyAttendance.objects.filter(employee_id__in=employee_ids, attendance_date__in=dates)
+    }
+    schedules = _employee_schedules(employee_ids)
+    summaries, created, updated = {}, [], []
+    now = timezone.now()
+    for key, employee in employees.items():
+        summary = existing.get(key)
+        if summary is None:
+            summary = DailyAttendance(employee=employee, attendance_date=key[1])
+            created.append(summary)
+        else:
+            updated.append(summary)
+        summary.scheduled_arrival, summary.scheduled_departure = _combine_schedule(key[1], *schedules[key[0]])
+        _fill_daily_attendance(summary, events_by_day.get(key, []))
+        summary.updated_at = now
+        summaries[key] = summary
+
+    DailyAttendance.objects.bulk_create(created, batch_size=500)
+    DailyAttendance.objects.bulk_update(updated, SUMMARY_FIELDS, batch_size=500)
+    invalidate_dashboards_on_commit((employee, key[1]) for key, employee in employees.items())
+    return summaries
+
+
+def update_daily_attendance_summaries(new_events) -> dict[tuple[int, object], DailyAttendance]:
+    """
+    Batch form of ``update_daily_attendance_summary``. ``new_events`` maps
+    ``(employee, attendance_date)`` to the ``(event_type, event_time)`` pairs
+    just stored for that day, in stored order. Days that can be folded are
+    updated from one read of their summaries; the rest are rebuilt.
+    """
+    if not new_events:
+        return {}
+    existing = {
+        (summary.employee_id, summary.attendance_date): summary
+        for summary in DailyAttendance.objects.select_for_update().filter(
+            employee_id__in={employee.id for employee, _ in new_events},
+            attendance_date__in={attendance_date for _, attendance_date in new_events},
+        )
+    }
+    summaries, stale = {}, []
+    now = timezone.now()
+    for (employee, attendance_date), events in new_events.items():
+        key = (employee.id, attendance_date)
+        summary = existing.get(key)
+        if not can_fold_event(summary, events[0][1]):
+            stale.append((employee, attendance_date))
+            continue
+        for event_type, event_time in events:
+            fold_event(summary, event_type, event_time)
+        summary.updated_at = now
+        summaries[key] = summary
+
+    DailyAttendance.objects.bulk_update(list(summaries.values()), SUMMARY_FIELDS, batch_size=500)
+    invalidate_dashboards_on_commit(
+        (employee, attendance_date) for employee, attendance_date in new_events
+        if (employee.id, attendance_date) in summaries
+    )
+    summaries.update(rebuild_daily_attendance_summaries(stale))
+    return summaries
+
+
+def refresh_attendance_schedules(employee_ids, batch_size: int = 1000) -> int:
+    """
+    Recompute the scheduled arrival/departure and late/early seconds of
+    every ``DailyAttendance`` of ``employee_ids`` after their schedule (or
+    their department's) changed. Returns the number of rows updated.
+    """
+    schedules = _employee_schedules(employee_ids)
+    if not schedules:
+        return 0
+    summaries = DailyAttendance.objects.filter(employee_id__in=schedules).only(
+        'id', 'employee_id', 'attendance_date', 'first_check_in', 'last_check_out', *LATENESS_FIELDS,
+    ).order_by('id')
+
+    updated, batch = 0, []
+    for summary in summaries.iterator(chunk_size=batch_size):
+        _set_schedule(summary, *schedules[summary.employee_id])
+        batch.append(summary)
+        if len(batch) >= batch_size:
+            DailyAttendance.objects.bulk_update(batch, LATENESS_FIELDS)
+            updated += len(batch)
+            batch = []
+    if batch:
+        DailyAttendance.objects.bulk_update(batch, LATENESS_FIELDS)
+        updated += len(batch)
+    today = timezone.localdate()
+    employees = Employee.objects.filter(id__in=schedules).only('id', 'enterprise_id', 'branch_id', 'department_id')
+    invalidate_dashboards_on_commit((employee, today) for employee in employees)
+    return updated
+
+
+def publish_attendance_update(summary: DailyAttendance, employee: Employee, event_type: int,
+                              event_time: datetime, event_id: int | None = None) -> None:
+    """Best-effort publish of a summary change to SSE clients so the frontend can update in real-time."""
+    try:
+        # Include summary fields so clients can update authoritative values
+        publish_event({
+            'event_id': event_id,
+            'employee_id': employee.id,
+            'employee_name': employee.name,
+            'event_type': int(event_type),
+            'event_time': event_time.isoformat(),
+            'attendance_date': str(summary.attendance_date),
+            'attendance_date_bs': str(summary.attendance_date_bs) if summary.attendance_date_bs else None,
+            'first_check_in': summary.first_check_in.isoformat() if summary.first_check_in else None,
+            'last_check_out': summary.last_check_out.isoformat() if summary.last_check_out else None,
+            'worked_minutes': int(summary.worked_minutes or 0),
+        }, enterprise_id=employee.enterprise_id, branch_id=employee.branch_id)
+    except Exception:
+        # Never let SSE publishing break recording flow
+        pass
+
+
 @transaction.atomic
 def record_device_event(
     employee: Employee,
@@ -316,6 +605,8 @@ def record_device_event(
     raw_payload: dict | None = None,
     source: str = 'device',
 ) -> tuple[DailyAttendance, AttendanceEvent]:
+    # Device pushes are deduplicated by fingerprint in ingest.py, from the raw
+    # row the terminal sent; events recorded here carry no fingerprint.
     event_time = event_time or timezone.now()
     raw_payload = raw_payload or {}
     event = AttendanceEvent.objects.create(
@@ -328,25 +619,8 @@ def record_device_event(
     )
     if device_serial:
         BiometricDevice.objects.filter(serial_number=str(device_serial).strip()).update(last_seen_at=event_time)
-    summary = rebuild_daily_attendance_summary(employee, timezone.localdate(event_time))
-    # Best-effort publish to SSE clients so frontend can update in real-time.
-    try:
-        # Include summary fields so clients can update authoritative values
-        publish_event({
-            'event_id': event.id,
-            'employee_id': employee.id,
-            'employee_name': employee.name,
-            'event_type': int(event_type),
-            'event_time': event_time.isoformat(),
-            'attendance_date': str(summary.attendance_date),
-            'attendance_date_bs': str(summary.attendance_date_bs) if summary.attendance_date_bs else None,
-            'first_check_in': summary.first_check_in.isoformat() if summary.first_check_in else None,
-            'last_check_out': summary.last_check_out.isoformat() if summary.last_check_out else None,
-            'worked_minutes': int(summary.worked_minutes or 0),
-        })
-    except Exception:
-        # Never let SSE publishing break recording flow
-        pass
+    summary = update_daily_attendance_summary(employee, event)
+    publish_attendance_update(summary, employee, event_type, event_time, event.id)
 
     return summary, event
 
@@ -372,8 +646,8 @@ def build_dashboard_rows(attendance_date=None, branch_id=None, department_id=Non
     }
     events_by_employee: dict[int, list[AttendanceEvent]] = {}
     for event in AttendanceEvent.objects.filter(
+        within_local_days(attendance_date),
         employee_id__in=employee_ids,
-        event_time__date=attendance_date,
     ).order_by('event_time', 'id'):
         events_by_employee.setdefault(event.employee_id, []).append(event)
 
@@ -436,8 +710,8 @@ def build_dashboard_rows_for_employees(employees, attendance_date=None):
     }
     events_by_employee: dict[int, list[AttendanceEvent]] = {}
     for event in AttendanceEvent.objects.filter(
+        within_local_days(attendance_date),
         employee_id__in=employee_ids,
-        event_time__date=attendance_date,
     ).order_by('event_time', 'id'):
         events_by_employee.setdefault(event.employee_id, []).append(event)
 
@@ -573,36 +847,6 @@ def build_dashboard_stats_fast(attendance_date=None, branch_id=None, department_
     }
 
 
-def _compute_late_arrival_seconds(summary: DailyAttendance) -> int:
-    """Calculate seconds late for a given attendance summary.
-    
-    Returns 0 if employee arrived on time or early, otherwise returns seconds after scheduled arrival.
-    """
-    if not summary or not summary.first_check_in:
-        return 0
-
-    scheduled_arrival, _ = _schedule_datetimes(summary.employee, summary.attendance_date)
-    if summary.first_check_in <= scheduled_arrival:
-        return 0
-    
-    return int((summary.first_check_in - scheduled_arrival).total_seconds())
-
-
-def _compute_early_departure_seconds(summary: DailyAttendance) -> int:
-    """Calculate seconds early for a given attendance summary.
-    
-    Returns 0 if employee departed on time or late, otherwise returns seconds before scheduled departure.
-    """
-    if not summary or not summary.last_check_out:
-        return 0
-
-    _, scheduled_departure = _schedule_datetimes(summary.employee, summary.attendance_date)
-    if summary.last_check_out >= scheduled_departure:
-        return 0
-    
-    return int((scheduled_departure - summary.last_check_out).total_seconds())
-
-
 def get_late_arrivals(attendance_date=None, branch_id=None, department_id=None, enterprise_id=None) -> list[dict]:
     """Fetch employees who arrived late on a given day, with optional branch/department filter.
     
@@ -616,11 +860,11 @@ def get_late_arrivals(attendance_date=None, branch_id=None, department_id=None,
     """
     attendance_date = attendance_date or timezone.localdate()
     
-    # Get all daily attendance records for the date
+    # Lateness is stored on the summary, so this is one indexed query
     summaries = DailyAttendance.objects.filter(
         attendance_date=attendance_date,
-        first_check_in__isnull=False,  # Must have checked in
-    ).select_related('employee', 'employee__department')
+        late_seconds__gt=0,
+    ).select_related('employee', 'employee__department').order_by('-late_seconds', 'id')
     
     # Apply filters
     if branch_id:
@@ -630,24 +874,17 @@ def get_late_arrivals(attendance_date=None, branch_id=None, department_id=None,
     if enterprise_id:
         summaries = summaries.filter(employee__enterprise_id=enterprise_id)
     
-    late_arrivals = []
-    for summary in summaries:
-        late_seconds = _compute_late_arrival_seconds(summary)
-        if late_seconds > 0:
-            scheduled_arrival, _ = _schedule_datetimes(summary.employee, summary.attendance_date)
-            
-            late_arrivals.append({
-                'employee': summary.employee,
-                'check_in': summary.first_check_in,
-                'scheduled_arrival': scheduled_arrival,
-                'late_seconds': late_seconds,
-                'late_minutes': round(late_seconds / 60, 1),
-                'summary': summary,
-            })
-    
-    # Sort by late_seconds descending
-    late_arrivals.sort(key=lambda x: x['late_seconds'], reverse=True)
-    return late_arrivals
+    return [
+        {
+            'employee': summary.employee,
+            'check_in': summary.first_check_in,
+            'scheduled_arrival': summary.scheduled_arrival,
+            'late_seconds': summary.late_seconds,
+            'late_minutes': round(summary.late_seconds / 60, 1),
+            'summary': summary,
+        }
+        for summary in summaries
+    ]
 
 
 def get_early_departures(attendance_date=None, branch_id=None, department_id=None, enterprise_id=None) -> list[dict]:
@@ -663,11 +900,10 @@ def get_early_departures(attendance_date=None, branch_id=None, department_id=Non
     """
     attendance_date = attendance_date or timezone.localdate()
     
-    # Get all daily attendance records for the date
     summaries = DailyAttendance.objects.filter(
         attendance_date=attendance_date,
-        last_check_out__isnull=False,  # Must have checked out
-    ).select_related('employee', 'employee__department')
+        early_seconds__gt=0,
+    ).select_related('employee', 'employee__department').order_by('-early_seconds', 'id')
     
     # Apply filters
     if branch_id:
@@ -677,21 +913,14 @@ def get_early_departures(attendance_date=None, branch_id=None, department_id=Non
     if enterprise_id:
         summaries = summaries.filter(employee__enterprise_id=enterprise_id)
     
-    early_departures = []
-    for summary in summaries:
-        early_seconds = _compute_early_departure_seconds(summary)
-        if early_seconds > 0:
-            _, scheduled_departure = _schedule_datetimes(summary.employee, summary.attendance_date)
-            
-            early_departures.append({
-                'employee': summary.employee,
-                'check_out': summary.last_check_out,
-                'scheduled_departure': scheduled_departure,
-                'early_seconds': early_seconds,
-                'early_minutes': round(early_seconds / 60, 1),
-                'summary': summary,
-            })
-    
-    # Sort by early_seconds descending
-    early_departures.sort(key=lambda x: x['early_seconds'], reverse=True)
-    return early_departures
+    return [
+        {
+            'employee': summary.employee,
+            'check_out': summary.last_check_out,
+            'scheduled_departure': summary.scheduled_departure,
+            'early_seconds': summary.early_seconds,
+            'early_minutes': round(summary.early_seconds / 60, 1),
+            'summary': summary,
+        }
+        for summary in summaries
+    ]
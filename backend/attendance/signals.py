@@ -0,0 +1,45 @@
+from django.db.models.signals import post_save, pre_save
+
+from enterprise.models import Department, Employee
+
+from .services import refresh_attendance_schedules
+
+# ``DailyAttendance`` stores each day's schedule and lateness, so changing an
+# employee's (or their department's) hours, or moving them to another
+# department, recomputes their summaries.
+
+SCHEDULE_FIELDS = {
+    Employee: ('arrival_time', 'departure_time', 'department_id'),
+    Department: ('arrival_time', 'departure_time'),
+}
+
+
+def _schedule(instance):
+    return tuple(getattr(instance, field) for field in SCHEDULE_FIELDS[type(instance)])
+
+
+def remember_schedule(sender, instance, update_fields=None, **kwargs):
+    fields = SCHEDULE_FIELDS[sender]
+    instance._previous_schedule = None
+    if instance.pk is None:
+        return
+    if update_fields is not None and not {field.removesuffix('_id') for field in fields} & set(update_fields):
+        return
+    instance._previous_schedule = sender.objects.filter(pk=instance.pk).values_list(*fields).first()
+
+
+def refresh_changed_schedule(sender, instance, created=False, **kwargs):
+    previous = getattr(instance, '_previous_schedule', None)
+    if created or previous is None or previous == _schedule(instance):
+        return
+    if sender is Department:
+        employee_ids = list(instance.employees.values_list('id', flat=True))
+    else:
+        employee_ids = [instance.pk]
+    refresh_attendance_schedules(employee_ids)
+
+
+def connect_schedule_signals():
+    for model in SCHEDULE_FIELDS:
+        pre_save.connect(remember_schedule, sender=model)
+        post_save.connect(refresh_changed_schedule, sender=model)
@@ -1,29 +1,216 @@
+from __future__ import annotations
+
 import json
-import queue
+import logging
+import select
 import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass
 from typing import Any
 
-# Simple in-memory pub/sub for Server-Sent Events (SSE).
-# This is intentionally minimal and works for single-process development.
+from django.conf import settings
+from django.db import connections
+
+# Pub/sub for Server-Sent Events (SSE).
+#
+# Every process keeps its subscribers and a short history of recent events
+# in memory. The broker decides how an event gets to every process: the
+# in-memory broker only reaches the current one (tests, runserver), the
+# PostgreSQL broker sends it with NOTIFY and each process LISTENs for it, so
+# a punch recorded by one gunicorn worker reaches dashboards on all of them.
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'attendance_events'
+# PostgreSQL rejects NOTIFY payloads of 8000 bytes or more
+MAX_NOTIFY_BYTES = 8000
+
+
+def _setting(name: str, default):
+    return getattr(settings, name, default)
+
+
+@dataclass(frozen=True)
+class Event:
+    id: str
+    data: str
+    enterprise_id: int | None = None
+    branch_id: int | None = None
+
+
+class Subscription:
+    """
+    One client's view of the stream: events of its enterprise (and branch,
+    when given) in a bounded buffer that drops the oldest event when the
+    client can't keep up.
+    """
+
+    def __init__(self, enterprise_id=None, branch_id=None, buffer_size=None):
+        self.enterprise_id = enterprise_id
+        self.branch_id = branch_id
+        self.buffer: deque[Event] = deque(maxlen=buffer_size or _setting('ATTENDANCE_SSE_BUFFER_SIZE', 100))
+        self.dropped = 0
+        self._ready = threading.Condition()
+
+    def matches(self, event: Event) -> bool:
+        if self.enterprise_id is not None and event.enterprise_id != self.enterprise_id:
+            return False
+        if self.branch_id is not None and event.branch_id != self.branch_id:
+            return False
+        return True
+
+    def offer(self, event: Event) -> None:
+        with self._ready:
+            if len(self.buffer) == self.buffer.maxlen:
+                self.dropped += 1
+            self.buffer.append(event)
+            self._ready.notify()
+
+    def get(self, timeout: float | None = None) -> Event | None:
+        """Next event, or ``None`` when nothing arrived within ``timeout`` seconds."""
+        with self._ready:
+            if not self.buffer:
+                self._ready.wait(timeout)
+            return self.buffer.popleft() if self.buffer else None
+
+
+class MemoryBroker:
+    """Delivers events to the subscribers of this process only."""
+
+    def __init__(self, history_size=None):
+        self._lock = threading.Lock()
+        self._subscriptions: set[Subscription] = set()
+        self._history: deque[Event] = deque(maxlen=history_size or _setting('ATTENDANCE_SSE_HISTORY_SIZE', 500))
+
+    def publish(self, event: Event) -> None:
+        self._dispatch(event)
+
+    def subscribe(self, enterprise_id=None, branch_id=None, last_event_id=None, buffer_size=None) -> Subscription:
+        subscription = Subscription(enterprise_id, branch_id, buffer_size)
+        with self._lock:
+            if last_event_id:
+                # Replay what the client missed while reconnecting; an id that
+                # has already left the history replays nothing.
+                ids = [event.id for event in self._history]
+                if last_event_id in ids:
+                    for event in list(self._history)[ids.index(last_event_id) + 1:]:
+                        if subscription.matches(event):
+                            subscription.offer(event)
+            self._subscriptions.add(subscription)
+        return subscription
 
-_clients: set[queue.Queue] = set()
-_clients_lock = threading.Lock()
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            self._subscriptions.discard(subscription)
 
+    def _dispatch(self, event: Event) -> None:
+        with self._lock:
+            self._history.append(event)
+            subscriptions = [subscription for subscription in self._subscriptions if subscription.matches(event)]
+        for subscription in subscriptions:
+            subscription.offer(event)
 
-def subscribe() -> queue.Queue:
-    q: queue.Queue = queue.Queue()
-    with _clients_lock:
-        _clients.add(q)
-    return q
 
+class PostgresBroker(MemoryBroker):
+    """
+    Publishes with ``pg_notify`` on the request's connection, so events are
+    only sent once the transaction that recorded them commits, and receives
+    them on a dedicated LISTEN connection per process.
+    """
 
-def unsubscribe(q: queue.Queue) -> None:
-    with _clients_lock:
-        _clients.discard(q)
+    def __init__(self, using='default', history_size=None):
+        super().__init__(history_size)
+        self.using = using
+        self._listener: threading.Thread | None = None
 
+    def publish(self, event: Event) -> None:
+        message = json.dumps({
+            'id': event.id, 'data': event.data, 'enterprise_id': event.enterprise_id, 'branch_id': event.branch_id,
+        })
+        if len(message.encode('utf-8')) >= MAX_NOTIFY_BYTES:
+            # NOTIFY would fail and abort the caller's transaction
+            logger.warning("Attendance event %s is too large to publish", event.id)
+            return
+        with connections[self.using].cursor() as cursor:
+            cursor.execute("SELECT pg_notify(%s, %s)", [CHANNEL, message])
 
-def publish_event(payload: Any) -> None:
-    """Publish a JSON-serializable payload to all connected SSE clients."""
+    def subscribe(self, *args, **kwargs) -> Subscription:
+        self._start_listener()
+        return super().subscribe(*args, **kwargs)
+
+    def _start_listener(self) -> None:
+        with self._lock:
+            if self._listener is None or not self._listener.is_alive():
+                self._listener = threading.Thread(target=self._listen, name='attendance-events-listener', daemon=True)
+                self._listener.start()
+
+    def _listen(self) -> None:
+        import psycopg2
+        import psycopg2.extensions
+
+        backoff = 1
+        while True:
+            listen_connection = None
+            try:
+                listen_connection = psycopg2.connect(**connections[self.using].get_connection_params())
+                listen_connection.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                with listen_connection.cursor() as cursor:
+                    cursor.execute(f"LISTEN {CHANNEL}")
+                backoff = 1
+                while True:
+                    if select.select([listen_connection], [], [], 30) == ([], [], []):
+                        continue
+                    listen_connection.poll()
+                    while listen_connection.notifies:
+                        message = json.loads(listen_connection.notifies.pop(0).payload)
+                        self._dispatch(Event(**message))
+            except Exception:
+                logger.exception("Attendance event listener lost its connection, retrying in %s s", backoff)
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+            finally:
+                if listen_connection is not None:
+                    listen_connection.close()
+
+
+_broker: MemoryBroker | None = None
+_broker_lock = threading.Lock()
+
+
+def get_broker() -> MemoryBroker:
+    """
+    The process-wide broker picked by ``ATTENDANCE_EVENT_BROKER`` (``'postgres'``
+    or ``'memory'``); by default PostgreSQL when that is the database.
+    """
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            backend = _setting('ATTENDANCE_EVENT_BROKER', None)
+            if backend is None:
+                backend = 'postgres' if connections['default'].vendor == 'postgresql' else 'memory'
+            _broker = PostgresBroker() if backend == 'postgres' else MemoryBroker()
+        return _broker
+
+
+def set_broker(broker: MemoryBroker | None) -> None:
+    """Swap the process-wide broker (``None`` picks it again from settings)."""
+    global _broker
+    with _broker_lock:
+        _broker = broker
+
+
+def subscribe(enterprise_id=None, branch_id=None, last_event_id=None) -> Subscription:
+    return get_broker().subscribe(enterprise_id, branch_id, last_event_id)
+
+
+def unsubscribe(subscription: Subscription) -> None:
+    get_broker().unsubscribe(subscription)
+
+
+def publish_event(payload: Any, enterprise_id=None, branch_id=None) -> None:
+    """Publish a JSON-serializable payload to the SSE clients of its enterprise and branch."""
     text = None
     try:
         text = json.dumps(payload, default=str)
@@ -31,11 +218,4 @@ def publish_event(payload: Any) -> None:
         # Fallback - attempt coarse stringification
         text = str(payload)
 
-    with _clients_lock:
-        for q in list(_clients):
-            try:
-                # Put without blocking to avoid stalling publisher
-                q.put_nowait(text)
-            except Exception:
-                # ignore client queue failures
-                pass
+    get_broker().publish(Event(uuid.uuid4().hex, text, enterprise_id, branch_id))
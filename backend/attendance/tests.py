@@ -1,13 +1,34 @@
+import csv
+import io
+import json
+import random
+import threading
+import unittest
+from io import StringIO
+from unittest import mock
+
+from django.contrib.admin.sites import AdminSite
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
-from datetime import datetime
+from datetime import date, datetime, time, timedelta
 from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
 
 from attendance.models import AttendanceEvent, DailyAttendance
+from attendance import date_utils
 from attendance.date_utils import ad_to_bs, format_bs_date
-from attendance.services import build_dashboard_rows, record_device_event
-from enterprise.models import Employee, Enterprise, Branch
+from attendance import dashboard_cache, services, ssm
+from attendance.admin import AttendanceEventAdmin
+from attendance.ingest import ingest_punches
+from attendance.serializers import DailyAttendanceSerializer
+from attendance.services import _fill_daily_attendance, build_dashboard_rows, record_device_event
+from attendance.time_window import local_day_bounds, within_local_days
+from enterprise.models import Employee, Enterprise, Branch, Department
 from device.models import BiometricDevice, EmployeeBiometricMapping
 
 
@@ -226,3 +247,588 @@ class AttendanceAggregationTests(TestCase):
         self.assertEqual(len(events), 2)
         self.assertEqual(events[0].event_type, AttendanceEvent.CHECK_IN)
         self.assertEqual(events[1].event_type, AttendanceEvent.CHECK_OUT)
+
+
+class AttlogIngestTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.enterprise = Enterprise.objects.create(name='Test Enterprise')
+        self.branch = Branch.objects.create(name='Main', enterprise=self.enterprise)
+        self.device = BiometricDevice.objects.create(serial_number='DEVICE-01')
+        self.employees = []
+        for i in range(1, 4):
+            employee = Employee.objects.create(
+                employee_code=f'EMP00{i}', name=f'Employee {i}', enterprise=self.enterprise, branch=self.branch,
+                is_hourly_wage=False,
+            )
+            EmployeeBiometricMapping.objects.create(employee=employee, device=self.device, device_user_id=str(i))
+            self.employees.append(employee)
+
+    def _push(self, rows):
+        return self.client.post('/iclock/cdata/?SN=DEVICE-01', data='\n'.join(rows), content_type='text/plain')
+
+    def test_batch_infers_codes_and_rebuilds_each_day_once(self):
+        rows = [
+            '1\t2026-04-28 09:00:00', '2\t2026-04-28 09:05:00', '99\t2026-04-28 09:06:00',
+            '1\t2026-04-28 13:00:00', '1\t2026-04-28 14:00:00', '1\t2026-04-28 18:00:00',
+            '2\t2026-04-29 09:00:00', '2\t2026-04-29 17:00:00',
+        ]
+        response = self._push(rows)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content.decode(), 'OK')
+        first, second, _ = self.employees
+        self.assertEqual(
+            list(AttendanceEvent.objects.filter(employee=first).values_list('event_type', flat=True)),
+            [AttendanceEvent.CHECK_IN, AttendanceEvent.CHECK_OUT, AttendanceEvent.CHECK_IN, AttendanceEvent.CHECK_OUT],
+        )
+        self.assertEqual(DailyAttendance.objects.count(), 3)
+        summary = DailyAttendance.objects.get(employee=first)
+        self.assertEqual(timezone.localtime(summary.first_check_in).hour, 9)
+        self.assertEqual(timezone.localtime(summary.last_check_out).hour, 18)
+        self.assertEqual(summary.worked_minutes, 9 * 60)
+        self.assertEqual(DailyAttendance.objects.get(employee=second, attendance_date='2026-04-29').worked_minutes, 8 * 60)
+
+        self.device.refresh_from_db()
+        self.assertEqual(self.device.enterprise, self.enterprise)
+        self.assertEqual(timezone.localtime(self.device.last_seen_at).day, 29)
+
+    def test_inference_continues_from_stored_events(self):
+        self._push(['1\t2026-04-28 09:00:00'])
+        self._push(['1\t2026-04-28 18:00:00'])
+
+        self.assertEqual(
+            list(AttendanceEvent.objects.values_list('event_type', flat=True)),
+            [AttendanceEvent.CHECK_IN, AttendanceEvent.CHECK_OUT],
+        )
+        self.assertEqual(DailyAttendance.objects.get().worked_minutes, 9 * 60)
+
+    def test_query_count_does_not_grow_with_batch_size(self):
+        def push(day, count):
+            rows = [f'{i % 3 + 1}\t2026-05-{day:02d} {9 + i // 3:02d}:00:00' for i in range(count)]
+            with CaptureQueriesContext(connection) as queries:
+                self._push(rows)
+            return len(queries.captured_queries)
+
+        self.assertEqual(push(1, 6), push(2, 30))
+
+    def test_repeated_push_is_skipped(self):
+        rows = ['1\t2026-04-28 09:00:00', '1\t2026-04-28 18:00:00', '1\t2026-04-28 18:00:00']
+        self._push(rows)
+        summary = DailyAttendance.objects.get()
+
+        with CaptureQueriesContext(connection) as queries:
+            self._push(rows[:2])
+        self.assertEqual(
+            list(AttendanceEvent.objects.values_list('event_type', flat=True)),
+            [AttendanceEvent.CHECK_IN, AttendanceEvent.CHECK_OUT],
+        )
+        self.assertFalse(any('attendance_dailyattendance' in query['sql'] for query in queries.captured_queries))
+        self.assertEqual(DailyAttendance.objects.get().updated_at, summary.updated_at)
+
+    def test_dedupe_command_removes_historical_duplicates(self):
+        employee = self.employees[0]
+        event_time = timezone.make_aware(datetime(2026, 4, 28, 9, 0))
+        payload = {'SN': 'DEVICE-01', 'PIN': '1', 'timestamp': '2026-04-28 09:00:00'}
+        first = AttendanceEvent.objects.create(
+            employee=employee, event_type=AttendanceEvent.CHECK_IN, event_time=event_time,
+            device_serial='DEVICE-01', raw_payload=payload,
+        )
+        # The legacy path inferred a check-out for the re-uploaded row
+        AttendanceEvent.objects.create(
+            employee=employee, event_type=AttendanceEvent.CHECK_OUT, event_time=event_time,
+            device_serial='DEVICE-01', raw_payload=payload,
+        )
+        AttendanceEvent.objects.create(employee=employee, event_type=AttendanceEvent.CHECK_OUT,
+                                       event_time=event_time, source='manual')
+
+        call_command('dedupe_attendance_events', batch_size=1, stdout=StringIO())
+
+        self.assertEqual(AttendanceEvent.objects.filter(source='device').get(), first)
+        self.assertEqual(AttendanceEvent.objects.count(), 2)
+        self.assertIsNotNone(AttendanceEvent.objects.get(pk=first.pk).fingerprint)
+        self.assertEqual(DailyAttendance.objects.get().last_check_out, event_time)
+
+        self._push(['1\t2026-04-28 09:00:00'])
+        self.assertEqual(AttendanceEvent.objects.count(), 2)
+
+
+class IncrementalSummaryPropertyTests(TestCase):
+    """
+    Randomised check (seeded, so failures reproduce) that a summary kept up
+    to date punch by punch always equals a rebuild from the day's events.
+    """
+    FIELDS = [
+        'first_check_in', 'last_check_out', 'first_ot_in', 'last_ot_out', 'worked_minutes', 'present',
+        'last_event_type', 'last_event_time', 'break_duration', 'open_break_start', 'attendance_date_bs',
+        'scheduled_arrival', 'scheduled_departure', 'late_seconds', 'early_seconds',
+    ]
+
+    def setUp(self):
+        self.enterprise = Enterprise.objects.create(name='Test Enterprise')
+        self.employee = Employee.objects.create(employee_code='1', name='Alice Example', enterprise=self.enterprise,
+                                                is_hourly_wage=False)
+        self.day = date(2026, 3, 2)
+        self.start = timezone.make_aware(datetime(2026, 3, 2, 6, 0))
+        # Open days are measured up to "now"; pin it so both sides agree
+        patcher = mock.patch('django.utils.timezone.now', return_value=self.start + timedelta(hours=17))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _values(self, summary):
+        return {field: getattr(summary, field) for field in self.FIELDS}
+
+    def _assert_matches_rebuild(self, message):
+        events = list(AttendanceEvent.objects.filter(employee=self.employee).order_by('event_time', 'id'))
+        expected = DailyAttendance(employee=self.employee, attendance_date=self.day)
+        expected.scheduled_arrival, expected.scheduled_departure = services._schedule_datetimes(self.employee, self.day)
+        _fill_daily_attendance(expected, events)
+        stored = DailyAttendance.objects.get(employee=self.employee, attendance_date=self.day)
+        self.assertEqual(self._values(stored), self._values(expected), message)
+
+    def _punch_times(self, rng, count):
+        # Mostly in order (ties included), now and then a late upload of an earlier punch
+        minute = 0
+        for _ in range(count):
+            if rng.random() < 0.8:
+                minute += rng.randint(0, 90)
+                yield self.start + timedelta(minutes=minute)
+            else:
+                yield self.start + timedelta(minutes=rng.randint(0, minute), seconds=rng.randint(0, 59))
+
+    def _reset(self):
+        AttendanceEvent.objects.all().delete()
+        DailyAttendance.objects.all().delete()
+
+    def test_single_punches_agree_with_rebuild(self):
+        rng = random.Random(1013)
+        with mock.patch('attendance.services.rebuild_daily_attendance_summary',
+                        wraps=services.rebuild_daily_attendance_summary) as rebuild:
+            steps = 0
+            for case in range(120):
+                self._reset()
+                for step, event_time in enumerate(self._punch_times(rng, rng.randint(1, 12))):
+                    record_device_event(self.employee, rng.randrange(6), event_time, source='manual')
+                    self._assert_matches_rebuild(f'case {case}, step {step}')
+                    steps += 1
+        # The comparison means little unless most punches took the folding path
+        self.assertLess(rebuild.call_count, steps / 2)
+
+    def test_batches_agree_with_rebuild(self):
+        rng = random.Random(2013)
+        for case in range(60):
+            self._reset()
+            for batch in range(rng.randint(1, 4)):
+                rows = [
+                    {'SN': 'DEVICE-01', 'PIN': '1', 'status': str(rng.randrange(6)),
+                     'timestamp': timezone.localtime(event_time).strftime('%Y-%m-%d %H:%M:%S')}
+                    for event_time in self._punch_times(rng, rng.randint(1, 6))
+                ]
+                ingest_punches(rows)
+                self._assert_matches_rebuild(f'case {case}, batch {batch}')
+
+    def test_deleting_an_event_rebuilds(self):
+        for minutes, event_type in ((0, AttendanceEvent.CHECK_IN), (60, AttendanceEvent.BREAK_OUT),
+                                    (90, AttendanceEvent.BREAK_IN), (480, AttendanceEvent.CHECK_OUT)):
+            record_device_event(self.employee, event_type, self.start + timedelta(minutes=minutes), source='manual')
+        self.assertEqual(DailyAttendance.objects.get().worked_minutes, 450)
+
+        event = AttendanceEvent.objects.get(event_type=AttendanceEvent.BREAK_IN)
+        AttendanceEventAdmin(AttendanceEvent, AdminSite()).delete_model(None, event)
+        self._assert_matches_rebuild('after delete')
+
+
+class AttendanceEventBrokerTests(TestCase):
+    def setUp(self):
+        self.broker = ssm.MemoryBroker(history_size=5)
+        ssm.set_broker(self.broker)
+        self.addCleanup(ssm.set_broker, None)
+        self.enterprise = Enterprise.objects.create(name='Test Enterprise')
+        self.branch = Branch.objects.create(name='Main', enterprise=self.enterprise)
+        self.user = get_user_model().objects.create_user(email='admin@example.com', name='Admin', password='pass12345')
+        Employee.objects.create(name='Admin', employee_code='A1', user=self.user, enterprise=self.enterprise, role='Admin')
+
+    def _publish(self, number, enterprise_id=1, branch_id=None):
+        ssm.publish_event({'n': number}, enterprise_id=enterprise_id, branch_id=branch_id)
+
+    def _drain(self, subscription):
+        numbers = []
+        while (event := subscription.get(timeout=0)) is not None:
+            numbers.append(json.loads(event.data)['n'])
+        return numbers
+
+    def test_subscribers_only_see_their_tenant(self):
+        enterprise_wide = ssm.subscribe(enterprise_id=1)
+        one_branch = ssm.subscribe(enterprise_id=1, branch_id=10)
+        self._publish(1, branch_id=10)
+        self._publish(2, branch_id=11)
+        self._publish(3, enterprise_id=2, branch_id=10)
+
+        self.assertEqual(self._drain(enterprise_wide), [1, 2])
+        self.assertEqual(self._drain(one_branch), [1])
+
+    def test_slow_client_keeps_the_newest_events(self):
+        subscription = self.broker.subscribe(enterprise_id=1, buffer_size=3)
+        for number in range(5):
+            self._publish(number)
+        self.assertEqual(self._drain(subscription), [2, 3, 4])
+        self.assertEqual(subscription.dropped, 2)
+
+    def test_reconnect_replays_missed_events(self):
+        subscription = ssm.subscribe(enterprise_id=1)
+        self._publish(1)
+        last_seen = subscription.get(timeout=0).id
+        ssm.unsubscribe(subscription)
+        self._publish(2)
+        self._publish(3, enterprise_id=2)
+
+        self.assertEqual(self._drain(ssm.subscribe(enterprise_id=1, last_event_id=last_seen)), [2])
+        # Ids that have left the history replay nothing
+        self.assertEqual(self._drain(ssm.subscribe(enterprise_id=1, last_event_id='gone')), [])
+
+    def _ticket(self):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        response = client.post('/attendance/api/events/ticket/')
+        self.assertEqual(response.status_code, 201)
+        return response.data['ticket']
+
+    def test_stream_tickets_are_single_use_and_short_lived(self):
+        cache.clear()
+        # The access token itself is no longer accepted in the URL
+        token = str(AccessToken.for_user(self.user))
+        self.assertEqual(self.client.get('/attendance/api/events/stream/', {'token': token}).status_code, 401)
+        self.assertEqual(self.client.get('/attendance/api/events/stream/', {'ticket': 'forged'}).status_code, 401)
+
+        ticket = self._ticket()
+        response = self.client.get('/attendance/api/events/stream/', {'ticket': ticket})
+        self.assertEqual(response.status_code, 200)
+        response.close()
+        self.assertEqual(self.client.get('/attendance/api/events/stream/', {'ticket': ticket}).status_code, 401)
+
+        with override_settings(ATTENDANCE_SSE_TICKET_MAX_AGE=-1):
+            self.assertEqual(self.client.get('/attendance/api/events/stream/', {'ticket': self._ticket()}).status_code, 401)
+
+    @override_settings(ATTENDANCE_SSE_KEEPALIVE=0.01)
+    def test_stream_sends_keep_alives_and_tenant_events(self):
+        self.assertEqual(self.client.get('/attendance/api/events/stream/').status_code, 401)
+
+        response = self.client.get('/attendance/api/events/stream/', {'ticket': self._ticket(), 'branch_id': self.branch.id})
+        stream = iter(response.streaming_content)
+        self.assertEqual(next(stream), b'retry: 3000\n\n')
+        self.assertEqual(next(stream), b': keep-alive\n\n')
+
+        employee = Employee.objects.create(name='Bob', employee_code='B1', enterprise=self.enterprise, branch=self.branch)
+        record_device_event(employee, AttendanceEvent.CHECK_IN, timezone.now(), source='manual')
+        chunk = next(stream).decode()
+        self.assertTrue(chunk.startswith('id: '))
+        self.assertEqual(json.loads(chunk.split('data: ', 1)[1])['employee_id'], employee.id)
+        response.close()
+        self.assertFalse(self.broker._subscriptions)
+
+
+class DashboardCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.enterprise = Enterprise.objects.create(name='Test Enterprise')
+        self.branch = Branch.objects.create(name='Main', enterprise=self.enterprise)
+        self.other_branch = Branch.objects.create(name='Annex', enterprise=self.enterprise)
+        user = get_user_model().objects.create_user(email='admin@example.com', name='Admin', password='pass12345')
+        Employee.objects.create(name='Admin', employee_code='A1', user=user, enterprise=self.enterprise, role='Admin')
+        self.employee = Employee.objects.create(
+            name='Bob', employee_code='B1', enterprise=self.enterprise, branch=self.branch,
+        )
+        self.client.force_authenticate(user)
+
+    def _stats(self, **params):
+        return self.client.get('/attendance/api/dashboard/stats/', params).json()['stats']
+
+    def test_punch_invalidates_the_cached_stats(self):
+        self.assertEqual(self._stats()['present_today'], 0)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self._stats()['present_today'], 0)
+        self.assertFalse([query for query in queries.captured_queries if 'attendance_dailyattendance' in query['sql']])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            record_device_event(self.employee, AttendanceEvent.CHECK_IN, timezone.now(), source='manual')
+        self.assertEqual(self._stats()['present_today'], 1)
+
+    def test_punch_leaves_other_scopes_warm(self):
+        today = timezone.localdate()
+        keys = {
+            branch_id: dashboard_cache.dashboard_cache_key('stats', self.enterprise.id, today, branch_id)
+            for branch_id in (None, self.branch.id, self.other_branch.id)
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            record_device_event(self.employee, AttendanceEvent.CHECK_IN, timezone.now(), source='manual')
+
+        self.assertNotEqual(dashboard_cache.dashboard_cache_key('stats', self.enterprise.id, today), keys[None])
+        self.assertNotEqual(
+            dashboard_cache.dashboard_cache_key('stats', self.enterprise.id, today, self.branch.id), keys[self.branch.id],
+        )
+        self.assertEqual(
+            dashboard_cache.dashboard_cache_key('stats', self.enterprise.id, today, self.other_branch.id),
+            keys[self.other_branch.id],
+        )
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_concurrent_misses_compute_once(self):
+        started, release, calls = threading.Event(), threading.Event(), []
+
+        def compute():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return {'value': len(calls)}
+
+        results = []
+        first = threading.Thread(target=lambda: results.append(dashboard_cache.get_or_compute('key', compute)))
+        first.start()
+        started.wait(5)
+        second = threading.Thread(target=lambda: results.append(dashboard_cache.get_or_compute('key', compute)))
+        second.start()
+        release.set()
+        first.join(5)
+        second.join(5)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{'value': 1}, {'value': 1}])
+
+
+class ScheduledLatenessTests(TestCase):
+    def setUp(self):
+        self.enterprise = Enterprise.objects.create(name='Test Enterprise')
+        self.department = Department.objects.create(name='Ops', enterprise=self.enterprise)
+        self.employee = Employee.objects.create(
+            employee_code='1', name='Alice Example', enterprise=self.enterprise, department=self.department,
+            is_hourly_wage=False,
+        )
+        self.day = date(2026, 3, 2)
+
+    def _at(self, hour, minute=0):
+        return timezone.make_aware(datetime(2026, 3, 2, hour, minute))
+
+    def _work(self, employee, check_in, check_out):
+        record_device_event(employee, AttendanceEvent.CHECK_IN, check_in, source='manual')
+        return record_device_event(employee, AttendanceEvent.CHECK_OUT, check_out, source='manual')[0]
+
+    def test_summary_stores_schedule_and_lateness(self):
+        summary = self._work(self.employee, self._at(9, 20), self._at(17, 30))
+        summary.refresh_from_db()
+        self.assertEqual(summary.scheduled_arrival, self._at(9))
+        self.assertEqual(summary.scheduled_departure, self._at(18))
+        self.assertEqual((summary.late_seconds, summary.early_seconds), (20 * 60, 30 * 60))
+
+    def test_reports_read_the_stored_columns(self):
+        punctual = Employee.objects.create(employee_code='2', name='Bob', enterprise=self.enterprise,
+                                           is_hourly_wage=False)
+        self._work(self.employee, self._at(9, 20), self._at(18))
+        self._work(punctual, self._at(8, 55), self._at(17))
+
+        with self.assertNumQueries(2):
+            late = services.get_late_arrivals(self.day, enterprise_id=self.enterprise.id)
+            early = services.get_early_departures(self.day, enterprise_id=self.enterprise.id)
+        self.assertEqual([(row['employee'], row['late_seconds']) for row in late], [(self.employee, 1200)])
+        self.assertEqual([(row['employee'], row['early_seconds']) for row in early], [(punctual, 3600)])
+
+    def test_schedule_changes_refresh_summaries(self):
+        self._work(self.employee, self._at(9, 20), self._at(17, 30))
+
+        self.employee.arrival_time = time(9, 30)
+        self.employee.save()
+        summary = DailyAttendance.objects.get()
+        self.assertEqual((summary.scheduled_arrival, summary.late_seconds), (self._at(9, 30), 0))
+
+        self.employee.departure_time = time(17)
+        self.employee.save(update_fields=['departure_time'])
+        summary.refresh_from_db()
+        self.assertEqual((summary.scheduled_departure, summary.early_seconds), (self._at(17), 0))
+
+        with mock.patch('attendance.signals.refresh_attendance_schedules') as refresh:
+            self.department.save()
+            self.department.arrival_time = time(8)
+            self.department.save()
+        refresh.assert_called_once_with([self.employee.id])
+
+
+class MonthlySummaryTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.enterprise = Enterprise.objects.create(name='Test Enterprise')
+        user = get_user_model().objects.create_user(email='admin@example.com', name='Admin', password='pass12345')
+        Employee.objects.create(name='Admin', employee_code='A1', user=user, enterprise=self.enterprise, role='Admin')
+        self.client.force_authenticate(user)
+
+    def _day(self, employee, day, arrival_minute):
+        check_in = timezone.make_aware(datetime(2026, 3, day, 9, arrival_minute))
+        record_device_event(employee, AttendanceEvent.CHECK_IN, check_in, source='manual')
+        record_device_event(employee, AttendanceEvent.CHECK_OUT, check_in + timedelta(hours=8), source='manual')
+
+    def test_totals_only_the_requested_page(self):
+        employees = [
+            Employee.objects.create(name=f'Employee {i:02d}', employee_code=f'E{i}', enterprise=self.enterprise,
+                                    is_hourly_wage=False)
+            for i in range(35)
+        ]
+        self._day(employees[0], 2, 0)
+        self._day(employees[0], 3, 15)
+        self._day(employees[34], 2, 5)
+
+        with CaptureQueriesContext(connection) as queries:
+            first = self.client.get('/attendance/api/reports/monthly-summary/', {'year': 2026, 'month': 3}).json()
+        self.assertEqual(first['count'], 36)
+        self.assertEqual(len(first['summary']), 30)
+        row = next(row for row in first['summary'] if row['employee']['id'] == employees[0].id)
+        self.assertEqual((row['present_days'], row['late_days'], row['absent_days']), (2, 1, 29))
+        self.assertEqual(row['worked_minutes'], 2 * 8 * 60)
+        self.assertEqual(
+            len([query for query in queries.captured_queries if 'attendance_dailyattendance' in query['sql']]), 1,
+        )
+
+        second = self.client.get(
+            '/attendance/api/reports/monthly-summary/', {'year': 2026, 'month': 3, 'page': 2},
+        ).json()
+        row = next(row for row in second['summary'] if row['employee']['id'] == employees[34].id)
+        self.assertEqual((row['present_days'], row['late_days']), (1, 1))
+
+    def test_detailed_matrix_builds_only_the_page(self):
+        branch = Branch.objects.create(name='Main', enterprise=self.enterprise)
+        other = Branch.objects.create(name='Annex', enterprise=self.enterprise)
+        employees = [
+            Employee.objects.create(name=f'Employee {i:02d}', employee_code=f'E{i}', enterprise=self.enterprise,
+                                    branch=branch, is_hourly_wage=False)
+            for i in range(31)
+        ]
+        outsider = Employee.objects.create(name='Outsider', employee_code='X1', enterprise=self.enterprise,
+                                           branch=other, is_hourly_wage=False)
+        self._day(employees[0], 2, 0)
+        self._day(outsider, 2, 0)
+        break_out = timezone.make_aware(datetime(2026, 3, 2, 12, 0))
+        record_device_event(employees[0], AttendanceEvent.BREAK_OUT, break_out, source='manual')
+        record_device_event(employees[0], AttendanceEvent.BREAK_IN, break_out + timedelta(minutes=30), source='manual')
+
+        with mock.patch('attendance.views.DailyAttendanceSerializer', wraps=DailyAttendanceSerializer) as serializer:
+            data = self.client.get('/attendance/api/reports/monthly-summary-detailed/', {
+                'year': 2026, 'month': 3, 'branch_id': branch.id,
+            }).json()
+        self.assertEqual(data['count'], 31)
+        self.assertEqual(len(data['rows']), 30)
+        # Only employees[0] of the page has a summary; the outsider is not serialized
+        self.assertEqual(serializer.call_count, 1)
+        day = data['rows'][0]['days'][1]
+        self.assertTrue(day['present'])
+        self.assertEqual(len(day['break_sessions']), 1)
+
+    def test_detailed_matrix_csv_export_streams_every_employee(self):
+        employees = [
+            Employee.objects.create(name=f'Employee {i:02d}', employee_code=f'E{i}', enterprise=self.enterprise,
+                                    is_hourly_wage=False)
+            for i in range(3)
+        ]
+        self._day(employees[1], 2, 30)
+
+        with mock.patch('attendance.views.MonthlySummaryDetailedAPIView.export_chunk_size', 2):
+            response = self.client.get('/attendance/api/reports/monthly-summary-detailed/', {
+                'year': 2026, 'month': 3, 'format': 'csv',
+            })
+            lines = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(lines[0][:3], ['employee_code', 'employee_name', 'attendance_date_ad'])
+        # Admin plus three employees, 31 days each
+        self.assertEqual(len([line for line in lines[1:] if len(line) > 2]), 4 * 31)
+        late = next(line for line in lines if line[:1] == ['E1'] and line[2] == '2026-03-02')
+        self.assertEqual((late[4], late[10]), ('True', '30.0'))
+        self.assertIn(['present_days', '1'], lines)
+
+
+class TimeWindowTests(TestCase):
+    """Local-day filters select the same rows as ``__date`` and can range-scan ``(employee, event_time)``."""
+
+    @classmethod
+    def setUpTestData(cls):
+        enterprise = Enterprise.objects.create(name='Test Enterprise')
+        cls.employees = Employee.objects.bulk_create([
+            Employee(name=f'Employee {i}', employee_code=f'E{i}', enterprise=enterprise, is_hourly_wage=False)
+            for i in range(40)
+        ])
+        start = timezone.make_aware(datetime(2026, 3, 1))
+        AttendanceEvent.objects.bulk_create([
+            AttendanceEvent(employee=employee, event_type=event_type,
+                            event_time=start + timedelta(days=day, hours=hours), source='manual')
+            for employee in cls.employees
+            for day in range(30)
+            # The last punch falls a minute before local midnight
+            for event_type, hours in ((AttendanceEvent.CHECK_IN, 9), (AttendanceEvent.CHECK_OUT, 23.99))
+        ])
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE attendance_attendanceevent')
+
+    def test_bounds_are_half_open_local_days(self):
+        start, end = local_day_bounds(date(2026, 3, 2), date(2026, 3, 3))
+        self.assertEqual(timezone.localtime(start), timezone.make_aware(datetime(2026, 3, 2)))
+        self.assertEqual(timezone.localtime(end), timezone.make_aware(datetime(2026, 3, 4)))
+        self.assertEqual(local_day_bounds(date(2026, 3, 2)), local_day_bounds(date(2026, 3, 2), date(2026, 3, 2)))
+
+    def test_matches_date_lookup(self):
+        for first, last in ((date(2026, 3, 2), None), (date(2026, 3, 5), date(2026, 3, 9))):
+            expected = AttendanceEvent.objects.filter(event_time__date__range=(first, last or first))
+            actual = AttendanceEvent.objects.filter(within_local_days(first, last))
+            self.assertEqual(set(actual.values_list('id', flat=True)), set(expected.values_list('id', flat=True)))
+            self.assertTrue(actual.exists())
+
+    def _uses_event_time_range(self, queryset):
+        plan = queryset.explain()
+        if connection.vendor == 'postgresql':
+            return 'Index Cond' in plan and 'event_time >=' in plan
+        return 'event_time>?' in plan
+
+    @unittest.skipUnless(connection.vendor in ('postgresql', 'sqlite'), 'EXPLAIN output is backend-specific')
+    def test_plans_range_scan_the_employee_index(self):
+        employee = self.employees[7]
+        window = AttendanceEvent.objects.filter(within_local_days(date(2026, 3, 2)), employee=employee)
+        self.assertTrue(self._uses_event_time_range(window))
+        many = AttendanceEvent.objects.filter(
+            within_local_days(date(2026, 3, 2), date(2026, 3, 8)), employee_id__in=[e.id for e in self.employees[:5]],
+        )
+        self.assertTrue(self._uses_event_time_range(many))
+        # What the window replaces: the column is wrapped in a conversion, so only employee_id is searched
+        self.assertFalse(self._uses_event_time_range(
+            AttendanceEvent.objects.filter(event_time__date=date(2026, 3, 2), employee=employee)
+        ))
+
+
+class DateConversionTests(TestCase):
+    def test_known_dates(self):
+        self.assertEqual(ad_to_bs(date(2023, 5, 15)), (2080, 2, 1))
+        self.assertEqual(date_utils.bs_to_ad(2080, 2, 1), date(2023, 5, 15))
+        self.assertEqual(ad_to_bs(datetime(2017, 2, 11, 23, 59)), (2073, 10, 29))
+
+    def test_round_trip_and_batch_agree(self):
+        days = [date(2000, 1, 1) + timedelta(days=offset) for offset in range(0, 30 * 365, 7)]
+        converted = date_utils.ad_to_bs_many(days)
+        self.assertEqual(converted, [ad_to_bs(day) for day in days])
+        self.assertEqual(date_utils.bs_to_ad_many(converted), days)
+        # Consecutive days step through each BS month one day at a time
+        month = date_utils.ad_to_bs_many([date(2025, 4, 1) + timedelta(days=offset) for offset in range(62)])
+        for previous, current in zip(month, month[1:]):
+            self.assertTrue(current[2] == previous[2] + 1 or current[2] == 1, (previous, current))
+
+    @unittest.skipUnless(date_utils._PACKAGE_CALENDAR_DATA, 'nepali-date-utils is not installed')
+    def test_matches_nepali_date_utils(self):
+        from nepali_date_utils import converter
+
+        rng = random.Random(2020)
+        for _ in range(500):
+            day = date.fromordinal(rng.randint(date(1925, 1, 1).toordinal(), date(2035, 1, 1).toordinal()))
+            expected = tuple(int(part) for part in converter.ad_to_bs(day.strftime('%Y/%m/%d')).split('/'))
+            self.assertEqual(ad_to_bs(day), expected, day)
+
+    def test_rejects_invalid_and_out_of_range_dates(self):
+        with self.assertRaises(ValueError):
+            date_utils.bs_to_ad(2080, 13, 1)
+        with self.assertRaises(ValueError):
+            date_utils.bs_to_ad(2080, 1, 33)
+        with self.assertRaises(ValueError):
+            ad_to_bs(date(1800, 1, 1))
@@ -0,0 +1,28 @@
+from __future__ import annotations
+
+from datetime import date, datetime, timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+
+# Local calendar days as half-open ranges of aware datetimes.
+#
+# ``event_time__date=day`` converts every row's timestamp to the local zone
+# before comparing, so no index on ``event_time`` can serve it. Comparing the
+# raw column against ``[start of day, start of next day)`` gives the same rows
+# and lets ``(employee, event_time)`` be scanned as a range.
+
+
+def local_day_bounds(first_date: date, last_date: date | None = None) -> tuple[datetime, datetime]:
+    """Aware ``[start, end)`` covering the local days ``first_date`` to ``last_date`` (default: the same day)."""
+    last_date = first_date if last_date is None else last_date
+    current_tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.combine(first_date, datetime.min.time()), current_tz)
+    end = timezone.make_aware(datetime.combine(last_date + timedelta(days=1), datetime.min.time()), current_tz)
+    return start, end
+
+
+def within_local_days(first_date: date, last_date: date | None = None, field: str = 'event_time') -> Q:
+    """Filter for ``field`` falling on the local days ``first_date`` to ``last_date``."""
+    start, end = local_day_bounds(first_date, last_date)
+    return Q(**{f'{field}__gte': start, f'{field}__lt': end})
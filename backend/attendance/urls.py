@@ -11,6 +11,7 @@ from .views import (
     IClockCDataView,
     IClockGetRequestView,
     sse_events_view,
+    EventStreamTicketAPIView,
     LateArrivalsAPIView,
     EarlyDeparturesAPIView,
 )
@@ -49,6 +50,7 @@ urlpatterns = [
             __import__('attendance.views', fromlist=['MonthlySummaryDetailedAPIView']).MonthlySummaryDetailedAPIView.as_view(),
             name='monthly_summary_detailed'),
     
+    path('api/events/ticket/', EventStreamTicketAPIView.as_view(), name='events_ticket'),
     path('api/events/stream/', sse_events_view, name='events_stream'),
     path('', include('device.iclock_urls')),
 ]
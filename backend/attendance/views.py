@@ -1,9 +1,9 @@
 from __future__ import annotations
 
 from datetime import datetime, date, timedelta
+from django.db.models import Count, Q, Sum
 from django.http import HttpRequest, HttpResponse
 from django.utils import timezone
-from django.core.cache import cache
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
 from rest_framework.exceptions import UnsupportedMediaType
@@ -13,8 +13,17 @@ from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.parsers import BaseParser, MultiPartParser, FormParser, JSONParser
 from django.http import StreamingHttpResponse
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.signing import BadSignature, TimestampSigner
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
 import json
+import secrets
 from .ssm import subscribe, unsubscribe
+from alltransactions.exports import EXPORT_FORMATS, ReportExportMixin, export_report
 from enterprise.permissions import IsAdminRole
 
 from .services import (
@@ -23,15 +32,14 @@ from .services import (
     build_dashboard_rows_for_employees,
     build_dashboard_stats_fast,
     get_filtered_employees_queryset,
-    infer_next_event_code,
-    parse_device_timestamp,
-    parse_event_code,
     register_biometric_device,
-    record_device_event,
-    resolve_employee,
     get_late_arrivals,
     get_early_departures,
+    _build_break_sessions,
 )
+from .time_window import within_local_days
+from .dashboard_cache import cached_dashboard
+from .ingest import ingest_punches
 from .serializers import DailyAttendanceSerializer
 from .models import DailyAttendance, AttendanceEvent
 from enterprise.models import Employee, Enterprise, Branch, Department
@@ -195,37 +203,45 @@ class DashboardAPIView(APIView):
         if department_id and not Department.objects.filter(id=department_id, enterprise=enterprise).exists():
             return Response({'error': 'Department not found for your enterprise'}, status=404)
 
-        paginator = self.pagination_class()
-        employees = get_filtered_employees_queryset(
-            branch_id=branch_id,
-            department_id=department_id,
-            enterprise_id=enterprise.id,
-        ).select_related('enterprise', 'branch', 'department', 'user')
-        page_employees = paginator.paginate_queryset(employees, request, view=self)
-        page_rows = build_dashboard_rows_for_employees(
-            page_employees,
-            attendance_date=timezone.localdate(),
-        )
-        serialized_rows = [_serialize_attendance_row(row) for row in page_rows]
-        return Response({
-            'attendance_rows': serialized_rows,
-            'attendance_date': str(timezone.localdate()),
-            'attendance_date_ad': _format_ad_bs(timezone.localdate())[0],
-            'attendance_date_bs': _format_ad_bs(timezone.localdate())[1],
-            'stats': build_dashboard_stats_fast(
-                attendance_date=timezone.localdate(),
+        attendance_date = timezone.localdate()
+
+        def build_payload():
+            paginator = self.pagination_class()
+            employees = get_filtered_employees_queryset(
                 branch_id=branch_id,
                 department_id=department_id,
                 enterprise_id=enterprise.id,
-            ),
-            'pagination': {
-                'count': paginator.page.paginator.count,
-                'next': paginator.get_next_link(),
-                'previous': paginator.get_previous_link(),
-                'page': paginator.page.number,
-                'page_size': self.pagination_class.page_size,
-            },
-        })
+            ).select_related('enterprise', 'branch', 'department', 'user')
+            page_employees = paginator.paginate_queryset(employees, request, view=self)
+            page_rows = build_dashboard_rows_for_employees(
+                page_employees,
+                attendance_date=attendance_date,
+            )
+            serialized_rows = [_serialize_attendance_row(row) for row in page_rows]
+            return {
+                'attendance_rows': serialized_rows,
+                'attendance_date': str(attendance_date),
+                'attendance_date_ad': _format_ad_bs(attendance_date)[0],
+                'attendance_date_bs': _format_ad_bs(attendance_date)[1],
+                'stats': build_dashboard_stats_fast(
+                    attendance_date=attendance_date,
+                    branch_id=branch_id,
+                    department_id=department_id,
+                    enterprise_id=enterprise.id,
+                ),
+                'pagination': {
+                    'count': paginator.page.paginator.count,
+                    'next': paginator.get_next_link(),
+                    'previous': paginator.get_previous_link(),
+                    'page': paginator.page.number,
+                    'page_size': self.pagination_class.page_size,
+                },
+            }
+
+        return Response(cached_dashboard(
+            'dashboard', enterprise.id, attendance_date, build_payload,
+            branch_id=branch_id, department_id=department_id, variant=request.get_full_path(),
+        ))
 
 
 class AttendanceRowsAPIView(APIView):
@@ -299,18 +315,25 @@ class DashboardStatsAPIView(APIView):
         if department_id and not Department.objects.filter(id=department_id, enterprise=enterprise).exists():
             return Response({'error': 'Department not found for your enterprise'}, status=404)
 
-        stats = build_dashboard_stats_fast(
-            attendance_date=timezone.localdate(),
-            branch_id=branch_id,
-            department_id=department_id,
-            enterprise_id=enterprise.id,
-        )
-        return Response({
-            'attendance_date': str(timezone.localdate()),
-            'attendance_date_ad': _format_ad_bs(timezone.localdate())[0],
-            'attendance_date_bs': _format_ad_bs(timezone.localdate())[1],
-            'stats': stats,
-        })
+        attendance_date = timezone.localdate()
+
+        def build_payload():
+            return {
+                'attendance_date': str(attendance_date),
+                'attendance_date_ad': _format_ad_bs(attendance_date)[0],
+                'attendance_date_bs': _format_ad_bs(attendance_date)[1],
+                'stats': build_dashboard_stats_fast(
+                    attendance_date=attendance_date,
+                    branch_id=branch_id,
+                    department_id=department_id,
+                    enterprise_id=enterprise.id,
+                ),
+            }
+
+        return Response(cached_dashboard(
+            'dashboard-stats', enterprise.id, attendance_date, build_payload,
+            branch_id=branch_id, department_id=department_id,
+        ))
 
 
 class HierarchicalDashboardAPIView(APIView):
@@ -324,21 +347,17 @@ class HierarchicalDashboardAPIView(APIView):
             return Response({'error': 'No enterprise found for this user'}, status=403)
 
         attendance_date = timezone.localdate()
-        cache_key = f'hierarchical_dashboard:{enterprise.id}:{attendance_date.isoformat()}'
-        cached_payload = cache.get(cache_key)
-        if cached_payload is not None:
-            return Response(cached_payload)
 
-        dashboard_context = self._build_dashboard_context(enterprise, attendance_date)
+        def build_payload():
+            dashboard_context = self._build_dashboard_context(enterprise, attendance_date)
+            return {
+                'enterprise': self._build_enterprise_view(enterprise, attendance_date, dashboard_context),
+                'attendance_date': str(attendance_date),
+                'attendance_date_ad': _format_ad_bs(attendance_date)[0],
+                'attendance_date_bs': _format_ad_bs(attendance_date)[1],
+            }
 
-        response_payload = {
-            'enterprise': self._build_enterprise_view(enterprise, attendance_date, dashboard_context),
-            'attendance_date': str(attendance_date),
-            'attendance_date_ad': _format_ad_bs(attendance_date)[0],
-            'attendance_date_bs': _format_ad_bs(attendance_date)[1],
-        }
-        cache.set(cache_key, response_payload, timeout=15)
-        return Response(response_payload)
+        return Response(cached_dashboard('hierarchical', enterprise.id, attendance_date, build_payload))
 
     def _get_user_enterprise(self, request):
         return _resolve_user_enterprise(request.user)
@@ -572,18 +591,6 @@ class PlainTextParser(BaseParser):
             return data
 
 
-def _pick_value(payload: dict, keys: list[str], default=None):
-    for key in keys:
-        if key not in payload:
-            continue
-        value = payload[key]
-        if isinstance(value, (list, tuple)):
-            value = value[0] if value else None
-        if value not in ('', None):
-            return value
-    return default
-
-
 def _parse_iclock_row_format(raw_str: str) -> dict:
     """Parse iClock tab-separated row format.
 
@@ -693,7 +700,6 @@ class IClockCDataView(APIView):
         if isinstance(raw_body, bytes):
             raw_body = raw_body.decode('utf-8', errors='ignore')
         raw_body = str(raw_body).strip()
-        print(raw_body)
 
         try:
             payload = request.data if hasattr(request, 'data') else _parse_request_data(request)
@@ -722,51 +728,8 @@ class IClockCDataView(APIView):
         else:
             records = [base_payload]
 
-        recorded_count = 0
-        for record_payload in records:
-            sn = _pick_value(record_payload, ['SN', 'sn', 'device_sn', 'DeviceSN'], 'unknown')
-            employee_identifier = _pick_value(
-                record_payload,
-                ['PIN', 'pin', 'UserID', 'userid', 'USERID', 'EMPID', 'empid', 'employee_id', 'device_id', 'CardNo', 'cardno', 'ID', 'id'],
-            )
-            event_code = parse_event_code(
-                _pick_value(record_payload, ['event_code', 'event', 'type', 'eventtype', 'eventType', 'attendance_type', 'status'])
-            )
-            event_time = parse_device_timestamp(
-                _pick_value(record_payload, ['timestamp', 'time', 'datetime', 'date_time', 'punch_time', 'punchTime'])
-            )
-
-            if sn:
-                register_biometric_device(sn, last_seen_at=event_time)
-
-            employee = resolve_employee(employee_identifier, device_serial=sn)
-            if employee is None:
-                continue
-
-            if event_code is None:
-                event_code = infer_next_event_code(employee, event_time)
-
-            if sn:
-                device = register_biometric_device(
-                    sn,
-                    enterprise=getattr(employee, 'enterprise', None),
-                    branch=getattr(employee, 'branch', None),
-                    last_seen_at=event_time,
-                )
-                if device is not None and device.enterprise_id is None and employee.enterprise_id is not None:
-                    device.enterprise = employee.enterprise
-                    device.branch = employee.branch
-                    device.save(update_fields=['enterprise', 'branch'])
-
-
-            summary, event = record_device_event(
-                employee=employee,
-                event_type=event_code,
-                event_time=event_time,
-                device_serial=str(sn),
-                raw_payload=record_payload,
-            )
-            recorded_count += 1
+        result = ingest_punches(records)
+        logger.info("ATTLOG push from %s: %s", request.GET.get('SN'), result.as_dict())
         return _plain_text_response('OK')
 
 
@@ -782,35 +745,65 @@ class IClockGetRequestView(APIView):
         return _plain_text_response('OK')
 
 
-def _sse_event_stream(request):
-    """Streaming generator for SSE events. Returns event text blocks.
-
-    This is a simple public stream. For production you'd want auth and
-    a more robust broker (Redis, channels, etc.).
-    """
-    q = subscribe()
-
+def _sse_event_stream(subscription, keepalive: float):
+    """Streaming generator for SSE events: event blocks, with a comment line whenever the stream is idle."""
     try:
-        # Keep yielding events from the queue as they arrive
+        yield "retry: 3000\n\n"
         while True:
-            try:
-                data = q.get()
-            except GeneratorExit:
-                break
-            if data is None:
+            event = subscription.get(timeout=keepalive)
+            if event is None:
+                # Keeps proxies from closing an idle connection and lets us
+                # notice clients that went away.
+                yield ": keep-alive\n\n"
                 continue
             # SSE requires lines beginning with 'data: '
-            yield f"data: {data}\n\n"
+            yield f"id: {event.id}\ndata: {event.data}\n\n"
     finally:
-        unsubscribe(q)
+        unsubscribe(subscription)
 
 
-def sse_events_view(request: HttpRequest):
-    # StreamingHttpResponse with the proper SSE content type
-    response = StreamingHttpResponse(_sse_event_stream(request), content_type='text/event-stream')
-    response['Cache-Control'] = 'no-cache'
-    response['X-Accel-Buffering'] = 'no'
-    return response
+STREAM_TICKET_SALT = 'attendance.events.stream'
+
+
+def issue_stream_ticket(user) -> str:
+    """A signed ticket that opens one event stream for ``user``; see ``ATTENDANCE_SSE_TICKET_MAX_AGE``."""
+    return TimestampSigner(salt=STREAM_TICKET_SALT).sign(f'{user.pk}:{secrets.token_urlsafe(8)}')
+
+
+def _ticket_user(ticket: str):
+    max_age = getattr(settings, 'ATTENDANCE_SSE_TICKET_MAX_AGE', 30)
+    try:
+        value = TimestampSigner(salt=STREAM_TICKET_SALT).unsign(ticket, max_age=max_age)
+    except BadSignature:
+        return None
+    # Single use: a ticket read back from a log or the history cannot be replayed
+    if not cache.add(f'attendance:stream-ticket:{value}', 1, timeout=max_age):
+        return None
+    return get_user_model().objects.filter(pk=value.split(':', 1)[0], is_active=True).first()
+
+
+def _sse_user(request: HttpRequest):
+    # EventSource can't set headers, so browsers come with a ?ticket= from
+    # EventStreamTicketAPIView instead of their access token
+    ticket = request.GET.get('ticket')
+    if ticket:
+        return _ticket_user(ticket)
+    try:
+        authenticated = JWTAuthentication().authenticate(request)
+    except (InvalidToken, AuthenticationFailed):
+        return None
+    return authenticated[0] if authenticated else None
+
+
+class EventStreamTicketAPIView(APIView):
+    """Short-lived, single-use ticket for opening ``events/stream/`` with ``?ticket=``."""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        return Response({
+            'ticket': issue_stream_ticket(request.user),
+            'expires_in': getattr(settings, 'ATTENDANCE_SSE_TICKET_MAX_AGE', 30),
+        }, status=status.HTTP_201_CREATED)
 
 
 class LateArrivalsAPIView(APIView):
@@ -833,7 +826,6 @@ class LateArrivalsAPIView(APIView):
         # `dateFormat=bs` when providing Nepali (Bikram Sambat) dates so
         # the backend can convert them to AD for querying.
         date_format = request.query_params.get('dateFormat') or request.query_params.get('date_format')
-        print("Yaha samma", request.query_params.get('attendance_date'), date_format)
         attendance_date = _parse_date_param(request.query_params.get('attendance_date'), date_format=date_format)
 
         branch_id = _parse_optional_int(request.query_params.get('branch_id'))
@@ -847,48 +839,52 @@ class LateArrivalsAPIView(APIView):
             return Response({'error': 'Branch not found for your enterprise'}, status=404)
         if department_id and not Department.objects.filter(id=department_id, enterprise=enterprise).exists():
             return Response({'error': 'Department not found for your enterprise'}, status=404)
-        
-        print("date hai ta", attendance_date, "branch", branch_id, "dept", department_id)
-        
-        late_arrivals = get_late_arrivals(
-            attendance_date=attendance_date,
-            branch_id=branch_id,
-            department_id=department_id,
-            enterprise_id=enterprise.id,
-        )
 
-        paginator = self.pagination_class()
-        page_arrivals = paginator.paginate_queryset(late_arrivals, request, view=self)
-
-        serialized = []
-        for arrival in page_arrivals:
-            employee = arrival.get('employee')
-            emp_data = _serialize_employee_min(employee)
-
-            serialized.append({
-                'employee': emp_data,
-                'check_in': _dt_iso(arrival.get('check_in')),
-                'scheduled_arrival': _dt_iso(arrival.get('scheduled_arrival')),
-                'late_seconds': int(arrival.get('late_seconds') or 0),
-                'late_minutes': round(arrival.get('late_seconds', 0) / 60, 1),
-            })
+        attendance_date = attendance_date or timezone.localdate()
 
-        requested_format = _get_requested_date_format(request)
+        def build_payload():
+            late_arrivals = get_late_arrivals(
+                attendance_date=attendance_date,
+                branch_id=branch_id,
+                department_id=department_id,
+                enterprise_id=enterprise.id,
+            )
 
-        return Response({
-            'late_arrivals': serialized,
-            'count': paginator.page.paginator.count,
-            'attendance_date': str(attendance_date or timezone.localdate()),
-            'attendance_date_ad': _format_ad_bs(attendance_date or timezone.localdate())[0],
-            'attendance_date_bs': _format_ad_bs(attendance_date or timezone.localdate())[1],
-            'requested_date_format': requested_format,
-            'pagination': {
-                'next': paginator.get_next_link(),
-                'previous': paginator.get_previous_link(),
-                'page': paginator.page.number,
-                'page_size': self.pagination_class.page_size,
-            },
-        })
+            paginator = self.pagination_class()
+            page_arrivals = paginator.paginate_queryset(late_arrivals, request, view=self)
+
+            serialized = []
+            for arrival in page_arrivals:
+                employee = arrival.get('employee')
+                emp_data = _serialize_employee_min(employee)
+
+                serialized.append({
+                    'employee': emp_data,
+                    'check_in': _dt_iso(arrival.get('check_in')),
+                    'scheduled_arrival': _dt_iso(arrival.get('scheduled_arrival')),
+                    'late_seconds': int(arrival.get('late_seconds') or 0),
+                    'late_minutes': round(arrival.get('late_seconds', 0) / 60, 1),
+                })
+
+            return {
+                'late_arrivals': serialized,
+                'count': paginator.page.paginator.count,
+                'attendance_date': str(attendance_date),
+                'attendance_date_ad': _format_ad_bs(attendance_date)[0],
+                'attendance_date_bs': _format_ad_bs(attendance_date)[1],
+                'requested_date_format': _get_requested_date_format(request),
+                'pagination': {
+                    'next': paginator.get_next_link(),
+                    'previous': paginator.get_previous_link(),
+                    'page': paginator.page.number,
+                    'page_size': self.pagination_class.page_size,
+                },
+            }
+
+        return Response(cached_dashboard(
+            'late-arrivals', enterprise.id, attendance_date, build_payload,
+            branch_id=branch_id, department_id=department_id, variant=request.get_full_path(),
+        ))
 
 
 class EarlyDeparturesAPIView(APIView):
@@ -924,46 +920,62 @@ class EarlyDeparturesAPIView(APIView):
             return Response({'error': 'Branch not found for your enterprise'}, status=404)
         if department_id and not Department.objects.filter(id=department_id, enterprise=enterprise).exists():
             return Response({'error': 'Department not found for your enterprise'}, status=404)
-        
-        early_departures = get_early_departures(
-            attendance_date=attendance_date,
-            branch_id=branch_id,
-            department_id=department_id,
-            enterprise_id=enterprise.id,
-        )
 
-        paginator = self.pagination_class()
-        page_departures = paginator.paginate_queryset(early_departures, request, view=self)
-
-        serialized = []
-        for departure in page_departures:
-            employee = departure.get('employee')
-            emp_data = _serialize_employee_min(employee)
-
-            serialized.append({
-                'employee': emp_data,
-                'check_out': _dt_iso(departure.get('check_out')),
-                'scheduled_departure': _dt_iso(departure.get('scheduled_departure')),
-                'early_seconds': int(departure.get('early_seconds') or 0),
-                'early_minutes': round(departure.get('early_seconds', 0) / 60, 1),
-            })
+        attendance_date = attendance_date or timezone.localdate()
 
-        requested_format = _get_requested_date_format(request)
+        def build_payload():
+            early_departures = get_early_departures(
+                attendance_date=attendance_date,
+                branch_id=branch_id,
+                department_id=department_id,
+                enterprise_id=enterprise.id,
+            )
 
-        return Response({
-            'early_departures': serialized,
-            'count': paginator.page.paginator.count,
-            'attendance_date': str(attendance_date or timezone.localdate()),
-            'attendance_date_ad': _format_ad_bs(attendance_date or timezone.localdate())[0],
-            'attendance_date_bs': _format_ad_bs(attendance_date or timezone.localdate())[1],
-            'requested_date_format': requested_format,
-            'pagination': {
-                'next': paginator.get_next_link(),
-                'previous': paginator.get_previous_link(),
-                'page': paginator.page.number,
-                'page_size': self.pagination_class.page_size,
-            },
-        })
+            paginator = self.pagination_class()
+            page_departures = paginator.paginate_queryset(early_departures, request, view=self)
+
+            serialized = []
+            for departure in page_departures:
+                employee = departure.get('employee')
+                emp_data = _serialize_employee_min(employee)
+
+                serialized.append({
+                    'employee': emp_data,
+                    'check_out': _dt_iso(departure.get('check_out')),
+                    'scheduled_departure': _dt_iso(departure.get('scheduled_departure')),
+                    'early_seconds': int(departure.get('early_seconds') or 0),
+                    'early_minutes': round(departure.get('early_seconds', 0) / 60, 1),
+                })
+
+            return {
+                'early_departures': serialized,
+                'count': paginator.page.paginator.count,
+                'attendance_date': str(attendance_date),
+                'attendance_date_ad': _format_ad_bs(attendance_date)[0],
+                'attendance_date_bs': _format_ad_bs(attendance_date)[1],
+                'requested_date_format': _get_requested_date_format(request),
+                'pagination': {
+                    'next': paginator.get_next_link(),
+                    'previous': paginator.get_previous_link(),
+                    'page': paginator.page.number,
+                    'page_size': self.pagination_class.page_size,
+                },
+            }
+
+        return Response(cached_dashboard(
+            'early-departures', enterprise.id, attendance_date, build_payload,
+            branch_id=branch_id, department_id=department_id, variant=request.get_full_path(),
+        ))
+
+
+def _format_ad_bs_many(days) -> dict:
+    """``_format_ad_bs`` of every day in ``days``, converted in one batch."""
+    try:
+        from .date_utils import ad_to_bs_many, format_bs_date
+
+        return {day: (str(day), format_bs_date(*bs)) for day, bs in zip(days, ad_to_bs_many(days))}
+    except Exception:
+        return {day: _format_ad_bs(day) for day in days}
 
 
 def _parse_date_param(value: str | None, *, date_format: str | None = None):
@@ -1066,7 +1078,7 @@ class MonthlySummaryAPIView(APIView):
             return Response({'error': 'Employee not found for your enterprise'}, status=404)
 
         # Employees to include
-        employees = Employee.objects.filter(is_active=True, enterprise=enterprise).select_related('department')
+        employees = Employee.objects.filter(is_active=True, enterprise=enterprise)
         if branch_id:
             employees = employees.filter(branch_id=branch_id)
         if department_id:
@@ -1074,28 +1086,31 @@ class MonthlySummaryAPIView(APIView):
         if employee_id:
             employees = employees.filter(id=employee_id)
 
-        summaries = DailyAttendance.objects.filter(
-            attendance_date__range=(start, end),
-            employee__enterprise=enterprise,
-        ).select_related('employee', 'employee__department')
-        if employee_id:
-            summaries = summaries.filter(employee_id=employee_id)
-
-        # Index by employee
-        by_emp = {}
-        for s in summaries:
-            by_emp.setdefault(s.employee_id, []).append(s)
+        # Paginate the employees first, then total only their days in one GROUP BY
+        paginator = self.pagination_class()
+        page_employees = paginator.paginate_queryset(
+            employees.order_by('name', 'employee_code', 'id').only('id', 'employee_code', 'name'), request, view=self,
+        )
+        totals = {
+            row['employee_id']: row
+            for row in DailyAttendance.objects.filter(
+                employee_id__in=[emp.id for emp in page_employees],
+                attendance_date__range=(start, end),
+            ).values('employee_id').annotate(
+                present_days=Count('id', filter=Q(present=True)),
+                late_days=Count('id', filter=Q(late_seconds__gt=0)),
+                worked_minutes=Sum('worked_minutes'),
+            ).order_by()
+        }
 
-        result = []
+        page = []
         total_days = (end - start).days + 1
-        for emp in employees.order_by('name', 'employee_code'):
-            records = by_emp.get(emp.id, [])
-            present_days = sum(1 for r in records if bool(r.present))
-            absent_days = total_days - present_days
-            late_days = sum(1 for r in records if DailyAttendanceSerializer(r).data.get('late_seconds', 0) > 0)
-            worked_minutes = sum(int(r.worked_minutes or 0) for r in records)
-
-            result.append({
+        for emp in page_employees:
+            row = totals.get(emp.id, {})
+            present_days = row.get('present_days', 0)
+            worked_minutes = row.get('worked_minutes') or 0
+
+            page.append({
                 'employee': {
                     'id': emp.id,
                     'employee_code': emp.employee_code,
@@ -1103,15 +1118,12 @@ class MonthlySummaryAPIView(APIView):
                 },
                 'total_days': total_days,
                 'present_days': present_days,
-                'absent_days': absent_days,
-                'late_days': late_days,
+                'absent_days': total_days - present_days,
+                'late_days': row.get('late_days', 0),
                 'worked_minutes': worked_minutes,
                 'worked_hours': round(worked_minutes / 60, 2),
             })
 
-        paginator = self.pagination_class()
-        page = paginator.paginate_queryset(result, request, view=self)
-
         response_data = {
             'start_date': str(start),
             'end_date': str(end),
@@ -1136,13 +1148,16 @@ class MonthlySummaryAPIView(APIView):
         return Response(response_data)
 
 
-class MonthlySummaryDetailedAPIView(APIView):
+class MonthlySummaryDetailedAPIView(ReportExportMixin, APIView):
     """Return a detailed per-employee per-day matrix for a month.
 
-    Query params same as MonthlySummaryAPIView.
+    Query params same as MonthlySummaryAPIView, plus ``format=csv|xlsx`` to
+    download the whole matrix (one line per employee and day) instead of a page.
     """
     permission_classes = [IsAuthenticated, IsAdminRole]
     pagination_class = DefaultPagination
+    # Employees whose days are loaded together while exporting
+    export_chunk_size = 200
 
     def get(self, request: HttpRequest):
         enterprise = _resolve_user_enterprise(request.user)
@@ -1177,103 +1192,23 @@ class MonthlySummaryDetailedAPIView(APIView):
             employees = employees.filter(department_id=department_id)
         if employee_id:
             employees = employees.filter(id=employee_id)
-
-        employee_ids = list(employees.values_list('id', flat=True))
-
-        summaries = DailyAttendance.objects.filter(
-            attendance_date__range=(start, end),
-            employee__enterprise=enterprise,
-        ).select_related('employee', 'employee__department')
-        if employee_id:
-            summaries = summaries.filter(employee_id=employee_id)
-        by_emp = {}
-        for s in summaries:
-            by_emp.setdefault(s.employee_id, {})[str(s.attendance_date)] = DailyAttendanceSerializer(s).data
-
-        events_by_emp_date: dict[int, dict[str, list[AttendanceEvent]]] = {}
-        if employee_ids:
-            attendance_events = (
-                AttendanceEvent.objects.filter(
-                    employee_id__in=employee_ids,
-                    event_time__date__range=(start, end),
-                )
-                .order_by('event_time', 'id')
-            )
-            for event in attendance_events:
-                event_day = timezone.localtime(event.event_time).date()
-                events_by_emp_date.setdefault(event.employee_id, {}).setdefault(str(event_day), []).append(event)
+        employees = employees.order_by('name', 'employee_code', 'id').only('id', 'name', 'employee_code')
 
         days = []
         current_day = start
         while current_day <= end:
             days.append(current_day)
             current_day += timedelta(days=1)
-        rows = []
-        for emp in employees.order_by('name', 'employee_code'):
-            emp_days = by_emp.get(emp.id, {})
-            # Build day entries
-            day_entries = []
-            for day_value in days:
-                entry = emp_days.get(str(day_value))
-                day_events = events_by_emp_date.get(emp.id, {}).get(str(day_value), [])
-                break_sessions = []
-                current_break_out = None
-                for event in day_events:
-                    if event.event_type == AttendanceEvent.BREAK_OUT:
-                        if current_break_out is not None:
-                            break_sessions.append({'break_out': current_break_out, 'break_in': None})
-                        current_break_out = event.event_time
-                    elif event.event_type == AttendanceEvent.BREAK_IN:
-                        if current_break_out is not None:
-                            break_sessions.append({'break_out': current_break_out, 'break_in': event.event_time})
-                            current_break_out = None
-                        else:
-                            break_sessions.append({'break_out': None, 'break_in': event.event_time})
-
-                if current_break_out is not None:
-                    break_sessions.append({'break_out': current_break_out, 'break_in': None})
 
-                first_break_out = next((session.get('break_out') for session in break_sessions if session.get('break_out')), None)
-                last_break_in = next((session.get('break_in') for session in reversed(break_sessions) if session.get('break_in')), None)
-
-                if entry:
-                    day_entries.append({
-                        **entry,
-                        'break_out': _dt_iso(first_break_out),
-                        'break_in': _dt_iso(last_break_in),
-                        'break_sessions': [
-                            {
-                                'break_out': _dt_iso(session.get('break_out')),
-                                'break_in': _dt_iso(session.get('break_in')),
-                            }
-                            for session in break_sessions
-                        ],
-                    })
-                else:
-                    ad, bs = _format_ad_bs(day_value)
-                    day_entries.append({
-                        'attendance_date': ad,
-                        'attendance_date_ad': ad,
-                        'attendance_date_bs': bs,
-                        'present': False,
-                        'break_out': _dt_iso(first_break_out),
-                        'break_in': _dt_iso(last_break_in),
-                        'break_sessions': [
-                            {
-                                'break_out': _dt_iso(session.get('break_out')),
-                                'break_in': _dt_iso(session.get('break_in')),
-                            }
-                            for session in break_sessions
-                        ],
-                    })
-
-            rows.append({
-                'employee': {'id': emp.id, 'name': emp.name, 'employee_code': emp.employee_code},
-                'days': day_entries,
-            })
+        export_format = request.GET.get('format')
+        if export_format in EXPORT_FORMATS:
+            report = MonthlyMatrixReport(self, employees, days)
+            return export_report(report, export_format, f'attendance-{start}-{end}')
 
+        # Only the employees on the requested page get their days built
         paginator = self.pagination_class()
-        page = paginator.paginate_queryset(rows, request, view=self)
+        page_employees = paginator.paginate_queryset(employees, request, view=self)
+        page = self.build_rows(page_employees, days)
 
         response_data = {
             'start_date': str(start),
@@ -1299,10 +1234,146 @@ class MonthlySummaryDetailedAPIView(APIView):
 
         return Response(response_data)
 
+    def build_rows(self, employees, days) -> list[dict]:
+        """Matrix rows of ``employees`` over ``days``, from one query for summaries and one for events."""
+        employees = list(employees)
+        if not employees:
+            return []
+        employee_ids = [emp.id for emp in employees]
+
+        summaries = DailyAttendance.objects.filter(
+            employee_id__in=employee_ids,
+            attendance_date__range=(days[0], days[-1]),
+        ).select_related('employee')
+        by_emp = {}
+        for s in summaries:
+            by_emp.setdefault(s.employee_id, {})[str(s.attendance_date)] = DailyAttendanceSerializer(s).data
+
+        events_by_emp_date: dict[int, dict[str, list[AttendanceEvent]]] = {}
+        attendance_events = AttendanceEvent.objects.filter(
+            within_local_days(days[0], days[-1]),
+            employee_id__in=employee_ids,
+            event_type__in=(AttendanceEvent.BREAK_OUT, AttendanceEvent.BREAK_IN),
+        ).only('employee_id', 'event_type', 'event_time').order_by('event_time', 'id')
+        for event in attendance_events:
+            event_day = timezone.localtime(event.event_time).date()
+            events_by_emp_date.setdefault(event.employee_id, {}).setdefault(str(event_day), []).append(event)
+
+        day_labels = _format_ad_bs_many(days)
+        rows = []
+        for emp in employees:
+            emp_days = by_emp.get(emp.id, {})
+            # Build day entries
+            day_entries = []
+            for day_value in days:
+                entry = emp_days.get(str(day_value))
+                break_sessions = _build_break_sessions(events_by_emp_date.get(emp.id, {}).get(str(day_value), []))
+
+                first_break_out = next((session.get('break_out') for session in break_sessions if session.get('break_out')), None)
+                last_break_in = next((session.get('break_in') for session in reversed(break_sessions) if session.get('break_in')), None)
+
+                if not entry:
+                    ad, bs = day_labels[day_value]
+                    entry = {
+                        'attendance_date': ad,
+                        'attendance_date_ad': ad,
+                        'attendance_date_bs': bs,
+                        'present': False,
+                    }
+                day_entries.append({
+                    **entry,
+                    'break_out': _dt_iso(first_break_out),
+                    'break_in': _dt_iso(last_break_in),
+                    'break_sessions': [
+                        {
+                            'break_out': _dt_iso(session.get('break_out')),
+                            'break_in': _dt_iso(session.get('break_in')),
+                        }
+                        for session in break_sessions
+                    ],
+                })
+
+            rows.append({
+                'employee': {'id': emp.id, 'name': emp.name, 'employee_code': emp.employee_code},
+                'days': day_entries,
+            })
+        return rows
+
+
+class MonthlyMatrixReport:
+    """
+    The detailed matrix as export lines, one per employee and day, built
+    ``export_chunk_size`` employees at a time so the file streams out.
+    """
+
+    columns = [
+        'employee_code', 'employee_name', 'attendance_date_ad', 'attendance_date_bs', 'present',
+        'first_check_in', 'last_check_out', 'break_out', 'break_in', 'worked_hours',
+        'late_minutes', 'early_minutes',
+    ]
+
+    def __init__(self, view, employees, days):
+        self.view = view
+        self.employees = employees
+        self.days = days
+        self.employee_count = 0
+        self.present_days = 0
+
+    def rows(self):
+        chunk_size = self.view.export_chunk_size
+        chunk = []
+        for emp in self.employees.iterator(chunk_size=chunk_size):
+            chunk.append(emp)
+            if len(chunk) == chunk_size:
+                yield from self._lines(chunk)
+                chunk = []
+        yield from self._lines(chunk)
+
+    def _lines(self, employees):
+        for row in self.view.build_rows(employees, self.days):
+            self.employee_count += 1
+            for day in row['days']:
+                self.present_days += int(bool(day.get('present')))
+                yield {
+                    'employee_code': row['employee']['employee_code'],
+                    'employee_name': row['employee']['name'],
+                    'attendance_date_ad': day.get('attendance_date_ad'),
+                    'attendance_date_bs': day.get('attendance_date_bs'),
+                    'present': bool(day.get('present')),
+                    'first_check_in': day.get('first_check_in'),
+                    'last_check_out': day.get('last_check_out'),
+                    'break_out': day.get('break_out'),
+                    'break_in': day.get('break_in'),
+                    'worked_hours': day.get('worked_hours', 0),
+                    'late_minutes': round((day.get('late_seconds') or 0) / 60, 1),
+                    'early_minutes': round((day.get('early_seconds') or 0) / 60, 1),
+                }
+
+    def totals(self):
+        return {
+            'employees': self.employee_count,
+            'days_in_range': len(self.days),
+            'present_days': self.present_days,
+        }
+
 
 def sse_events_view(request: HttpRequest):
+    """
+    Live attendance events of the caller's enterprise, optionally narrowed
+    to ``?branch_id=``. Reconnecting clients send ``Last-Event-ID`` (the
+    browser does this itself) and get the events they missed replayed.
+    """
+    user = _sse_user(request)
+    enterprise = _resolve_user_enterprise(user) if user is not None else None
+    if enterprise is None:
+        return HttpResponse('Unauthorized', status=401)
+    branch_id = _parse_optional_int(request.GET.get('branch_id'))
+    last_event_id = request.META.get('HTTP_LAST_EVENT_ID') or request.GET.get('last_event_id')
+
+    subscription = subscribe(enterprise_id=enterprise.id, branch_id=branch_id, last_event_id=last_event_id)
+    keepalive = getattr(settings, 'ATTENDANCE_SSE_KEEPALIVE', 15)
     # StreamingHttpResponse with the proper SSE content type
-    response = StreamingHttpResponse(_sse_event_stream(request), content_type='text/event-stream')
+    response = StreamingHttpResponse(_sse_event_stream(subscription, keepalive), content_type='text/event-stream')
     response['Cache-Control'] = 'no-cache'
     response['X-Accel-Buffering'] = 'no'
     return response
@@ -217,3 +217,28 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 # Trust the X-Forwarded-Proto header so `request.is_secure()` is correct
 SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
 USE_X_FORWARDED_HOST = True
+
+
+# Live attendance events (attendance/ssm.py). The broker defaults to
+# PostgreSQL LISTEN/NOTIFY on PostgreSQL and to in-process delivery otherwise.
+ATTENDANCE_EVENT_BROKER = os.getenv('ATTENDANCE_EVENT_BROKER') or None
+ATTENDANCE_SSE_BUFFER_SIZE = 100     # events queued per client before the oldest is dropped
+ATTENDANCE_SSE_HISTORY_SIZE = 500    # recent events kept for Last-Event-ID replay
+ATTENDANCE_SSE_KEEPALIVE = 15        # seconds between keep-alive comments on an idle stream
+ATTENDANCE_SSE_TICKET_MAX_AGE = 30   # seconds a single-use stream ticket stays valid
+
+# Shared by every gunicorn worker, so a dashboard payload is computed once
+# for all of them; the table is created after ``migrate``.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'django_cache',
+    }
+}
+ATTENDANCE_DASHBOARD_CACHE_TIMEOUT = 30   # seconds a dashboard payload is served without a punch
+ATTENDANCE_DASHBOARD_LOCK_TIMEOUT = 10    # seconds other workers wait for the one computing a payload
+
+# Sales bill numbers (alltransactions/bill_numbers.py) run per enterprise;
+# set this to number each branch's bills separately.
+SALES_BILL_NUMBERS_PER_BRANCH = False
+SALES_BILL_NUMBER_MAX_BLOCK = 500     # most numbers a till can reserve at once
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import logging
 from datetime import timedelta
 
 from django.http import HttpRequest, HttpResponse
@@ -20,15 +21,7 @@ from enterprise.permissions import IsAdminRole
 from alltransactions.models import EmployeeTransactions
 from alltransactions.serializers import EmployeeTransactionSerializer
 
-from attendance.services import (
-    DailyAttendance,
-    infer_next_event_code,
-    parse_device_timestamp,
-    parse_event_code,
-    record_device_event,
-    register_biometric_device,
-    resolve_employee,
-)
+from attendance.ingest import ingest_punches
 from enterprise.models import Employee
 
 from .models import BiometricDevice, DeviceCommand, EmployeeBiometricMapping
@@ -42,6 +35,9 @@ from .serializers import (
 from .services import sync_employee_to_device
 
 
+logger = logging.getLogger(__name__)
+
+
 class CsrfExemptSessionAuthentication(SessionAuthentication):
     def enforce_csrf(self, request):
         return
@@ -58,13 +54,6 @@ def _plain_text_response(message: str) -> HttpResponse:
     return HttpResponse(message, content_type='text/plain; charset=utf-8')
 
 
-def _pick_value(payload: dict, keys: list[str], default=None):
-    for key in keys:
-        if key in payload and payload[key] not in (None, ''):
-            return payload[key]
-    return default
-
-
 def _parse_iclock_row_format(raw_str: str) -> dict:
     row = raw_str.strip()
     if not row:
@@ -125,6 +114,32 @@ def _parse_request_data(request: HttpRequest) -> dict:
     return data
 
 
+def _record_daily_wages(result) -> None:
+    """Replace the day's Daily Wage of every hourly-wage employee who checked out in this batch."""
+    for employee_id, attendance_date in sorted(result.check_outs):
+        employee = result.employees[employee_id]
+        if not employee.is_hourly_wage:
+            continue
+        working_hours = result.summaries[(employee_id, attendance_date)].worked_minutes / 60
+        EmployeeTransactions.objects.filter(
+            employee=employee,
+            transaction_type='Daily Wage',
+            date=attendance_date,
+        ).delete()
+        serializer = EmployeeTransactionSerializer(data={
+            'employee': employee.id,
+            'transaction_type': 'Daily Wage',
+            'amount': employee.hourly_rate * working_hours,
+            'branch': employee.branch.id if employee.branch else None,
+            'enterprise': employee.enterprise.id,
+            'employee_type': 'salary',
+            'desc': f"Checked out after working for {working_hours:.2f} hours",
+            'date': attendance_date,
+        })
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+
 @csrf_exempt
 @require_http_methods(["GET", "POST"])
 def adms_cdata(request):
@@ -163,7 +178,6 @@ def adms_cdata(request):
             payload['raw'] = raw_body
 
     base_payload = dict(payload) if isinstance(payload, dict) else {}
-    print(base_payload)
     base_payload.update(request.GET.dict())
     rows = base_payload.pop('rows', None)
     if isinstance(rows, list) and rows:
@@ -171,100 +185,9 @@ def adms_cdata(request):
     else:
         records = [base_payload]
 
-    for record_payload in records:
-        sn = _pick_value(record_payload, ['SN', 'sn', 'device_sn', 'DeviceSN'], 'unknown')
-        employee_identifier = _pick_value(
-            record_payload,
-            ['PIN', 'pin', 'UserID', 'userid', 'USERID', 'EMPID', 'empid', 'employee_id', 'device_id', 'CardNo', 'cardno', 'ID', 'id'],
-        )
-        event_code = parse_event_code(
-            _pick_value(record_payload, ['event_code', 'event', 'type', 'eventtype', 'eventType', 'attendance_type', 'status'])
-        )
-        event_time = parse_device_timestamp(
-            _pick_value(record_payload, ['timestamp', 'time', 'datetime', 'date_time', 'punch_time', 'punchTime'])
-        )
-
-        if sn:
-            register_biometric_device(sn, last_seen_at=event_time)
-
-        employee = resolve_employee(employee_identifier, device_serial=sn)
-        if employee is None:
-            continue
-
-
-        if event_code is None:
-            event_code = infer_next_event_code(employee, event_time)
-
-        if sn:
-            device = register_biometric_device(
-                sn,
-                enterprise=getattr(employee, 'enterprise', None),
-                branch=getattr(employee, 'branch', None),
-                last_seen_at=event_time,
-            )
-            if device is not None and device.enterprise_id is None and employee.enterprise_id is not None:
-                device.enterprise = employee.enterprise
-                device.branch = employee.branch
-                device.save(update_fields=['enterprise', 'branch'])
-        
-        print("event code", event_code)
-
-        record_device_event(
-            employee=employee,
-            event_type=event_code,
-            event_time=event_time,
-            device_serial=str(sn),
-            raw_payload=record_payload,
-        )
-
-        # now add the transaction
-        if event_code == 1:  # Check-out
-            # if no other checkouts that day, then add a transaction
-            attendance_today = DailyAttendance.objects.filter(employee=employee,attendance_date=event_time.date()).first()
-            working_hours = attendance_today.worked_minutes / 60
-            if employee.is_hourly_wage:
-                if not attendance_today.last_check_out:
-                    print("Adding transaction for employee", employee.id)
-                    #get today's working hours
-                     
-                    serializer = EmployeeTransactionSerializer(data={
-                        'employee': employee.id,
-                        'transaction_type': 'Daily Wage',
-                        'amount': employee.hourly_rate * working_hours,
-                        'branch': employee.branch.id if employee.branch else None,
-                        'enterprise': employee.enterprise.id,
-                        'employee_type': 'salary',
-                        'desc': f"Checked out after working for {working_hours:.2f} hours",
-                        'date': event_time.date(),
-                    })
-
-                    serializer.is_valid(raise_exception=True)
-                    et = serializer.save() 
-                else:
-                    #delete the last transaction of type Daily Wage for today, since this is not a valid checkout
-                    EmployeeTransactions.objects.filter(
-                        employee=employee,
-                        transaction_type='Daily Wage',
-                        date=event_time.date(),
-                    ).delete()
-                    #record a new transaction
-                    serializer = EmployeeTransactionSerializer(data={
-                        'employee': employee.id,
-                        'transaction_type': 'Daily Wage',
-                        'amount': employee.hourly_rate * working_hours,
-                        'branch': employee.branch.id if employee.branch else None,
-                        'enterprise': employee.enterprise.id,
-                        'employee_type': 'salary',
-                        'desc': f"Checked out after working for {working_hours:.2f} hours",
-                        'date': event_time.date(),
-                    })
-
-                    serializer.is_valid(raise_exception=True)
-                    et = serializer.save() 
-               
-
-                print("Here is the transaction,", et)
-        print("Done Recording")
+    result = ingest_punches(records)
+    _record_daily_wages(result)
+    logger.info("ATTLOG push from %s: %s", serial_number, result.as_dict())
 
     return _plain_text_response('OK')
 
@@ -8,6 +8,22 @@ python manage.py makemigrations allinventory alltransactions enterprise userauth
 echo "===> Running migrations..."
 python manage.py migrate --noinput
 
+# Products that predate the stock journal start from their live count
+echo "===> Opening the stock journal..."
+python manage.py open_stock_journal
+
+# The dashboard reads the daily ledger rollup, not the raw lines
+echo "===> Rebuilding the daily ledger..."
+python manage.py rebuild_daily_ledger
+
+# Late and early seconds are stored on the daily summaries, not worked out on read
+echo "===> Refreshing attendance schedules..."
+python manage.py refresh_attendance_schedules
+
+# Customer lists read the stored spend and visit totals
+echo "===> Rebuilding customer totals..."
+python manage.py rebuild_customer_totals
+
 # 2. (Optional) Re-collect static files if anything changed
 echo "===> Collecting static files..."
 python manage.py collectstatic --noinput
@@ -5,7 +5,10 @@ from .models import Order, OrderItem
 from rest_framework.status import HTTP_404_NOT_FOUND
 from .serializers import OrderSerializer, OrderItemSerializer
 from rest_framework.response import Response
-from rest_framework.pagination import PageNumberPagination
+from alltransactions.pagination import KeysetPagination
+from django.db.models import Value
+from django.db.models.functions import Coalesce
+import datetime
 from rest_framework import status
 from allinventory.models import IncentiveProduct
 from django.utils import timezone
@@ -49,8 +52,10 @@ class OrderView(APIView):
         if status:
             orders = orders.filter(status=status)
 
-        orders = orders.order_by('due_date')
-        paginator = PageNumberPagination()
+        # Orders without a due date come last
+        orders = orders.annotate(due=Coalesce('due_date', Value(datetime.date.max)))
+        paginator = KeysetPagination()
+        paginator.ordering = ('due', 'id')
         paginator.page_size = 5  # Set the page size here
         paginated_orders = paginator.paginate_queryset(orders, request)
         serializer = OrderSerializer(paginated_orders, many=True)
@@ -97,8 +102,8 @@ class IncentiveProductView(APIView):
         if branch:
             incentive_products = incentive_products.filter(branch=branch)
 
-        incentive_products = incentive_products.order_by('name')
-        paginator = PageNumberPagination()
+        paginator = KeysetPagination()
+        paginator.ordering = ('name', 'id')
         paginator.page_size = 5  # Set the page size here
         paginated_incentive_products = paginator.paginate_queryset(incentive_products, request)
         serializer = IncentiveProductSerializer(paginated_incentive_products, many=True)
@@ -809,6 +809,11 @@ function AllSalesTransactionForm({ isExchange = false, isEdit = false }) {
             ? `Sales exchanged exceeding balance ${previousBalance.toFixed(2)}`
             : "",
       };
+      // The suggested bill number may have been taken by another till since;
+      // leave it out so the server hands out the next free one.
+      if (!isEdit && String(formData.bill_no) === String(nextBill)) {
+        delete payload.bill_no;
+      }
 
       if (useLoyaltyPoints) {
         payload.amount_paid = 0;
@@ -307,48 +307,68 @@ function AttendanceReportContent() {
     if (!branchId) return;
     
     const baseUrl = import.meta.env.VITE_API_URL || 'http://localhost:8000';
-    const url = `${baseUrl}/attendance/api/events/stream/`;
     let es = null;
+    let closed = false;
+    let retryTimer = null;
+    let lastEventId = '';
 
-    try {
-      es = new EventSource(url);
-      es.onmessage = (e) => {
-        try {
-          const payload = JSON.parse(e.data);
-          const eventId = payload?.event_id;
-          const fallbackKey = `${payload?.employee_id ?? 'x'}:${payload?.event_type ?? 'x'}:${payload?.event_time ?? 'x'}`;
-          const eventKey = eventId ? `id:${String(eventId)}` : `sig:${fallbackKey}`;
-
-          if (seenEventKeysRef.current.has(eventKey)) {
-            return;
-          }
-          seenEventKeysRef.current.add(eventKey);
-          if (seenEventKeysRef.current.size > 500) {
-            const keys = Array.from(seenEventKeysRef.current);
-            seenEventKeysRef.current = new Set(keys.slice(keys.length - 250));
-          }
-
-          setAttendanceRows((prev) => {
-            const { rows, added } = applyEventToRows(prev, payload);
-            if (added) setTotalCount((count) => count + 1);
-            return rows;
-          });
-
-          if (showAll) {
-            setAllAttendanceRows((prev) => applyEventToRows(prev, payload).rows);
+    // EventSource can't send the Authorization header, so each connection
+    // opens with a short-lived, single-use ticket instead of the access token
+    const connect = async () => {
+      try {
+        const { data } = await api.post('attendance/api/events/ticket/');
+        if (closed) return;
+        const streamParams = new URLSearchParams({
+          ticket: data.ticket,
+          branch_id: String(branchId),
+        });
+        if (lastEventId) streamParams.set('last_event_id', lastEventId);
+        es = new EventSource(`${baseUrl}/attendance/api/events/stream/?${streamParams.toString()}`);
+        es.onmessage = (e) => {
+          if (e.lastEventId) lastEventId = e.lastEventId;
+          try {
+            const payload = JSON.parse(e.data);
+            const eventId = payload?.event_id;
+            const fallbackKey = `${payload?.employee_id ?? 'x'}:${payload?.event_type ?? 'x'}:${payload?.event_time ?? 'x'}`;
+            const eventKey = eventId ? `id:${String(eventId)}` : `sig:${fallbackKey}`;
+
+            if (seenEventKeysRef.current.has(eventKey)) {
+              return;
+            }
+            seenEventKeysRef.current.add(eventKey);
+            if (seenEventKeysRef.current.size > 500) {
+              const keys = Array.from(seenEventKeysRef.current);
+              seenEventKeysRef.current = new Set(keys.slice(keys.length - 250));
+            }
+
+            setAttendanceRows((prev) => {
+              const { rows, added } = applyEventToRows(prev, payload);
+              if (added) setTotalCount((count) => count + 1);
+              return rows;
+            });
+
+            if (showAll) {
+              setAllAttendanceRows((prev) => applyEventToRows(prev, payload).rows);
+            }
+          } catch (err) {
+            // Ignore malformed events
           }
-        } catch (err) {
-          // Ignore malformed events
-        }
-      };
-      es.onerror = () => {
-        // Ignore SSE errors; API polling still works
-      };
-    } catch (err) {
-      // SSE initialization failed; API polling still works
-    }
+        };
+        es.onerror = () => {
+          // The ticket is spent, so reconnect with a new one; API polling still works meanwhile
+          es.close();
+          if (!closed) retryTimer = setTimeout(connect, 3000);
+        };
+      } catch (err) {
+        // SSE initialization failed; API polling still works
+        if (!closed) retryTimer = setTimeout(connect, 15000);
+      }
+    };
+    connect();
 
     return () => {
+      closed = true;
+      clearTimeout(retryTimer);
       if (es) es.close();
     };
   }, [branchId, showAll]);